@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Arabic text normalization for matching
+Folds spelling variants that speech recognition output mixes freely
+"""
+
+from typing import List, Tuple
+
+# Short vowels, tanween, shadda, sukun and dagger alef
+TASHKEEL = set("ًٌٍَُِّْٰ")
+TATWEEL = "ـ"
+
+CHARACTER_MAP = {
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا",
+    "ى": "ي", "ئ": "ي",
+    "ؤ": "و",
+    "ة": "ه",
+}
+# Arabic-Indic and Eastern Arabic-Indic (Persian) digits
+for _offset in range(10):
+    CHARACTER_MAP[chr(0x0660 + _offset)] = str(_offset)
+    CHARACTER_MAP[chr(0x06F0 + _offset)] = str(_offset)
+
+PUNCTUATION = set(".,;:!?؟،؛\"'()[]{}-_/\\«»…")
+
+
+def normalize_with_offsets(text: str) -> Tuple[str, List[int]]:
+    """Normalize text and map every output character back to its source index"""
+    output: List[str] = []
+    offsets: List[int] = []
+    for index, char in enumerate(text):
+        if char in TASHKEEL or char == TATWEEL:
+            continue
+        char = CHARACTER_MAP.get(char, char).lower()
+        if char.isspace() or char in PUNCTUATION:
+            # Collapse runs of separators into one space
+            if not output or output[-1] == " ":
+                continue
+            char = " "
+        output.append(char)
+        offsets.append(index)
+
+    if output and output[-1] == " ":
+        output.pop()
+        offsets.pop()
+    return "".join(output), offsets
+
+
+# Same folding as normalize_with_offsets, for str.translate
+TRANSLATION = {ord(char): None for char in TASHKEEL | {TATWEEL}}
+TRANSLATION.update({ord(char): value for char, value in CHARACTER_MAP.items()})
+TRANSLATION.update({ord(char): " " for char in PUNCTUATION})
+
+# Attached conjunctions, prepositions and the article, longest first
+PREFIXES = ("وال", "بال", "كال", "فال", "لل", "ال", "و")
+SUFFIXES = ("ها", "ان", "ات", "ون", "ين", "يه", "ه", "ي")
+
+STOP_WORDS = {
+    "في", "من", "الي", "علي", "عن", "مع", "هل", "ما", "ماذا", "متي", "كيف", "اين", "هو", "هي",
+    "هذا", "هذه", "ذلك", "تلك", "التي", "الذي", "ان", "او", "ثم", "لا", "نعم", "كل", "قد", "كان",
+}
+
+
+def normalize_arabic(text: str) -> str:
+    """Fold hamza/alef, yaa, taa marbuta, tashkeel, digits and punctuation"""
+    return " ".join(text.translate(TRANSLATION).lower().split())
+
+
+def light_stem(word: str) -> str:
+    """Strip one common prefix and one suffix from a normalized word (Light10 style)"""
+    for prefix in PREFIXES:
+        if word.startswith(prefix) and len(word) - len(prefix) >= 3:
+            word = word[len(prefix):]
+            break
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 2:
+            word = word[:-len(suffix)]
+            break
+    return word
+
+
+def index_terms(text: str) -> List[str]:
+    """Normalized, stemmed search terms without stop words"""
+    return [light_stem(word) for word in normalize_arabic(text).split() if word not in STOP_WORDS]
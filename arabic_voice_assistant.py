@@ -4,169 +4,654 @@ Arabic Voice Assistant - Final Production Version
 A complete Arabic voice assistant for office use with memory and task management
 """
 
+import time
+from startup import STARTUP
+_imports_started = time.perf_counter()
+
+import argparse
 import asyncio
 import json
 import os
+import re
 import sys
-from typing import Any, Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Dict, List, Optional, Union
 from dotenv import load_dotenv
-import openai
-from elevenlabs import Voice, VoiceSettings
-from elevenlabs.client import ElevenLabs
 import speech_recognition as sr
 import tempfile
 import threading
 import queue
-import time
 from datetime import datetime
-import pickle
-import subprocess
+from audio_playback import PCMPlayer, StreamingAudioPlayer, create_sink
+from response_pipeline import SentencePipeline, SentenceSplitter
+from tts_cache import TTSCache
+from memory_store import MemoryJournal, apply_record, task_index
+from shared_memory import SHARED_OPS, ResyncRequired, SharedOfficeStore
+from recognition_service import RecognitionService
+from audio_capture import ContinuousCapture, MicrophoneSource
+from voice_gate import KeywordSpotter, VoiceGate
+from stt_backends import GOOGLE_SPEECH_ENDPOINT, create_backend
+from intent_router import Intent, IntentRouter
+from response_cache import ResponseCache, memory_fingerprint
+from prompt_builder import (ContextBuilder, prompt_messages, summary_messages, summary_watermark, system_prefix,
+                            turns_to_summarize)
+from memory_index import MemoryIndex, conversation_key, conversation_kind, conversation_text, sentence_embedder
+from metrics import Metrics, MetricsExporter
+from http_pool import HTTPPool
+from circuit_breaker import CircuitBreaker
+from model_router import ModelRouter, load_tiers, voice_limit
+from local_tts import LocalTTS
+from scheduler import Announcement, Meeting, Scheduler, SystemClock, Task, describe_due, item_from_dict, new_item_id, parse_due
+import numpy as np
+
+# The OpenAI and ElevenLabs SDKs take most of a second to import; they are
+# imported on a startup thread in create_api_clients() instead of here
+STARTUP.record("import (eager modules)", _imports_started, time.perf_counter())
 
 # Load environment variables
 load_dotenv()
 
+# Fixed replies that are worth synthesizing once at startup
+DEFAULT_PREWARM_PHRASES = [
+    "تم عرض الإعدادات",
+    "وداعاً! أتمنى لك يوماً سعيداً",
+    "لا توجد مهام حالياً",
+    "رقم المهمة غير صحيح",
+    "يرجى تحديد رقم المهمة المراد حذفها",
+    "يرجى تحديد المهمة المراد إضافتها",
+    "لا توجد محادثات محفوظة",
+    "لا توجد تفضيلات محفوظة",
+    "لا توجد ملاحظات محفوظة",
+    "يمكنني مساعدتك في إدارة المهام والاجتماعات وحفظ التفضيلات",
+    "عذراً، حدث خطأ في معالجة طلبك.",
+]
+
 class ArabicVoiceAssistant:
-    def __init__(self):
-        """Initialize the Arabic Voice Assistant"""
+    def __init__(self, audio_input: bool = True):
+        """Initialize the Arabic Voice Assistant
+
+        With audio_input=False no microphone is opened (server mode, where
+        audio arrives from remote workstations).
+        """
+        init_started = time.perf_counter()
         # API Configuration
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
         self.elevenlabs_api_key = os.getenv("ELEVENLABS_API_KEY")
         self.voice_id = os.getenv("DEFAULT_VOICE_ID")
         self.voice_model = os.getenv("VOICE_MODEL", "eleven_multilingual_v2")
+        self.streaming_playback = os.getenv("STREAMING_PLAYBACK", "true").lower() == "true"
+        self.pipelined_responses = os.getenv("PIPELINED_RESPONSES", "true").lower() == "true"
+        self.capture_during_playback = os.getenv("CAPTURE_DURING_PLAYBACK", "false").lower() == "true"
+        self.voice_settings = {}
+        if os.getenv("VOICE_STABILITY"):
+            self.voice_settings["stability"] = float(os.getenv("VOICE_STABILITY"))
+        if os.getenv("VOICE_SIMILARITY_BOOST"):
+            self.voice_settings["similarity_boost"] = float(os.getenv("VOICE_SIMILARITY_BOOST"))
         
         # Office Configuration
         self.office_name = os.getenv("OFFICE_NAME", "Your Office Name")
         self.assistant_name = os.getenv("ASSISTANT_NAME", "المساعد الذكي")
         self.default_language = "ar"  # Force Arabic only
         
-        # Initialize APIs
-        self.openai_client = openai.OpenAI(api_key=self.openai_api_key)
-        self.elevenlabs_client = ElevenLabs(api_key=self.elevenlabs_api_key)
+        # Per-stage latency histograms and timeout/fallback/error counters
+        self.metrics = Metrics()
+        metrics_port = os.getenv("METRICS_PORT")
+        self.metrics_exporter = MetricsExporter(
+            self.metrics,
+            port=int(metrics_port) if metrics_port else None,
+            host=os.getenv("METRICS_HOST", "127.0.0.1"),
+            dump_path=os.getenv("METRICS_DUMP_FILE") or None,
+            interval=float(os.getenv("METRICS_DUMP_INTERVAL", "60"))
+        )
+        self.metrics_exporter.start()
+        
+        # One keep-alive connection pool per host, shared by the OpenAI,
+        # ElevenLabs and speech-recognition calls
+        self.openai_base_url = os.getenv("OPENAI_BASE_URL") or "https://api.openai.com/v1"
+        self.elevenlabs_base_url = os.getenv("ELEVENLABS_BASE_URL") or "https://api.elevenlabs.io"
+        self.http_pool = HTTPPool(
+            per_host=int(os.getenv("HTTP_POOL_SIZE", "4")),
+            keepalive_expiry=float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "120")),
+            http2=os.getenv("HTTP2", "true").lower() == "true",
+            verify=os.getenv("HTTP_CA_BUNDLE") or True,
+            keep_warm_interval=float(os.getenv("HTTP_KEEP_WARM_INTERVAL", "25"))
+        )
+        
+        # API clients are built on a startup thread (see below)
+        self.openai_client = None
+        self.elevenlabs_client = None
+        
+        # Circuit breakers: once a backend keeps failing or answering slowly,
+        # turns go straight to the fallback until a probe call succeeds
+        self.breakers = {
+            name: CircuitBreaker(
+                name,
+                failure_threshold=int(os.getenv("BREAKER_FAILURES", "3")),
+                error_rate=float(os.getenv("BREAKER_ERROR_RATE", "0.5")),
+                window=int(os.getenv("BREAKER_WINDOW", "20")),
+                slow_call=float(os.getenv("BREAKER_SLOW_CALL", "8")),
+                reset_timeout=float(os.getenv("BREAKER_RESET_TIMEOUT", "30")),
+                on_transition=self.breaker_transition
+            )
+            for name in ("llm", "tts")
+        }
+        # System voice for when ElevenLabs is unavailable, created once in the background
+        self.local_tts = LocalTTS(rate=150)
+        if os.getenv("LOCAL_TTS_PRELOAD", "true").lower() == "true":
+            self.local_tts.start()
+        
+        # Audio playback: raw PCM into one output stream kept open for the
+        # whole session, or MP3 into an external player if no audio library
+        # is installed. Server mode sends audio to workstations instead.
+        jitter_buffer_bytes = int(os.getenv("PLAYBACK_JITTER_BUFFER_BYTES", "4096"))
+        playback_rate = int(os.getenv("PLAYBACK_SAMPLE_RATE", "22050"))
+        sink = create_sink(os.getenv("PLAYBACK_SINK", "auto" if audio_input else "none"), playback_rate)
+        if sink is not None:
+            self.audio_player = PCMPlayer(sink, playback_rate, jitter_buffer_bytes=jitter_buffer_bytes)
+            self.tts_output_format = f"pcm_{playback_rate}"
+        else:
+            self.audio_player = StreamingAudioPlayer(jitter_buffer_bytes=jitter_buffer_bytes)
+            self.tts_output_format = None
+        
+        # TTS cache for phrases that repeat word for word
+        self.tts_cache = TTSCache(
+            cache_dir=os.getenv("TTS_CACHE_DIR", "tts_cache"),
+            max_bytes=int(os.getenv("TTS_CACHE_MAX_MB", "100")) * 1024 * 1024
+        )
         
         # Initialize speech recognition
         self.recognizer = sr.Recognizer()
-        self.microphone = sr.Microphone()
+        self.continuous_capture = audio_input and os.getenv("CONTINUOUS_CAPTURE", "true").lower() == "true"
+        self.microphone = None
+        self.microphone_future = None
+        if self.continuous_capture:
+            # Always-on mic: no reopening or recalibration per utterance.
+            # The device opens on the capture thread while startup continues.
+            self.audio_capture = ContinuousCapture(
+                MicrophoneSource(),
+                pre_roll=float(os.getenv("CAPTURE_PRE_ROLL", "0.3")),
+                end_silence=float(os.getenv("CAPTURE_END_SILENCE", "0.8")),
+                max_utterance=8.0
+            )
+            self.audio_capture.start()
+        
+        # Barge-in: talking over a reply stops it and starts a new turn.
+        # Only needed when capture pauses during playback.
+        self.barge_in_enabled = (self.continuous_capture and not self.capture_during_playback
+                                 and os.getenv("BARGE_IN", "true").lower() == "true")
+        self.barge_in_min_speech = float(os.getenv("BARGE_IN_MIN_SPEECH", "0.1"))
+        self.barge_in_ratio = float(os.getenv("BARGE_IN_RATIO", "4.0"))
+        self.turn_task: Optional[asyncio.Task] = None
+        self.turn_interrupted = threading.Event()
+        
+        # Local gate so silence and background noise never reach the cloud
+        self.voice_gate_enabled = os.getenv("VOICE_GATE", "true").lower() == "true"
+        self.voice_gate = VoiceGate(wake_window=float(os.getenv("WAKE_WORD_WINDOW", "20")))
+        wake_word_templates = os.getenv("WAKE_WORD_TEMPLATES")
+        if wake_word_templates and os.path.isdir(wake_word_templates):
+            spotter = KeywordSpotter(threshold=float(os.getenv("WAKE_WORD_THRESHOLD", "0.16")))
+            if spotter.enroll_directory(wake_word_templates):
+                self.voice_gate.spotter = spotter
+                self.voice_gate.require_wake_word = True
+                print(f"👂 كلمة التنبيه مفعلة: {self.assistant_name}")
+        self.recognition_deadline = float(os.getenv("ASR_DEADLINE", "5"))
+        # Let the HTTP request itself give up too, so hung workers are freed
+        self.recognizer.operation_timeout = self.recognition_deadline
+        
+        # Speech-to-text engine, loaded once (at startup, concurrently) and kept warm
+        self.stt_backend = create_backend(
+            os.getenv("STT_BACKEND", "google"),
+            recognizer=self.recognizer,
+            language='ar-SA',
+            model_path=os.getenv("STT_MODEL_PATH"),
+            endpoint=os.getenv("STT_ENDPOINT") or None,
+            http_pool=self.http_pool
+        )
+        # Hedging only pays off for network engines, not for a local CPU model
+        hedge = os.getenv("ASR_HEDGING", "true").lower() == "true" and self.stt_backend.name == "google"
+        self.recognition_service = RecognitionService(
+            self.stt_backend.recognize,
+            workers=int(os.getenv("ASR_WORKERS", "4")),
+            deadline=self.recognition_deadline,
+            hedge=hedge,
+            definitive_errors=(sr.UnknownValueError,)
+        )
+        
+        # Office commands resolve locally, without an LLM round trip
+        self.intent_router = IntentRouter()
+        
+        # Answers to repeated questions, valid until notes or preferences change
+        self.response_cache_enabled = os.getenv("RESPONSE_CACHE", "true").lower() == "true"
+        self.response_cache = ResponseCache(
+            max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", "256")),
+            ttl=float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+        )
+        
+        # Prompt context under a fixed token budget; older turns are summarized
+        self.context_builder = ContextBuilder(
+            budget=int(os.getenv("PROMPT_CONTEXT_TOKENS", "1000")),
+            window=int(os.getenv("PROMPT_RECENT_TURNS", "5"))
+        )
+        # The instructions never change between turns, so the provider can
+        # serve them from its prefix cache; only the context and question vary
+        self.system_prefix = system_prefix(self.assistant_name, self.office_name)
+        self.summary_batch = int(os.getenv("SUMMARY_BATCH", "5"))
+        self.summary_task = None
+        # Capped LLM streams still being read to the end (see stream_response_tokens)
+        self.stream_drains = set()
+        # Where the running summary lives in office_context (per desk in server mode)
+        self.summary_key = 'conversation_summary'
+        self.summary_until_key = 'summary_until'
+        # Index of the first turn the summary has not absorbed yet
+        self.summary_watermark = 0
+        self.last_prompt_stats = {}
+        
+        # LLM model tiers: each question goes to the smallest tier that can
+        # answer it within the latency budget, with spoken-length limits
+        self.model_router = ModelRouter(
+            load_tiers(os.getenv("LLM_TIERS"), model=os.getenv("LLM_MODEL", "gpt-3.5-turbo")),
+            budget=float(os.getenv("LLM_LATENCY_BUDGET", "4"))
+        )
         
         # Memory system
         self.memory_file = "assistant_memory.pkl"
+        self.memory_journal = MemoryJournal(
+            directory=os.getenv("MEMORY_DIR", "assistant_memory"),
+            snapshot_every=int(os.getenv("MEMORY_SNAPSHOT_EVERY", "500"))
+        )
+        self.memory_journal.state_provider = lambda: (self.conversation_history, self.office_context)
+        # Assistant processes on one host can share tasks, notes, preferences
+        # and the schedule; conversation history stays per process
+        self.shared_store = None
+        if os.getenv("SHARED_MEMORY_DB"):
+            self.shared_store = SharedOfficeStore(os.getenv("SHARED_MEMORY_DB"))
+        
+        # Searchable index over all history, notes and tasks
+        embed = None
+        if os.getenv("EMBEDDING_MODEL"):
+            try:
+                embed = sentence_embedder(os.getenv("EMBEDDING_MODEL"))
+            except Exception as e:
+                print(f"⚠️ البحث الدلالي غير متاح: {e}")
+        self.memory_index = MemoryIndex(os.path.join(self.memory_journal.directory, "index"), embed=embed)
+        self.retrieval_top_k = int(os.getenv("RETRIEVAL_TOP_K", "3"))
+        self.index_compact_every = int(os.getenv("INDEX_COMPACT_EVERY", "1000"))
+        self.index_compaction: Optional[threading.Thread] = None
+        self.max_conversations = int(os.getenv("MEMORY_MAX_CONVERSATIONS", "0"))
         self.conversation_history = []
         self.office_context = {
             "current_tasks": [],
-            "meetings": [],
-            "announcements": [],
+            "schedule": {},
             "team_members": [],
             "user_preferences": {},
             "important_notes": [],
             "conversation_summary": ""
         }
         
-        # Load existing memory
-        self.load_memory()
+        # Meetings, announcements and reminders fire from the event loop;
+        # their audio is synthesized ahead of time so it plays when due
+        self.scheduler = Scheduler(
+            SystemClock(),
+            render=self.synthesize_audio,
+            announce=self.announce_reminder,
+            render_ahead=float(os.getenv("REMINDER_RENDER_AHEAD", "300"))
+        )
+        self.meeting_reminder = float(os.getenv("MEETING_REMINDER_MINUTES", "10")) * 60
+        
+        # Slow startup work runs concurrently: SDK imports and client
+        # construction, memory and index loading, speech model loading and
+        # opening the microphone; pooled connections open in the background
+        STARTUP.record("init (configuration)", init_started, time.perf_counter())
+        self.warmup_thread = None
+        if os.getenv("CONNECTION_WARMUP", "true").lower() == "true":
+            self.warmup_thread = threading.Thread(target=self.warm_up_connections, name="warm-up", daemon=True)
+            self.warmup_thread.start()
+        with ThreadPoolExecutor(max_workers=4, thread_name_prefix="startup") as startup:
+            if audio_input and not self.continuous_capture:
+                self.microphone_future = startup.submit(STARTUP.timed("open microphone", sr.Microphone))
+            phases = [
+                startup.submit(STARTUP.timed("api clients", self.create_api_clients)),
+                startup.submit(STARTUP.timed("load memory", self.load_memory)),
+                startup.submit(STARTUP.timed(f"load stt ({self.stt_backend.name})", self.stt_backend.load)),
+            ]
+            for phase in phases:
+                # Surface failures here, as the serial startup did
+                phase.result()
         
         print(f"🎤 {self.assistant_name} جاهز للعمل في {self.office_name}")
         print(f"🔊 Language: {self.default_language}")
         print(f"🎵 Voice Model: {self.voice_model}")
         print(f"🧠 Memory: {len(self.conversation_history)} conversations loaded")
+        
+        # Synthesize fixed phrases in the background so they play instantly
+        self.prewarm_tts_cache()
+        self.ready_at = time.perf_counter()
+
+    def create_api_clients(self):
+        """Import the OpenAI and ElevenLabs SDKs and build their clients"""
+        with STARTUP.phase("import openai"):
+            import openai
+        with STARTUP.phase("import elevenlabs"):
+            from elevenlabs.client import ElevenLabs
+        
+        self.openai_client = openai.AsyncOpenAI(
+            api_key=self.openai_api_key,
+            base_url=self.openai_base_url,
+            http_client=self.http_pool.async_client(self.openai_base_url)
+        )
+        self.elevenlabs_client = ElevenLabs(
+            api_key=self.elevenlabs_api_key,
+            base_url=self.elevenlabs_base_url,
+            httpx_client=self.http_pool.client(self.elevenlabs_base_url)
+        )
+
+    def warm_up_connections(self):
+        """Open pooled connections to the endpoints called from worker threads
+
+        The OpenAI client is bound to the event loop; keep_warm() connects it
+        when the conversation loop starts.
+        """
+        with STARTUP.phase("connection warm-up"):
+            self.http_pool.client(self.elevenlabs_base_url)
+            if self.stt_backend.name == "google":
+                self.http_pool.client(self.stt_backend.endpoint or GOOGLE_SPEECH_ENDPOINT)
+            self.warmup_results = self.http_pool.warm_up()
+        for result in self.warmup_results:
+            if result['error']:
+                print(f"⚠️ تعذر الاتصال المسبق بـ {result['host']}: {result['error']}")
 
     def load_memory(self):
-        """Load conversation history and context from file"""
+        """Load the latest memory snapshot and replay the journal"""
         try:
-            if os.path.exists(self.memory_file):
-                with open(self.memory_file, 'rb') as f:
-                    data = pickle.load(f)
-                    self.conversation_history = data.get('conversations', [])
-                    self.office_context = data.get('context', self.office_context)
-                print(f"✅ تم تحميل الذاكرة: {len(self.conversation_history)} محادثة")
+            conversations, context = self.memory_journal.load(legacy_pickle=self.memory_file)
+            self.conversation_history = conversations
+            self.summary_watermark = 0
+            self.office_context.update(context)
+            if self.shared_store:
+                self.office_context.update(self.shared_store.load())
+            print(f"✅ تم تحميل الذاكرة: {len(self.conversation_history)} محادثة")
+            missed = self.scheduler.load(self.office_context.get('schedule', {}).values())
+            if missed:
+                print(f"⏰ فات موعد {len(missed)} تذكير أثناء إيقاف المساعد")
         except Exception as e:
             print(f"❌ خطأ في تحميل الذاكرة: {e}")
+        
+        try:
+            # Only memory missing from the saved index is tokenized again
+            self.memory_index.load()
+            added = self.memory_index.sync(
+                self.conversation_history,
+                self.office_context.get('important_notes', []),
+                self.office_context.get('current_tasks', [])
+            )
+            if len(self.memory_index.delta_texts) >= self.index_compact_every:
+                self.memory_index.save()
+            print(f"🔎 فهرس الذاكرة: {len(self.memory_index)} عنصر ({added} جديد)")
+        except Exception as e:
+            print(f"❌ خطأ في تحميل فهرس الذاكرة: {e}")
 
     def save_memory(self):
-        """Save conversation history and context to file"""
+        """Write a compacted snapshot of the conversation history and context"""
         try:
-            data = {
-                'conversations': self.conversation_history,
-                'context': self.office_context
-            }
-            with open(self.memory_file, 'wb') as f:
-                pickle.dump(data, f)
+            with self.metrics.span('save_memory'):
+                self.memory_journal.snapshot(self.conversation_history, self.office_context)
+                if self.shared_store:
+                    self.sync_shared_memory()
+                    self.shared_store.compact(self.office_context)
+                if self.memory_index.delta_texts:
+                    self.memory_index.save()
+        except Exception as e:
+            print(f"❌ خطأ في حفظ الذاكرة: {e}")
+
+    def record_memory(self, op: str, **fields):
+        """Apply a memory mutation and append it to the journal
+
+        Shared office memory is written to the shared store first and applied
+        in the store's order, together with other processes' changes.
+        """
+        if self.shared_store and op in SHARED_OPS:
+            try:
+                self.shared_store.append(op, fields)
+            except Exception as e:
+                print(f"❌ خطأ في حفظ الذاكرة المشتركة: {e}")
+                return
+            self.sync_shared_memory()
+            return
+        self.apply_memory(op, fields)
+        try:
+            self.memory_journal.append(op, **fields)
         except Exception as e:
             print(f"❌ خطأ في حفظ الذاكرة: {e}")
 
+    def apply_memory(self, op: str, fields: Dict[str, Any]):
+        """Apply one memory record to the in-memory state, index, cache and scheduler"""
+        tasks = self.office_context.get('current_tasks', [])
+        index = task_index(tasks, fields) if op == 'task_remove' else None
+        removed_task = tasks[index] if index is not None else None
+        apply_record(self.conversation_history, self.office_context, dict(fields, op=op))
+        self.update_memory_index(op, fields, removed_task)
+        if op == 'schedule_add':
+            self.scheduler.add(item_from_dict(fields['item']))
+        elif op == 'schedule_remove':
+            self.scheduler.cancel(fields['id'])
+        if op in ('preference_set', 'note_add'):
+            # Cached answers were generated with the old notes and preferences
+            self.response_cache.invalidate()
+
+    def sync_shared_memory(self):
+        """Apply changes other processes made to the shared office memory"""
+        if not self.shared_store or self.shared_store.closed:
+            return
+        try:
+            for _, op, fields in self.shared_store.changes_since():
+                self.apply_memory(op, fields)
+        except ResyncRequired:
+            # Fell behind a compaction: reload the whole shared view
+            self.office_context.update(self.shared_store.load())
+            schedule = self.office_context['schedule']
+            for item_id in [item_id for item_id in self.scheduler.items if item_id not in schedule]:
+                self.scheduler.cancel(item_id)
+            self.scheduler.load(schedule.values())
+            self.memory_index.sync(self.conversation_history, self.office_context['important_notes'],
+                                   self.office_context['current_tasks'])
+            self.response_cache.invalidate()
+        except Exception as e:
+            print(f"❌ خطأ في تحديث الذاكرة المشتركة: {e}")
+
+    def watch_shared_memory(self):
+        """Refresh the shared office memory on the event loop whenever it changes"""
+        if self.shared_store:
+            loop = asyncio.get_running_loop()
+            self.shared_store.watch(lambda: loop.call_soon_threadsafe(self.sync_shared_memory))
+
+    def update_memory_index(self, op: str, fields: Dict[str, Any], removed_task: Optional[str] = None):
+        """Keep the retrieval index in step with memory mutations"""
+        try:
+            if op == 'conversation':
+                conv = fields['conversation']
+                self.memory_index.add(conversation_key(conv), conversation_text(conv), conversation_kind(conv))
+            elif op == 'note_add':
+                number = len(self.office_context['important_notes']) - 1
+                self.memory_index.add(f"note:{number}", fields['note'], 'note')
+            elif op == 'task_add':
+                self.memory_index.add(f"task:{fields['task']}", fields['task'], 'task')
+            elif op == 'task_remove' and removed_task is not None:
+                self.memory_index.remove(f"task:{removed_task}")
+        except Exception as e:
+            print(f"❌ خطأ في فهرسة الذاكرة: {e}")
+        self.maybe_compact_index()
+
+    def maybe_compact_index(self):
+        """Merge a large delta into the memory-mapped index on a background thread"""
+        if len(self.memory_index.delta_texts) < self.index_compact_every:
+            return
+        if self.index_compaction and self.index_compaction.is_alive():
+            return
+        self.index_compaction = threading.Thread(target=self.compact_index, name="index-compaction", daemon=True)
+        self.index_compaction.start()
+
+    def compact_index(self):
+        try:
+            with self.metrics.span('index_compact'):
+                self.memory_index.save()
+            print(f"🔎 تم ضغط فهرس الذاكرة: {len(self.memory_index)} عنصر")
+        except Exception as e:
+            print(f"❌ خطأ في ضغط فهرس الذاكرة: {e}")
+
+    def retrieve_memories(self, user_input: str, kinds: Optional[List[str]] = None) -> List[str]:
+        """Most relevant older memories for a query, formatted for the prompt"""
+        if not self.retrieval_top_k:
+            return []
+        # The recent window is already in the prompt verbatim
+        recent = [conversation_key(conv) for conv in self.conversation_history[-self.context_builder.window:]]
+        memories = []
+        for memory in self.memory_index.search(user_input, k=self.retrieval_top_k, kinds=kinds, exclude=recent):
+            if memory['kind'].startswith('conversation'):
+                question, _, answer = memory['text'].partition("\n")
+                memories.append(f"المستخدم: {question} / المساعد: {answer}")
+            elif memory['kind'] == 'task':
+                memories.append(f"مهمة: {memory['text']}")
+            else:
+                memories.append(memory['text'])
+        return memories
+
     def add_to_memory(self, user_input: str, assistant_response: str):
         """Add conversation to memory"""
-        conversation = {
-            'timestamp': datetime.now().isoformat(),
-            'user_input': user_input,
-            'assistant_response': assistant_response
-        }
-        self.conversation_history.append(conversation)
-        
-        # Keep only last 100 conversations
-        if len(self.conversation_history) > 100:
-            self.conversation_history = self.conversation_history[-100:]
-        
-        # Save to file
-        self.save_memory()
+        with self.metrics.span('memory'):
+            conversation = {
+                'timestamp': datetime.now().isoformat(),
+                'user_input': user_input,
+                'assistant_response': assistant_response
+            }
+            self.record_memory('conversation', conversation=conversation)
+            
+            # Optional cap on conversations kept in memory (0 keeps everything)
+            if self.max_conversations and len(self.conversation_history) > self.max_conversations:
+                removed = len(self.conversation_history) - self.max_conversations
+                del self.conversation_history[:removed]
+                self.summary_watermark = max(0, self.summary_watermark - removed)
 
-    def get_recent_context(self, limit: int = 5) -> str:
-        """Get recent conversation context"""
-        if not self.conversation_history:
-            return ""
-        
-        recent_conversations = self.conversation_history[-limit:]
-        context = "المحادثات الأخيرة:\n"
-        for conv in recent_conversations:
-            context += f"- المستخدم: {conv['user_input']}\n"
-            context += f"- المساعد: {conv['assistant_response']}\n"
-        return context
+    def schedule_summary(self):
+        """Start folding old turns into the summary unless a job is running"""
+        if self.summary_task and not self.summary_task.done():
+            return
+        summary_until = self.office_context.get(self.summary_until_key, '')
+        self.summary_watermark = summary_watermark(self.conversation_history, summary_until, self.summary_watermark)
+        turns = turns_to_summarize(
+            self.conversation_history,
+            summary_until,
+            self.context_builder.window,
+            self.summary_batch,
+            start=self.summary_watermark
+        )
+        if turns:
+            self.summary_task = asyncio.create_task(self.update_summary(turns))
+
+    async def update_summary(self, turns: List[Dict[str, Any]]):
+        """Fold turns into conversation_summary off the response path"""
+        try:
+            start = time.perf_counter()
+            with self.metrics.span('summary'):
+                # Summaries are short and off the response path: smallest tier
+                response = await self.openai_client.chat.completions.create(
+                    model=self.model_router.tiers[0].model,
+                    messages=summary_messages(self.office_context.get(self.summary_key, ''), turns),
+                    max_tokens=250,
+                    temperature=0.3
+                )
+            summary = response.choices[0].message.content.strip()
+            if summary:
+                self.record_memory('context_set', key=self.summary_key, value=summary)
+                self.record_memory('context_set', key=self.summary_until_key, value=turns[-1]['timestamp'])
+                print(f"📝 تم تحديث ملخص المحادثات ({len(turns)} محادثات، "
+                      f"{time.perf_counter() - start:.1f} ثانية)")
+        except Exception as e:
+            print(f"❌ خطأ في تلخيص المحادثات: {e}")
+
+    def capture_audio(self) -> sr.AudioData:
+        """Record one utterance from the microphone (blocking)"""
+        if self.microphone is None:
+            # Opened on a startup thread; normally ready long before this
+            self.microphone = self.microphone_future.result()
+        with self.microphone as source:
+            # Adjust for ambient noise
+            self.recognizer.adjust_for_ambient_noise(source, duration=0.5)
+            print("✅ تم تحديث مستوى الضوضاء")
+            
+            # Listen for voice input
+            audio = self.recognizer.listen(source, timeout=3, phrase_time_limit=8)
+            print("✅ تم تسجيل الصوت")
+        return audio
+
+    def gate_audio(self, audio: sr.AudioData):
+        """Run the local voice gate on a recorded segment"""
+        samples = np.frombuffer(audio.get_raw_data(convert_rate=16000, convert_width=2), dtype='<i2')
+        noise_floor = self.audio_capture.noise_floor if self.continuous_capture else None
+        return self.voice_gate.check(samples, noise_floor=noise_floor)
 
     async def listen_for_voice(self) -> Optional[str]:
         """Voice listening with timeout handling"""
         try:
             print("🎤 استمع...")
             
-            with self.microphone as source:
-                # Adjust for ambient noise
-                self.recognizer.adjust_for_ambient_noise(source, duration=0.5)
-                print("✅ تم تحديث مستوى الضوضاء")
-                
-                # Listen for voice input
-                audio = self.recognizer.listen(source, timeout=3, phrase_time_limit=8)
+            if self.continuous_capture:
+                # The capture thread has already segmented the utterance
+                utterance = await asyncio.to_thread(self.audio_capture.next_utterance, 3)
+                if utterance is None:
+                    print("⏰ انتهت مهلة الاستماع")
+                    return None
+                self.metrics.observe('capture', utterance.ended_at - utterance.started_at)
+                audio = sr.AudioData(utterance.frame_data, utterance.sample_rate, 2)
                 print("✅ تم تسجيل الصوت")
+            else:
+                # The microphone blocks, so record on a worker thread
+                start = time.perf_counter()
+                audio = await asyncio.to_thread(self.capture_audio)
+                self.metrics.observe('capture', time.perf_counter() - start)
             
             print("🔄 معالجة الصوت...")
             
-            # Try Google recognition with timeout
+            # Only segments that look like speech are worth a cloud round trip
+            if self.voice_gate_enabled:
+                with self.metrics.span('gate'):
+                    decision = self.gate_audio(audio)
+                if not decision.accepted:
+                    self.metrics.count('rejected', 'gate')
+                    print(f"🔇 تم تجاهل المقطع الصوتي محلياً ({decision.reason})")
+                    return None
+            
+            # Try speech recognition with timeout
             try:
                 print("🔍 محاولة التعرف على الكلام...")
                 
-                # Use a timeout for Google recognition
-                import concurrent.futures
-                with concurrent.futures.ThreadPoolExecutor() as executor:
-                    future = executor.submit(
-                        self.recognizer.recognize_google, 
-                        audio, 
-                        language='ar-SA'
-                    )
-                    try:
-                        text = future.result(timeout=5)  # 5 second timeout
-                        if text and text.strip():
-                            print(f"✅ تم التعرف على الكلام: {text}")
-                            return text
-                        else:
-                            print("❌ النص فارغ")
-                            return None
-                    except concurrent.futures.TimeoutError:
-                        print("⏰ انتهت مهلة التعرف على الكلام")
-                        return None
+                # The deadline is enforced even if the request itself hangs
+                start = time.perf_counter()
+                try:
+                    text = await self.recognition_service.recognize(audio)
+                finally:
+                    self.metrics.observe('asr', time.perf_counter() - start)
+                if text and text.strip():
+                    print(f"✅ تم التعرف على الكلام: {text} "
+                          f"({self.stt_backend.name}، {self.stt_backend.last_latency * 1000:.0f} مللي ثانية)")
+                    return text
+                else:
+                    print("❌ النص فارغ")
+                    return None
                         
+            except asyncio.TimeoutError:
+                self.metrics.count('timeout', 'asr')
+                print("⏰ انتهت مهلة التعرف على الكلام")
+                return None
             except sr.UnknownValueError:
+                self.metrics.count('unrecognized', 'asr')
                 print("❌ لم أتمكن من فهم الصوت - يرجى التحدث باللغة العربية")
                 return None
             except sr.RequestError as e:
+                self.metrics.count('error', 'asr')
                 print(f"❌ خطأ في خدمة التعرف على الكلام: {e}")
                 return None
             except Exception as e:
+                self.metrics.count('error', 'asr')
                 print(f"❌ خطأ في التعرف على الكلام: {e}")
                 return None
                 
@@ -174,157 +659,590 @@ class ArabicVoiceAssistant:
             print("⏰ انتهت مهلة الاستماع")
             return None
         except Exception as e:
+            self.metrics.count('error', 'capture')
             print(f"❌ خطأ في الاستماع: {e}")
             return None
 
+    def build_messages(self, user_input: str) -> List[Dict[str, str]]:
+        """Build the chat messages for a user query"""
+        # Recent turns, summary, preferences and notes within the token budget
+        with self.metrics.span('prompt'):
+            context = self.context_builder.build(
+                user_input,
+                self.conversation_history,
+                summary=self.office_context.get(self.summary_key, ''),
+                preferences=self.office_context.get('user_preferences', {}),
+                notes=self.office_context.get('important_notes', []),
+                memories=self.retrieve_memories(user_input)
+            )
+        
+        messages = prompt_messages(self.system_prefix, context.text, user_input)
+        
+        count = self.context_builder.counter.count
+        self.last_prompt_stats = {
+            'prompt_tokens': sum(count(message['content']) for message in messages),
+            'context_tokens': context.tokens,
+            'build_seconds': context.build_seconds,
+            'retrieval_seconds': self.memory_index.last_query_seconds,
+            'dropped': sum(context.dropped.values()),
+        }
+        print(f"📏 طول الطلب: ~{self.last_prompt_stats['prompt_tokens']} رمز "
+              f"(سياق {context.tokens}/{self.context_builder.budget})، "
+              f"بناء {context.build_seconds * 1000:.2f} مللي ثانية، "
+              f"بحث {self.memory_index.last_query_seconds * 1000:.2f} مللي ثانية")
+        
+        return messages
+
+    def memory_fingerprint(self) -> str:
+        """Fingerprint of the memory that shapes every answer"""
+        return memory_fingerprint(
+            self.office_context.get('user_preferences', {}),
+            self.office_context.get('important_notes', [])
+        )
+
+    def cached_response(self, user_input: str) -> Optional[str]:
+        """Answer from the response cache when possible"""
+        if not self.response_cache_enabled:
+            return None
+        cached = self.response_cache.get(user_input, self.memory_fingerprint())
+        if cached is not None:
+            stats = self.response_cache.stats()
+            print(f"⚡ استجابة من الذاكرة المؤقتة ({stats['hit_rate']:.0%} إصابة، "
+                  f"توفير {stats['saved_seconds']:.1f} ثانية)")
+        return cached
+
     async def generate_response(self, user_input: str) -> str:
         """Generate AI response using OpenAI with memory"""
+        start = time.perf_counter()
         try:
-            print(f"🤖 توليد الاستجابة لـ: {user_input}")
+            cached = self.cached_response(user_input)
+            if cached is not None:
+                return cached
             
-            # Get recent conversation context
-            recent_context = self.get_recent_context()
+            if not self.breakers['llm'].available():
+                return self.llm_unavailable(start)
             
-            system_prompt = f"""أنت {self.assistant_name}، مساعد ذكي باللغة العربية في {self.office_name}.
-
-المهمة: مساعدة الموظفين في المهام المكتبية والرد على استفساراتهم.
-
-السياق الحالي:
-{recent_context}
-
-التفضيلات المحفوظة: {self.office_context.get('user_preferences', {})}
-الملاحظات المهمة: {self.office_context.get('important_notes', [])}
-
-تعليمات مهمة:
-- ارد دائماً باللغة العربية فقط
-- كن مفيداً ومهذباً
-- استخدم الذاكرة للرد بناءً على المحادثات السابقة
-- ساعد في المهام المكتبية مثل إدارة المهام والاجتماعات
-- تذكر المعلومات المهمة التي يخبرك بها المستخدم
-
-المهام المتاحة:
-- إدارة المهام: أضف، عرض، حذف المهام
-- إدارة الاجتماعات: جدولة، عرض، تذكير
-- الإعلانات: إنشاء، عرض، بث
-- الذاكرة: حفظ التفضيلات والملاحظات
-
-رد على: {user_input}"""
-
-            response = self.openai_client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_input}
-                ],
-                max_tokens=500,
-                temperature=0.7
-            )
+            print(f"🤖 توليد الاستجابة لـ: {user_input}")
+            
+            fingerprint = self.memory_fingerprint()
+            messages = self.build_messages(user_input)
+            tier = self.choose_tier(user_input)
+            requested = time.perf_counter()
+            with self.metrics.span('llm'), self.breakers['llm'].guard():
+                response = await self.openai_client.chat.completions.create(
+                    model=tier.model,
+                    messages=messages,
+                    max_tokens=tier.max_tokens,
+                    temperature=tier.temperature
+                )
+            self.record_tier_latency(tier, time.perf_counter() - requested)
+            self.record_prompt_cache(response.usage)
             
-            result = response.choices[0].message.content.strip()
+            choice = response.choices[0]
+            result = voice_limit(choice.message.content.strip(), tier.max_sentences,
+                                 truncated=choice.finish_reason == "length")
             print(f"✅ تم توليد الاستجابة: {result[:50]}...")
+            if self.response_cache_enabled and result:
+                self.response_cache.put(user_input, fingerprint, result, time.perf_counter() - start)
             return result
             
         except Exception as e:
             print(f"❌ خطأ في توليد الاستجابة: {e}")
-            return "عذراً، حدث خطأ في معالجة طلبك."
+            return self.llm_unavailable(start)
+
+    def choose_tier(self, user_input: str):
+        """Pick and log the model tier for a question"""
+        choice = self.model_router.select(user_input)
+        tier = choice.tier
+        self.metrics.count(tier.name, 'llm_tier')
+        print(f"🧭 النموذج: {tier.name} ({tier.model}، حتى {tier.max_tokens} رمز) "
+              f"- السؤال {choice.need}، {choice.reason}")
+        return tier
+
+    def record_tier_latency(self, tier, seconds: float):
+        """Log a tier's observed latency next to its expected latency"""
+        self.model_router.observe(tier, seconds)
+        self.metrics.observe(f"llm_{tier.name}", seconds)
+        print(f"⏱️ {tier.name}: {seconds * 1000:.0f} مللي ثانية (المتوقع {tier.expected_latency * 1000:.0f})")
+
+    def record_prompt_cache(self, usage):
+        """Record how much of the prompt the provider served from its prefix cache"""
+        if usage is None:
+            # The provider sent no usage chunk, or the stream was cut off
+            self.metrics.count('unreported', 'llm_tokens')
+            return
+        details = getattr(usage, 'prompt_tokens_details', None)
+        cached = getattr(details, 'cached_tokens', None) or 0
+        prompt = usage.prompt_tokens or 0
+        self.metrics.count('prompt', 'llm_tokens', prompt)
+        self.metrics.count('cached', 'llm_tokens', cached)
+        self.last_prompt_stats.update(api_prompt_tokens=prompt, cached_tokens=cached)
+        print(f"💾 رموز مخزنة لدى المزود: {cached}/{prompt}")
+
+    def llm_unavailable(self, since: float) -> str:
+        """Apology used when the LLM failed or its breaker is open"""
+        if not self.breakers['llm'].available():
+            self.metrics.count('short_circuit', 'llm')
+        self.metrics.count('fallback', 'llm')
+        self.metrics.observe('llm_fallback', time.perf_counter() - since)
+        return "عذراً، حدث خطأ في معالجة طلبك."
+
+    def breaker_transition(self, name: str, old: str, new: str):
+        """Export and announce a backend's circuit breaker changing state"""
+        self.metrics.count(new, f"breaker_{name}")
+        icon = {"open": "🔴", "half_open": "🟡", "closed": "🟢"}[new]
+        print(f"{icon} قاطع {name}: {old} -> {new}")
+
+    async def stream_response_tokens(self, user_input: str):
+        """Yield the response from OpenAI sentence by sentence as it is generated
+
+        Nothing more is yielded once the tier's spoken-sentence limit is
+        reached, and a last sentence cut off by the token limit is not spoken.
+        The rest of a capped reply is read in the background (bounded by the
+        tier's max_tokens) so its connection goes back to the pool; only an
+        interrupted turn closes the stream early.
+        """
+        messages = self.build_messages(user_input)
+        tier = self.choose_tier(user_input)
+        requested = time.perf_counter()
+        # The breaker times the request up to the first response bytes
+        with self.breakers['llm'].guard():
+            stream = await self.openai_client.chat.completions.create(
+                model=tier.model,
+                messages=messages,
+                max_tokens=tier.max_tokens,
+                temperature=tier.temperature,
+                stream=True,
+                # Token usage, including cached prompt tokens, arrives in a final chunk
+                stream_options={"include_usage": True}
+            )
+        splitter = SentenceSplitter()
+        spoken = 0
+        truncated = False
+        usage = None
+        draining = False
+        try:
+            async for chunk in stream:
+                usage = chunk.usage or usage
+                if not chunk.choices:
+                    continue
+                for sentence in splitter.feed(chunk.choices[0].delta.content or "")[:tier.max_sentences - spoken]:
+                    yield sentence + " "
+                    spoken += 1
+                if spoken >= tier.max_sentences:
+                    break
+                truncated = truncated or chunk.choices[0].finish_reason == "length"
+            else:
+                rest = splitter.flush()
+                if rest and not (truncated and spoken):
+                    yield rest
+            self.record_tier_latency(tier, time.perf_counter() - requested)
+            if spoken >= tier.max_sentences:
+                drain = asyncio.create_task(self.drain_stream(stream, usage))
+                self.stream_drains.add(drain)
+                drain.add_done_callback(self.stream_drains.discard)
+                draining = True
+            else:
+                self.record_prompt_cache(usage)
+        finally:
+            # An interrupted turn stops generation instead of draining it
+            if not draining:
+                await stream.close()
+
+    async def drain_stream(self, stream, usage=None):
+        """Read a capped reply to its end, keeping its usage and its pooled connection"""
+        finished = False
+        try:
+            async for chunk in stream:
+                usage = chunk.usage or usage
+            finished = True
+            self.record_prompt_cache(usage)
+        except Exception as e:
+            print(f"⚠️ تعذر إكمال قراءة الاستجابة: {e}")
+        finally:
+            if not finished:
+                await stream.close()
+
+    def tts_request(self, text: str) -> Dict[str, Any]:
+        """Build the ElevenLabs request arguments for a piece of text"""
+        request = {
+            'text': text,
+            'voice_id': self.voice_id,
+            'model_id': self.voice_model
+        }
+        if self.tts_output_format:
+            request['output_format'] = self.tts_output_format
+        if self.voice_settings:
+            from elevenlabs import VoiceSettings
+            request['voice_settings'] = VoiceSettings(**self.voice_settings)
+        return request
+
+    def tts_cache_key(self, text: str) -> str:
+        """Cache key for the audio of a piece of text in the current voice"""
+        return self.tts_cache.make_key(text, self.voice_id, self.voice_model, self.voice_settings,
+                                       self.tts_output_format)
+
+    def synthesize_audio(self, text: str, interruptible: bool = False) -> bytes:
+        """Synthesize one piece of text into audio bytes
+
+        interruptible audio belongs to the current turn and is abandoned if
+        the user barges in.
+        """
+        key = self.tts_cache_key(text)
+        cached = self.tts_cache.get(key)
+        if cached:
+            return cached
+        
+        with self.metrics.span('tts'), self.breakers['tts'].guard():
+            audio_generator = self.elevenlabs_client.text_to_speech.convert(**self.tts_request(text))
+            parts = []
+            for chunk in audio_generator:
+                if interruptible and self.turn_interrupted.is_set():
+                    # Barge-in: stop downloading audio nobody will hear
+                    close = getattr(audio_generator, 'close', None)
+                    if close is not None:
+                        close()
+                    return b""
+                parts.append(chunk)
+            audio_bytes = b"".join(parts)
+        self.tts_cache.put(key, audio_bytes)
+        return audio_bytes
+
+    def cache_audio_stream(self, key: str, chunks):
+        """Pass audio chunks through and cache the complete clip"""
+        parts = []
+        try:
+            for chunk in chunks:
+                parts.append(chunk)
+                yield chunk
+        finally:
+            # Closed early when playback is interrupted; nothing is cached then
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
+        self.tts_cache.put(key, b"".join(parts))
+
+    def track_delivery(self, chunks, delivered: threading.Event):
+        """Pass audio chunks through, setting delivered once one reaches the player"""
+        try:
+            for chunk in chunks:
+                delivered.set()
+                yield chunk
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
+
+    def prewarm_tts_cache(self):
+        """Synthesize the configured fixed phrases in the background"""
+        phrases = os.getenv("TTS_PREWARM_PHRASES")
+        if phrases is None:
+            phrases = DEFAULT_PREWARM_PHRASES
+        else:
+            phrases = [phrase for phrase in phrases.split("|") if phrase.strip()]
+        
+        if phrases:
+            self.tts_cache.prewarm(phrases, self.tts_cache_key, self.synthesize_audio)
+
+    def play_audio(self, audio_bytes: bytes) -> None:
+        """Play synthesized audio bytes"""
+        with self.metrics.span('playback'):
+            stats = self.audio_player.play_stream([audio_bytes])
+        self.report_underruns(stats)
+
+    def synthesize_sentence(self, text: str) -> Union[bytes, str]:
+        """Audio for one pipelined sentence, or the text itself for the local voice"""
+        if not self.breakers['tts'].available():
+            # ElevenLabs is known to be down: don't wait for it to fail again
+            self.metrics.count('short_circuit', 'tts')
+            return text
+        try:
+            return self.synthesize_audio(text, interruptible=True)
+        except Exception as e:
+            # Counted as a tts error by the span around the call
+            print(f"❌ خطأ في تحويل النص إلى كلام: {e}")
+            return text
+
+    def play_sentence(self, audio: Union[bytes, str]) -> None:
+        """Play a pipelined sentence, speaking it locally when synthesis failed"""
+        if isinstance(audio, str):
+            self.fallback_tts(audio)
+        else:
+            self.play_audio(audio)
+
+    def report_underruns(self, stats: Dict[str, float]):
+        """Count gaps where the speaker ran dry in the middle of a reply"""
+        if stats.get('underruns'):
+            self.metrics.count('underrun', 'playback', stats['underruns'])
+            print(f"⚠️ انقطاع الصوت {stats['underruns']} مرة ({stats['underrun_time'] * 1000:.0f} مللي ثانية)")
+
+    async def respond_pipelined(self, user_input: str) -> str:
+        """Generate and speak a response sentence by sentence"""
+        cached = self.cached_response(user_input)
+        if cached is not None:
+            await self.speak_response(cached)
+            return cached
+        
+        if not self.breakers['llm'].available():
+            result = self.llm_unavailable(time.perf_counter())
+            await self.speak_response(result)
+            return result
+        
+        print(f"🤖 توليد الاستجابة لـ: {user_input}")
+        fingerprint = self.memory_fingerprint()
+        pipeline = SentencePipeline(self.synthesize_sentence, self.play_sentence)
+        try:
+            with self.metrics.span('llm_stream'):
+                result = await pipeline.run(self.stream_response_tokens(user_input))
+            stats = pipeline.last_stats
+            self.metrics.observe('llm_first_sentence', stats['time_to_first_sentence'])
+            self.metrics.observe('first_audio', stats['time_to_first_audio'])
+            if self.response_cache_enabled and result:
+                # What a hit saves is the wait for the first sentence
+                self.response_cache.put(user_input, fingerprint, result, stats['time_to_first_sentence'])
+            print(f"✅ تم توليد الاستجابة: {result[:50]}...")
+            print(f"⏱️ أول جملة بعد {stats['time_to_first_sentence'] * 1000:.0f} مللي ثانية، "
+                  f"أول صوت بعد {stats['time_to_first_audio'] * 1000:.0f} مللي ثانية")
+            return result
+        except Exception as e:
+            print(f"❌ خطأ في توليد الاستجابة: {e}")
+            # Remember what the user actually heard, not the whole answer
+            spoken = " ".join(pipeline.spoken)
+            if spoken:
+                return spoken
+            result = "عذراً، حدث خطأ في معالجة طلبك."
+            await self.speak_response(result)
+            return result
 
     async def speak_response(self, text: str) -> None:
         """Convert text to speech using ElevenLabs with simple playback"""
+        with self.metrics.span('speak'):
+            await self.speak_with_fallbacks(text)
+
+    async def speak_with_fallbacks(self, text: str) -> None:
+        """Cached audio, streaming playback, or synthesize-then-play via a temp file"""
+        started = time.perf_counter()
+        cached = self.tts_cache.get(self.tts_cache_key(text))
+        if cached and self.audio_player.available:
+            await self.speak_cached(text, cached, started)
+            return
+        
+        if not self.breakers['tts'].available():
+            # ElevenLabs is known to be down: don't wait for it to fail again
+            self.metrics.count('short_circuit', 'tts')
+            await asyncio.to_thread(self.fallback_tts, text, started)
+            return
+        
+        # The in-process player always streams: there is no decoder to start
+        if (self.streaming_playback or self.audio_player.in_process) and self.audio_player.available:
+            await self.speak_response_streaming(text, started)
+            return
+        
         try:
             print(f"🔊 التحدث: {text}")
             
-            # Generate audio using ElevenLabs
-            print("🎵 توليد الصوت...")
-            audio_generator = self.elevenlabs_client.text_to_speech.convert(
-                text=text,
-                voice_id=self.voice_id,
-                model_id=self.voice_model
-            )
-            
-            # Convert generator to bytes
-            audio_bytes = b"".join(audio_generator)
-            print("✅ تم توليد الصوت")
+            if cached:
+                audio_bytes = cached
+            else:
+                # Generate audio using ElevenLabs
+                print("🎵 توليد الصوت...")
+                audio_bytes = await asyncio.to_thread(self.synthesize_audio, text)
+                print("✅ تم توليد الصوت")
             
             # Save audio to temporary file
             with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as tmp_file:
                 tmp_file.write(audio_bytes)
                 tmp_file_path = tmp_file.name
             
-            # Play audio using system command
+            # Play audio using system command, allowing for the whole clip
+            # (128 kbit/s MP3) rather than a fixed cap that cuts long answers
             print("🔊 تشغيل الصوت...")
+            timeout = len(audio_bytes) / 16000 + 10
             try:
-                result = subprocess.run([
-                    'mpg123', '-q', tmp_file_path
-                ], capture_output=True, timeout=30)
-                
-                if result.returncode != 0:
-                    print("⚠️ mpg123 فشل، جرب mplayer...")
-                    # Fallback to mplayer
-                    subprocess.run(['mplayer', '-really-quiet', tmp_file_path], timeout=30)
+                with self.metrics.span('playback'):
+                    returncode = await self.run_player(['mpg123', '-q', tmp_file_path], timeout)
                     
-            except subprocess.TimeoutExpired:
+                    if returncode != 0:
+                        print("⚠️ mpg123 فشل، جرب mplayer...")
+                        self.metrics.count('fallback', 'playback')
+                        # Fallback to mplayer
+                        await self.run_player(['mplayer', '-really-quiet', tmp_file_path], timeout)
+                    
+            except asyncio.TimeoutError:
+                self.metrics.count('timeout', 'playback')
                 print("⏰ انتهت مهلة تشغيل الصوت")
             except Exception as e:
                 print(f"❌ خطأ في تشغيل الصوت: {e}")
                 # Fallback to system TTS
-                self.fallback_tts(text)
+                await asyncio.to_thread(self.fallback_tts, text, started)
             
             # Clean up
             os.unlink(tmp_file_path)
             print("✅ انتهى تشغيل الصوت")
             
         except Exception as e:
+            self.metrics.count('error', 'tts')
             print(f"❌ خطأ في تحويل النص إلى كلام: {e}")
             # Fallback to system TTS
-            self.fallback_tts(text)
+            await asyncio.to_thread(self.fallback_tts, text, started)
+
+    async def run_player(self, command: List[str], timeout: float) -> int:
+        """Run an audio player without blocking the event loop"""
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+        try:
+            return await asyncio.wait_for(process.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise
+
+    async def speak_cached(self, text: str, audio_bytes: bytes, started: Optional[float] = None) -> None:
+        """Play audio for text straight from the TTS cache"""
+        try:
+            print(f"🔊 التحدث (من الذاكرة المؤقتة): {text}")
+            await asyncio.to_thread(self.play_audio, audio_bytes)
+            print("✅ انتهى تشغيل الصوت")
+        except Exception as e:
+            self.metrics.count('error', 'playback')
+            print(f"❌ خطأ في تشغيل الصوت: {e}")
+            # Fallback to system TTS
+            await asyncio.to_thread(self.fallback_tts, text, started)
 
-    def fallback_tts(self, text: str) -> None:
-        """Fallback TTS using system"""
+    async def speak_response_streaming(self, text: str, started: Optional[float] = None) -> None:
+        """Convert text to speech using ElevenLabs, playing chunks as they arrive"""
+        delivered = threading.Event()
         try:
-            print("🔊 استخدام النظام الاحتياطي...")
-            import pyttsx3
-            engine = pyttsx3.init()
-            engine.setProperty('rate', 150)
-            engine.say(text)
-            engine.runAndWait()
-        except:
+            print(f"🔊 التحدث: {text}")
+            
+            # Stream audio from ElevenLabs straight into the player
+            print("🎵 توليد وتشغيل الصوت...")
+            audio_stream = self.elevenlabs_client.text_to_speech.stream(**self.tts_request(text))
+            audio_stream = self.breakers['tts'].stream(audio_stream)
+            audio_stream = self.cache_audio_stream(self.tts_cache_key(text), audio_stream)
+            audio_stream = self.track_delivery(audio_stream, delivered)
+            
+            with self.metrics.span('playback'):
+                stats = await asyncio.to_thread(self.audio_player.play_stream, audio_stream)
+            self.metrics.observe('first_audio', stats['time_to_first_audio'])
+            self.report_underruns(stats)
+            print(f"✅ انتهى تشغيل الصوت (أول صوت بعد {stats['time_to_first_audio'] * 1000:.0f} مللي ثانية)")
+            
+        except Exception as e:
+            self.metrics.count('error', 'tts')
+            print(f"❌ خطأ في تحويل النص إلى كلام: {e}")
+            if delivered.is_set():
+                # The start has been heard; speaking the whole reply again would repeat it
+                print("⚠️ انقطع الصوت أثناء التشغيل")
+                return
+            # Fallback to system TTS
+            await asyncio.to_thread(self.fallback_tts, text, started)
+
+    def fallback_tts(self, text: str, since: Optional[float] = None) -> None:
+        """Fallback TTS using the system voice, created once at startup"""
+        self.metrics.count('fallback', 'tts')
+        if since is not None:
+            # How long the turn waited before the fallback started speaking
+            self.metrics.observe('tts_fallback', time.perf_counter() - since)
+        print("🔊 استخدام النظام الاحتياطي...")
+        if not self.local_tts.speak(text):
             print(f"🔊 (Fallback): {text}")
 
-    async def process_office_command(self, user_input: str) -> str:
+    async def process_office_command(self, user_input: str, intent: Optional[Intent] = None) -> str:
         """Process office-specific commands"""
-        user_input_lower = user_input.lower()
+        if intent is None:
+            intent = self.intent_router.route(user_input)
+        name = intent.name if intent else None
         
         # Task management
-        if "أضف مهمة" in user_input:
-            task = user_input.replace("أضف مهمة", "").strip()
+        if name == "add_task":
+            task = intent.slots.get('text')
+            due, task_text = parse_due(task) if task else (None, task)
+            if due and task_text:
+                # A deadline also schedules a reminder, keyed like the index entry
+                self.record_memory('task_add', task=task_text)
+                self.record_memory('schedule_add', item=Task(f"task:{task_text}", task_text, due.timestamp()).to_dict())
+                return f"تم إضافة المهمة: {task_text}، موعدها {describe_due(due.timestamp())}"
             if task:
-                self.office_context["current_tasks"].append(task)
-                self.save_memory()
+                self.record_memory('task_add', task=task)
                 return f"تم إضافة المهمة: {task}"
             else:
                 return "يرجى تحديد المهمة المراد إضافتها"
         
-        elif "عرض المهام" in user_input:
+        elif name == "list_tasks":
             if self.office_context["current_tasks"]:
                 tasks = "\n".join([f"{i+1}. {task}" for i, task in enumerate(self.office_context["current_tasks"])])
                 return f"المهام الحالية:\n{tasks}"
             else:
                 return "لا توجد مهام حالياً"
         
-        elif "حذف مهمة" in user_input:
-            try:
-                task_num = int(user_input.split()[-1]) - 1
-                if 0 <= task_num < len(self.office_context["current_tasks"]):
-                    removed_task = self.office_context["current_tasks"].pop(task_num)
-                    self.save_memory()
-                    return f"تم حذف المهمة: {removed_task}"
-                else:
-                    return "رقم المهمة غير صحيح"
-            except:
+        elif name == "delete_task":
+            number = intent.slots.get('number')
+            if number is None:
                 return "يرجى تحديد رقم المهمة المراد حذفها"
+            task_num = number - 1
+            if 0 <= task_num < len(self.office_context["current_tasks"]):
+                removed_task = self.office_context["current_tasks"][task_num]
+                self.record_memory('task_remove', index=task_num, task=removed_task)
+                if self.scheduler.get(f"task:{removed_task}"):
+                    self.record_memory('schedule_remove', id=f"task:{removed_task}")
+                return f"تم حذف المهمة: {removed_task}"
+            else:
+                return "رقم المهمة غير صحيح"
+        
+        # Meetings, announcements and reminders
+        elif name == "schedule_meeting":
+            due, title = parse_due(intent.slots.get('text', ''))
+            if due is None:
+                return "يرجى تحديد موعد الاجتماع، مثلاً: أضف اجتماع مع العميل غداً الساعة 10"
+            title = title or "بدون عنوان"
+            self.record_memory('schedule_add', item=Meeting(
+                new_item_id('meeting'), title, due.timestamp(), remind_before=self.meeting_reminder
+            ).to_dict())
+            return f"تم جدولة الاجتماع {title} {describe_due(due.timestamp())}"
+        
+        elif name in ("list_meetings", "list_reminders"):
+            kind = "meeting" if name == "list_meetings" else "task"
+            items = self.scheduler.upcoming(kind, limit=10)
+            if not items:
+                return "لا توجد اجتماعات قادمة" if kind == "meeting" else "لا توجد تذكيرات قادمة"
+            lines = "\n".join(f"{i+1}. {item.text} - {describe_due(item.due)}" for i, item in enumerate(items))
+            return f"{'الاجتماعات القادمة' if kind == 'meeting' else 'التذكيرات القادمة'}:\n{lines}"
+        
+        elif name == "cancel_meeting":
+            number = intent.slots.get('number')
+            if number is None:
+                return "يرجى تحديد رقم الاجتماع المراد إلغاؤه"
+            meetings = self.scheduler.upcoming("meeting", limit=number)
+            if not 1 <= number <= len(meetings):
+                return "رقم الاجتماع غير صحيح"
+            meeting = meetings[number - 1]
+            self.record_memory('schedule_remove', id=meeting.id)
+            return f"تم إلغاء الاجتماع: {meeting.text}"
+        
+        elif name == "add_announcement":
+            due, text = parse_due(intent.slots.get('text', ''))
+            if not text:
+                return "يرجى تحديد نص الإعلان"
+            # Without a time the announcement goes out as soon as this turn ends
+            due_at = due.timestamp() if due else time.time()
+            self.record_memory('schedule_add', item=Announcement(new_item_id('announcement'), text, due_at).to_dict())
+            return f"سيتم بث الإعلان {describe_due(due_at)}" if due else "سيتم بث الإعلان الآن"
+        
+        elif name == "add_reminder":
+            due, text = parse_due(intent.slots.get('text', ''))
+            # "ذكرني بالاتصال" / "ذكرني أن أتصل": drop the linking particle
+            text = re.sub(r"^(?:أن|ان)\s+|^ب(?=ال)", "", text or "")
+            if due is None or not text:
+                return "يرجى تحديد التذكير وموعده، مثلاً: ذكرني بالاتصال بالعميل بعد ساعة"
+            self.record_memory('schedule_add', item=Task(new_item_id('task'), text, due.timestamp()).to_dict())
+            return f"سأذكرك بـ {text} {describe_due(due.timestamp())}"
         
         # Memory commands
-        elif "عرض الذاكرة" in user_input:
+        elif name == "show_memory":
             if self.conversation_history:
                 recent = self.conversation_history[-5:]
                 memory_text = "المحادثات الأخيرة:\n"
@@ -334,32 +1252,34 @@ class ArabicVoiceAssistant:
             else:
                 return "لا توجد محادثات محفوظة"
         
-        elif "أضف تفضيل" in user_input:
-            preference = user_input.replace("أضف تفضيل", "").strip()
+        elif name == "add_preference":
+            preference = intent.slots.get('text')
             if preference:
-                self.office_context["user_preferences"][f"pref_{len(self.office_context['user_preferences'])}"] = preference
-                self.save_memory()
+                self.record_memory(
+                    'preference_set',
+                    key=new_item_id('pref'),
+                    value=preference
+                )
                 return f"تم حفظ التفضيل: {preference}"
             else:
                 return "يرجى تحديد التفضيل المراد حفظه"
         
-        elif "عرض التفضيلات" in user_input:
+        elif name == "list_preferences":
             if self.office_context["user_preferences"]:
                 prefs = "\n".join([f"- {pref}" for pref in self.office_context["user_preferences"].values()])
                 return f"التفضيلات المحفوظة:\n{prefs}"
             else:
                 return "لا توجد تفضيلات محفوظة"
         
-        elif "أضف ملاحظة" in user_input or "أضف نوتة" in user_input:
-            note = user_input.replace("أضف ملاحظة", "").replace("أضف نوتة", "").strip()
+        elif name == "add_note":
+            note = intent.slots.get('text')
             if note:
-                self.office_context["important_notes"].append(note)
-                self.save_memory()
+                self.record_memory('note_add', note=note)
                 return f"تم حفظ الملاحظة: {note}"
             else:
                 return "يرجى تحديد الملاحظة المراد حفظها"
         
-        elif "عرض الملاحظات" in user_input:
+        elif name == "list_notes":
             if self.office_context["important_notes"]:
                 notes = "\n".join([f"- {note}" for note in self.office_context["important_notes"]])
                 return f"الملاحظات المهمة:\n{notes}"
@@ -369,16 +1289,87 @@ class ArabicVoiceAssistant:
         else:
             return "يمكنني مساعدتك في إدارة المهام والاجتماعات وحفظ التفضيلات"
 
+    async def announce_reminder(self, item, audio: Optional[bytes]):
+        """Play a due reminder between turns, from audio synthesized ahead of time"""
+        await self.turn_idle.wait()
+        self.metrics.observe('reminder_lag', max(0.0, time.time() - item.reminder_at))
+        print(f"🔔 {item.reminder_text()}")
+        self.begin_turn()
+        try:
+            if audio and self.audio_player.available:
+                await self.run_interruptible(asyncio.to_thread(self.play_audio, audio))
+            else:
+                self.metrics.count('fallback', 'reminder')
+                await self.run_interruptible(self.speak_response(item.reminder_text()))
+        finally:
+            self.end_turn()
+        self.record_memory('schedule_done', id=item.id)
+
     async def run_conversation_loop(self):
         """Main conversation loop with better error handling"""
         print(f"\n🎯 {self.assistant_name} جاهز للاستماع...")
         print("💡 أوامر التحكم:")
-        print("   - 'توقف' أو 'خروج' - إنهاء المحادثة")
+        print("   - 'توقف' - إيقاف الرد الحالي")
+        print("   - 'خروج' أو 'إنهاء المحادثة' - إنهاء المحادثة")
         print("   - 'عرض الإعدادات' - عرض إعدادات النظام")
         print("=" * 60)
         
-        while True:
+        utterances = asyncio.Queue(maxsize=2)
+        persist_queue = asyncio.Queue(maxsize=32)
+        self.stop_requested = asyncio.Event()
+        self.turn_idle = asyncio.Event()
+        self.turn_idle.set()
+        
+        # Capture, response and persistence run as concurrent stages
+        capture = asyncio.create_task(self.capture_stage(utterances))
+        persist = asyncio.create_task(self.persist_stage(persist_queue))
+        keep_warm = asyncio.create_task(self.http_pool.keep_warm())
+        reminders = asyncio.create_task(self.scheduler.run())
+        self.watch_shared_memory()
+        try:
+            await self.response_stage(utterances, persist_queue)
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            print("\n👋 تم إيقاف المساعد")
+        finally:
+            capture.cancel()
+            persist.cancel()
+            keep_warm.cancel()
+            reminders.cancel()
+            if self.summary_task:
+                self.summary_task.cancel()
+            # Persist anything still queued before shutting down
+            while not persist_queue.empty():
+                self.add_to_memory(*persist_queue.get_nowait())
+            
+            # Compact the journal on a clean shutdown
+            self.save_memory()
+            self.memory_journal.close()
+            if self.shared_store:
+                self.shared_store.close()
+            self.local_tts.close()
+            self.recognition_service.shutdown()
+            self.metrics_exporter.stop()
+            self.report_connection_reuse()
+            await self.http_pool.aclose()
+            self.audio_player.close()
+            if self.continuous_capture:
+                self.audio_capture.stop()
+
+    def report_connection_reuse(self):
+        """Print requests versus new connections per host"""
+        for host, stats in self.http_pool.stats().items():
+            calls = stats['requests'] + stats['pings']
+            print(f"🌐 {host}: {stats['requests']} طلب، {stats['connections']} اتصال جديد، "
+                  f"{stats['reused']}/{calls} إعادة استخدام")
+
+    async def capture_stage(self, utterances: asyncio.Queue):
+        """Listen continuously and queue recognized utterances"""
+        while not self.stop_requested.is_set():
             try:
+                # Without echo cancellation the mic would hear our own reply
+                if not self.capture_during_playback:
+                    await self.turn_idle.wait()
+                
                 # Listen for voice input
                 user_input = await self.listen_for_voice()
                 
@@ -387,46 +1378,192 @@ class ArabicVoiceAssistant:
                     continue
                 
                 print(f"✅ تم فهم الصوت: {user_input}")
+                self.begin_turn()
+                await utterances.put(user_input)
                 
-                # Check for control commands
-                if "عرض الإعدادات" in user_input.lower():
-                    settings = """
-الإعدادات الحالية:
-- استخدام مكتبة speech_recognition البسيطة
-- مهلة الاستماع: 3 ثوان
-- حد الكلام: 8 ثوان
-- مهلة التعرف: 5 ثوان
-- اللغة: العربية فقط
-"""
-                    print(settings)
-                    await self.speak_response("تم عرض الإعدادات")
-                    continue
-                
-                # Check for exit commands - Arabic only
-                if any(word in user_input.lower() for word in ["توقف", "خروج"]):
-                    await self.speak_response("وداعاً! أتمنى لك يوماً سعيداً")
-                    break
-                
-                # Process the command - Arabic only
-                if any(word in user_input for word in ["مهمة", "اجتماع", "إعلان", "ذاكرة", "تذكر", "تفضيل", "ملاحظة", "نوتة"]):
-                    response = await self.process_office_command(user_input)
-                else:
-                    response = await self.generate_response(user_input)
-                
-                # Speak the response
-                await self.speak_response(response)
-                
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ خطأ: {e}")
+
+    def begin_turn(self):
+        """Mark the assistant busy so capture ignores its own voice"""
+        self.turn_idle.clear()
+        self.turn_interrupted.clear()
+        if self.continuous_capture and not self.capture_during_playback:
+            self.audio_capture.pause()
+            if self.barge_in_enabled:
+                loop = asyncio.get_running_loop()
+                self.audio_capture.arm_barge_in(
+                    lambda onset: loop.call_soon_threadsafe(self.interrupt_turn, onset, time.monotonic()),
+                    min_speech=self.barge_in_min_speech,
+                    ratio=self.barge_in_ratio
+                )
+
+    def end_turn(self):
+        """Mark the assistant idle and resume listening"""
+        if self.continuous_capture and not self.capture_during_playback:
+            self.audio_capture.resume()
+        self.turn_idle.set()
+
+    async def response_stage(self, utterances: asyncio.Queue, persist_queue: asyncio.Queue):
+        """Answer queued utterances in order and hand them to persistence"""
+        while not self.stop_requested.is_set():
+            user_input = await utterances.get()
+            try:
+                with self.metrics.span('turn'):
+                    response = await self.run_turn(user_input)
+            except Exception as e:
+                print(f"❌ خطأ: {e}")
+                response = None
+            finally:
+                # Capture may resume while this turn is being persisted
+                self.end_turn()
+            
+            if response is not None:
+                await persist_queue.put((user_input, response))
+
+    async def run_turn(self, user_input: str) -> Optional[str]:
+        """Respond to one utterance; None when the user interrupted the reply"""
+        return await self.run_interruptible(self.respond_to(user_input))
+
+    async def run_interruptible(self, work: Awaitable) -> Any:
+        """Run a turn's work as a task that barge-in can cancel"""
+        self.turn_task = asyncio.ensure_future(work)
+        try:
+            return await self.turn_task
+        except asyncio.CancelledError:
+            if not self.turn_interrupted.is_set():
+                raise
+            self.metrics.count('interrupted', 'turn')
+            print("✋ تمت مقاطعة الرد، أستمع إليك...")
+            return None
+        finally:
+            self.turn_task = None
+
+    def interrupt_turn(self, onset: float, detected: float):
+        """Stop speaking and cancel the running turn (on the event loop)
+
+        onset is when the user started talking and detected when the
+        detector fired, both on the time.monotonic() clock.
+        """
+        if self.turn_task is None or self.turn_task.done():
+            return
+        self.turn_interrupted.set()
+        # Silence first: the player stops within one write slice
+        self.audio_player.stop()
+        stopped = time.monotonic()
+        self.turn_task.cancel()
+        # A capped reply still being read belongs to this turn: abort it too
+        for drain in tuple(self.stream_drains):
+            drain.cancel()
+        self.metrics.observe('barge_in', stopped - onset)
+        self.metrics.observe('barge_in_stop', stopped - detected)
+        print(f"⏱️ توقف الصوت بعد {(stopped - onset) * 1000:.0f} مللي ثانية من بدء الكلام")
+
+    async def persist_stage(self, persist_queue: asyncio.Queue):
+        """Write finished turns to memory off the response path"""
+        while True:
+            user_input, response = await persist_queue.get()
+            try:
                 # Add to memory
                 self.add_to_memory(user_input, response)
+                self.schedule_summary()
                 
-                print("-" * 30)
+                cache_stats = self.tts_cache.stats()
+                print(f"💾 ذاكرة الصوت المؤقتة: {cache_stats['hits']} إصابة، "
+                      f"{cache_stats['misses']} إخفاق ({cache_stats['hit_rate']:.0%})")
                 
-            except KeyboardInterrupt:
-                print("\n👋 تم إيقاف المساعد")
-                break
+                if self.response_cache_enabled:
+                    response_stats = self.response_cache.stats()
+                    print(f"⚡ ذاكرة الاستجابات: {response_stats['hits']} إصابة، "
+                          f"{response_stats['misses']} إخفاق ({response_stats['hit_rate']:.0%})، "
+                          f"توفير {response_stats['saved_seconds']:.1f} ثانية")
+                
+                gate_stats = self.voice_gate.stats()
+                if gate_stats['segments']:
+                    latencies = self.recognition_service.latencies
+                    saved = gate_stats['rejected'] * (sum(latencies) / len(latencies) if latencies else 0)
+                    print(f"🚦 البوابة الصوتية: رفض {gate_stats['rejected']} من {gate_stats['segments']} مقطع، "
+                          f"{gate_stats['us_per_frame']:.1f} ميكروثانية/إطار، "
+                          f"تكلفة {gate_stats['gate_seconds'] * 1000:.0f} مللي ثانية مقابل توفير ~{saved:.1f} ثانية")
+                print("-" * 30)
             except Exception as e:
-                print(f"❌ خطأ: {e}")
-                continue
+                print(f"❌ خطأ في حفظ الذاكرة: {e}")
+
+    async def respond_to(self, user_input: str) -> Optional[str]:
+        """Route and speak one utterance, returning the reply to remember"""
+        # One local pass finds any command; everything else goes to the LLM
+        intent = self.intent_router.route(user_input)
+        name = intent.name if intent else None
+        
+        # Check for control commands
+        if name == "show_settings":
+            settings = f"""
+الإعدادات الحالية:
+- محرك التعرف على الكلام: {self.stt_backend.name}
+- الالتقاط المستمر: {'مفعل' if self.continuous_capture else 'معطل'}
+- مهلة الاستماع: 3 ثوان
+- حد الكلام: 8 ثوان
+- مهلة التعرف: {self.recognition_deadline:g} ثوان
+- اللغة: العربية فقط
+"""
+            print(settings)
+            await self.speak_response("تم عرض الإعدادات")
+            return None
+        
+        # "توقف" over a reply: barge-in already silenced it, keep listening
+        if name == "stop_speaking":
+            print("🤫 تم إيقاف الرد")
+            return None
+        
+        # Check for exit commands - Arabic only
+        if name == "exit":
+            self.stop_requested.set()
+            await self.speak_response("وداعاً! أتمنى لك يوماً سعيداً")
+            return None
+        
+        # Process the command - Arabic only
+        if intent is not None:
+            with self.metrics.span('command'):
+                response = await self.process_office_command(user_input, intent)
+            await self.speak_response(response)
+        elif self.pipelined_responses:
+            # Generation and speech overlap, sentence by sentence
+            response = await self.respond_pipelined(user_input)
+        else:
+            response = await self.generate_response(user_input)
+            await self.speak_response(response)
+        
+        return response
+
+def startup_profile():
+    """Start the assistant, print where startup time went, and shut down"""
+    assistant = ArabicVoiceAssistant()
+    if assistant.warmup_thread:
+        assistant.warmup_thread.join(timeout=5)
+    if assistant.microphone_future:
+        assistant.microphone_future.exception(timeout=5)
+    if assistant.continuous_capture:
+        assistant.audio_capture.source.opened.wait(timeout=5)
+    if assistant.audio_player.in_process:
+        assistant.audio_player.opened.wait(timeout=5)
+    print()
+    print(STARTUP.report(assistant.ready_at))
+    for result in getattr(assistant, 'warmup_results', []):
+        timings = ", ".join(f"{key} {result[key] * 1000:.0f} ms" for key in ('connect', 'tls', 'seconds')
+                            if result[key] is not None)
+        print(f"🌐 {result['host']}: {result['error'] or timings}")
+    
+    if assistant.continuous_capture:
+        assistant.audio_capture.stop()
+    assistant.memory_journal.close()
+    if assistant.shared_store:
+        assistant.shared_store.close()
+    assistant.recognition_service.shutdown()
+    assistant.metrics_exporter.stop()
+    assistant.http_pool.close()
+    assistant.audio_player.close()
 
 async def main():
     """Main function with simple error handling"""
@@ -439,4 +1576,11 @@ async def main():
         print(f"❌ خطأ في تشغيل المساعد: {e}")
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Arabic Voice Assistant")
+    parser.add_argument("--startup-profile", action="store_true",
+                        help="print an import and init-phase timing breakdown, then exit")
+    args = parser.parse_args()
+    if args.startup_profile:
+        startup_profile()
+    else:
+        asyncio.run(main())
\ No newline at end of file
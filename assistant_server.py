@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+"""
+Multi-client server mode for the Arabic Voice Assistant
+Office workstations stream microphone frames over WebSocket and get spoken
+replies back; one process holds the API clients, caches and office memory
+
+Protocol (one WebSocket per workstation):
+  client -> server  {"type": "hello", "session": "desk-3", "sample_rate": 16000}
+  client -> server  binary 16-bit mono PCM frames
+  client -> server  {"type": "end"} when it stops sending audio
+  server -> client  {"type": "transcript" | "reply" | "ignored" | "busy", ...}
+  server -> client  binary audio (MP3) for each spoken reply, then {"type": "audio_end"}
+  server -> client  {"type": "reminder", "text": ...}, its audio, then {"type": "audio_end"}
+                    when a reminder or meeting the desk set is due, or an announcement
+  server -> client  {"type": "speak_text", "text": ...} in place of audio while speech
+                    synthesis is failing; the workstation speaks it with its own voice
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import deque
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import numpy as np
+import speech_recognition as sr
+import websockets
+
+from arabic_voice_assistant import ArabicVoiceAssistant
+from audio_capture import ContinuousCapture, PushSource, Utterance
+from scheduler import Announcement, ScheduledItem
+from voice_gate import VoiceGate
+
+
+class ServerBusy(Exception):
+    """Raised when too many turns are already waiting for a slot"""
+
+
+class TurnLimiter:
+    """Concurrency semaphore for cloud work with a bounded waiting line"""
+
+    def __init__(self, max_concurrent: int = 8, max_waiting: int = 32):
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.wait_times = deque(maxlen=1000)
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one of the concurrent slots; fail fast when the line is full"""
+        if self.waiting >= self.max_waiting:
+            self.rejected += 1
+            raise ServerBusy()
+        self.waiting += 1
+        start = time.perf_counter()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.wait_times.append(time.perf_counter() - start)
+        self.admitted += 1
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self.wait_times)
+        return {
+            'active': self.active,
+            'waiting': self.waiting,
+            'admitted': self.admitted,
+            'rejected': self.rejected,
+            'p99_wait': waits[min(len(waits) - 1, int(len(waits) * 0.99))] if waits else 0.0,
+        }
+
+
+class SessionAssistant(ArabicVoiceAssistant):
+    """One workstation's view of the shared office assistant
+
+    Shares the office's API clients, caches, intent router, recognition
+    service and office_context; keeps its own conversation history, capture
+    state and voice gate, and sends audio to its client instead of a speaker.
+    """
+
+    def __init__(self, office: ArabicVoiceAssistant, session_id: str, websocket, limiter: TurnLimiter,
+                 sample_rate: int = 16000):
+        self.__dict__.update(office.__dict__)
+        self.office = office
+        self.session_id = session_id
+        self.websocket = websocket
+        self.limiter = limiter
+        self.loop = asyncio.get_running_loop()
+        self.stop_requested = asyncio.Event()
+        # Cleared while a turn or a reminder is being sent to this desk
+        self.turn_idle = asyncio.Event()
+        self.turn_idle.set()
+
+        # Isolated history and running summary: this desk's own turns only
+        self.conversation_history = [
+            conv for conv in office.conversation_history if conv.get('session') == session_id
+        ]
+        self.summary_key = f"conversation_summary@{session_id}"
+        self.summary_until_key = f"summary_until@{session_id}"
+        self.summary_task = None
+        self.summary_watermark = 0
+        self.stream_drains = set()
+        self.continuous_capture = True
+        self.audio_capture = ContinuousCapture(
+            PushSource(sample_rate),
+            pre_roll=float(os.getenv("CAPTURE_PRE_ROLL", "0.3")),
+            end_silence=float(os.getenv("CAPTURE_END_SILENCE", "0.8")),
+            max_utterance=8.0
+        )
+        # Wake-word windows are per desk
+        self.voice_gate = VoiceGate(
+            sample_rate=office.voice_gate.sample_rate,
+            spotter=office.voice_gate.spotter,
+            require_wake_word=office.voice_gate.require_wake_word,
+            wake_window=office.voice_gate.wake_window
+        )
+
+    async def send_json(self, **message):
+        await self.websocket.send(json.dumps(message, ensure_ascii=False))
+
+    async def send_audio(self, audio_bytes: bytes):
+        await self.websocket.send(audio_bytes)
+
+    def play_audio(self, audio_bytes: bytes) -> None:
+        """Called from pipeline worker threads: hand the audio to the event loop"""
+        asyncio.run_coroutine_threadsafe(self.send_audio(audio_bytes), self.loop).result()
+
+    async def speak_response(self, text: str) -> None:
+        """Synthesize (or reuse cached audio) and send it to the workstation"""
+        started = time.perf_counter()
+        with self.metrics.span('speak'):
+            cached = self.tts_cache.get(self.tts_cache_key(text))
+            if not cached and not self.breakers['tts'].available():
+                # ElevenLabs is known to be down: don't wait for it to fail again
+                self.metrics.count('short_circuit', 'tts')
+                await self.send_text_fallback(text, started)
+                return
+            try:
+                audio = cached or await asyncio.to_thread(self.synthesize_audio, text)
+            except Exception as e:
+                # Counted as a tts error by the span and the breaker around the call
+                print(f"❌ خطأ في تحويل النص إلى كلام ({self.session_id}): {e}")
+                await self.send_text_fallback(text, started)
+                return
+            await self.send_audio(audio)
+
+    async def send_text_fallback(self, text: str, since: Optional[float] = None):
+        """Send the text for the workstation to speak; the server's own voice is no use to it"""
+        self.metrics.count('fallback', 'tts')
+        if since is not None:
+            self.metrics.observe('tts_fallback', time.perf_counter() - since)
+        await self.send_json(type='speak_text', text=text)
+
+    def fallback_tts(self, text: str, since: Optional[float] = None) -> None:
+        """Called from pipeline worker threads (via play_sentence) when a sentence has no audio"""
+        asyncio.run_coroutine_threadsafe(self.send_text_fallback(text, since), self.loop).result()
+
+    async def deliver_reminder(self, item: ScheduledItem, audio: Optional[bytes]):
+        """Send a due reminder to this desk between its turns, from audio rendered ahead of time"""
+        await self.turn_idle.wait()
+        self.turn_idle.clear()
+        try:
+            self.metrics.observe('reminder_lag', max(0.0, time.time() - item.reminder_at))
+            await self.send_json(type='reminder', text=item.reminder_text())
+            if audio:
+                await self.send_audio(audio)
+            else:
+                self.metrics.count('fallback', 'reminder')
+                await self.speak_response(item.reminder_text())
+            await self.send_json(type='audio_end')
+        finally:
+            self.turn_idle.set()
+
+    def record_memory(self, op: str, **fields):
+        """Reminders and meetings set at this desk are announced back to it"""
+        if op == 'schedule_add':
+            fields['item'] = dict(fields['item'], session=self.session_id)
+        super().record_memory(op, **fields)
+
+    def memory_fingerprint(self) -> str:
+        """Cached answers were shaped by this desk's own context, so they stay with it"""
+        return f"{super().memory_fingerprint()}@{self.session_id}"
+
+    def retrieve_memories(self, user_input: str, kinds=None):
+        """Shared notes and tasks, but only this desk's own past turns"""
+        return super().retrieve_memories(user_input, kinds=['note', 'task', f"conversation@{self.session_id}"])
+
+    def add_to_memory(self, user_input: str, assistant_response: str):
+        """Record the turn in the office journal, tagged with this session"""
+        conversation = {
+            'timestamp': datetime.now().isoformat(),
+            'user_input': user_input,
+            'assistant_response': assistant_response,
+            'session': self.session_id
+        }
+        self.office.record_memory('conversation', conversation=conversation)
+        self.conversation_history.append(conversation)
+        if self.max_conversations and len(self.conversation_history) > self.max_conversations:
+            del self.conversation_history[:-self.max_conversations]
+
+    async def handle_turn(self, utterance: Utterance) -> Optional[float]:
+        """Gate, recognize, answer and speak one utterance; returns the turn latency"""
+        start = time.perf_counter()
+        audio = sr.AudioData(utterance.frame_data, utterance.sample_rate, 2)
+        if self.voice_gate_enabled:
+            decision = self.gate_audio(audio)
+            if not decision.accepted:
+                await self.send_json(type='ignored', reason=decision.reason)
+                return None
+
+        try:
+            async with self.limiter.slot():
+                with self.metrics.span('asr'):
+                    try:
+                        text = await self.recognition_service.recognize(audio)
+                    except asyncio.TimeoutError:
+                        self.metrics.count('timeout', 'asr')
+                        text = None
+                    except (sr.UnknownValueError, sr.RequestError):
+                        text = None
+                if not text or not text.strip():
+                    await self.send_json(type='ignored', reason='unrecognized')
+                    return None
+                await self.send_json(type='transcript', text=text)
+
+                # A reminder already on its way to this desk finishes first
+                await self.turn_idle.wait()
+                self.turn_idle.clear()
+                try:
+                    if not self.capture_during_playback:
+                        self.audio_capture.pause()
+                    try:
+                        with self.metrics.span('respond'):
+                            response = await self.respond_to(text)
+                    finally:
+                        self.audio_capture.resume()
+
+                    latency = time.perf_counter() - start
+                    self.metrics.observe('turn', latency)
+                    await self.send_json(type='audio_end')
+                    await self.send_json(type='reply', text=response or "", latency=latency)
+                finally:
+                    self.turn_idle.set()
+        except ServerBusy:
+            self.metrics.count('busy', 'turn')
+            await self.send_json(type='busy')
+            return None
+
+        if response:
+            self.add_to_memory(text, response)
+            self.schedule_summary()
+        return latency
+
+    async def turn_worker(self, turns: asyncio.Queue, server: "AssistantServer"):
+        """Answer this desk's utterances one at a time"""
+        while True:
+            utterance = await turns.get()
+            try:
+                latency = await self.handle_turn(utterance)
+                if latency is not None:
+                    server.record_turn(latency)
+            except websockets.ConnectionClosed:
+                return
+            except Exception as e:
+                print(f"❌ خطأ في معالجة الطلب ({self.session_id}): {e}")
+            finally:
+                turns.task_done()
+            if self.stop_requested.is_set():
+                await self.websocket.close()
+                return
+
+
+class AssistantServer:
+    """WebSocket front end sharing one office assistant across workstations"""
+
+    def __init__(self, office: ArabicVoiceAssistant, host: str = "0.0.0.0", port: int = 8765,
+                 max_concurrent: int = 8, max_waiting: int = 32, max_queued_turns: int = 2):
+        self.office = office
+        self.host = host
+        self.port = port
+        self.max_queued_turns = max_queued_turns
+        self.limiter = TurnLimiter(max_concurrent, max_waiting)
+        self.sessions: Dict[str, SessionAssistant] = {}
+        self.turn_latencies = deque(maxlen=10000)
+        self.started_at = time.perf_counter()
+        self.dropped_utterances = 0
+        self._server = None
+        self.reminders = None
+
+    def record_turn(self, latency: float):
+        self.turn_latencies.append(latency)
+
+    async def serve_session(self, websocket, *args):
+        """Run one workstation connection until it ends or says goodbye"""
+        hello = json.loads(await websocket.recv())
+        session_id = hello.get('session') or uuid.uuid4().hex[:8]
+        session = SessionAssistant(self.office, session_id, websocket, self.limiter,
+                                   int(hello.get('sample_rate', 16000)))
+        self.sessions[session_id] = session
+        print(f"🖥️ اتصال جديد: {session_id} ({len(self.sessions)} جلسة)")
+
+        turns = asyncio.Queue(maxsize=self.max_queued_turns)
+        worker = asyncio.create_task(session.turn_worker(turns, self))
+        frame_samples = session.audio_capture.source.frame_samples
+        pending = np.zeros(0, dtype=np.int16)
+        try:
+            async for message in websocket:
+                if isinstance(message, str):
+                    if json.loads(message).get('type') == 'end':
+                        break
+                    continue
+                # Re-frame whatever the client sends into capture-sized frames
+                pending = np.concatenate([pending, np.frombuffer(message, dtype='<i2')])
+                while len(pending) >= frame_samples:
+                    session.audio_capture.process_frame(pending[:frame_samples])
+                    pending = pending[frame_samples:]
+                while True:
+                    utterance = session.audio_capture.next_utterance(timeout=0)
+                    if utterance is None:
+                        break
+                    if turns.full():
+                        # Backpressure: this desk already has turns queued
+                        self.dropped_utterances += 1
+                        await session.send_json(type='busy')
+                        continue
+                    turns.put_nowait(utterance)
+            # Finish what the desk already said
+            await turns.join()
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            worker.cancel()
+            self.sessions.pop(session_id, None)
+            print(f"🖥️ انتهى الاتصال: {session_id}")
+
+    async def announce(self, item: ScheduledItem, audio: Optional[bytes]):
+        """Deliver a due item: announcements to every desk, everything else to the desk that set it"""
+        if isinstance(item, Announcement) or item.session is None:
+            targets = list(self.sessions.values())
+        else:
+            targets = [self.sessions[item.session]] if item.session in self.sessions else []
+        if not targets:
+            # Left pending in the journal; a restart within the grace period retries it
+            self.office.metrics.count('undelivered', 'reminder')
+            print(f"⏰ لا توجد جلسة متصلة لتلقي التذكير: {item.reminder_text()}")
+            return
+        print(f"🔔 {item.reminder_text()} ({len(targets)} جلسة)")
+        results = await asyncio.gather(*(session.deliver_reminder(item, audio) for session in targets),
+                                       return_exceptions=True)
+        if any(not isinstance(result, BaseException) for result in results):
+            self.office.record_memory('schedule_done', id=item.id)
+
+    async def start(self):
+        self._server = await websockets.serve(self.serve_session, self.host, self.port, max_size=2 ** 22)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self.keep_warm = asyncio.create_task(self.office.http_pool.keep_warm())
+        # Reminders go out over the desks' WebSockets, not the server's speaker
+        self.office.scheduler.announce = self.announce
+        self.reminders = asyncio.create_task(self.office.scheduler.run())
+        self.office.watch_shared_memory()
+        print(f"🌐 الخادم يعمل على ws://{self.host}:{self.port}")
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self.keep_warm.cancel()
+            self.reminders.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        """Throughput and turn latency percentiles since start"""
+        latencies = sorted(self.turn_latencies)
+        elapsed = time.perf_counter() - self.started_at
+
+        def percentile(q: float) -> float:
+            return latencies[min(len(latencies) - 1, int(len(latencies) * q))] if latencies else 0.0
+
+        return {
+            'sessions': len(self.sessions),
+            'turns': len(latencies),
+            'turns_per_second': len(latencies) / elapsed if elapsed else 0.0,
+            'p50': percentile(0.5),
+            'p99': percentile(0.99),
+            'dropped_utterances': self.dropped_utterances,
+            'limiter': self.limiter.stats(),
+        }
+
+
+async def serve(host: str, port: int):
+    """Run the server until interrupted"""
+    office = ArabicVoiceAssistant(audio_input=False)
+    server = AssistantServer(
+        office, host, port,
+        max_concurrent=int(os.getenv("SERVER_MAX_CONCURRENT_TURNS", "8")),
+        max_waiting=int(os.getenv("SERVER_MAX_WAITING_TURNS", "32"))
+    )
+    await server.start()
+    try:
+        await asyncio.Future()
+    finally:
+        await server.stop()
+        office.save_memory()
+        office.memory_journal.close()
+        if office.shared_store:
+            office.shared_store.close()
+        office.local_tts.close()
+        office.recognition_service.shutdown()
+        office.metrics_exporter.stop()
+        office.report_connection_reuse()
+        await office.http_pool.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the Arabic Voice Assistant to many workstations")
+    parser.add_argument("--host", default=os.getenv("SERVER_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("SERVER_PORT", "8765")))
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("👋 تم إيقاف الخادم")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""
+Continuous audio capture for the Arabic Voice Assistant
+An always-on thread writes PCM frames into a ring buffer and cuts utterances
+out of it with pre-roll, tracking the noise floor adaptively
+"""
+
+import queue
+import threading
+import time
+import wave
+from dataclasses import dataclass
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+from startup import STARTUP
+
+SAMPLE_RATE = 16000
+FRAME_SAMPLES = 480  # 30 ms at 16 kHz
+
+
+@dataclass
+class Utterance:
+    """One segmented utterance of 16-bit mono PCM"""
+    samples: np.ndarray
+    sample_rate: int
+    started_at: float
+    ended_at: float
+
+    @property
+    def duration(self) -> float:
+        return len(self.samples) / self.sample_rate
+
+    @property
+    def frame_data(self) -> bytes:
+        return self.samples.astype('<i2').tobytes()
+
+
+class MicrophoneSource:
+    """Read fixed-size PCM frames from the default microphone
+
+    The device is opened on the first read, i.e. on the capture thread, so
+    PortAudio's slow device probing overlaps the rest of startup.
+    """
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE, frame_samples: int = FRAME_SAMPLES,
+                 device_index: Optional[int] = None):
+        self.sample_rate = sample_rate
+        self.frame_samples = frame_samples
+        self.device_index = device_index
+        self.opened = threading.Event()
+        self._audio = None
+        self._stream = None
+
+    def open(self):
+        with STARTUP.phase("open microphone"):
+            import pyaudio
+
+            self._audio = pyaudio.PyAudio()
+            self._stream = self._audio.open(
+                format=pyaudio.paInt16,
+                channels=1,
+                rate=self.sample_rate,
+                input=True,
+                input_device_index=self.device_index,
+                frames_per_buffer=self.frame_samples
+            )
+        self.opened.set()
+
+    def read_frame(self) -> Optional[np.ndarray]:
+        if self._stream is None:
+            self.open()
+        data = self._stream.read(self.frame_samples, exception_on_overflow=False)
+        return np.frombuffer(data, dtype='<i2')
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.stop_stream()
+            self._stream.close()
+        if self._audio is not None:
+            self._audio.terminate()
+
+
+class WavFileSource:
+    """Read PCM frames from a 16-bit mono WAV file, optionally in real time"""
+
+    def __init__(self, path: str, frame_samples: int = FRAME_SAMPLES, realtime: bool = False):
+        self._wav = wave.open(path, 'rb')
+        if self._wav.getsampwidth() != 2 or self._wav.getnchannels() != 1:
+            raise ValueError(f"{path} must be 16-bit mono PCM")
+        self.sample_rate = self._wav.getframerate()
+        self.frame_samples = frame_samples
+        self.realtime = realtime
+
+    def read_frame(self) -> Optional[np.ndarray]:
+        data = self._wav.readframes(self.frame_samples)
+        if not data:
+            return None
+        if self.realtime:
+            time.sleep(len(data) / 2 / self.sample_rate)
+        return np.frombuffer(data, dtype='<i2')
+
+    def close(self):
+        self._wav.close()
+
+
+class PushSource:
+    """Frames pushed in by the caller (e.g. from a network client)
+
+    Used with ContinuousCapture.process_frame instead of start(), so no
+    capture thread is needed per source.
+    """
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE, frame_samples: int = FRAME_SAMPLES):
+        self.sample_rate = sample_rate
+        self.frame_samples = frame_samples
+
+    def read_frame(self) -> Optional[np.ndarray]:
+        return None
+
+    def close(self):
+        pass
+
+
+class RingBuffer:
+    """Preallocated int16 ring buffer addressed by absolute sample index"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.data = np.zeros(capacity, dtype=np.int16)
+        self.written = 0
+
+    def write(self, samples: np.ndarray):
+        count = len(samples)
+        if count >= self.capacity:
+            samples = samples[-self.capacity:]
+            self.written += count - self.capacity
+            count = self.capacity
+        start = self.written % self.capacity
+        first = min(count, self.capacity - start)
+        self.data[start:start + first] = samples[:first]
+        self.data[:count - first] = samples[first:]
+        self.written += count
+
+    def read(self, start: int, end: int) -> np.ndarray:
+        """Copy samples [start, end) that are still in the buffer"""
+        start = max(start, self.written - self.capacity, 0)
+        end = min(end, self.written)
+        if end <= start:
+            return np.zeros(0, dtype=np.int16)
+        first = start % self.capacity
+        count = end - start
+        if first + count <= self.capacity:
+            return self.data[first:first + count].copy()
+        return np.concatenate((self.data[first:], self.data[:count - (self.capacity - first)]))
+
+
+class ContinuousCapture:
+    """Always-on capture thread with adaptive noise floor and utterance segmentation
+
+    The noise floor follows background frames quickly (noise_alpha) and
+    creeps up during speech by at most noise_rise per frame, so a lasting
+    rise in background noise (an air conditioner starting) stops counting as
+    speech after a few seconds instead of latching capture open.
+    """
+
+    def __init__(self, source, pre_roll: float = 0.3, end_silence: float = 0.8,
+                 min_speech: float = 0.1, max_utterance: float = 8.0, buffer_seconds: float = 30.0,
+                 threshold_ratio: float = 3.0, min_energy: float = 1e-5, noise_alpha: float = 0.05,
+                 noise_rise: float = 0.01):
+        self.source = source
+        self.sample_rate = source.sample_rate
+        self.frame_samples = source.frame_samples
+        frame_seconds = self.frame_samples / self.sample_rate
+
+        self.pre_roll_samples = int(pre_roll * self.sample_rate)
+        self.end_silence_frames = max(1, int(end_silence / frame_seconds))
+        self.min_speech_frames = max(1, int(min_speech / frame_seconds))
+        self.max_utterance_samples = int(max_utterance * self.sample_rate)
+        self.threshold_ratio = threshold_ratio
+        self.min_energy = min_energy
+        self.noise_alpha = noise_alpha
+        self.noise_rise = noise_rise
+
+        self.ring = RingBuffer(int(buffer_seconds * self.sample_rate))
+        self.utterances: "queue.Queue[Optional[Utterance]]" = queue.Queue()
+        self.noise_floor: Optional[float] = None
+        self.frames_read = 0
+
+        self._paused = False
+        self._min_start = 0
+        self._speech_start: Optional[int] = None
+        self._speech_frames = 0
+        self._silence_frames = 0
+        # Barge-in: while paused for playback, speech well above the echo
+        # of our own voice unpauses capture and calls back
+        self._barge_in: Optional[Callable[[float], None]] = None
+        self._barge_in_grace_frames = 0
+        self._barge_in_min_frames = 0
+        self._barge_in_ratio = 4.0
+        self._barge_in_frames = 0
+        self._barge_in_speech = 0
+        self.echo_floor = 0.0
+        self.echo_decay = 0.995
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start the capture thread"""
+        self._thread = threading.Thread(target=self._run, name="audio-capture", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop capturing and close the source"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+
+    def pause(self):
+        """Stop segmenting (e.g. while the assistant itself is speaking)"""
+        with self._lock:
+            self._paused = True
+            self._reset_segment()
+
+    def resume(self):
+        """Resume segmenting, dropping anything captured while paused
+
+        After a barge-in capture is already running and the interrupting
+        utterance is kept.
+        """
+        with self._lock:
+            self._barge_in = None
+            if not self._paused:
+                return
+            self._paused = False
+            self._min_start = self.ring.written
+            self._reset_segment()
+            while not self.utterances.empty():
+                self.utterances.get_nowait()
+
+    def arm_barge_in(self, callback: Callable[[float], None], min_speech: float = 0.1,
+                     grace: float = 0.2, ratio: float = 4.0):
+        """Watch for the user talking over playback while paused
+
+        The first grace seconds after our reply becomes audible only learn
+        how loud its echo is; after that, min_speech seconds of frames ratio times
+        above it unpause capture and call callback(onset), onset being the
+        time.monotonic() at which that speech started.
+        """
+        frame_seconds = self.frame_samples / self.sample_rate
+        with self._lock:
+            self._barge_in = callback
+            self._barge_in_grace_frames = int(grace / frame_seconds)
+            self._barge_in_min_frames = max(1, int(min_speech / frame_seconds))
+            self._barge_in_ratio = ratio
+            self._barge_in_frames = 0
+            self._barge_in_speech = 0
+            self.echo_floor = 0.0
+
+    def disarm_barge_in(self):
+        with self._lock:
+            self._barge_in = None
+
+    def _detect_barge_in(self, energy: float, frame_length: int) -> Optional[Tuple[Callable, float]]:
+        noise_threshold = max(self.noise_floor * self.threshold_ratio, self.min_energy)
+        if self._barge_in_frames == 0 and energy <= noise_threshold:
+            # The reply has not reached the mic yet (LLM or TTS still working)
+            return None
+        self._barge_in_frames += 1
+        if self._barge_in_frames <= self._barge_in_grace_frames:
+            self.echo_floor = max(self.echo_floor, energy)
+            return None
+
+        threshold = max(self.echo_floor * self._barge_in_ratio, noise_threshold)
+        if energy <= threshold:
+            # Peak hold with a slow decay follows the echo level of the reply
+            self._barge_in_speech = 0
+            self.echo_floor = max(energy, self.echo_floor * self.echo_decay)
+            return None
+
+        self._barge_in_speech += 1
+        if self._barge_in_speech < self._barge_in_min_frames:
+            return None
+
+        # Start the utterance where the interruption started
+        frame_end = self.ring.written
+        onset = frame_end - self._barge_in_speech * frame_length
+        self._paused = False
+        self._speech_start = max(onset - self.pre_roll_samples, self._min_start)
+        self._speech_frames = self._barge_in_speech
+        self._silence_frames = 0
+        callback, self._barge_in = self._barge_in, None
+        return callback, time.monotonic() - (frame_end - onset) / self.sample_rate
+
+    def _reset_segment(self):
+        self._speech_start = None
+        self._speech_frames = 0
+        self._silence_frames = 0
+
+    def frame_energy(self, frame: np.ndarray) -> float:
+        """Mean square energy of a frame, normalized to [0, 1]"""
+        samples = frame.astype(np.float32) / 32768.0
+        return float(np.dot(samples, samples) / max(1, len(samples)))
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                frame = self.source.read_frame()
+                if frame is None:
+                    break
+                self.process_frame(frame)
+        except Exception as e:
+            print(f"❌ خطأ في الميكروفون: {e}")
+        finally:
+            with self._lock:
+                if self._speech_start is not None and self._speech_frames >= self.min_speech_frames:
+                    self._emit(self.ring.written)
+            self.utterances.put(None)
+            self.source.close()
+
+    def process_frame(self, frame: np.ndarray):
+        """Store one frame and advance the segmentation state machine"""
+        with self._lock:
+            barge_in = self._advance(frame)
+        if barge_in is not None:
+            callback, onset = barge_in
+            callback(onset)
+
+    def _advance(self, frame: np.ndarray) -> Optional[Tuple[Callable, float]]:
+        """Locked part of process_frame; returns a barge-in callback to run after it"""
+        self.ring.write(frame)
+        self.frames_read += 1
+        energy = self.frame_energy(frame)
+
+        if self.noise_floor is None:
+            self.noise_floor = max(energy, self.min_energy)
+        is_speech = energy > max(self.noise_floor * self.threshold_ratio, self.min_energy)
+
+        if not is_speech:
+            self.noise_floor += self.noise_alpha * (energy - self.noise_floor)
+            self.noise_floor = max(self.noise_floor, self.min_energy)
+        elif not self._paused:
+            # Slow enough that a few seconds of speech barely move it, but
+            # noise that never stops is eventually treated as background.
+            # Our own reply (paused) must not raise it.
+            self.noise_floor = min(self.noise_floor * (1 + self.noise_rise), energy)
+
+        if self._paused:
+            if self._barge_in is not None:
+                return self._detect_barge_in(energy, len(frame))
+            return None
+
+        frame_end = self.ring.written
+        if self._speech_start is None:
+            if is_speech:
+                self._speech_frames += 1
+                if self._speech_frames >= self.min_speech_frames:
+                    onset = frame_end - self._speech_frames * len(frame)
+                    self._speech_start = max(onset - self.pre_roll_samples, self._min_start)
+                    self._silence_frames = 0
+            else:
+                self._speech_frames = 0
+            return None
+
+        if is_speech:
+            self._speech_frames += 1
+            self._silence_frames = 0
+        else:
+            self._silence_frames += 1
+
+        too_long = frame_end - self._speech_start >= self.max_utterance_samples
+        if self._silence_frames >= self.end_silence_frames or too_long:
+            self._emit(frame_end)
+
+    def _emit(self, end: int):
+        samples = self.ring.read(self._speech_start, end)
+        now = time.monotonic()
+        self.utterances.put(Utterance(
+            samples=samples,
+            sample_rate=self.sample_rate,
+            started_at=now - (end - self._speech_start) / self.sample_rate,
+            ended_at=now
+        ))
+        self._reset_segment()
+
+    def next_utterance(self, timeout: Optional[float] = None) -> Optional[Utterance]:
+        """Block until the next utterance; None on timeout or end of input"""
+        try:
+            return self.utterances.get(timeout=timeout)
+        except queue.Empty:
+            return None
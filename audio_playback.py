@@ -0,0 +1,494 @@
+#!/usr/bin/env python3
+"""
+Streaming audio playback for the Arabic Voice Assistant
+Plays raw PCM in-process through one long-lived output stream, or feeds MP3
+chunks into an external player when no audio library is installed
+"""
+
+import queue
+import shutil
+import subprocess
+import threading
+import time
+import wave
+from typing import Dict, Iterable, List, Optional
+
+from startup import STARTUP
+
+# ElevenLabs pcm_<rate> output: 16-bit little-endian mono
+PCM_SAMPLE_WIDTH = 2
+
+# Players that can decode MP3 from stdin, in order of preference
+DEFAULT_PLAYER_COMMANDS = [
+    ['mpg123', '-q', '-'],
+    ['mplayer', '-really-quiet', '-cache', '1024', '-'],
+]
+
+
+def find_player_command() -> Optional[List[str]]:
+    """Return the first installed player command that reads from stdin"""
+    for command in DEFAULT_PLAYER_COMMANDS:
+        if shutil.which(command[0]):
+            return list(command)
+    return None
+
+
+class StreamingAudioPlayer:
+    """Pipe audio chunks into a player process with a small jitter buffer"""
+
+    # Expects MP3 and starts a decoder process per reply
+    in_process = False
+
+    def __init__(self, command: Optional[List[str]] = None, jitter_buffer_bytes: int = 4096,
+                 max_queued_chunks: int = 64):
+        self.command = command or find_player_command()
+        self.jitter_buffer_bytes = jitter_buffer_bytes
+        self.max_queued_chunks = max_queued_chunks
+        self.last_stats: Dict[str, float] = {}
+        self._process: Optional[subprocess.Popen] = None
+        self._stopped = False
+
+    @property
+    def available(self) -> bool:
+        return self.command is not None
+
+    def stop(self, timeout: float = 0.1) -> bool:
+        """Kill the player process of the current reply (barge-in)"""
+        self._stopped = True
+        process = self._process
+        if process is not None and process.poll() is None:
+            process.kill()
+        return True
+
+    def close(self):
+        pass
+
+    @staticmethod
+    def _offer(chunk_queue: queue.Queue, item, done: threading.Event) -> bool:
+        """Queue an item unless playback has ended; False once nobody is reading"""
+        while not done.is_set():
+            try:
+                chunk_queue.put(item, timeout=0.05)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _fetch_chunks(self, chunks: Iterable[bytes], chunk_queue: queue.Queue, errors: list,
+                      done: threading.Event):
+        """Pull chunks from the TTS generator on a separate thread
+
+        Stops as soon as playback ends (stop, broken pipe), even with the
+        queue full, and closes the generator so the download is dropped.
+        """
+        try:
+            for chunk in chunks:
+                if chunk and not self._offer(chunk_queue, chunk, done):
+                    break
+        except Exception as e:
+            errors.append(e)
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                try:
+                    close()
+                except Exception:
+                    pass
+            self._offer(chunk_queue, None, done)
+
+    def play_stream(self, chunks: Iterable[bytes]) -> Dict[str, float]:
+        """Play chunks as they arrive and return timing statistics"""
+        if not self.command:
+            raise RuntimeError("No audio player found (install mpg123 or mplayer)")
+
+        start_time = time.monotonic()
+        stats = {
+            'time_to_first_chunk': 0.0,
+            'time_to_first_audio': 0.0,
+            'total_time': 0.0,
+            'bytes': 0,
+            'chunks': 0,
+        }
+
+        # Keep network reads flowing even while the player pipe is full
+        chunk_queue = queue.Queue(maxsize=self.max_queued_chunks)
+        errors = []
+        done = threading.Event()
+        fetcher = threading.Thread(
+            target=self._fetch_chunks, args=(chunks, chunk_queue, errors, done), daemon=True
+        )
+        fetcher.start()
+
+        self._stopped = False
+        process = subprocess.Popen(
+            self.command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+        self._process = process
+
+        pending = []
+        pending_size = 0
+        started = False
+        try:
+            while True:
+                chunk = chunk_queue.get()
+                if chunk is None or self._stopped:
+                    break
+
+                if stats['chunks'] == 0:
+                    stats['time_to_first_chunk'] = time.monotonic() - start_time
+                stats['chunks'] += 1
+                stats['bytes'] += len(chunk)
+
+                if started:
+                    process.stdin.write(chunk)
+                    process.stdin.flush()
+                    continue
+
+                # Jitter buffer: hold back a little audio so the player does not starve
+                pending.append(chunk)
+                pending_size += len(chunk)
+                if pending_size >= self.jitter_buffer_bytes:
+                    process.stdin.write(b"".join(pending))
+                    process.stdin.flush()
+                    stats['time_to_first_audio'] = time.monotonic() - start_time
+                    pending = []
+                    started = True
+
+            # Short replies may never fill the jitter buffer
+            if pending:
+                process.stdin.write(b"".join(pending))
+                stats['time_to_first_audio'] = time.monotonic() - start_time
+
+            process.stdin.close()
+            process.wait()
+        except BrokenPipeError:
+            process.wait()
+        except BaseException:
+            process.kill()
+            process.wait()
+            raise
+        finally:
+            # Unblocks a fetcher waiting on the full queue
+            done.set()
+            fetcher.join(timeout=5)
+
+        stats['total_time'] = time.monotonic() - start_time
+        stats['interrupted'] = self._stopped
+        self.last_stats = stats
+
+        if errors:
+            raise errors[0]
+        if process.returncode != 0 and not self._stopped:
+            raise RuntimeError(f"Player exited with code {process.returncode}")
+        return stats
+
+
+class NullSink:
+    """Discards audio; with realtime=True it takes as long as a sound card would"""
+
+    def __init__(self, sample_rate: int, realtime: bool = False):
+        self.sample_rate = sample_rate
+        self.realtime = realtime
+        self.bytes_written = 0
+
+    def open(self):
+        pass
+
+    def write(self, pcm: bytes):
+        self.bytes_written += len(pcm)
+        if self.realtime:
+            time.sleep(len(pcm) / (self.sample_rate * PCM_SAMPLE_WIDTH))
+
+    def close(self):
+        pass
+
+
+class WavFileSink:
+    """Writes everything played into one WAV file, as fast as it arrives"""
+
+    realtime = False
+
+    def __init__(self, path: str, sample_rate: int):
+        self.path = path
+        self.sample_rate = sample_rate
+        self._wav = None
+
+    def open(self):
+        self._wav = wave.open(self.path, "wb")
+        self._wav.setnchannels(1)
+        self._wav.setsampwidth(PCM_SAMPLE_WIDTH)
+        self._wav.setframerate(self.sample_rate)
+
+    def write(self, pcm: bytes):
+        self._wav.writeframes(pcm)
+
+    def close(self):
+        if self._wav is not None:
+            self._wav.close()
+
+
+class PyAudioSink:
+    """Default output device through a blocking PortAudio stream"""
+
+    realtime = True
+
+    def __init__(self, sample_rate: int, frames_per_buffer: int = 1024):
+        import pyaudio
+
+        self._pyaudio = pyaudio
+        self.sample_rate = sample_rate
+        self.frames_per_buffer = frames_per_buffer
+        self._audio = None
+        self._stream = None
+
+    def open(self):
+        self._audio = self._pyaudio.PyAudio()
+        self._stream = self._audio.open(
+            format=self._pyaudio.paInt16,
+            channels=1,
+            rate=self.sample_rate,
+            output=True,
+            frames_per_buffer=self.frames_per_buffer
+        )
+
+    def write(self, pcm: bytes):
+        self._stream.write(pcm)
+
+    def discard(self):
+        """Drop audio already handed to the device (barge-in)"""
+        if self._stream is not None:
+            self._stream.stop_stream()
+            self._stream.start_stream()
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.stop_stream()
+            self._stream.close()
+        if self._audio is not None:
+            self._audio.terminate()
+
+
+class PygameSink:
+    """Default output device through the pygame mixer, one queued Sound per write"""
+
+    realtime = True
+
+    def __init__(self, sample_rate: int):
+        import pygame
+
+        self._pygame = pygame
+        self.sample_rate = sample_rate
+        self._channel = None
+
+    def open(self):
+        self._pygame.mixer.init(frequency=self.sample_rate, size=-16, channels=1)
+        self._channel = self._pygame.mixer.Channel(0)
+
+    def write(self, pcm: bytes):
+        sound = self._pygame.mixer.Sound(buffer=pcm)
+        # The channel holds one playing and one queued sound
+        while self._channel.get_queue() is not None:
+            time.sleep(0.005)
+        if self._channel.get_busy():
+            self._channel.queue(sound)
+        else:
+            self._channel.play(sound)
+
+    def discard(self):
+        """Drop the playing and queued sounds (barge-in)"""
+        if self._channel is not None:
+            self._channel.stop()
+
+    def close(self):
+        if self._channel is not None:
+            self._pygame.mixer.quit()
+
+
+def create_sink(name: str, sample_rate: int):
+    """Build the output selected by PLAYBACK_SINK, or None for the external player
+
+    auto tries pyaudio then pygame; null discards audio; wav:<path> records it.
+    """
+    name = (name or "auto").strip()
+    if name == "none":
+        return None
+    if name == "null":
+        return NullSink(sample_rate)
+    if name.startswith("wav:"):
+        return WavFileSink(name[4:], sample_rate)
+    candidates = {'auto': [PyAudioSink, PygameSink], 'pyaudio': [PyAudioSink], 'pygame': [PygameSink]}
+    if name not in candidates:
+        raise ValueError(f"Unknown playback sink: {name}")
+    for sink_class in candidates[name]:
+        try:
+            return sink_class(sample_rate)
+        except ImportError:
+            continue
+    return None
+
+
+class PCMPlayer:
+    """In-process PCM playback through one output stream kept open for the process
+
+    play_stream() queues chunks for the output thread, which writes them to
+    the sink in short slices. Underruns are counted against an audio clock:
+    a chunk that arrives after everything queued before it has finished
+    playing left a gap in the middle of a reply. stop() cuts the current
+    reply off within one slice (barge-in).
+    """
+
+    in_process = True
+    available = True
+
+    def __init__(self, sink, sample_rate: int, jitter_buffer_bytes: int = 4096,
+                 max_queued_chunks: int = 64, slice_seconds: float = 0.02):
+        self.sink = sink
+        self.sample_rate = sample_rate
+        self.bytes_per_second = sample_rate * PCM_SAMPLE_WIDTH
+        self.jitter_buffer_bytes = jitter_buffer_bytes
+        self.slice_bytes = max(PCM_SAMPLE_WIDTH, int(slice_seconds * sample_rate) * PCM_SAMPLE_WIDTH)
+        self.chunks: queue.Queue = queue.Queue(maxsize=max_queued_chunks)
+        self.last_stats: Dict[str, float] = {}
+        self.underruns = 0
+        self.opened = threading.Event()
+        self.error: Optional[Exception] = None
+        # Bumped by stop(); audio queued under an older generation is dropped
+        self.generation = 0
+        self._thread = threading.Thread(target=self._run, name="playback", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        """Open the device once, then write whatever is queued"""
+        try:
+            with STARTUP.phase("open speaker"):
+                self.sink.open()
+        except Exception as e:
+            self.error = e
+            print(f"❌ خطأ في فتح جهاز الصوت: {e}")
+        finally:
+            self.opened.set()
+        while True:
+            item = self.chunks.get()
+            if item is None:
+                break
+            if isinstance(item, threading.Event):
+                # End-of-reply or stop marker: everything before it is done
+                item.set()
+                continue
+            generation, pcm = item
+            for offset in range(0, len(pcm), self.slice_bytes):
+                if generation != self.generation or self.error is not None:
+                    break
+                try:
+                    self.sink.write(pcm[offset:offset + self.slice_bytes])
+                except Exception as e:
+                    self.error = e
+        self.sink.close()
+
+    def play_stream(self, chunks: Iterable[bytes]) -> Dict[str, float]:
+        """Play PCM chunks as they arrive and return timing and underrun statistics"""
+        start_time = time.monotonic()
+        generation = self.generation
+        stats = {
+            'time_to_first_chunk': 0.0,
+            'time_to_first_audio': 0.0,
+            'total_time': 0.0,
+            'bytes': 0,
+            'chunks': 0,
+            'underruns': 0,
+            'underrun_time': 0.0,
+            'interrupted': False,
+        }
+        pending = b""
+        # When the audio queued so far will have finished playing
+        clock = None
+
+        def enqueue(pcm: bytes):
+            nonlocal clock
+            now = time.monotonic()
+            if clock is None:
+                stats['time_to_first_audio'] = now - start_time
+                clock = now
+            elif now > clock:
+                stats['underruns'] += 1
+                stats['underrun_time'] += now - clock
+                clock = now
+            clock += len(pcm) / self.bytes_per_second
+            self.chunks.put((generation, pcm))
+
+        try:
+            for chunk in chunks:
+                if generation != self.generation:
+                    stats['interrupted'] = True
+                    break
+                if not chunk:
+                    continue
+                if stats['chunks'] == 0:
+                    stats['time_to_first_chunk'] = time.monotonic() - start_time
+                stats['chunks'] += 1
+                stats['bytes'] += len(chunk)
+                pending += chunk
+                # Jitter buffer before the first write; whole samples only after it
+                if clock is None and len(pending) < self.jitter_buffer_bytes:
+                    continue
+                usable = len(pending) - len(pending) % PCM_SAMPLE_WIDTH
+                if usable:
+                    enqueue(pending[:usable])
+                    pending = pending[usable:]
+        except Exception:
+            # Play what arrived before the stream broke, as the mpg123 path does
+            if len(pending) >= PCM_SAMPLE_WIDTH:
+                enqueue(pending[:len(pending) - len(pending) % PCM_SAMPLE_WIDTH])
+            raise
+        finally:
+            # Stops an interrupted TTS download instead of reading it to the end
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
+        if len(pending) >= PCM_SAMPLE_WIDTH and not stats['interrupted']:
+            enqueue(pending[:len(pending) - len(pending) % PCM_SAMPLE_WIDTH])
+
+        written = threading.Event()
+        self.chunks.put(written)
+        written.wait()
+        if self.error is not None:
+            raise RuntimeError(f"Audio output failed: {self.error}")
+        if self.sink.realtime and clock is not None:
+            # Let the device play out what it has buffered
+            while generation == self.generation and time.monotonic() < clock:
+                time.sleep(min(0.01, max(0.0, clock - time.monotonic())))
+        stats['interrupted'] = stats['interrupted'] or generation != self.generation
+
+        stats['total_time'] = time.monotonic() - start_time
+        self.underruns += stats['underruns']
+        self.last_stats = stats
+        return stats
+
+    def stop(self, timeout: float = 0.1) -> bool:
+        """Cut the current reply off; True once the output has gone quiet"""
+        self.generation += 1
+        # Drop queued audio; markers still fire so play_stream() returns
+        while True:
+            try:
+                item = self.chunks.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self.chunks.put(None)
+                break
+            if isinstance(item, threading.Event):
+                item.set()
+        discard = getattr(self.sink, 'discard', None)
+        if discard is not None:
+            discard()
+        quiet = threading.Event()
+        self.chunks.put(quiet)
+        return quiet.wait(timeout)
+
+    def close(self):
+        """Stop the output thread and release the device"""
+        self.chunks.put(None)
+        self._thread.join(timeout=2)
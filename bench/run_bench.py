@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark for the Arabic Voice Assistant
+Replays a corpus of WAV utterances through the real pipeline (capture, voice
+gate, Google-protocol recognition, routing, prompt, streamed LLM, TTS and
+playback) against local stand-ins for the chat, TTS and speech APIs, reports
+time-to-first-audio, full-turn latency and CPU/RSS per turn, and compares the
+assistant's own share of that time against a stored baseline
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from audio_capture import ContinuousCapture, PushSource  # noqa: E402
+from stub_backends import STUB_CA_FILE, ASRStub, ChatStub, Latency, TTSStub  # noqa: E402
+from stub_environment import SAMPLE_RATE, environment, speech_fixture, write_wav  # noqa: E402
+from voice_gate import read_wav  # noqa: E402
+
+DEFAULT_CORPUS = os.path.join(BENCH_DIR, "corpus")
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+
+# Metrics compared against the baseline, all "lower is better". Latency is
+# gated as overhead: the part of the turn no stub was sleeping through, so
+# the injected backend delays and their jitter cancel out
+COMPARED = ('first_audio_overhead', 'turn_overhead', 'cpu_per_turn')
+REPORTED = ('time_to_first_audio', 'turn_latency') + COMPARED
+QUANTILES = ('p50', 'p95', 'p99')
+# p99 of a few hundred turns is little more than the slowest one: reported, not gated
+GATED_QUANTILES = ('p50', 'p95')
+
+
+def load_corpus(directory: str = DEFAULT_CORPUS) -> List[Dict[str, Any]]:
+    """Read manifest.json; utterances without a recording get a synthetic stand-in"""
+    with open(os.path.join(directory, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    corpus = []
+    for index, item in enumerate(manifest):
+        path = os.path.join(directory, item['file'])
+        if not os.path.exists(path):
+            write_wav(path, speech_fixture(seconds=1.0 + 0.1 * index, pitch=110.0 + 15 * index))
+        samples, sample_rate = read_wav(path)
+        if sample_rate != SAMPLE_RATE:
+            raise ValueError(f"{path} must be {SAMPLE_RATE} Hz")
+        corpus.append({'file': item['file'], 'transcript': item['transcript'], 'samples': samples})
+    return corpus
+
+
+def rss_mb() -> float:
+    """Current resident set size (peak size where /proc is unavailable)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def machine_info() -> Dict[str, Any]:
+    """Where a run happened, stored with the baseline"""
+    return {
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpus': os.cpu_count(),
+        'python': platform.python_version(),
+    }
+
+
+def stub_wait(stubs: List, start: float, end: float) -> float:
+    """Seconds in [start, end] during which at least one stub was sleeping"""
+    intervals: List[Tuple[float, float]] = sorted(
+        (max(begin, start), min(finish, end))
+        for stub in stubs for begin, finish in tuple(stub.waits)
+        if finish > start and begin < end
+    )
+    total, covered = 0.0, start
+    for begin, finish in intervals:
+        if finish > covered:
+            total += finish - max(begin, covered)
+            covered = finish
+    return total
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    ordered = sorted(values)
+    if not ordered:
+        return {q: 0.0 for q in QUANTILES}
+    return {
+        q: ordered[min(len(ordered) - 1, int(len(ordered) * float(q[1:]) / 100))]
+        for q in QUANTILES
+    }
+
+
+class FirstAudioProbe:
+    """Wraps the player so the first audio chunk of each turn is timestamped"""
+
+    def __init__(self, player):
+        self.first_audio: Optional[float] = None
+        play_stream = player.play_stream
+
+        def tap(chunks):
+            for chunk in chunks:
+                if self.first_audio is None:
+                    self.first_audio = time.perf_counter()
+                yield chunk
+
+        player.play_stream = lambda chunks: play_stream(tap(chunks))
+
+
+def stub_assistant(chat: ChatStub, tts: TTSStub, asr: ASRStub, directory: str, response_cache: bool = False):
+    """The real assistant, pointed at the stubs, fed from a push source"""
+    from arabic_voice_assistant import ArabicVoiceAssistant
+
+    with environment(OPENAI_API_KEY="stub", OPENAI_BASE_URL=chat.url,
+                     ELEVENLABS_API_KEY="stub", ELEVENLABS_BASE_URL=tts.url,
+                     DEFAULT_VOICE_ID="stub-voice", STT_BACKEND="google", STT_ENDPOINT=asr.url,
+                     HTTP_CA_BUNDLE=STUB_CA_FILE,
+                     MEMORY_DIR=os.path.join(directory, "memory"),
+                     TTS_CACHE_DIR=os.path.join(directory, "tts"),
+                     TTS_PREWARM_PHRASES="", RESPONSE_CACHE=str(response_cache).lower(),
+                     PIPELINED_RESPONSES="true", STREAMING_PLAYBACK="true", PLAYBACK_SINK="null"):
+        assistant = ArabicVoiceAssistant(audio_input=False)
+        assistant.continuous_capture = True
+        assistant.audio_capture = ContinuousCapture(
+            PushSource(SAMPLE_RATE),
+            pre_roll=float(os.getenv("CAPTURE_PRE_ROLL", "0.3")),
+            end_silence=float(os.getenv("CAPTURE_END_SILENCE", "0.8")),
+            max_utterance=8.0
+        )
+    return assistant
+
+
+async def replay_turn(assistant, asr: ASRStub, stubs: List, probe: FirstAudioProbe,
+                      item: Dict[str, Any]) -> Dict[str, Any]:
+    """Speak one utterance into the capture pipeline and time the reply"""
+    asr.transcript = item['transcript']
+    capture = assistant.audio_capture
+    frame_samples = capture.source.frame_samples
+    cpu_start = time.process_time()
+    stub_cpu_start = sum(stub.cpu_seconds for stub in stubs)
+
+    samples = item['samples']
+    for start in range(0, len(samples) - frame_samples + 1, frame_samples):
+        capture.process_frame(samples[start:start + frame_samples])
+    # The user has stopped talking; everything from here is the assistant
+    start = time.perf_counter()
+    probe.first_audio = None
+
+    text = await assistant.listen_for_voice()
+    response = await assistant.respond_to(text) if text else None
+    end = time.perf_counter()
+    if response:
+        assistant.add_to_memory(text, response)
+
+    cpu = (time.process_time() - cpu_start) - (sum(stub.cpu_seconds for stub in stubs) - stub_cpu_start)
+    first_audio = probe.first_audio
+    return {
+        'file': item['file'],
+        'transcript': text,
+        'answered': response is not None,
+        'time_to_first_audio': (first_audio - start) if first_audio else None,
+        'turn_latency': end - start,
+        'first_audio_overhead': (first_audio - start - stub_wait(stubs, start, first_audio)) if first_audio else None,
+        'turn_overhead': end - start - stub_wait(stubs, start, end),
+        'cpu_per_turn': max(cpu, 0.0),
+        'rss_mb': rss_mb(),
+    }
+
+
+async def run_bench(corpus: List[Dict[str, Any]], iterations: int = 20,
+                    llm: Latency = None, tts: Latency = None, asr: Latency = None,
+                    token_interval: float = 0.02, tts_chunk_interval: float = 0.01,
+                    response_cache: bool = False, tls: bool = False) -> Dict[str, Any]:
+    """Replay the corpus `iterations` times and summarize per-turn measurements
+
+    With tls the stubs serve HTTPS, so connection reuse shows up as
+    handshakes saved.
+    """
+    counter = itertools.count(1)
+    chat_stub = ChatStub(
+        reply=lambda body: (f"بالتأكيد، هذه الإجابة رقم {next(counter)} على سؤالك. "
+                            "يمكنني مساعدتك في أي شيء آخر تحتاجه في المكتب."),
+        delay=llm or Latency(0.4), token_interval=token_interval, tls=tls
+    )
+    tts_stub = TTSStub(audio=b"ID3" + b"\x00" * 16384, delay=tts or Latency(0.15),
+                       chunk_size=2048, chunk_interval=tts_chunk_interval, tls=tls)
+    asr_stub = ASRStub(delay=asr or Latency(0.3), tls=tls)
+    stubs = [chat_stub, tts_stub, asr_stub]
+    turns = []
+    try:
+        with tempfile.TemporaryDirectory(prefix="bench_") as directory:
+            assistant = stub_assistant(chat_stub, tts_stub, asr_stub, directory, response_cache)
+            probe = FirstAudioProbe(assistant.audio_player)
+            for _ in range(iterations):
+                for item in corpus:
+                    turns.append(await replay_turn(assistant, asr_stub, stubs, probe, item))
+            assistant.memory_journal.close()
+            assistant.recognition_service.shutdown()
+            await assistant.http_pool.aclose()
+            assistant.audio_player.close()
+            stages = assistant.metrics.snapshot()['stages']
+            connections = assistant.http_pool.stats()
+    finally:
+        for stub in stubs:
+            stub.close()
+
+    answered = [turn for turn in turns if turn['answered']]
+    return {
+        'machine': machine_info(),
+        'turns': len(turns),
+        'answered': len(answered),
+        'time_to_first_audio': percentiles([t['time_to_first_audio'] for t in answered
+                                            if t['time_to_first_audio'] is not None]),
+        'turn_latency': percentiles([t['turn_latency'] for t in answered]),
+        'first_audio_overhead': percentiles([t['first_audio_overhead'] for t in answered
+                                             if t['first_audio_overhead'] is not None]),
+        'turn_overhead': percentiles([t['turn_overhead'] for t in answered]),
+        'cpu_per_turn': percentiles([t['cpu_per_turn'] for t in turns]),
+        'rss_mb': {'p50': percentiles([t['rss_mb'] for t in turns])['p50'],
+                   'max': max((t['rss_mb'] for t in turns), default=0.0)},
+        'stages': {stage: {'p50': values['p50'], 'p99': values['p99'], 'count': values['count']}
+                   for stage, values in sorted(stages.items())},
+        # New connections (TLS handshakes with --https) per 100 turns, by host
+        'connections_per_100_turns': {host: round(values['connections'] * 100 / max(len(turns), 1), 1)
+                                      for host, values in sorted(connections.items())},
+        'per_turn': turns,
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 0.3,
+            floor: float = 0.02) -> List[str]:
+    """Regressions beyond tolerance (relative) plus floor (seconds) of noise"""
+    regressions = []
+    for metric in COMPARED:
+        for q in GATED_QUANTILES:
+            old = baseline.get(metric, {}).get(q)
+            new = report.get(metric, {}).get(q)
+            if old is None or new is None:
+                continue
+            if new > old * (1 + tolerance) + floor:
+                regressions.append(f"{metric} {q}: {old * 1000:.0f} ms -> {new * 1000:.0f} ms")
+    old_rss = baseline.get('rss_mb', {}).get('max')
+    new_rss = report.get('rss_mb', {}).get('max')
+    if old_rss and new_rss and new_rss > old_rss * (1 + tolerance):
+        regressions.append(f"rss_mb max: {old_rss:.0f} MB -> {new_rss:.0f} MB")
+    if report.get('answered', 0) < baseline.get('answered', 0):
+        regressions.append(f"answered turns: {baseline['answered']} -> {report['answered']}")
+    return regressions
+
+
+def print_report(report: Dict[str, Any]):
+    print("📊 Benchmark")
+    print("=" * 50)
+    machine = report['machine']
+    print(f"Machine: {machine['platform']}, {machine['processor']}, {machine['cpus']} CPUs, Python {machine['python']}")
+    print(f"Turns: {report['turns']} ({report['answered']} answered)")
+    for metric in REPORTED:
+        values = report[metric]
+        print(f"{metric}: " + ", ".join(f"{q} {values[q] * 1000:.0f} ms" for q in QUANTILES))
+    print(f"rss_mb: p50 {report['rss_mb']['p50']:.0f} MB, max {report['rss_mb']['max']:.0f} MB")
+    print("new connections per 100 turns: " + ", ".join(
+        f"{host} {count:g}" for host, count in report['connections_per_100_turns'].items()))
+    print("stages (p50 / p99):")
+    for stage, values in report['stages'].items():
+        print(f"  {stage}: {values['p50'] * 1000:.1f} / {values['p99'] * 1000:.1f} ms ({values['count']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded utterances through the assistant against local stubs")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="directory with manifest.json and WAV files")
+    parser.add_argument("--iterations", type=int, default=20, help="passes over the corpus")
+    parser.add_argument("--llm-latency", type=float, default=0.4, help="median seconds to first token")
+    parser.add_argument("--llm-token-interval", type=float, default=0.02)
+    parser.add_argument("--tts-latency", type=float, default=0.15, help="median seconds to first audio byte")
+    parser.add_argument("--tts-chunk-interval", type=float, default=0.01)
+    parser.add_argument("--asr-latency", type=float, default=0.3)
+    parser.add_argument("--jitter", type=float, default=0.25, help="log-normal spread of every latency")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--response-cache", action="store_true", help="leave the LLM response cache on")
+    parser.add_argument("--https", action="store_true", help="serve the stubs over TLS")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="allowed relative slowdown")
+    parser.add_argument("--floor", type=float, default=0.02, help="allowed absolute slowdown in seconds")
+    parser.add_argument("--output", help="write the full report (with per-turn rows) as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_bench(
+        load_corpus(args.corpus), args.iterations,
+        llm=Latency(args.llm_latency, args.jitter, args.seed),
+        tts=Latency(args.tts_latency, args.jitter, args.seed + 1),
+        asr=Latency(args.asr_latency, args.jitter, args.seed + 2),
+        token_interval=args.llm_token_interval,
+        tts_chunk_interval=args.tts_chunk_interval,
+        response_cache=args.response_cache,
+        tls=args.https
+    ))
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    summary = {key: value for key, value in report.items() if key != 'per_turn'}
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"💾 Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("⚠️ No baseline yet; run with --save-baseline")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get('machine') != summary['machine']:
+        print(f"⚠️ Baseline was recorded on another machine: {baseline.get('machine', 'unknown')}")
+    regressions = compare(summary, baseline, args.tolerance, args.floor)
+    if regressions:
+        print("❌ Regressions against baseline:")
+        for regression in regressions:
+            print(f"   - {regression}")
+        return 1
+    print(f"✅ Within {args.tolerance:.0%} + {args.floor * 1000:.0f} ms of baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
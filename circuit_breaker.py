@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Circuit breakers for the cloud backends of the Arabic Voice Assistant
+A breaker per backend tracks a rolling window of call outcomes and
+latencies; once a backend keeps failing or answering too slowly, turns go
+straight to the local fallback until a half-open probe shows it recovered
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a backend whose breaker is open"""
+
+
+class CircuitBreaker:
+    """Rolling-window circuit breaker for one backend
+
+    Closed: calls go through. The breaker opens after failure_threshold
+    consecutive failures, or when error_rate of the last window calls failed
+    (once at least min_calls are in the window). A call slower than
+    slow_call seconds counts as a failure.
+    Open: calls are refused for reset_timeout seconds.
+    Half-open: one probe call at a time; success closes, failure reopens.
+
+    on_transition(name, old_state, new_state) is called outside the lock.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 3, error_rate: float = 0.5, window: int = 20,
+                 min_calls: int = 10, slow_call: Optional[float] = None, reset_timeout: float = 30.0,
+                 on_transition: Optional[Callable[[str, str, str], None]] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.slow_call = slow_call
+        self.reset_timeout = reset_timeout
+        self.on_transition = on_transition
+        self.clock = clock
+
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.consecutive_failures = 0
+        self.outcomes = deque(maxlen=window)
+        self.latencies = deque(maxlen=window)
+        self.short_circuits = 0
+        self.transitions = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def _move(self, state: str) -> Optional[tuple]:
+        """Change state under the lock; returns the transition to report"""
+        if state == self.state:
+            return None
+        old, self.state = self.state, state
+        self.transitions += 1
+        if state == OPEN:
+            self.opened_at = self.clock()
+        elif state == CLOSED:
+            self.consecutive_failures = 0
+            self.outcomes.clear()
+        return (self.name, old, state)
+
+    def _report(self, transition: Optional[tuple]):
+        if transition and self.on_transition:
+            self.on_transition(*transition)
+
+    def available(self) -> bool:
+        """Whether a call would be let through right now, without taking the probe"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                return self.clock() - self.opened_at >= self.reset_timeout
+            return not self._probing
+
+    def acquire(self) -> bool:
+        """Permission for one call; the caller must then record() or release()"""
+        transition = None
+        with self._lock:
+            if self.state == OPEN and self.clock() - self.opened_at >= self.reset_timeout:
+                transition = self._move(HALF_OPEN)
+            if self.state == CLOSED:
+                allowed = True
+            elif self.state == HALF_OPEN and not self._probing:
+                self._probing = allowed = True
+            else:
+                self.short_circuits += 1
+                allowed = False
+        self._report(transition)
+        return allowed
+
+    def record(self, ok: bool, seconds: Optional[float] = None):
+        """Record the outcome of a call let through by acquire()"""
+        transition = None
+        with self._lock:
+            if ok and seconds is not None and self.slow_call is not None and seconds > self.slow_call:
+                ok = False
+            self.outcomes.append(ok)
+            if seconds is not None:
+                self.latencies.append(seconds)
+            if self.state == HALF_OPEN:
+                self._probing = False
+                transition = self._move(CLOSED if ok else OPEN)
+            elif ok:
+                self.consecutive_failures = 0
+            else:
+                self.consecutive_failures += 1
+                failures = self.outcomes.count(False)
+                if (self.consecutive_failures >= self.failure_threshold or
+                        (len(self.outcomes) >= self.min_calls and
+                         failures / len(self.outcomes) >= self.error_rate)):
+                    transition = self._move(OPEN)
+        self._report(transition)
+
+    def release(self):
+        """Give back a permit whose call ended without an outcome (e.g. cancelled)"""
+        with self._lock:
+            self._probing = False
+
+    @contextmanager
+    def guard(self):
+        """Run one backend call under the breaker, raising CircuitOpenError if refused"""
+        if not self.acquire():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        start = self.clock()
+        try:
+            yield
+        except (GeneratorExit, asyncio.CancelledError):
+            # Abandoned by the caller (barge-in, shutdown): says nothing about the backend
+            self.release()
+            raise
+        except Exception:
+            self.record(False, self.clock() - start)
+            raise
+        except BaseException:
+            self.release()
+            raise
+        else:
+            self.record(True, self.clock() - start)
+
+    def stream(self, chunks: Iterable[Any]) -> Iterator[Any]:
+        """Pass a lazily requested stream through the breaker
+
+        Latency is the time to the first chunk; an error at any point is a
+        failure. Closing the stream early closes chunks as well.
+        """
+        if not self.acquire():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        start = self.clock()
+        first = None
+        try:
+            for chunk in chunks:
+                if first is None:
+                    first = self.clock() - start
+                yield chunk
+        except GeneratorExit:
+            if first is None:
+                self.release()
+            else:
+                self.record(True, first)
+            raise
+        except Exception:
+            self.record(False, self.clock() - start)
+            raise
+        except BaseException:
+            self.release()
+            raise
+        else:
+            self.record(True, first if first is not None else self.clock() - start)
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            latencies = sorted(self.latencies)
+            return {
+                'state': self.state,
+                'error_rate': self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0,
+                'p50': latencies[len(latencies) // 2] if latencies else 0.0,
+                'short_circuits': self.short_circuits,
+                'transitions': self.transitions,
+            }
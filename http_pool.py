@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Shared keep-alive HTTP transport for the Arabic Voice Assistant
+One pooled httpx client per host (HTTP/2 where available) shared by the
+OpenAI, ElevenLabs and speech-recognition calls, with idle keep-warm pings
+and per-host connection-reuse statistics
+"""
+
+import asyncio
+import ssl
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class HostStats:
+    """Requests versus new connections for one host"""
+
+    def __init__(self, host: str):
+        self.host = host
+        self.requests = 0
+        self.connections = 0
+        self.tls_handshakes = 0
+        self.pings = 0
+        self.last_used = 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'requests': self.requests,
+            'connections': self.connections,
+            'tls_handshakes': self.tls_handshakes,
+            'pings': self.pings,
+            'reused': max(0, self.requests + self.pings - self.connections),
+        }
+
+
+class _Tracer:
+    """httpcore trace callback that counts connects and TLS handshakes
+
+    Step durations are kept in timings, e.g. timings['connect_tcp'].
+    """
+
+    def __init__(self, pool: "HTTPPool", stats: HostStats):
+        self.pool = pool
+        self.stats = stats
+        self.started: Dict[str, float] = {}
+        self.timings: Dict[str, float] = {}
+
+    def event(self, name: str, info: Dict[str, Any]):
+        step, _, phase = name.rpartition(".")
+        step = step.rpartition(".")[2]
+        if phase == "started":
+            self.started[step] = time.perf_counter()
+        elif phase == "complete" and step in self.started:
+            self.timings[step] = time.perf_counter() - self.started[step]
+            if step == "connect_tcp":
+                with self.pool._lock:
+                    self.stats.connections += 1
+            elif step == "start_tls":
+                with self.pool._lock:
+                    self.stats.tls_handshakes += 1
+
+    async def aevent(self, name: str, info: Dict[str, Any]):
+        self.event(name, info)
+
+
+class _PooledTransport(httpx.HTTPTransport):
+    def __init__(self, pool: "HTTPPool", stats: HostStats, **kwargs):
+        super().__init__(**kwargs)
+        self.pool = pool
+        self.stats = stats
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        tracer = self.pool._track(self.stats, request)
+        request.extensions = dict(request.extensions, trace=tracer.event)
+        request.extensions.setdefault('tracer', tracer)
+        return super().handle_request(request)
+
+
+class _AsyncPooledTransport(httpx.AsyncHTTPTransport):
+    def __init__(self, pool: "HTTPPool", stats: HostStats, **kwargs):
+        super().__init__(**kwargs)
+        self.pool = pool
+        self.stats = stats
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        tracer = self.pool._track(self.stats, request)
+        request.extensions = dict(request.extensions, trace=tracer.aevent)
+        request.extensions.setdefault('tracer', tracer)
+        return await super().handle_async_request(request)
+
+
+class HTTPPool:
+    """Keep-alive connection pools, one per host, shared across backends
+
+    per_host bounds the idle connections kept open to each host; requests
+    beyond it still go out on extra connections rather than queueing.
+    """
+
+    def __init__(self, per_host: int = 4, keepalive_expiry: float = 120.0, http2: bool = True,
+                 verify: Any = True, timeout: float = 30.0, keep_warm_interval: float = 25.0):
+        self.per_host = per_host
+        self.keepalive_expiry = keepalive_expiry
+        self.http2 = http2 and HTTP2_AVAILABLE
+        # A CA bundle path (e.g. for local HTTPS stubs) becomes one shared context
+        self.verify = ssl.create_default_context(cafile=verify) if isinstance(verify, str) else verify
+        self.timeout = timeout
+        self.keep_warm_interval = keep_warm_interval
+        self.hosts: Dict[str, HostStats] = {}
+        self._clients: Dict[str, httpx.Client] = {}
+        self._async_clients: Dict[str, httpx.AsyncClient] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def origin(url: str) -> str:
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+    def _stats(self, origin: str) -> HostStats:
+        if origin not in self.hosts:
+            self.hosts[origin] = HostStats(urlsplit(origin).netloc)
+        return self.hosts[origin]
+
+    def _track(self, stats: HostStats, request: httpx.Request) -> _Tracer:
+        with self._lock:
+            if request.extensions.get('ping'):
+                stats.pings += 1
+            else:
+                stats.requests += 1
+            stats.last_used = time.monotonic()
+        return _Tracer(self, stats)
+
+    def _transport_options(self) -> Dict[str, Any]:
+        return {
+            'verify': self.verify,
+            'http2': self.http2,
+            'limits': httpx.Limits(
+                max_connections=None,
+                max_keepalive_connections=self.per_host,
+                keepalive_expiry=self.keepalive_expiry
+            ),
+        }
+
+    def client(self, url: str) -> httpx.Client:
+        """Blocking client for the host of url (ElevenLabs, speech recognition)"""
+        origin = self.origin(url)
+        with self._lock:
+            if origin not in self._clients:
+                stats = self._stats(origin)
+                self._clients[origin] = httpx.Client(
+                    transport=_PooledTransport(self, stats, **self._transport_options()),
+                    timeout=self.timeout
+                )
+            return self._clients[origin]
+
+    def async_client(self, url: str) -> httpx.AsyncClient:
+        """Asyncio client for the host of url (OpenAI)"""
+        origin = self.origin(url)
+        with self._lock:
+            if origin not in self._async_clients:
+                stats = self._stats(origin)
+                self._async_clients[origin] = httpx.AsyncClient(
+                    transport=_AsyncPooledTransport(self, stats, **self._transport_options()),
+                    timeout=self.timeout
+                )
+            return self._async_clients[origin]
+
+    def _ping_result(self, origin: str, request: httpx.Request, start: float,
+                     error: Optional[Exception]) -> Dict[str, Any]:
+        timings = request.extensions['tracer'].timings if 'tracer' in request.extensions else {}
+        return {
+            'host': self.hosts[origin].host,
+            'connect': timings.get('connect_tcp'),
+            'tls': timings.get('start_tls'),
+            'seconds': time.perf_counter() - start,
+            'error': (str(error) or type(error).__name__) if error else None,
+        }
+
+    def ping(self, origin: str) -> Dict[str, Any]:
+        """Open (or refresh) a pooled connection with a HEAD request
+
+        connect and tls are None when an idle connection was reused.
+        """
+        client = self._clients[origin]
+        request = client.build_request("HEAD", origin + "/", extensions={'ping': True})
+        start, error = time.perf_counter(), None
+        try:
+            client.send(request)
+        except httpx.HTTPError as e:
+            error = e
+        return self._ping_result(origin, request, start, error)
+
+    async def aping(self, origin: str) -> Dict[str, Any]:
+        client = self._async_clients[origin]
+        request = client.build_request("HEAD", origin + "/", extensions={'ping': True})
+        start, error = time.perf_counter(), None
+        try:
+            await client.send(request)
+        except httpx.HTTPError as e:
+            error = e
+        return self._ping_result(origin, request, start, error)
+
+    def warm_up(self) -> List[Dict[str, Any]]:
+        """Connect every blocking client's pool ahead of the first turn
+
+        Asyncio clients are bound to the event loop, so keep_warm() opens
+        theirs as soon as the loop starts.
+        """
+        with self._lock:
+            origins = list(self._clients)
+        return [self.ping(origin) for origin in origins]
+
+    async def keep_warm(self):
+        """Ping hosts that have been idle for a while so a connection stays open
+
+        Runs for the life of the event loop; the first pass connects any
+        host that has not been used yet.
+        """
+        while True:
+            now = time.monotonic()
+            with self._lock:
+                idle = [origin for origin, stats in self.hosts.items()
+                        if now - stats.last_used >= self.keep_warm_interval]
+            for origin in idle:
+                if origin in self._async_clients:
+                    await self.aping(origin)
+                if origin in self._clients:
+                    await asyncio.to_thread(self.ping, origin)
+            await asyncio.sleep(self.keep_warm_interval / 2)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-host requests, new connections, TLS handshakes and reuse"""
+        with self._lock:
+            return {stats.host: stats.snapshot() for stats in self.hosts.values()}
+
+    def close(self):
+        for client in list(self._clients.values()):
+            client.close()
+
+    async def aclose(self):
+        for client in list(self._async_clients.values()):
+            await client.aclose()
+        self.close()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Compiled Arabic intent router for the Arabic Voice Assistant
+Normalizes the utterance once and finds every command phrase in a single
+Aho-Corasick pass, so office commands resolve locally instead of via the LLM
+"""
+
+import json
+import os
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from arabic_text import normalize_arabic, normalize_with_offsets
+
+# (intent, phrases, slot type) in priority order; phrases are normalized at compile time.
+# The command that starts earliest wins, so words inside a task or note never
+# trigger another command; priority only breaks ties at the same position
+INTENTS = [
+    ("show_settings", ["عرض الإعدادات", "اعرض الإعدادات"], None),
+    ("exit", ["خروج", "إنهاء المحادثة", "أغلق المساعد", "إيقاف المساعد"], None),
+    # "Stop" said over a reply silences it; leaving takes an explicit phrase
+    ("stop_speaking", ["توقف", "اسكت"], None),
+    ("add_task", ["أضف مهمة", "أضيفي مهمة", "إضافة مهمة", "سجل مهمة"], "text"),
+    ("list_tasks", ["عرض المهام", "اعرض المهام", "ما هي المهام", "المهام الحالية"], None),
+    ("delete_task", ["حذف مهمة", "احذف مهمة", "امسح مهمة", "إلغاء مهمة", "حذف المهمة", "احذف المهمة"], "number"),
+    ("show_memory", ["عرض الذاكرة", "اعرض الذاكرة"], None),
+    ("add_preference", ["أضف تفضيل", "إضافة تفضيل", "سجل تفضيل"], "text"),
+    ("list_preferences", ["عرض التفضيلات", "اعرض التفضيلات"], None),
+    ("add_note", ["أضف ملاحظة", "أضف نوتة", "إضافة ملاحظة", "سجل ملاحظة", "دون ملاحظة"], "text"),
+    ("list_notes", ["عرض الملاحظات", "اعرض الملاحظات"], None),
+    ("schedule_meeting", ["أضف اجتماع", "حدد اجتماع", "جدول اجتماع", "جدولة اجتماع", "احجز اجتماع"], "text"),
+    ("list_meetings", ["عرض الاجتماعات", "اعرض الاجتماعات", "ما هي الاجتماعات", "الاجتماعات القادمة"], None),
+    ("cancel_meeting", ["إلغاء اجتماع", "ألغ اجتماع", "احذف اجتماع", "إلغاء الاجتماع", "ألغ الاجتماع"], "number"),
+    ("add_announcement", ["أضف إعلان", "بث إعلان", "أذع إعلان", "جدول إعلان"], "text"),
+    ("add_reminder", ["ذكرني", "أضف تذكير", "سجل تذكير"], "text"),
+    ("list_reminders", ["عرض التذكيرات", "اعرض التذكيرات"], None),
+]
+
+NUMBER_WORDS = {
+    1: ["واحد", "واحده", "اول", "اولى", "الاول", "الاولى"],
+    2: ["اثنين", "اثنان", "اثنتين", "ثاني", "ثانيه", "الثاني", "الثانيه"],
+    3: ["ثلاث", "ثلاثه", "ثالث", "ثالثه", "الثالث", "الثالثه"],
+    4: ["اربع", "اربعه", "رابع", "رابعه", "الرابع", "الرابعه"],
+    5: ["خمس", "خمسه", "خامس", "خامسه", "الخامس", "الخامسه"],
+    6: ["ست", "سته", "سادس", "سادسه", "السادس", "السادسه"],
+    7: ["سبع", "سبعه", "سابع", "سابعه", "السابع", "السابعه"],
+    8: ["ثمان", "ثماني", "ثمانيه", "ثامن", "ثامنه", "الثامن", "الثامنه"],
+    9: ["تسع", "تسعه", "تاسع", "تاسعه", "التاسع", "التاسعه"],
+    10: ["عشر", "عشره", "عاشر", "عاشره", "العاشر", "العاشره"],
+}
+NUMBER_LOOKUP = {word: value for value, words in NUMBER_WORDS.items() for word in words}
+
+
+@dataclass
+class Intent:
+    """A routed command with its extracted slots"""
+    name: str
+    slots: Dict[str, Any] = field(default_factory=dict)
+    phrase: str = ""
+
+
+class AhoCorasick:
+    """Multi-pattern matcher: every pattern found in one pass over the text"""
+
+    def __init__(self, patterns: List[Tuple[str, Any]]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[List[Tuple[int, Any]]] = [[]]
+
+        for pattern, value in patterns:
+            state = 0
+            for char in pattern:
+                if char not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            self.output[state].append((len(pattern), value))
+
+        # Breadth-first construction of failure links
+        pending = deque(self.goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for char, child in self.goto[state].items():
+                pending.append(child)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def search(self, text: str) -> Iterator[Tuple[int, int, Any]]:
+        """Yield (start, end, value) for every pattern occurrence"""
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            for length, value in self.output[state]:
+                yield index + 1 - length, index + 1, value
+
+
+def parse_number(text: str) -> Optional[int]:
+    """First number in normalized text, as digits or Arabic number words"""
+    for token in text.split():
+        if token.isdigit():
+            return int(token)
+        # Attached conjunction/preposition prefixes: "والثالثه", "بالثانيه"
+        for candidate in (token, token[1:] if token[:1] in "وب" else None):
+            if candidate and candidate in NUMBER_LOOKUP:
+                return NUMBER_LOOKUP[candidate]
+    return None
+
+
+class IntentRouter:
+    """Single-pass intent engine over normalized Arabic"""
+
+    def __init__(self, intents=INTENTS):
+        self.priority = {name: rank for rank, (name, _, _) in enumerate(intents)}
+        self.slot_types = {name: slot_type for name, _, slot_type in intents}
+        patterns = [
+            (normalize_arabic(phrase), (name, phrase))
+            for name, phrases, _ in intents
+            for phrase in phrases
+        ]
+        self.matcher = AhoCorasick(patterns)
+
+    def route(self, text: str) -> Optional[Intent]:
+        """Return the earliest command found in text (highest priority on ties), if any"""
+        normalized, offsets = normalize_with_offsets(text)
+        best = None
+        for start, end, (name, phrase) in self.matcher.search(normalized):
+            # Whole words only
+            if start > 0 and normalized[start - 1] != " ":
+                continue
+            if end < len(normalized) and normalized[end] != " ":
+                continue
+            key = (start, self.priority[name], -(end - start))
+            if best is None or key < best[0]:
+                best = (key, name, phrase, end)
+
+        if best is None:
+            return None
+
+        _, name, phrase, end = best
+        intent = Intent(name=name, phrase=phrase)
+        slot_type = self.slot_types[name]
+        if slot_type == "text":
+            # Keep the user's original spelling for stored text
+            rest = text[offsets[end]:] if end < len(offsets) else ""
+            intent.slots['text'] = rest.strip(" \t\n:،,.-")
+        elif slot_type == "number":
+            intent.slots['number'] = parse_number(normalized[end:])
+        return intent
+
+
+def load_examples(path: str) -> List[Dict[str, Any]]:
+    """Load the labelled routing examples"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def evaluate(router: IntentRouter, examples: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Accuracy of intents and slots on labelled examples"""
+    failures = []
+    for example in examples:
+        intent = router.route(example['text'])
+        name = intent.name if intent else None
+        slots = intent.slots if intent else {}
+        expected_slots = example.get('slots', {})
+        if name != example['intent'] or any(slots.get(k) != v for k, v in expected_slots.items()):
+            failures.append({'text': example['text'], 'expected': example['intent'], 'got': name, 'slots': slots})
+    return {
+        'examples': len(examples),
+        'accuracy': 1 - len(failures) / len(examples) if examples else 0.0,
+        'failures': failures,
+    }
+
+
+def benchmark(router: IntentRouter, utterances: List[str], repeat: int = 200) -> Dict[str, float]:
+    """Routing throughput over a list of utterances"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for utterance in utterances:
+            router.route(utterance)
+    elapsed = time.perf_counter() - start
+    routes = repeat * len(utterances)
+    return {'routes': routes, 'routes_per_second': routes / elapsed, 'us_per_route': elapsed / routes * 1e6}
+
+
+def main():
+    """Report routing accuracy and throughput on the labelled examples"""
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(__file__), "intent_examples.json")
+    examples = load_examples(path)
+    router = IntentRouter()
+
+    results = evaluate(router, examples)
+    speed = benchmark(router, [example['text'] for example in examples])
+
+    print("🧭 Intent Router")
+    print("=" * 40)
+    print(f"Examples: {results['examples']}")
+    print(f"Accuracy: {results['accuracy']:.1%}")
+    for failure in results['failures']:
+        print(f"  ❌ {failure['text']} -> {failure['got']} (expected {failure['expected']})")
+    print(f"Throughput: {speed['routes_per_second']:,.0f} routes/s ({speed['us_per_route']:.1f} µs/route)")
+    return 0 if not results['failures'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Local system text-to-speech used when the cloud voice is unavailable
+The pyttsx3 engine takes hundreds of milliseconds to create, so it is
+created once on its own thread at startup and reused for every fallback
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Optional
+
+
+def pyttsx3_engine():
+    import pyttsx3
+    return pyttsx3.init()
+
+
+class LocalTTS:
+    """A pyttsx3 engine owned by one worker thread
+
+    pyttsx3 engines must be driven from the thread that created them, so
+    speak() hands text to the worker and waits for it to finish.
+    """
+
+    def __init__(self, rate: int = 150, engine_factory: Callable[[], Any] = pyttsx3_engine):
+        self.rate = rate
+        self.engine_factory = engine_factory
+        self.engine = None
+        self.error: Optional[Exception] = None
+        self.init_seconds: Optional[float] = None
+        self.spoken = 0
+        self.ready = threading.Event()
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Create the engine in the background; safe to call more than once"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="local-tts", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        start = time.perf_counter()
+        try:
+            self.engine = self.engine_factory()
+            self.engine.setProperty('rate', self.rate)
+        except Exception as e:
+            self.engine = None
+            self.error = e
+        self.init_seconds = time.perf_counter() - start
+        self.ready.set()
+
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            text, done = item
+            try:
+                self.engine.say(text)
+                self.engine.runAndWait()
+                self.spoken += 1
+                done.set_result(True)
+            except Exception as e:
+                done.set_exception(e)
+
+    def speak(self, text: str, timeout: Optional[float] = None) -> bool:
+        """Speak text and wait for it; False if no local engine is available"""
+        self.start()
+        if not self.ready.wait(timeout) or self.engine is None:
+            return False
+        done: Future = Future()
+        self._queue.put((text, done))
+        try:
+            return done.result(timeout)
+        except Exception:
+            return False
+
+    def close(self):
+        if self._thread is not None:
+            self._queue.put(None)
@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+Local retrieval index over conversations, notes and tasks
+BM25 over normalized, light-stemmed Arabic terms, optionally fused with dense
+vectors; the compacted index is memory-mapped so startup does not rebuild it
+"""
+
+import json
+from array import array
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from arabic_text import index_terms
+
+META_FILE = "meta.json"
+
+
+def sentence_embedder(model_name: str) -> Callable[[List[str]], np.ndarray]:
+    """Local CPU embedding model via sentence-transformers (optional dependency)"""
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        raise RuntimeError("Dense retrieval needs 'pip install sentence-transformers'")
+    model = SentenceTransformer(model_name, device="cpu")
+
+    def embed(texts: List[str]) -> np.ndarray:
+        return model.encode(texts, normalize_embeddings=True, convert_to_numpy=True).astype(np.float32)
+
+    return embed
+
+
+class MemoryIndex:
+    """Incremental BM25 (+ optional dense) index with a memory-mapped base
+
+    Documents added since the last save live in an in-memory delta; save()
+    merges base and delta into a new generation of files and switches to it
+    by atomically replacing meta.json. The new files are written outside the
+    lock, so save() can run on a background thread while the index is used.
+    """
+
+    def __init__(self, directory: str = "assistant_memory/index", k1: float = 1.5, b: float = 0.75,
+                 embed: Optional[Callable[[List[str]], np.ndarray]] = None):
+        self.directory = directory
+        self.k1 = k1
+        self.b = b
+        self.embed = embed
+        self.generation = 0
+
+        # Memory-mapped base generation
+        self.lexicon: Dict[str, List[int]] = {}
+        self.postings = np.zeros(0, dtype=np.int32)
+        self.frequencies = np.zeros(0, dtype=np.float32)
+        self.base_lengths = np.zeros(0, dtype=np.float32)
+        self.text_offsets = np.zeros(1, dtype=np.int64)
+        self.texts = np.zeros(0, dtype=np.uint8)
+        self.base_vectors: Optional[np.ndarray] = None
+
+        # Everything added since the last save; postings are (doc id, count) pairs
+        self.delta_postings: Dict[str, array] = defaultdict(lambda: array('i'))
+        self.delta_lengths: List[int] = []
+        self.delta_texts: List[str] = []
+        self.delta_vectors: List[np.ndarray] = []
+
+        self.keys: Dict[str, int] = {}
+        self.kinds: List[str] = []
+        # Per-document kind as a small integer, for vectorized filtering
+        self.kind_lookup: Dict[str, int] = {}
+        self.kind_codes = array('H')
+        self.deleted = set()
+        self.total_length = 0.0
+        self.last_query_seconds = 0.0
+        # Guards the in-memory state; saves are serialized by their own lock
+        self._lock = threading.RLock()
+        self._save_lock = threading.Lock()
+        self.compactions = 0
+
+        os.makedirs(directory, exist_ok=True)
+
+    def __len__(self) -> int:
+        return len(self.kinds) - len(self.deleted)
+
+    @property
+    def base_count(self) -> int:
+        return len(self.base_lengths)
+
+    def _path(self, name: str, generation: Optional[int] = None) -> str:
+        generation = self.generation if generation is None else generation
+        stem, extension = os.path.splitext(name)
+        return os.path.join(self.directory, f"{stem}-{generation}{extension}")
+
+    def load(self) -> int:
+        """Memory-map the last saved generation; returns the number of documents"""
+        meta_path = os.path.join(self.directory, META_FILE)
+        if not os.path.exists(meta_path):
+            return 0
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+
+        with self._lock:
+            self._map_generation(meta['generation'], meta.get('dense'))
+            self.deleted = set(meta['deleted'])
+            self.keys = {key: doc_id for doc_id, key in enumerate(meta['keys']) if doc_id not in self.deleted}
+            self.kinds = list(meta['kinds'])
+            self.kind_codes = array('H', (self._kind_code(kind) for kind in self.kinds))
+            self.total_length = float(np.sum(self.base_lengths))
+            return len(self)
+
+    def _map_generation(self, generation: int, dense: Optional[bool]):
+        """Memory-map the files of a saved generation as the base"""
+        self.generation = generation
+        with open(self._path("lexicon.json"), 'r', encoding='utf-8') as f:
+            self.lexicon = json.load(f)
+        self.postings = np.load(self._path("postings.npy"), mmap_mode='r')
+        self.frequencies = np.load(self._path("frequencies.npy"), mmap_mode='r')
+        self.base_lengths = np.load(self._path("lengths.npy"), mmap_mode='r')
+        self.text_offsets = np.load(self._path("text_offsets.npy"), mmap_mode='r')
+        self.texts = np.memmap(self._path("texts.bin"), dtype=np.uint8, mode='r') \
+            if self.text_offsets[-1] else np.zeros(0, dtype=np.uint8)
+        self.base_vectors = None
+        if dense and os.path.exists(self._path("vectors.npy")):
+            self.base_vectors = np.load(self._path("vectors.npy"), mmap_mode='r')
+
+    def add(self, key: str, text: str, kind: str) -> bool:
+        """Index one document unless its key is already present"""
+        if key in self.keys or not text:
+            return False
+        terms = Counter(index_terms(text))
+        vector = np.asarray(self.embed([text])[0], dtype=np.float32) if self.embed is not None else None
+        with self._lock:
+            if key in self.keys:
+                return False
+            doc_id = len(self.kinds)
+            for term, count in terms.items():
+                self.delta_postings[term].extend((doc_id, count))
+            length = sum(terms.values())
+            self.delta_lengths.append(length)
+            self.delta_texts.append(text)
+            self.total_length += length
+            self.keys[key] = doc_id
+            self.kinds.append(kind)
+            self.kind_codes.append(self._kind_code(kind))
+            if vector is not None:
+                self.delta_vectors.append(vector)
+        return True
+
+    def _kind_code(self, kind: str) -> int:
+        return self.kind_lookup.setdefault(kind, len(self.kind_lookup))
+
+    def remove(self, key: str):
+        """Hide a document from results (tasks can be deleted)"""
+        with self._lock:
+            doc_id = self.keys.pop(key, None)
+            if doc_id is not None:
+                self.deleted.add(doc_id)
+
+    def sync(self, conversations: Iterable[Dict[str, Any]], notes: Iterable[str], tasks: Iterable[str]) -> int:
+        """Add whatever memory is missing from the index; returns documents added"""
+        added = 0
+        for conv in conversations:
+            added += self.add(conversation_key(conv), conversation_text(conv), conversation_kind(conv))
+        for number, note in enumerate(notes):
+            added += self.add(f"note:{number}", note, 'note')
+        tasks = list(tasks)
+        for task in tasks:
+            added += self.add(f"task:{task}", task, 'task')
+        current = {f"task:{task}" for task in tasks}
+        for key in [key for key in self.keys if key.startswith("task:") and key not in current]:
+            self.remove(key)
+        return added
+
+    def text(self, doc_id: int) -> str:
+        if doc_id >= self.base_count:
+            return self.delta_texts[doc_id - self.base_count]
+        start, end = int(self.text_offsets[doc_id]), int(self.text_offsets[doc_id + 1])
+        return bytes(self.texts[start:end]).decode("utf-8")
+
+    def bm25_scores(self, query: str) -> np.ndarray:
+        """BM25 score of every document for the query terms"""
+        total = len(self.kinds)
+        scores = np.zeros(total, dtype=np.float32)
+        if not total:
+            return scores
+        lengths = np.concatenate([self.base_lengths, np.asarray(self.delta_lengths, dtype=np.float32)])
+        average = max(self.total_length / total, 1e-6)
+
+        for term in set(index_terms(query)):
+            doc_ids, counts = [], []
+            if term in self.lexicon:
+                start, size = self.lexicon[term]
+                doc_ids.append(self.postings[start:start + size])
+                counts.append(self.frequencies[start:start + size])
+            if term in self.delta_postings:
+                delta = np.frombuffer(self.delta_postings[term], dtype=np.int32).reshape(-1, 2)
+                doc_ids.append(delta[:, 0])
+                counts.append(delta[:, 1].astype(np.float32))
+            if not doc_ids:
+                continue
+            ids = np.concatenate(doc_ids)
+            tf = np.concatenate(counts)
+            idf = np.log(1 + (total - len(ids) + 0.5) / (len(ids) + 0.5))
+            norm = tf + self.k1 * (1 - self.b + self.b * lengths[ids] / average)
+            scores += np.bincount(ids, weights=idf * tf * (self.k1 + 1) / norm, minlength=total).astype(np.float32)
+        return scores
+
+    def dense_scores(self, query: str) -> Optional[np.ndarray]:
+        """Cosine similarity of every document to the query, when vectors exist"""
+        if self.embed is None:
+            return None
+        parts = []
+        if self.base_vectors is not None:
+            parts.append(np.asarray(self.base_vectors))
+        if self.delta_vectors:
+            parts.append(np.vstack(self.delta_vectors))
+        if not parts:
+            return None
+        vectors = np.vstack(parts) if len(parts) > 1 else parts[0]
+        if len(vectors) != len(self.kinds):
+            return None
+        return vectors @ np.asarray(self.embed([query])[0], dtype=np.float32)
+
+    @staticmethod
+    def top(scores: np.ndarray, k: int, mask: np.ndarray) -> np.ndarray:
+        """Indices of the k best positive-scoring documents"""
+        candidates = np.flatnonzero(mask & (scores > 0))
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+    def search(self, query: str, k: int = 5, kinds: Optional[Iterable[str]] = None,
+               exclude: Iterable[str] = ()) -> List[Dict[str, Any]]:
+        """Top-k memories for a query, fusing BM25 and dense ranks when enabled"""
+        with self._lock:
+            return self._search(query, k, kinds, exclude)
+
+    def _search(self, query: str, k: int, kinds: Optional[Iterable[str]],
+                exclude: Iterable[str]) -> List[Dict[str, Any]]:
+        start = time.perf_counter()
+        mask = np.ones(len(self.kinds), dtype=bool)
+        for doc_id in self.deleted:
+            mask[doc_id] = False
+        for key in exclude:
+            if key in self.keys:
+                mask[self.keys[key]] = False
+        if kinds is not None:
+            allowed = [self.kind_lookup[kind] for kind in kinds if kind in self.kind_lookup]
+            mask &= np.isin(np.frombuffer(self.kind_codes, dtype=np.uint16), allowed)
+
+        lexical = self.bm25_scores(query)
+        ranked = self.top(lexical, k * 2, mask)
+        dense = self.dense_scores(query)
+        if dense is not None:
+            # Reciprocal rank fusion of the two candidate lists
+            fused = defaultdict(float)
+            for rank, doc_id in enumerate(ranked):
+                fused[int(doc_id)] += 1 / (60 + rank)
+            for rank, doc_id in enumerate(self.top(dense, k * 2, mask)):
+                fused[int(doc_id)] += 1 / (60 + rank)
+            order = sorted(fused.items(), key=lambda item: -item[1])[:k]
+        else:
+            order = [(int(doc_id), float(lexical[doc_id])) for doc_id in ranked[:k]]
+
+        self.last_query_seconds = time.perf_counter() - start
+        return [{'text': self.text(doc_id), 'kind': self.kinds[doc_id], 'score': score}
+                for doc_id, score in order]
+
+    def save(self):
+        """Merge the delta into a new memory-mapped generation
+
+        The delta is frozen under the lock, the files are written without
+        it, and documents added or removed meanwhile stay in the new delta.
+        """
+        with self._save_lock:
+            with self._lock:
+                if not self.delta_texts and os.path.exists(os.path.join(self.directory, META_FILE)):
+                    self._write_meta(self.generation)
+                    return
+                frozen = len(self.delta_texts)
+                base_count = self.base_count + frozen
+                delta_postings = {term: bytes(pairs) for term, pairs in self.delta_postings.items()}
+                delta_lengths = self.delta_lengths[:frozen]
+                delta_texts = self.delta_texts[:frozen]
+                delta_vectors = self.delta_vectors[:frozen]
+                keys = [""] * base_count
+                for key, doc_id in self.keys.items():
+                    if doc_id < base_count:
+                        keys[doc_id] = key
+                meta = {
+                    'keys': keys,
+                    'kinds': self.kinds[:base_count],
+                    'deleted': sorted(doc_id for doc_id in self.deleted if doc_id < base_count),
+                }
+            generation = self.generation + 1
+            dense = self._write_generation(generation, base_count, delta_postings, delta_lengths,
+                                           delta_texts, delta_vectors)
+            with self._lock:
+                self._write_meta(generation, dense, meta)
+                previous = self.generation
+                self._map_generation(generation, dense)
+                # Keep what was added while the files were written
+                del self.delta_lengths[:frozen]
+                del self.delta_texts[:frozen]
+                del self.delta_vectors[:frozen]
+                for term in list(self.delta_postings):
+                    pairs = np.frombuffer(self.delta_postings[term], dtype=np.int32).reshape(-1, 2)
+                    newer = pairs[pairs[:, 0] >= base_count]
+                    if len(newer):
+                        self.delta_postings[term] = array('i', newer.ravel().tolist())
+                    else:
+                        del self.delta_postings[term]
+                self.compactions += 1
+            self._remove_generation(previous)
+
+    def _write_generation(self, generation: int, base_count: int, delta_postings: Dict[str, bytes],
+                          delta_lengths: List[int], delta_texts: List[str],
+                          delta_vectors: List[np.ndarray]) -> bool:
+        """Write base plus the frozen delta as a new generation; returns whether it has vectors"""
+        terms = set(self.lexicon) | set(delta_postings)
+        lexicon = {}
+        postings, frequencies = [], []
+        offset = 0
+        for term in sorted(terms):
+            size = 0
+            if term in self.lexicon:
+                start, length = self.lexicon[term]
+                postings.append(np.asarray(self.postings[start:start + length], dtype=np.int32))
+                frequencies.append(np.asarray(self.frequencies[start:start + length], dtype=np.float32))
+                size += length
+            if term in delta_postings:
+                delta = np.frombuffer(delta_postings[term], dtype=np.int32).reshape(-1, 2)
+                delta = delta[delta[:, 0] < base_count]
+                postings.append(delta[:, 0].copy())
+                frequencies.append(delta[:, 1].astype(np.float32))
+                size += len(delta)
+            if size:
+                lexicon[term] = (offset, size)
+                offset += size
+
+        encoded = [text.encode("utf-8") for text in delta_texts]
+        base_bytes = int(self.text_offsets[-1])
+        text_offsets = np.concatenate([
+            np.asarray(self.text_offsets, dtype=np.int64),
+            base_bytes + np.cumsum([len(data) for data in encoded], dtype=np.int64),
+        ])
+
+        np.save(self._path("postings.npy", generation),
+                np.concatenate(postings) if postings else np.zeros(0, dtype=np.int32))
+        np.save(self._path("frequencies.npy", generation),
+                np.concatenate(frequencies) if frequencies else np.zeros(0, dtype=np.float32))
+        np.save(self._path("lengths.npy", generation),
+                np.concatenate([self.base_lengths, np.asarray(delta_lengths, dtype=np.float32)]))
+        np.save(self._path("text_offsets.npy", generation), text_offsets)
+        with open(self._path("texts.bin", generation), 'wb') as f:
+            f.write(bytes(self.texts[:base_bytes]))
+            for data in encoded:
+                f.write(data)
+        with open(self._path("lexicon.json", generation), 'w', encoding='utf-8') as f:
+            json.dump(lexicon, f, ensure_ascii=False)
+        dense = self.embed is not None and (self.base_vectors is not None or self.base_count == 0)
+        if dense:
+            parts = ([np.asarray(self.base_vectors)] if self.base_vectors is not None else []) + delta_vectors
+            np.save(self._path("vectors.npy", generation), np.vstack(parts))
+        return dense
+
+    def _write_meta(self, generation: int, dense: Optional[bool] = None,
+                    documents: Optional[Dict[str, Any]] = None):
+        if documents is None:
+            keys = [""] * len(self.kinds)
+            for key, doc_id in self.keys.items():
+                keys[doc_id] = key
+            documents = {'keys': keys, 'kinds': self.kinds, 'deleted': sorted(self.deleted)}
+        meta = dict(documents, generation=generation,
+                    dense=self.base_vectors is not None if dense is None else dense)
+        path = os.path.join(self.directory, META_FILE)
+        with open(path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+
+    def _remove_generation(self, generation: int):
+        for name in ("postings.npy", "frequencies.npy", "lengths.npy", "text_offsets.npy",
+                     "texts.bin", "lexicon.json", "vectors.npy"):
+            path = self._path(name, generation)
+            if generation != self.generation and os.path.exists(path):
+                os.remove(path)
+
+
+def conversation_key(conv: Dict[str, Any]) -> str:
+    return f"conversation:{conv.get('timestamp', '')}"
+
+
+def conversation_kind(conv: Dict[str, Any]) -> str:
+    """Turns from server sessions are kept apart per workstation"""
+    return f"conversation@{conv['session']}" if conv.get('session') else "conversation"
+
+
+def conversation_text(conv: Dict[str, Any]) -> str:
+    return f"{conv.get('user_input', '')}\n{conv.get('assistant_response', '')}"
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Append-only memory journal for the Arabic Voice Assistant
+Each mutation is one JSON line; snapshots are compacted periodically
+"""
+
+import copy
+import json
+import os
+import pickle
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+SNAPSHOT_FILE = "snapshot.json"
+JOURNAL_FILE = "journal.jsonl"
+# Journal records a background snapshot is absorbing; removed once it is written
+PREVIOUS_JOURNAL_FILE = "journal.prev.jsonl"
+
+
+def task_index(tasks: List[str], record: Dict[str, Any]) -> Optional[int]:
+    """Position of the task a task_remove record refers to, if still present
+
+    Records carry the task text when another process may have changed the
+    list since the index was read; the index is only trusted when it still
+    points at that task.
+    """
+    index, task = record['index'], record.get('task')
+    if 0 <= index < len(tasks) and (task is None or tasks[index] == task):
+        return index
+    if task is not None and task in tasks:
+        return tasks.index(task)
+    return None
+
+
+def apply_record(conversations: List[Dict], context: Dict[str, Any], record: Dict[str, Any]):
+    """Apply one journal record to the in-memory state"""
+    op = record['op']
+    if op == 'conversation':
+        conversations.append(record['conversation'])
+    elif op == 'task_add':
+        context.setdefault('current_tasks', []).append(record['task'])
+    elif op == 'task_remove':
+        tasks = context.setdefault('current_tasks', [])
+        index = task_index(tasks, record)
+        if index is not None:
+            tasks.pop(index)
+    elif op == 'preference_set':
+        context.setdefault('user_preferences', {})[record['key']] = record['value']
+    elif op == 'note_add':
+        context.setdefault('important_notes', []).append(record['note'])
+    elif op == 'schedule_add':
+        context.setdefault('schedule', {})[record['item']['id']] = record['item']
+    elif op == 'schedule_remove':
+        context.setdefault('schedule', {}).pop(record['id'], None)
+    elif op == 'schedule_done':
+        item = context.setdefault('schedule', {}).get(record['id'])
+        if item is not None:
+            item['done'] = True
+    elif op == 'context_set':
+        context[record['key']] = record['value']
+    else:
+        raise ValueError(f"Unknown journal operation: {op}")
+
+
+class MemoryJournal:
+    """Snapshot plus append-only log with batched fsync and atomic compaction
+
+    Every snapshot_every records the journal is rotated aside and a copy of
+    the state is snapshotted on a background thread, so appends stay cheap
+    however long the history grows. load() replays a rotated journal left
+    behind by a crash before the current one.
+    """
+
+    def __init__(self, directory: str = "assistant_memory", snapshot_every: int = 500,
+                 fsync_interval: float = 0.5):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.fsync_interval = fsync_interval
+        self.snapshot_path = os.path.join(directory, SNAPSHOT_FILE)
+        self.journal_path = os.path.join(directory, JOURNAL_FILE)
+        self.previous_path = os.path.join(directory, PREVIOUS_JOURNAL_FILE)
+        self.seq = 0
+        self.records_since_snapshot = 0
+        self.state_provider: Optional[Callable[[], Tuple[List[Dict], Dict[str, Any]]]] = None
+
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._closed = threading.Event()
+        self._journal = None
+        self._flusher = None
+        self._snapshotter: Optional[threading.Thread] = None
+
+        os.makedirs(directory, exist_ok=True)
+
+    def load(self, legacy_pickle: Optional[str] = None) -> Tuple[List[Dict], Dict[str, Any]]:
+        """Load the latest snapshot and replay the journal tail"""
+        conversations: List[Dict] = []
+        context: Dict[str, Any] = {}
+        snapshot_seq = 0
+
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            conversations = snapshot.get('conversations', [])
+            context = snapshot.get('context', {})
+            snapshot_seq = snapshot.get('seq', 0)
+        elif legacy_pickle and os.path.exists(legacy_pickle):
+            # One-time migration from the old whole-file pickle
+            with open(legacy_pickle, 'rb') as f:
+                data = pickle.load(f)
+            conversations = data.get('conversations', [])
+            context = data.get('context', {})
+            self._write_snapshot(conversations, context, 0)
+
+        self.seq = snapshot_seq
+        replayed = 0
+        for path in (self.previous_path, self.journal_path):
+            if os.path.exists(path):
+                replayed += self._replay(path, conversations, context, snapshot_seq)
+
+        if os.path.exists(self.previous_path):
+            # A background snapshot never finished: take it now, before new records arrive
+            self._write_snapshot(conversations, context, self.seq)
+            self._open_journal(truncate=True)
+            os.remove(self.previous_path)
+            replayed = 0
+        self.records_since_snapshot = replayed
+        self._open_journal(truncate=False)
+        return conversations, context
+
+    def _replay(self, path: str, conversations: List[Dict], context: Dict[str, Any], snapshot_seq: int) -> int:
+        """Apply one journal file's records newer than the snapshot; returns how many"""
+        replayed = 0
+        valid_end = 0
+        with open(path, 'rb') as f:
+            for line in f:
+                try:
+                    # Every append ends in a newline; a line without one is torn
+                    if not line.endswith(b"\n"):
+                        raise ValueError("unterminated record")
+                    record = json.loads(line.decode('utf-8'))
+                except ValueError:
+                    # A torn final line from a crash mid-append
+                    break
+                valid_end += len(line)
+                if record['seq'] <= snapshot_seq:
+                    continue
+                apply_record(conversations, context, record)
+                self.seq = record['seq']
+                replayed += 1
+        if valid_end < os.path.getsize(path):
+            # Cut the torn tail off, or new records would land behind it and be lost
+            with open(path, 'r+b') as f:
+                f.truncate(valid_end)
+                os.fsync(f.fileno())
+        return replayed
+
+    def _open_journal(self, truncate: bool):
+        if self._journal:
+            self._journal.close()
+        self._journal = open(self.journal_path, 'w' if truncate else 'a', encoding='utf-8')
+        if not self._flusher:
+            self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self):
+        """Group appends into one fsync per interval"""
+        while not self._closed.wait(self.fsync_interval):
+            self.sync()
+
+    def sync(self):
+        """Force buffered journal records to disk"""
+        with self._lock:
+            if self._dirty and self._journal:
+                self._journal.flush()
+                os.fsync(self._journal.fileno())
+                self._dirty = False
+
+    def append(self, op: str, **fields):
+        """Append one mutation record; O(1) in the size of the history"""
+        with self._lock:
+            if self._journal is None:
+                self._open_journal(truncate=False)
+            self.seq += 1
+            record = {'seq': self.seq, 'op': op}
+            record.update(fields)
+            self._journal.write(json.dumps(record, ensure_ascii=False) + "\n")
+            # Hand the line to the OS now so a process crash cannot lose it
+            self._journal.flush()
+            self._dirty = True
+            self.records_since_snapshot += 1
+            if (self.records_since_snapshot >= self.snapshot_every and self.state_provider
+                    and not self.snapshot_running() and not os.path.exists(self.previous_path)):
+                # A failed snapshot leaves its rotated journal for load() to recover
+                self._start_snapshot()
+
+    def _start_snapshot(self):
+        """Rotate the journal aside and snapshot a copy of the state in the background
+
+        Called with the lock held. The history is copied by reference (its
+        conversations are never modified), the small context in full.
+        """
+        conversations, context = self.state_provider()
+        conversations, context, seq = list(conversations), copy.deepcopy(context), self.seq
+        # Records up to seq go with the snapshot; later ones to a fresh journal
+        self._journal.close()
+        os.replace(self.journal_path, self.previous_path)
+        self._journal = open(self.journal_path, 'w', encoding='utf-8')
+        self._dirty = False
+        self.records_since_snapshot = 0
+        self._snapshotter = threading.Thread(
+            target=self._background_snapshot, args=(conversations, context, seq), daemon=True
+        )
+        self._snapshotter.start()
+
+    def _background_snapshot(self, conversations: List[Dict], context: Dict[str, Any], seq: int):
+        try:
+            with open(self.previous_path, 'rb') as f:
+                os.fsync(f.fileno())
+            self._write_snapshot(conversations, context, seq)
+            os.remove(self.previous_path)
+        except Exception as e:
+            # The rotated journal stays on disk and is replayed on the next load
+            print(f"❌ خطأ في حفظ لقطة الذاكرة: {e}")
+
+    def snapshot_running(self) -> bool:
+        return self._snapshotter is not None and self._snapshotter.is_alive()
+
+    def wait_for_snapshot(self, timeout: Optional[float] = None):
+        """Block until a background snapshot in progress has been written"""
+        if self._snapshotter is not None:
+            self._snapshotter.join(timeout)
+
+    def _write_snapshot(self, conversations: List[Dict], context: Dict[str, Any], seq: int):
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'seq': seq, 'conversations': conversations, 'context': context},
+                      f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+    def snapshot(self, conversations: List[Dict], context: Dict[str, Any]):
+        """Write a compacted snapshot atomically and start a fresh journal"""
+        self.wait_for_snapshot()
+        with self._lock:
+            self._write_snapshot(conversations, context, self.seq)
+            # Records up to self.seq are now in the snapshot
+            self._open_journal(truncate=True)
+            if os.path.exists(self.previous_path):
+                os.remove(self.previous_path)
+            self._dirty = False
+            self.records_since_snapshot = 0
+
+    def close(self):
+        """Flush pending records, finish a background snapshot and stop the flusher"""
+        self.wait_for_snapshot()
+        self._closed.set()
+        self.sync()
+        with self._lock:
+            if self._journal:
+                self._journal.close()
+                self._journal = None
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Latency metrics for the Arabic Voice Assistant
+Per-stage spans recorded into fixed-bucket histograms, event counters, and
+export as Prometheus text over HTTP or as a periodic JSON-lines dump
+"""
+
+import asyncio
+import json
+import threading
+import time
+from time import perf_counter
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+# Seconds; covers a local gate check up to a slow cloud round trip
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """Fixed-bucket histogram; observe() is a bisect and two additions"""
+
+    __slots__ = ('bounds', 'counts', 'sum', 'count', '_lock')
+
+    def __init__(self, bounds: Sequence[float] = LATENCY_BUCKETS):
+        self.bounds = tuple(bounds)
+        # Last slot is the +Inf bucket
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by interpolating inside its bucket"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = self.bounds[index - 1] if index else 0.0
+                upper = self.bounds[index] if index < len(self.bounds) else self.bounds[-1]
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.bounds[-1]
+
+
+class Span:
+    """Times one stage on the monotonic clock; exceptions also count as errors
+
+    Cancellation (e.g. a turn cut off by barge-in) is not an error.
+    """
+
+    __slots__ = ('metrics', 'stage', 'histogram', 'start')
+
+    def __init__(self, metrics: "Metrics", stage: str, histogram: Histogram):
+        self.metrics = metrics
+        self.stage = stage
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(perf_counter() - self.start)
+        if exc_type is not None and not issubclass(exc_type, (GeneratorExit, asyncio.CancelledError)):
+            self.metrics.count('error', self.stage)
+        return False
+
+
+class Metrics:
+    """Registry of stage histograms and (event, stage) counters"""
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS, prefix: str = "assistant"):
+        self.buckets = tuple(buckets)
+        self.prefix = prefix
+        self.stages: Dict[str, Histogram] = {}
+        self.counters: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def span(self, stage: str) -> Span:
+        """with metrics.span("llm"): ..."""
+        return Span(self, stage, self.stages.get(stage) or self.histogram(stage))
+
+    def histogram(self, stage: str) -> Histogram:
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self.stages.setdefault(stage, Histogram(self.buckets))
+        return histogram
+
+    def observe(self, stage: str, seconds: float):
+        """Record a duration measured elsewhere"""
+        self.histogram(stage).observe(seconds)
+
+    def count(self, event: str, stage: str, amount: int = 1):
+        """Count a timeout, fallback, error or other event for a stage"""
+        key = (event, stage)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current values as plain data for the JSON-lines dump"""
+        stages = {}
+        for stage, histogram in list(self.stages.items()):
+            stages[stage] = {
+                'count': histogram.count,
+                'sum': round(histogram.sum, 6),
+                'p50': round(histogram.quantile(0.5), 6),
+                'p99': round(histogram.quantile(0.99), 6),
+                'buckets': list(histogram.counts),
+            }
+        counters = {f"{stage}.{event}": value for (event, stage), value in sorted(self.counters.items())}
+        return {'timestamp': time.time(), 'stages': stages, 'counters': counters}
+
+    def prometheus_text(self) -> str:
+        """Render in the Prometheus text exposition format"""
+        name = f"{self.prefix}_stage_seconds"
+        lines = [
+            f"# HELP {name} Duration of each assistant stage in seconds",
+            f"# TYPE {name} histogram",
+        ]
+        for stage, histogram in sorted(self.stages.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), histogram.counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float('inf') else repr(bound)
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {histogram.sum!r}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {histogram.count}')
+
+        name = f"{self.prefix}_events_total"
+        lines.append(f"# HELP {name} Timeouts, fallbacks and errors per stage")
+        lines.append(f"# TYPE {name} counter")
+        for (event, stage), value in sorted(self.counters.items()):
+            lines.append(f'{name}{{stage="{stage}",event="{event}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+class MetricsExporter:
+    """Serve /metrics over HTTP and/or append snapshots to a JSON-lines file"""
+
+    def __init__(self, metrics: Metrics, port: Optional[int] = None, host: str = "127.0.0.1",
+                 dump_path: Optional[str] = None, interval: float = 60.0):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self.dump_path = dump_path
+        self.interval = interval
+        self.server = None
+        self._stop = threading.Event()
+        self._dumper = None
+
+    def start(self):
+        if self.port is not None:
+            metrics = self.metrics
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split("?")[0] != "/metrics":
+                        self.send_error(404)
+                        return
+                    payload = metrics.prometheus_text().encode("utf-8")
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                    self.send_header('Content-Length', str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+
+                def log_message(self, *args):
+                    pass
+
+            self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+            self.server.daemon_threads = True
+            self.port = self.server.server_address[1]
+            threading.Thread(target=self.server.serve_forever, daemon=True, name="metrics-http").start()
+            print(f"📈 المقاييس متاحة على http://{self.host}:{self.port}/metrics")
+
+        if self.dump_path:
+            self._dumper = threading.Thread(target=self._dump_loop, daemon=True, name="metrics-dump")
+            self._dumper.start()
+
+    def dump(self):
+        """Append one snapshot line"""
+        with open(self.dump_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(self.metrics.snapshot(), ensure_ascii=False) + "\n")
+
+    def _dump_loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.dump()
+            except Exception as e:
+                print(f"❌ خطأ في حفظ المقاييس: {e}")
+
+    def stop(self):
+        """Stop serving and write a final snapshot"""
+        self._stop.set()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        if self._dumper:
+            self._dumper.join(timeout=1)
+            self._dumper = None
+            self.dump()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Latency-budgeted LLM model tiering for the Arabic Voice Assistant
+Free-form questions are classified locally (length and cue phrases) and
+sent to the smallest model tier that can answer them within the turn's
+latency budget, with output limits that suit a spoken reply
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Sequence
+
+from intent_router import IntentRouter
+from response_pipeline import SENTENCE_BOUNDARIES, split_sentences
+
+# Query needs, smallest first; tier i of the table serves need i
+NEEDS = ("brief", "standard", "detailed")
+
+# Cue phrases, matched like office commands (whole words, normalized Arabic)
+QUERY_CUES = [
+    ("detailed", ["اشرح", "وضح", "فصل", "بالتفصيل", "قارن", "ما الفرق", "لماذا", "خطة", "خطوات",
+                  "اكتب", "صغ", "لخص", "حلل", "اقترح"], None),
+    ("brief", ["مرحبا", "اهلا", "السلام عليكم", "صباح الخير", "مساء الخير", "شكرا", "كيف حالك",
+               "تمام", "حسنا", "نعم", "لا"], None),
+]
+
+
+@dataclass
+class ModelTier:
+    """One row of the tier table
+
+    expected_latency is the time to a complete reply of max_tokens, in
+    seconds; max_sentences caps what is spoken.
+    """
+    name: str
+    model: str
+    max_tokens: int
+    expected_latency: float
+    max_sentences: int = 3
+    temperature: float = 0.7
+
+
+def default_tiers(model: str = "gpt-3.5-turbo") -> List[ModelTier]:
+    return [
+        ModelTier("brief", model, max_tokens=80, expected_latency=1.0, max_sentences=2),
+        ModelTier("standard", model, max_tokens=180, expected_latency=2.0, max_sentences=4),
+        ModelTier("detailed", model, max_tokens=350, expected_latency=3.5, max_sentences=7),
+    ]
+
+
+def load_tiers(spec: Optional[str], model: str = "gpt-3.5-turbo") -> List[ModelTier]:
+    """Tier table from a JSON list (inline or a file path), smallest first"""
+    if not spec:
+        return default_tiers(model)
+    if spec.lstrip().startswith("["):
+        rows = json.loads(spec)
+    else:
+        with open(spec, 'r', encoding='utf-8') as f:
+            rows = json.load(f)
+    return [ModelTier(**row) for row in rows]
+
+
+def voice_limit(text: str, max_sentences: int, truncated: bool = False) -> str:
+    """Keep the first max_sentences sentences of a reply
+
+    A reply cut off by the token limit ends mid-sentence; that fragment is
+    dropped rather than spoken, unless it is all there is.
+    """
+    sentences = list(split_sentences([text]))
+    if truncated and len(sentences) > 1 and sentences[-1][-1] not in SENTENCE_BOUNDARIES:
+        sentences.pop()
+    return " ".join(sentences[:max_sentences])
+
+
+@dataclass
+class TierChoice:
+    tier: ModelTier
+    need: str
+    reason: str
+
+
+class ModelRouter:
+    """Pick a model tier per question and keep its observed latencies"""
+
+    def __init__(self, tiers: Sequence[ModelTier], budget: float = 4.0, brief_words: int = 8,
+                 detailed_words: int = 25):
+        if not tiers:
+            raise ValueError("The tier table needs at least one tier")
+        self.tiers = list(tiers)
+        self.budget = budget
+        self.brief_words = brief_words
+        self.detailed_words = detailed_words
+        self.cues = IntentRouter(QUERY_CUES)
+        self.observed: Dict[str, deque] = {tier.name: deque(maxlen=200) for tier in self.tiers}
+
+    def classify(self, text: str) -> str:
+        """What a question needs, from its length, question count and cue phrases"""
+        words = len(text.split())
+        questions = sum(text.count(mark) for mark in "؟?")
+        cue = self.cues.route(text)
+        if (cue and cue.name == "detailed") or words > self.detailed_words or questions > 1:
+            return "detailed"
+        if (cue and cue.name == "brief") or words <= self.brief_words:
+            return "brief"
+        return "standard"
+
+    def select(self, text: str, budget: Optional[float] = None) -> TierChoice:
+        """Smallest tier that serves the question's need within the budget
+
+        When no capable tier fits, the largest tier that does fit is used;
+        when none fits at all, the fastest one.
+        """
+        budget = self.budget if budget is None else budget
+        need = self.classify(text)
+        start = min(NEEDS.index(need), len(self.tiers) - 1)
+        for tier in self.tiers[start:]:
+            if tier.expected_latency <= budget:
+                return TierChoice(tier, need, "fits")
+        fitting = [tier for tier in self.tiers[:start] if tier.expected_latency <= budget]
+        if fitting:
+            return TierChoice(fitting[-1], need, "budget")
+        return TierChoice(min(self.tiers, key=lambda tier: tier.expected_latency), need, "over_budget")
+
+    def observe(self, tier: ModelTier, seconds: float):
+        self.observed[tier.name].append(seconds)
+
+    def report(self) -> List[Dict[str, float]]:
+        """Expected versus observed (p50, p90) latency per tier"""
+        rows = []
+        for tier in self.tiers:
+            values = sorted(self.observed[tier.name])
+            rows.append({
+                'tier': tier.name,
+                'model': tier.model,
+                'max_tokens': tier.max_tokens,
+                'expected': tier.expected_latency,
+                'count': len(values),
+                'p50': values[len(values) // 2] if values else 0.0,
+                'p90': values[min(len(values) - 1, int(len(values) * 0.9))] if values else 0.0,
+            })
+        return rows
+
+
+SAMPLE_QUESTIONS = [
+    "مرحبا",
+    "شكراً لك",
+    "ما هي ساعات العمل؟",
+    "متى يبدأ الاجتماع الأسبوعي؟",
+    "هل يمكنك أن تخبرني من المسؤول عن طلبات الصيانة في المبنى الثاني هذا الشهر",
+    "اشرح لي خطوات طلب إجازة سنوية",
+    "ما الفرق بين العقد المؤقت والعقد الدائم؟ ومتى أحتاج موافقة المدير؟",
+]
+
+
+async def benchmark(router: ModelRouter, questions: Sequence[str], repeat: int = 3,
+                    ms_per_token: float = 10.0):
+    """Run sample questions through their tiers against a local chat stub
+
+    The stub streams max_tokens/2 words, one every 2 * ms_per_token, so
+    observed latency scales with each tier's length limit like a real model's.
+    """
+    import openai
+    from stub_backends import ChatStub
+
+    def reply(body):
+        return " ".join(["كلمة"] * (body['max_tokens'] // 2)) + "."
+
+    chat = ChatStub(reply=reply, delay=0.1, token_interval=ms_per_token / 1000 * 2)
+    client = openai.AsyncOpenAI(api_key="stub", base_url=chat.url)
+    try:
+        for _ in range(repeat):
+            for question in questions:
+                choice = router.select(question)
+                start = time.perf_counter()
+                stream = await client.chat.completions.create(
+                    model=choice.tier.model, max_tokens=choice.tier.max_tokens,
+                    messages=[{"role": "user", "content": question}], stream=True
+                )
+                async for _ in stream:
+                    pass
+                router.observe(choice.tier, time.perf_counter() - start)
+        await client.close()
+    finally:
+        chat.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show tier choices and benchmark the tier table against stubs")
+    parser.add_argument("--tiers", help="JSON tier table or path to one (default: built-in table)")
+    parser.add_argument("--budget", type=float, default=4.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    router = ModelRouter(load_tiers(args.tiers), budget=args.budget)
+    for question in SAMPLE_QUESTIONS:
+        start = time.perf_counter()
+        choice = router.select(question)
+        elapsed = time.perf_counter() - start
+        print(f"🧭 {choice.tier.name:<9} ({choice.need}, {choice.reason}, {elapsed * 1e6:.0f} µs): {question}")
+
+    asyncio.run(benchmark(router, SAMPLE_QUESTIONS, repeat=args.repeat))
+    print()
+    for row in router.report():
+        print(f"⏱️ {row['tier']:<9} {row['model']} max_tokens={row['max_tokens']}: expected "
+              f"{row['expected']:.2f}s, observed p50 {row['p50']:.2f}s p90 {row['p90']:.2f}s over {row['count']}")
+    print(json.dumps([asdict(tier) for tier in router.tiers], ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
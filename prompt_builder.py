@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Token-budgeted prompt context for the Arabic Voice Assistant
+Recent turns, the rolling summary, preferences and notes are packed by
+priority until a fixed token budget is spent
+"""
+
+import math
+import re
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from arabic_text import normalize_arabic
+
+# Latin words, Arabic words, or any other single symbol
+TOKEN_PATTERN = re.compile(r"[A-Za-z0-9]+|[\u0600-\u06FF\u0750-\u077F]+|\S")
+
+
+class TokenCounter:
+    """Local token counting: tiktoken when installed, otherwise an estimate
+
+    The estimate errs on the high side (Arabic words cost about one token per
+    two letters in the OpenAI BPE vocabularies), so a budget is never exceeded.
+    """
+
+    def __init__(self, encoding: str = "cl100k_base"):
+        self._encoding = None
+        try:
+            import tiktoken
+            self._encoding = tiktoken.get_encoding(encoding)
+        except Exception:
+            pass
+        # Notes and preferences are recounted every turn
+        self.count = lru_cache(maxsize=4096)(self._count)
+
+    @property
+    def exact(self) -> bool:
+        return self._encoding is not None
+
+    def _count(self, text: str) -> int:
+        if self._encoding is not None:
+            return len(self._encoding.encode(text))
+        tokens = 0
+        for match in TOKEN_PATTERN.findall(text):
+            if match[0].isascii() and match[0].isalnum():
+                tokens += math.ceil(len(match) / 4)
+            elif len(match) > 1:
+                tokens += math.ceil(len(match) / 2)
+            else:
+                tokens += 1
+        return tokens
+
+
+@dataclass
+class PromptContext:
+    """Rendered context block and what it cost"""
+    text: str
+    tokens: int
+    build_seconds: float
+    included: Dict[str, int] = field(default_factory=dict)
+    dropped: Dict[str, int] = field(default_factory=dict)
+
+
+@lru_cache(maxsize=8192)
+def text_terms(text: str) -> frozenset:
+    """Normalized words of a note, cached since notes rarely change"""
+    return frozenset(normalize_arabic(text).split())
+
+
+def relevance(query_terms: set, text: str) -> int:
+    """Number of normalized query words that also appear in text"""
+    return len(query_terms & text_terms(text))
+
+
+class ContextBuilder:
+    """Pack memory into the prompt by priority under a hard token budget
+
+    Priority: preferences, retrieved memories, notes that share words with the
+    query, the most recent turns (newest first), the rolling summary, then
+    remaining notes (newest first). An item that does not fit is skipped, not
+    truncated.
+    """
+
+    def __init__(self, counter: Optional[TokenCounter] = None, budget: int = 1000, window: int = 5):
+        self.counter = counter or TokenCounter()
+        self.budget = budget
+        self.window = window
+
+    def build(self, query: str, history: List[Dict[str, Any]], summary: str = "",
+              preferences: Optional[Dict[str, Any]] = None, notes: Optional[List[str]] = None,
+              memories: Optional[List[str]] = None) -> PromptContext:
+        start = time.perf_counter()
+        preferences = preferences or {}
+        memories = memories or []
+        # Notes already retrieved as memories are not repeated
+        retrieved = set(memories)
+        notes = [note for note in (notes or []) if note not in retrieved]
+        query_terms = set(normalize_arabic(query).split())
+
+        # (section, sort key within the section, rendered line)
+        candidates: List[Tuple[str, int, str]] = []
+        for index, value in enumerate(preferences.values()):
+            candidates.append(('preferences', index, f"- {value}"))
+        for rank, memory in enumerate(memories):
+            candidates.append(('memories', rank, f"- {memory}"))
+        related = [i for i, note in enumerate(notes) if relevance(query_terms, note)]
+        for index in sorted(related, key=lambda i: (-relevance(query_terms, notes[i]), -i)):
+            candidates.append(('notes', index, f"- {notes[index]}"))
+        recent = history[-self.window:] if self.window else []
+        for offset, conv in enumerate(reversed(recent)):
+            candidates.append(('turns', -offset, f"- المستخدم: {conv['user_input']}\n"
+                                                 f"- المساعد: {conv['assistant_response']}"))
+        if summary:
+            candidates.append(('summary', 0, summary))
+        related = set(related)
+        for index in reversed(range(len(notes))):
+            if index not in related:
+                candidates.append(('notes', index, f"- {notes[index]}"))
+
+        # Headers are charged once, when a section gets its first line
+        headers = {
+            'summary': "ملخص المحادثات السابقة:",
+            'turns': "المحادثات الأخيرة:",
+            'preferences': "التفضيلات المحفوظة:",
+            'memories': "ذكريات ذات صلة:",
+            'notes': "الملاحظات المهمة:",
+        }
+        chosen: Dict[str, List[Tuple[int, str]]] = {name: [] for name in headers}
+        dropped = {name: 0 for name in headers}
+        used = 0
+        for section, key, line in candidates:
+            if used + 2 > self.budget:
+                # Not even a one-token line fits any more
+                dropped[section] += 1
+                continue
+            cost = self.counter.count(line) + 1
+            if not chosen[section]:
+                cost += self.counter.count(headers[section]) + 1
+            if used + cost > self.budget:
+                dropped[section] += 1
+                continue
+            chosen[section].append((key, line))
+            used += cost
+
+        # Slowest-changing sections first and the per-question memories last,
+        # so consecutive prompts share as long a prefix as possible
+        blocks = []
+        for section in ('preferences', 'notes', 'summary', 'turns', 'memories'):
+            if chosen[section]:
+                lines = [line for _, line in sorted(chosen[section])]
+                blocks.append("\n".join([headers[section]] + lines))
+        return PromptContext(
+            text="\n\n".join(blocks),
+            tokens=used,
+            build_seconds=time.perf_counter() - start,
+            included={name: len(lines) for name, lines in chosen.items()},
+            dropped=dropped,
+        )
+
+
+def system_prefix(assistant_name: str, office_name: str) -> str:
+    """Instructions that are byte-identical on every turn
+
+    Providers cache the longest prompt prefix they have already seen, so
+    nothing that changes between turns may appear here; it all goes in the
+    context message after it.
+    """
+    return f"""أنت {assistant_name}، مساعد ذكي باللغة العربية في {office_name}.
+
+المهمة: مساعدة الموظفين في المهام المكتبية والرد على استفساراتهم.
+
+تعليمات مهمة:
+- ارد دائماً باللغة العربية فقط
+- كن مفيداً ومهذباً
+- ردك سيُقرأ بصوت عالٍ: اجعله قصيراً وواضحاً وبلا قوائم أو رموز
+- استخدم الذاكرة للرد بناءً على المحادثات السابقة
+- ساعد في المهام المكتبية مثل إدارة المهام والاجتماعات
+- تذكر المعلومات المهمة التي يخبرك بها المستخدم
+
+المهام المتاحة:
+- إدارة المهام: أضف، عرض، حذف المهام
+- إدارة الاجتماعات: جدولة، عرض، تذكير
+- الإعلانات: إنشاء، عرض، بث
+- الذاكرة: حفظ التفضيلات والملاحظات"""
+
+
+def prompt_messages(prefix: str, context: str, user_input: str) -> List[Dict[str, str]]:
+    """Stable system prefix, then the per-turn context, then the question (once)"""
+    messages = [{"role": "system", "content": prefix}]
+    if context:
+        messages.append({"role": "system", "content": f"السياق الحالي:\n{context}"})
+    messages.append({"role": "user", "content": user_input})
+    return messages
+
+
+def summary_watermark(history: List[Dict[str, Any]], summary_until: str, start: int = 0) -> int:
+    """Index of the first turn after summary_until, scanning forward from start
+
+    History is in time order, so callers keep the result and pass it back as
+    start: each turn is stepped over once, not once per persisted turn.
+    """
+    index = min(start, len(history))
+    while index < len(history) and history[index].get('timestamp', '') <= (summary_until or ''):
+        index += 1
+    return index
+
+
+def turns_to_summarize(history: List[Dict[str, Any]], summary_until: str, window: int,
+                       batch: int, start: int = 0) -> List[Dict[str, Any]]:
+    """Turns older than the window that the summary has not absorbed yet
+
+    Only turns from index start (see summary_watermark) onwards are looked
+    at. Returns nothing until at least `batch` such turns have accumulated,
+    so the summarizer runs every few turns rather than every turn.
+    """
+    end = len(history) - window if window else len(history)
+    pending = [conv for conv in history[start:max(start, end)]
+               if conv.get('timestamp', '') > (summary_until or '')]
+    return pending if len(pending) >= batch else []
+
+
+def summary_messages(previous: str, turns: List[Dict[str, Any]], max_words: int = 120) -> List[Dict[str, str]]:
+    """Chat messages asking the model to fold turns into the running summary"""
+    conversation = "\n".join(
+        f"- المستخدم: {conv['user_input']}\n- المساعد: {conv['assistant_response']}" for conv in turns
+    )
+    return [
+        {"role": "system", "content": f"لخص المحادثات التالية باللغة العربية في أقل من {max_words} كلمة. "
+                                      "احتفظ بالحقائق والأسماء والمواعيد والطلبات المهمة فقط."},
+        {"role": "user", "content": f"الملخص السابق:\n{previous or 'لا يوجد'}\n\nمحادثات جديدة:\n{conversation}"},
+    ]
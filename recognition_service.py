@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Speech recognition service for the Arabic Voice Assistant
+Long-lived worker pool with enforced deadlines and optional hedged requests
+"""
+
+import asyncio
+import concurrent.futures
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional, Tuple, Type
+
+
+class RecognitionService:
+    """Run a blocking recognizer on a fixed pool with a real per-request deadline"""
+
+    def __init__(self, recognize: Callable[[Any], str], workers: int = 4, deadline: float = 5.0,
+                 hedge: bool = False, initial_hedge_delay: float = 1.5, hedge_min_samples: int = 20,
+                 latency_window: int = 200,
+                 definitive_errors: Tuple[Type[BaseException], ...] = ()):
+        self.recognize_fn = recognize
+        self.deadline = deadline
+        self.hedge = hedge
+        self.initial_hedge_delay = initial_hedge_delay
+        self.hedge_min_samples = hedge_min_samples
+        # Errors that answer the request (e.g. speech not understood) rather than a transient failure
+        self.definitive_errors = definitive_errors
+        self.latencies = deque(maxlen=latency_window)
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="asr"
+        )
+        self.counters = {
+            'requests': 0,
+            'timeouts': 0,
+            'hedges': 0,
+            'hedge_wins': 0,
+            'errors': 0,
+        }
+
+    def hedge_delay(self) -> float:
+        """Fire the hedge once the p90 of recent latencies has passed"""
+        if len(self.latencies) < self.hedge_min_samples:
+            return self.initial_hedge_delay
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.9))]
+
+    def _submit(self, loop: asyncio.AbstractEventLoop, audio: Any) -> asyncio.Future:
+        started = time.monotonic()
+
+        def timed_call():
+            result = self.recognize_fn(audio)
+            return result, time.monotonic() - started
+
+        return loop.run_in_executor(self.executor, timed_call)
+
+    async def recognize(self, audio: Any) -> Optional[str]:
+        """Recognize audio, raising asyncio.TimeoutError once the deadline passes"""
+        loop = asyncio.get_running_loop()
+        deadline_at = time.monotonic() + self.deadline
+        self.counters['requests'] += 1
+
+        primary = self._submit(loop, audio)
+        pending = {primary}
+        first_error: Optional[BaseException] = None
+        hedged = False
+
+        try:
+            while pending:
+                remaining = deadline_at - time.monotonic()
+                if remaining <= 0:
+                    break
+
+                wait_for = remaining
+                if self.hedge and not hedged:
+                    wait_for = min(remaining, max(0.0, self.hedge_delay() - (self.deadline - remaining)))
+
+                done, pending = await asyncio.wait(
+                    pending, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED
+                )
+
+                if not done:
+                    if self.hedge and not hedged and time.monotonic() < deadline_at:
+                        # Primary is slower than p90: race a second request against it
+                        hedged = True
+                        self.counters['hedges'] += 1
+                        pending.add(self._submit(loop, audio))
+                    continue
+
+                for future in done:
+                    try:
+                        text, latency = future.result()
+                    except self.definitive_errors:
+                        raise
+                    except Exception as e:
+                        first_error = first_error or e
+                        continue
+                    self.latencies.append(latency)
+                    if future is not primary:
+                        self.counters['hedge_wins'] += 1
+                    return text
+
+            if first_error and not pending:
+                self.counters['errors'] += 1
+                raise first_error
+
+            self.counters['timeouts'] += 1
+            raise asyncio.TimeoutError(f"Recognition exceeded {self.deadline:.1f}s deadline")
+        finally:
+            # Drop losers: queued requests never start, running ones are abandoned
+            for future in pending:
+                future.cancel()
+
+    def stats(self) -> Dict[str, float]:
+        """Return request counters and the current hedge threshold"""
+        stats = dict(self.counters)
+        stats['hedge_delay'] = self.hedge_delay()
+        return stats
+
+    def shutdown(self):
+        """Stop accepting work without waiting for hung requests"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+LLM response cache for the Arabic Voice Assistant
+Repeated questions are answered from memory instead of a chat-completions call
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from arabic_text import normalize_arabic
+
+
+def memory_fingerprint(preferences: Dict[str, Any], notes: List[str]) -> str:
+    """Hash the memory that goes into the prompt, so answers follow it"""
+    payload = json.dumps({'preferences': preferences, 'notes': notes}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class ResponseCache:
+    """In-memory TTL + LRU cache keyed by normalized query and memory fingerprint
+
+    Recent conversation turns are deliberately not part of the key: the
+    questions worth caching (working hours, who handles what) do not depend
+    on them.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 3600.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.saved_seconds = 0.0
+        # key -> (response, stored_at, generation latency)
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[str, float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(query: str, fingerprint: str) -> Tuple[str, str]:
+        return normalize_arabic(query), fingerprint
+
+    def get(self, query: str, fingerprint: str) -> Optional[str]:
+        """Return a fresh cached response and mark it as recently used"""
+        key = self.make_key(query, fingerprint)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.clock() - entry[1] > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.saved_seconds += entry[2]
+            return entry[0]
+
+    def put(self, query: str, fingerprint: str, response: str, latency: float = 0.0):
+        """Store a response with the time it took to generate"""
+        key = self.make_key(query, fingerprint)
+        with self._lock:
+            self._entries[key] = (response, self.clock(), latency)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self):
+        """Drop every entry; called when notes or preferences change"""
+        with self._lock:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': len(self._entries),
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations,
+            'saved_seconds': self.saved_seconds,
+        }
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Sentence-pipelined response path for the Arabic Voice Assistant
+Speaks the first sentence while the rest of the reply is still being generated
+"""
+
+import asyncio
+import time
+from typing import Any, AsyncIterable, Callable, Dict, Iterable, Iterator, List, Optional, Union
+
+# Characters that end a spoken sentence (Arabic question mark and comma included)
+SENTENCE_BOUNDARIES = ".؟?!،\n"
+
+
+class SentenceSplitter:
+    """Incrementally group tokens into sentences at Arabic sentence boundaries
+
+    A boundary only counts when followed by whitespace or the end of the
+    stream, so numbers like 3.5 are not cut in half.
+    """
+
+    def __init__(self, min_chars: int = 2):
+        self.min_chars = min_chars
+        self.buffer = ""
+
+    def feed(self, token: str) -> List[str]:
+        """Add a token and return the sentences it completed"""
+        if not token:
+            return []
+        self.buffer += token
+
+        # Emit every complete sentence currently in the buffer
+        sentences = []
+        start = 0
+        for i, char in enumerate(self.buffer[:-1]):
+            if char == "\n" or (char in SENTENCE_BOUNDARIES and self.buffer[i + 1].isspace()):
+                sentence = self.buffer[start:i + 1].strip()
+                if len(sentence) >= self.min_chars:
+                    sentences.append(sentence)
+                    start = i + 1
+        self.buffer = self.buffer[start:]
+        return sentences
+
+    def flush(self) -> Optional[str]:
+        """Return whatever is left once the stream has ended"""
+        sentence = self.buffer.strip()
+        self.buffer = ""
+        return sentence or None
+
+
+def split_sentences(tokens: Iterable[str], min_chars: int = 2) -> Iterator[str]:
+    """Group a token stream into sentences at Arabic sentence boundaries"""
+    splitter = SentenceSplitter(min_chars)
+    for token in tokens:
+        yield from splitter.feed(token)
+    sentence = splitter.flush()
+    if sentence:
+        yield sentence
+
+
+class SentencePipeline:
+    """Overlap synthesis of sentence N+1 with playback of sentence N
+
+    spoken holds the sentences whose playback has started, so a turn that
+    fails part-way knows what the user actually heard.
+    """
+
+    def __init__(self, synthesize: Callable[[str], Any], play: Callable[[Any], Any],
+                 max_pending_audio: int = 2):
+        self.synthesize = synthesize
+        self.play = play
+        self.max_pending_audio = max_pending_audio
+        self.last_stats: Dict[str, float] = {}
+        self.spoken: List[str] = []
+
+    async def run(self, tokens: Union[Iterable[str], AsyncIterable[str]]) -> str:
+        """Speak a token stream sentence by sentence and return the full text"""
+        loop = asyncio.get_running_loop()
+        start_time = time.monotonic()
+        sentence_queue: asyncio.Queue = asyncio.Queue()
+        audio_queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_pending_audio)
+        raw_tokens: List[str] = []
+        self.spoken = []
+        stats = {
+            'time_to_first_sentence': 0.0,
+            'time_to_first_audio': 0.0,
+            'total_time': 0.0,
+            'sentences': 0,
+        }
+
+        def emit(sentence: str):
+            if stats['sentences'] == 0:
+                stats['time_to_first_sentence'] = time.monotonic() - start_time
+            stats['sentences'] += 1
+            sentence_queue.put_nowait(sentence)
+
+        def record(token_stream: Iterable[str]) -> Iterator[str]:
+            for token in token_stream:
+                raw_tokens.append(token)
+                yield token
+
+        def produce_sentences():
+            # Runs on a worker thread because a sync token stream blocks on the network
+            try:
+                for sentence in split_sentences(record(tokens)):
+                    loop.call_soon_threadsafe(emit, sentence)
+            finally:
+                loop.call_soon_threadsafe(sentence_queue.put_nowait, None)
+
+        async def produce_sentences_async():
+            splitter = SentenceSplitter()
+            try:
+                async for token in tokens:
+                    raw_tokens.append(token)
+                    for sentence in splitter.feed(token):
+                        emit(sentence)
+                sentence = splitter.flush()
+                if sentence:
+                    emit(sentence)
+            finally:
+                sentence_queue.put_nowait(None)
+
+        async def synthesize_sentences():
+            while True:
+                sentence = await sentence_queue.get()
+                if sentence is None:
+                    await audio_queue.put(None)
+                    return
+                audio = await asyncio.to_thread(self.synthesize, sentence)
+                await audio_queue.put((sentence, audio))
+
+        async def play_sentences():
+            # A single consumer keeps playback in strict sentence order
+            while True:
+                item = await audio_queue.get()
+                if item is None:
+                    return
+                sentence, audio = item
+                if not stats['time_to_first_audio']:
+                    stats['time_to_first_audio'] = time.monotonic() - start_time
+                self.spoken.append(sentence)
+                await asyncio.to_thread(self.play, audio)
+
+        if hasattr(tokens, '__aiter__'):
+            producer = produce_sentences_async()
+        else:
+            producer = asyncio.to_thread(produce_sentences)
+        stages = [
+            asyncio.ensure_future(producer),
+            asyncio.ensure_future(synthesize_sentences()),
+            asyncio.ensure_future(play_sentences()),
+        ]
+        try:
+            await asyncio.gather(*stages)
+        except BaseException:
+            for stage in stages:
+                stage.cancel()
+            raise
+        finally:
+            stats['total_time'] = time.monotonic() - start_time
+            self.last_stats = stats
+
+        return "".join(raw_tokens).strip()
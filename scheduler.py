@@ -0,0 +1,461 @@
+#!/usr/bin/env python3
+"""
+Meetings, announcements and timed reminders for the Arabic Voice Assistant
+Typed records indexed by due time in a heap; one reminder loop on the event
+loop sleeps until the next item is due and synthesizes its audio ahead of
+time so it plays the instant it fires
+"""
+
+import asyncio
+import heapq
+import itertools
+import re
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, ClassVar, Dict, Iterable, List, Optional, Tuple
+
+from arabic_text import TASHKEEL, normalize_with_offsets
+from intent_router import NUMBER_LOOKUP
+
+# Heap actions: synthesize the reminder audio, then play it
+RENDER = 0
+FIRE = 1
+
+
+@dataclass
+class ScheduledItem:
+    """Something due at a wall-clock time (seconds since the epoch)
+
+    session is the server-mode workstation that scheduled it, if any.
+    """
+    id: str
+    text: str
+    due: float
+    remind_before: float = 0.0
+    done: bool = False
+    session: Optional[str] = None
+
+    kind: ClassVar[str] = "item"
+
+    @property
+    def reminder_at(self) -> float:
+        return self.due - self.remind_before
+
+    def reminder_text(self) -> str:
+        return f"تذكير: {self.text}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(asdict(self), kind=self.kind)
+
+
+@dataclass
+class Task(ScheduledItem):
+    """A task with a deadline"""
+    kind: ClassVar[str] = "task"
+
+
+@dataclass
+class Meeting(ScheduledItem):
+    """A meeting, announced remind_before seconds ahead of its start"""
+    attendees: List[str] = field(default_factory=list)
+
+    kind: ClassVar[str] = "meeting"
+
+    def reminder_text(self) -> str:
+        minutes = round(self.remind_before / 60)
+        if minutes <= 0:
+            return f"تذكير: حان موعد اجتماع {self.text}"
+        return f"تذكير: اجتماع {self.text} بعد {minutes_phrase(minutes)}"
+
+
+@dataclass
+class Announcement(ScheduledItem):
+    """Broadcast to the office when due"""
+    kind: ClassVar[str] = "announcement"
+
+    def reminder_text(self) -> str:
+        return f"إعلان: {self.text}"
+
+
+RECORD_TYPES = {cls.kind: cls for cls in (Task, Meeting, Announcement)}
+
+
+def item_from_dict(record: Dict[str, Any]) -> ScheduledItem:
+    """Rebuild a typed record from its journal form"""
+    fields = {key: value for key, value in record.items() if key != 'kind'}
+    return RECORD_TYPES[record['kind']](**fields)
+
+
+def new_item_id(kind: str) -> str:
+    return f"{kind}:{uuid.uuid4().hex[:12]}"
+
+
+def minutes_phrase(minutes: int) -> str:
+    """Arabic count of minutes with the right noun form"""
+    if minutes == 1:
+        return "دقيقة واحدة"
+    if minutes == 2:
+        return "دقيقتين"
+    if minutes <= 10:
+        return f"{minutes} دقائق"
+    return f"{minutes} دقيقة"
+
+
+def describe_due(due: float, now: Optional[float] = None) -> str:
+    """Spoken form of a due time: today, tomorrow or a date, plus the time"""
+    moment = datetime.fromtimestamp(due)
+    today = datetime.fromtimestamp(now if now is not None else time.time()).date()
+    if moment.date() == today:
+        day = "اليوم"
+    elif moment.date() == today + timedelta(days=1):
+        day = "غداً"
+    else:
+        day = f"يوم {moment.date().isoformat()}"
+    return f"{day} الساعة {moment:%H:%M}"
+
+
+# Time phrases are matched on normalized text (see arabic_text)
+_NUMBER = r"\d{1,2}|" + "|".join(sorted(NUMBER_LOOKUP, key=len, reverse=True))
+_UNITS = {
+    "دقيقه": 60, "دقايق": 60, "ساعه": 3600, "ساعات": 3600, "يوم": 86400, "ايام": 86400,
+}
+_FIXED_SPANS = {
+    "دقيقتين": 120, "ساعتين": 7200, "يومين": 172800, "نصف ساعه": 1800, "ربع ساعه": 900,
+}
+RELATIVE_TIME = re.compile(
+    rf"(?<!\S)بعد (?:(?P<fixed>{'|'.join(_FIXED_SPANS)})|(?:(?P<count>{_NUMBER}) )?(?P<unit>{'|'.join(_UNITS)}))(?!\S)"
+)
+CLOCK_TIME = re.compile(
+    rf"(?<!\S)(?:(?:في|على) )?الساعه (?P<hour>{_NUMBER})(?: (?P<minute>\d\d))?"
+    r"(?: (?P<fraction>والنصف|والربع|الا ربع))?"
+    r"(?: (?P<period>صباحا|الصبح|ظهرا|الظهر|عصرا|العصر|مساء|مساءا|المساء|ليلا))?(?!\S)"
+)
+TOMORROW = re.compile(r"(?<!\S)(?:غدا|بكره|بكرا)(?!\S)")
+_AFTERNOON = {"عصرا", "العصر", "مساء", "مساءا", "المساء", "ليلا"}
+
+
+def _number(token: str) -> int:
+    return int(token) if token.isdigit() else NUMBER_LOOKUP[token]
+
+
+def parse_due(text: str, now: Optional[datetime] = None) -> Tuple[Optional[datetime], str]:
+    """Find a spoken due time in text; returns it and the text without it
+
+    Understands "بعد 10 دقائق", "بعد ساعتين", "الساعة 3 والنصف مساءً" and
+    "غداً الساعة 10". A bare hour from 1 to 7 means the afternoon, and a
+    time already past today means tomorrow.
+    """
+    now = now or datetime.now()
+    normalized, offsets = normalize_with_offsets(text)
+    spans: List[Tuple[int, int]] = []
+    due = None
+
+    relative = RELATIVE_TIME.search(normalized)
+    if relative:
+        spans.append(relative.span())
+        if relative.group('fixed'):
+            seconds = _FIXED_SPANS[relative.group('fixed')]
+        else:
+            count = _number(relative.group('count')) if relative.group('count') else 1
+            seconds = count * _UNITS[relative.group('unit')]
+        due = now + timedelta(seconds=seconds)
+    else:
+        tomorrow = TOMORROW.search(normalized)
+        clock = CLOCK_TIME.search(normalized)
+        if tomorrow:
+            spans.append(tomorrow.span())
+        if clock:
+            spans.append(clock.span())
+            hour = _number(clock.group('hour'))
+            minute = int(clock.group('minute') or 0)
+            fraction = clock.group('fraction')
+            if fraction == "والنصف":
+                minute = 30
+            elif fraction == "والربع":
+                minute = 15
+            elif fraction == "الا ربع":
+                hour, minute = hour - 1, 45
+            period = clock.group('period')
+            if hour < 12 and (period in _AFTERNOON or (period in ("ظهرا", "الظهر") and hour <= 5)
+                              or (period is None and 1 <= hour <= 7)):
+                hour += 12
+            if not 0 <= hour <= 23 or minute > 59:
+                return None, text
+            day = now.date() + timedelta(days=1 if tomorrow else 0)
+            due = datetime.combine(day, datetime.min.time()).replace(hour=hour, minute=minute)
+            if not tomorrow and due <= now:
+                due += timedelta(days=1)
+        elif tomorrow:
+            # "Tomorrow" alone means the start of the working day
+            due = datetime.combine(now.date() + timedelta(days=1), datetime.min.time()).replace(hour=9)
+
+    if due is None:
+        return None, text
+
+    # Cut the time phrases out of the user's original spelling
+    rest = text
+    for start, end in sorted(spans, reverse=True):
+        first = offsets[start]
+        last = offsets[end - 1] + 1
+        while last < len(text) and text[last] in TASHKEEL:
+            last += 1
+        rest = rest[:first] + " " + rest[last:]
+    return due, " ".join(rest.split()).strip(" :،,.-")
+
+
+class SystemClock:
+    """Wall-clock time; waits are asyncio timeouts on the running loop
+
+    Long waits are cut into max_sleep pieces so a suspended laptop or a
+    clock change cannot leave a reminder hours late.
+    """
+
+    def __init__(self, max_sleep: float = 300.0):
+        self.max_sleep = max_sleep
+
+    def now(self) -> float:
+        return time.time()
+
+    async def wait(self, event: asyncio.Event, deadline: Optional[float]):
+        """Return when event is set or deadline passes (never, if None)"""
+        if deadline is None:
+            await event.wait()
+            return
+        timeout = min(deadline - self.now(), self.max_sleep)
+        if timeout <= 0:
+            return
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+class SimulatedClock:
+    """Manually advanced time for tests
+
+    advance() wakes every waiter whose deadline has passed and returns once
+    each of them has done its due work and is waiting again.
+    """
+
+    def __init__(self, start: float = 0.0):
+        self.current = start
+        self.entered = 0
+        self._timers: List[Tuple[float, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+
+    def now(self) -> float:
+        return self.current
+
+    async def wait(self, event: asyncio.Event, deadline: Optional[float]):
+        self.entered += 1
+        if deadline is not None and deadline <= self.current:
+            return
+        waiter = asyncio.ensure_future(event.wait())
+        futures = {waiter}
+        timer = None
+        if deadline is not None:
+            timer = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._timers, (deadline, next(self._seq), timer))
+            futures.add(timer)
+        try:
+            await asyncio.wait(futures, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            waiter.cancel()
+            if timer is not None and not timer.done():
+                timer.cancel()
+
+    async def advance(self, seconds: float):
+        # Let newly started tasks reach their first wait
+        await asyncio.sleep(0)
+        self.current += seconds
+        entered = self.entered
+        woken = 0
+        while self._timers and self._timers[0][0] <= self.current:
+            _, _, timer = heapq.heappop(self._timers)
+            if not timer.done():
+                timer.set_result(None)
+                woken += 1
+        while self.entered < entered + woken:
+            await asyncio.sleep(0)
+
+
+class Scheduler:
+    """Heap of reminder times with one sleeping loop to fire them
+
+    Every item has two heap entries: RENDER render_ahead seconds before its
+    reminder, which synthesizes the audio on a worker thread, and FIRE at
+    the reminder time, which hands item and audio to announce(). Cancelled
+    or replaced items leave stale entries that are skipped when popped, so
+    add and cancel stay O(log n) and O(1) with thousands pending.
+    """
+
+    def __init__(self, clock=None, render: Optional[Callable[[str], bytes]] = None,
+                 announce: Optional[Callable[[ScheduledItem, Optional[bytes]], Awaitable[None]]] = None,
+                 render_ahead: float = 300.0, render_workers: int = 2, late_grace: float = 600.0):
+        self.clock = clock or SystemClock()
+        self.render = render
+        self.announce = announce
+        self.render_ahead = render_ahead
+        self.late_grace = late_grace
+        self.items: Dict[str, ScheduledItem] = {}
+        self.fired = 0
+        self.late_renders = 0
+        self.wakeups = 0
+        self._heap: List[Tuple[float, int, int, ScheduledItem]] = []
+        self._stale = 0
+        self._seq = itertools.count()
+        self._renders: Dict[str, asyncio.Future] = {}
+        self._render_slots = asyncio.Semaphore(render_workers)
+        self._changed = asyncio.Event()
+        self._parked = False
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def _live(self, item: ScheduledItem) -> bool:
+        return self.items.get(item.id) is item and not item.done
+
+    def _push(self, item: ScheduledItem):
+        if self.render is not None:
+            heapq.heappush(self._heap, (item.reminder_at - self.render_ahead, next(self._seq), RENDER, item))
+        heapq.heappush(self._heap, (item.reminder_at, next(self._seq), FIRE, item))
+
+    def add(self, item: ScheduledItem):
+        """Schedule an item, replacing any with the same id"""
+        if self.items.pop(item.id, None) is not None:
+            self._forget(item.id)
+        self.items[item.id] = item
+        if not item.done:
+            self._push(item)
+            # The loop may be sleeping towards a later item
+            self._changed.set()
+
+    def load(self, records: Iterable[Dict[str, Any]]) -> List[str]:
+        """Bulk-load journal records; returns ids of reminders missed by more than late_grace"""
+        now = self.clock.now()
+        missed = []
+        for record in records:
+            item = item_from_dict(record)
+            if not item.done and item.reminder_at < now - self.late_grace:
+                item.done = True
+                missed.append(item.id)
+            self.items[item.id] = item
+        self._heap = []
+        self._stale = 0
+        for item in self.items.values():
+            if not item.done:
+                self._push(item)
+        heapq.heapify(self._heap)
+        self._changed.set()
+        return missed
+
+    def cancel(self, item_id: str) -> Optional[ScheduledItem]:
+        """Unschedule an item; its heap entries are dropped lazily"""
+        item = self.items.pop(item_id, None)
+        if item is not None:
+            self._forget(item_id)
+        return item
+
+    def _forget(self, item_id: str):
+        render = self._renders.pop(item_id, None)
+        if render is not None:
+            render.cancel()
+        self._stale += 2 if self.render is not None else 1
+        if self._stale > len(self._heap) // 2 + 64:
+            # Mostly cancelled entries: rebuild from the live items
+            self._heap = [entry for entry in self._heap if self._live(entry[3])]
+            heapq.heapify(self._heap)
+            self._stale = 0
+
+    def get(self, item_id: str) -> Optional[ScheduledItem]:
+        return self.items.get(item_id)
+
+    def upcoming(self, kind: Optional[str] = None, limit: Optional[int] = None) -> List[ScheduledItem]:
+        """Items not yet due (e.g. meetings that have not started), soonest first"""
+        now = self.clock.now()
+        items = [item for item in self.items.values()
+                 if item.due >= now and (kind is None or item.kind == kind)]
+        if limit is not None:
+            return heapq.nsmallest(limit, items, key=lambda item: item.due)
+        return sorted(items, key=lambda item: item.due)
+
+    def next_due(self) -> Optional[float]:
+        """Time of the next live heap entry"""
+        while self._heap and not self._live(self._heap[0][3]):
+            heapq.heappop(self._heap)
+            self._stale = max(0, self._stale - 1)
+        return self._heap[0][0] if self._heap else None
+
+    async def run(self):
+        """Fire reminders as they come due; costs nothing while nothing is due"""
+        while True:
+            self._changed.clear()
+            await self.process_due()
+            self._parked = True
+            try:
+                await self.clock.wait(self._changed, self.next_due())
+            finally:
+                self._parked = False
+            self.wakeups += 1
+
+    async def process_due(self):
+        """Run every heap entry whose time has come"""
+        while self.next_due() is not None and self._heap[0][0] <= self.clock.now():
+            _, _, action, item = heapq.heappop(self._heap)
+            if action == RENDER:
+                self._start_render(item)
+            else:
+                await self._fire(item)
+
+    def _start_render(self, item: ScheduledItem):
+        async def render() -> Optional[bytes]:
+            async with self._render_slots:
+                if not self._live(item):
+                    return None
+                try:
+                    audio = await asyncio.to_thread(self.render, item.reminder_text())
+                except Exception as e:
+                    print(f"⚠️ تعذر تجهيز صوت التذكير: {e}")
+                    return None
+                return audio or None
+
+        self._renders[item.id] = asyncio.ensure_future(render())
+
+    async def _fire(self, item: ScheduledItem):
+        item.done = True
+        self.fired += 1
+        audio = None
+        render = self._renders.pop(item.id, None)
+        if render is not None:
+            if not render.done():
+                self.late_renders += 1
+            audio = await render
+        if self.announce is not None:
+            try:
+                await self.announce(item, audio)
+            except Exception as e:
+                print(f"❌ خطأ في التذكير: {e}")
+
+    async def settle(self):
+        """Wait until run() is asleep and reminder audio has been synthesized
+
+        For tests with a simulated clock; run() must be running.
+        """
+        await asyncio.sleep(0)
+        while not self._parked or self._changed.is_set():
+            await asyncio.sleep(0)
+        pending = [render for render in self._renders.values() if not render.done()]
+        if pending:
+            await asyncio.wait(pending)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'items': len(self.items),
+            'pending': sum(1 for item in self.items.values() if not item.done),
+            'fired': self.fired,
+            'late_renders': self.late_renders,
+            'wakeups': self.wakeups,
+            'heap': len(self._heap),
+        }
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Load test for the multi-client server mode
+Drives N simulated workstations that stream a WAV fixture to a server backed
+by local chat and TTS stubs and a fake recognizer, then reports turns/sec and
+turn latency percentiles
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import websockets
+
+from stub_backends import ChatStub, TTSStub
+from stub_environment import SAMPLE_RATE, close_office, speech_fixture, stub_office
+from voice_gate import read_wav
+
+FRAME_SAMPLES = 480
+
+QUESTIONS = [
+    "ما هي ساعات العمل؟",
+    "من يتابع عقد شركة النور؟",
+    "متى الاجتماع القادم؟",
+    "كيف أطلب إجازة؟",
+]
+
+
+async def simulated_client(url: str, session: str, samples: np.ndarray, turns: int,
+                           realtime: bool = False, timeout: float = 30.0) -> Dict[str, Any]:
+    """Speak the fixture `turns` times, waiting for each reply like a person would"""
+    result = {'session': session, 'latencies': [], 'busy': 0, 'ignored': 0, 'audio_bytes': 0}
+    async with websockets.connect(url, max_size=2 ** 22) as websocket:
+        await websocket.send(json.dumps({'type': 'hello', 'session': session, 'sample_rate': SAMPLE_RATE}))
+        for _ in range(turns):
+            for start in range(0, len(samples), FRAME_SAMPLES):
+                await websocket.send(samples[start:start + FRAME_SAMPLES].tobytes())
+                if realtime:
+                    await asyncio.sleep(FRAME_SAMPLES / SAMPLE_RATE)
+            sent = time.perf_counter()
+            while True:
+                message = await asyncio.wait_for(websocket.recv(), timeout)
+                if isinstance(message, bytes):
+                    result['audio_bytes'] += len(message)
+                    continue
+                message = json.loads(message)
+                if message['type'] == 'reply':
+                    result['latencies'].append(time.perf_counter() - sent)
+                    break
+                if message['type'] in ('busy', 'ignored'):
+                    result[message['type']] += 1
+                    break
+        await websocket.send(json.dumps({'type': 'end'}))
+    return result
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))] if ordered else 0.0
+
+
+async def run_load_test(clients: int = 10, turns: int = 3, wav: Optional[str] = None,
+                        llm_latency: float = 0.3, tts_latency: float = 0.1, asr_latency: float = 0.2,
+                        max_concurrent: int = 8, max_waiting: int = 64,
+                        realtime: bool = False) -> Dict[str, Any]:
+    """Start stubs and a server, drive the clients, return throughput and latency"""
+    from assistant_server import AssistantServer
+
+    samples = read_wav(wav)[0] if wav else speech_fixture()
+    chat = ChatStub(reply="ساعات العمل من الثامنة صباحاً إلى الرابعة عصراً.", delay=llm_latency)
+    tts = TTSStub(delay=tts_latency)
+    try:
+        with tempfile.TemporaryDirectory(prefix="load_test_") as directory:
+            office = stub_office(chat, tts, directory, asr_latency,
+                                 [QUESTIONS[i % len(QUESTIONS)] for i in range(clients * turns * 2)])
+            server = AssistantServer(office, "127.0.0.1", 0, max_concurrent=max_concurrent,
+                                     max_waiting=max_waiting)
+            await server.start()
+            url = f"ws://127.0.0.1:{server.port}"
+
+            start = time.perf_counter()
+            results = await asyncio.gather(*(
+                simulated_client(url, f"desk-{i}", samples, turns, realtime) for i in range(clients)
+            ))
+            elapsed = time.perf_counter() - start
+
+            await server.stop()
+            await close_office(office)
+    finally:
+        chat.close()
+        tts.close()
+
+    latencies = [latency for result in results for latency in result['latencies']]
+    return {
+        'clients': clients,
+        'turns': len(latencies),
+        'busy': sum(result['busy'] for result in results),
+        'ignored': sum(result['ignored'] for result in results),
+        'elapsed': elapsed,
+        'turns_per_second': len(latencies) / elapsed if elapsed else 0.0,
+        'p50': percentile(latencies, 0.5),
+        'p99': percentile(latencies, 0.99),
+        'chat_requests': len(chat.requests),
+        'tts_requests': len(tts.requests),
+        'server': server.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the assistant server with simulated workstations")
+    parser.add_argument("--clients", type=int, default=10)
+    parser.add_argument("--turns", type=int, default=3, help="utterances per client")
+    parser.add_argument("--wav", help="16-bit mono WAV with one utterance and trailing silence")
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--tts-latency", type=float, default=0.1)
+    parser.add_argument("--asr-latency", type=float, default=0.2)
+    parser.add_argument("--max-concurrent", type=int, default=8)
+    parser.add_argument("--realtime", action="store_true", help="stream audio at real-time pace")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_load_test(
+        args.clients, args.turns, args.wav, args.llm_latency, args.tts_latency, args.asr_latency,
+        args.max_concurrent, realtime=args.realtime
+    ))
+    print("🏋️ Server Load Test")
+    print("=" * 40)
+    print(f"Clients: {report['clients']}")
+    print(f"Turns: {report['turns']} ({report['busy']} busy, {report['ignored']} ignored)")
+    print(f"Throughput: {report['turns_per_second']:.1f} turns/s")
+    print(f"Turn latency: p50 {report['p50'] * 1000:.0f} ms, p99 {report['p99'] * 1000:.0f} ms")
+    print(f"Limiter: {report['server']['limiter']}")
+    return 0 if report['turns'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Office memory shared by several assistant processes on one host
+Tasks, notes, preferences and the schedule live in one SQLite database in
+WAL mode as an ordered log of memory_store records; every process applies
+the same records in the same order, so their views converge without any
+process overwriting another's changes
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from memory_store import apply_record
+
+# office_context keys kept in the shared store, with their empty values
+SHARED_KEYS = {
+    'current_tasks': [],
+    'user_preferences': {},
+    'important_notes': [],
+    'schedule': {},
+}
+SHARED_OPS = {'task_add', 'task_remove', 'preference_set', 'note_add',
+              'schedule_add', 'schedule_remove', 'schedule_done'}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    op TEXT NOT NULL,
+    fields TEXT NOT NULL,
+    origin TEXT,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS snapshot (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    seq INTEGER NOT NULL,
+    pruned INTEGER NOT NULL,
+    context TEXT NOT NULL
+);
+"""
+
+
+class ResyncRequired(Exception):
+    """Changes this process has not applied were compacted away; call load()"""
+
+
+def shared_view(context: Dict[str, Any]) -> Dict[str, Any]:
+    """The shared part of an office_context, with every key present"""
+    return {key: json.loads(json.dumps(context.get(key, empty))) for key, empty in SHARED_KEYS.items()}
+
+
+class SharedOfficeStore:
+    """Ordered change log of office memory in a WAL-mode SQLite file
+
+    Writers serialize on SQLite's write lock (BEGIN IMMEDIATE) for the few
+    microseconds an insert takes; readers see a consistent snapshot and never
+    wait for a writer. last_seq is the newest change this process has applied.
+    """
+
+    def __init__(self, path: str, origin: Optional[str] = None, keep_changes: int = 10000,
+                 busy_timeout: float = 10.0):
+        self.path = path
+        self.origin = origin or f"{os.uname().nodename}:{os.getpid()}"
+        self.keep_changes = keep_changes
+        self.busy_timeout = busy_timeout
+        self.last_seq = 0
+        self.writes = 0
+        self.applied = 0
+        self.resyncs = 0
+        self.closed = False
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = self._connect()
+        self._db.executescript(SCHEMA)
+        self._watcher = None
+        self._watching = threading.Event()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit mode: transactions are opened explicitly below
+        db = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None,
+                             check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        # Durable at each checkpoint; a power cut can lose only the last commits
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def load(self) -> Dict[str, Any]:
+        """Full shared state: the snapshot plus every change after it"""
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                row = self._db.execute("SELECT seq, context FROM snapshot WHERE id = 1").fetchone()
+                seq, context = (row[0], json.loads(row[1])) if row else (0, {})
+                context = shared_view(context)
+                for seq, op, fields in self._select(seq):
+                    apply_record([], context, dict(fields, op=op))
+            finally:
+                self._db.execute("COMMIT")
+            self.last_seq = seq
+        return context
+
+    def _select(self, after: int) -> List[Tuple[int, str, Dict[str, Any]]]:
+        rows = self._db.execute(
+            "SELECT seq, op, fields FROM changes WHERE seq > ? ORDER BY seq", (after,)
+        ).fetchall()
+        return [(seq, op, json.loads(fields)) for seq, op, fields in rows]
+
+    def append(self, op: str, fields: Dict[str, Any]) -> int:
+        """Add one change to the end of the shared log and return its seq"""
+        if op not in SHARED_OPS:
+            raise ValueError(f"Not a shared memory operation: {op}")
+        payload = json.dumps(fields, ensure_ascii=False)
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = self._db.execute(
+                    "INSERT INTO changes (op, fields, origin, created) VALUES (?, ?, ?, ?)",
+                    (op, payload, self.origin, time.time())
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self.writes += 1
+            return cursor.lastrowid
+
+    def changes_since(self) -> List[Tuple[int, str, Dict[str, Any]]]:
+        """Changes after last_seq, oldest first, including this process's own
+
+        Advances last_seq, so the caller must apply every change returned.
+        """
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                row = self._db.execute("SELECT pruned FROM snapshot WHERE id = 1").fetchone()
+                if row and row[0] > self.last_seq:
+                    self.resyncs += 1
+                    raise ResyncRequired(f"changes up to {row[0]} were compacted")
+                changes = self._select(self.last_seq)
+            finally:
+                self._db.execute("COMMIT")
+            if changes:
+                self.last_seq = changes[-1][0]
+                self.applied += len(changes)
+            return changes
+
+    def compact(self, context: Dict[str, Any]):
+        """Store context as the state at last_seq and drop old changes
+
+        context must have every change up to last_seq applied. The newest
+        keep_changes are retained so lagging processes can still catch up
+        incrementally.
+        """
+        payload = json.dumps(shared_view(context), ensure_ascii=False)
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute("SELECT seq, pruned FROM snapshot WHERE id = 1").fetchone()
+                if row and row[0] >= self.last_seq:
+                    self._db.execute("COMMIT")
+                    return
+                pruned = max(row[1] if row else 0, self.last_seq - self.keep_changes)
+                self._db.execute(
+                    "INSERT OR REPLACE INTO snapshot (id, seq, pruned, context) VALUES (1, ?, ?, ?)",
+                    (self.last_seq, pruned, payload)
+                )
+                self._db.execute("DELETE FROM changes WHERE seq <= ?", (pruned,))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def watch(self, callback: Callable[[], None], interval: float = 0.05):
+        """Call callback (from a background thread) after another connection commits
+
+        PRAGMA data_version only reads the WAL index in shared memory, so
+        polling it costs no disk I/O while nothing changes.
+        """
+        if self._watcher:
+            return
+        self._watching.set()
+
+        def poll():
+            db = self._connect()
+            try:
+                version = db.execute("PRAGMA data_version").fetchone()[0]
+                while self._watching.is_set():
+                    time.sleep(interval)
+                    current = db.execute("PRAGMA data_version").fetchone()[0]
+                    if current != version:
+                        version = current
+                        callback()
+            finally:
+                db.close()
+
+        self._watcher = threading.Thread(target=poll, name="shared-memory-watch", daemon=True)
+        self._watcher.start()
+
+    def unwatch(self):
+        self._watching.clear()
+        if self._watcher:
+            self._watcher.join(timeout=1.0)
+            self._watcher = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'last_seq': self.last_seq,
+            'writes': self.writes,
+            'applied': self.applied,
+            'resyncs': self.resyncs,
+        }
+
+    def close(self):
+        self.unwatch()
+        with self._lock:
+            self.closed = True
+            self._db.close()
+
+
+def _percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+
+def _stress_worker(path: str, number: int, operations: int, barrier, results):
+    """One assistant process: add, remove and note while refreshing its view"""
+    store = SharedOfficeStore(path, origin=f"worker-{number}")
+    context = store.load()
+    writes, reads, removed = [], [], []
+
+    def refresh():
+        start = time.perf_counter()
+        for seq, op, fields in store.changes_since():
+            apply_record([], context, dict(fields, op=op))
+        reads.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    for step in range(operations):
+        start = time.perf_counter()
+        store.append('task_add', {'task': f"w{number}-{step}"})
+        writes.append(time.perf_counter() - start)
+        refresh()
+        if step % 5 == 4:
+            # Remove by the position this process sees; other writers may
+            # have shifted it by the time the change is applied
+            task = f"w{number}-{step - 2}"
+            store.append('task_remove', {'index': context['current_tasks'].index(task), 'task': task})
+            removed.append(task)
+        if step % 10 == 0:
+            store.append('note_add', {'note': f"ملاحظة {number}-{step}"})
+            store.append('preference_set', {'key': f"pref_w{number}_{step}", 'value': f"تفضيل {step}"})
+    elapsed = time.perf_counter() - started
+
+    barrier.wait()
+    refresh()
+    results.put({
+        'worker': number,
+        'writes': store.writes,
+        'seconds': elapsed,
+        'write_p99': _percentile(writes, 0.99),
+        'read_p50': _percentile(reads, 0.5),
+        'read_p99': _percentile(reads, 0.99),
+        'removed': removed,
+        'view': context,
+    })
+    store.close()
+
+
+def run_stress(path: str, processes: int = 4, operations: int = 200) -> Dict[str, Any]:
+    """Run concurrent writer processes against one store and check the result
+
+    Returns throughput and latency figures plus lost (expected tasks missing
+    from the final state) and diverged (workers whose incremental view
+    differs from a fresh load).
+    """
+    import multiprocessing
+
+    spawn = multiprocessing.get_context("spawn")
+    barrier = spawn.Barrier(processes)
+    results = spawn.Queue()
+    SharedOfficeStore(path).close()
+    workers = [spawn.Process(target=_stress_worker, args=(path, number, operations, barrier, results))
+               for number in range(processes)]
+    for worker in workers:
+        worker.start()
+    reports = [results.get(timeout=120) for _ in workers]
+    for worker in workers:
+        worker.join()
+
+    store = SharedOfficeStore(path)
+    final = store.load()
+    store.close()
+    removed = {task for report in reports for task in report['removed']}
+    expected = {f"w{number}-{step}" for number in range(processes) for step in range(operations)} - removed
+    writes = sum(report['writes'] for report in reports)
+    return {
+        'processes': processes,
+        'writes': writes,
+        'writes_per_second': writes / max(report['seconds'] for report in reports),
+        'write_p99': max(report['write_p99'] for report in reports),
+        'read_p50': _percentile([report['read_p50'] for report in reports], 0.5),
+        'read_p99': max(report['read_p99'] for report in reports),
+        'lost': sorted(expected - set(final['current_tasks'])),
+        'unexpected': sorted(set(final['current_tasks']) - expected),
+        'diverged': [report['worker'] for report in reports if report['view'] != final],
+        'final': final,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress the shared office memory with concurrent processes")
+    parser.add_argument("--path", default="shared_memory_stress.db")
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--operations", type=int, default=500)
+    args = parser.parse_args()
+
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(args.path + suffix):
+            os.remove(args.path + suffix)
+    report = run_stress(args.path, args.processes, args.operations)
+    print(f"📝 {report['writes']} writes from {report['processes']} processes: "
+          f"{report['writes_per_second']:.0f}/s, p99 {report['write_p99'] * 1000:.1f} ms")
+    print(f"📖 Incremental refresh: p50 {report['read_p50'] * 1000:.2f} ms, p99 {report['read_p99'] * 1000:.2f} ms")
+    print(f"{'✅' if not report['lost'] and not report['diverged'] else '❌'} "
+          f"lost updates: {len(report['lost'])}, diverged views: {len(report['diverged'])}")
+
+
+if __name__ == "__main__":
+    main()
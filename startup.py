@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Startup profiling for the Arabic Voice Assistant
+Records import and init phases, including those on background threads
+"""
+
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, List, Optional, Tuple
+
+
+class StartupProfile:
+    """Timeline of named phases relative to process start-up"""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.phases: List[Tuple[str, float, float, str]] = []
+        self._lock = threading.Lock()
+
+    def record(self, name: str, start: float, end: float):
+        with self._lock:
+            self.phases.append((name, start - self.origin, end - self.origin, threading.current_thread().name))
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter())
+
+    def timed(self, name: str, fn: Callable, *args, **kwargs) -> Callable[[], Any]:
+        """Wrap a call so it records its own phase wherever it runs"""
+        @functools.wraps(fn)
+        def run():
+            with self.phase(name):
+                return fn(*args, **kwargs)
+        return run
+
+    def report(self, ready_at: Optional[float] = None) -> str:
+        """Phase table plus how much the concurrent phases overlapped"""
+        phases = sorted(self.phases, key=lambda phase: phase[1])
+        lines = ["⏱️ Startup profile (ms since start)",
+                 f"{'phase':<34}{'start':>9}{'end':>9}{'took':>9}  thread"]
+        for name, start, end, thread in phases:
+            lines.append(f"{name:<34}{start * 1000:9.1f}{end * 1000:9.1f}{(end - start) * 1000:9.1f}  {thread}")
+        if phases:
+            ready = (ready_at - self.origin) if ready_at else max(end for _, _, end, _ in phases)
+            busy = sum(end - start for _, start, end, _ in phases)
+            lines.append(f"Ready after {ready * 1000:.0f} ms; phases add up to {busy * 1000:.0f} ms")
+        return "\n".join(lines)
+
+
+# One profile per process, started as early as this module is imported
+STARTUP = StartupProfile()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Speech-to-text backends for the Arabic Voice Assistant
+Google (cloud), Vosk and Whisper (local CPU) and a deterministic fake for tests
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+import httpx
+import numpy as np
+import speech_recognition as sr
+from speech_recognition.recognizers.google import OutputParser, create_request_builder
+
+# Same service speech_recognition calls over plain HTTP, reached over HTTPS
+# when requests go through the shared connection pool
+GOOGLE_SPEECH_ENDPOINT = "https://www.google.com/speech-api/v2/recognize"
+
+
+class STTBackend:
+    """Base class: load once, transcribe many times, track per-utterance latency"""
+
+    name = "base"
+
+    def __init__(self, language: str = "ar-SA"):
+        self.language = language
+        self.latencies = deque(maxlen=500)
+        self.last_latency = 0.0
+        self.loaded = False
+
+    def load(self):
+        """Load models or clients; called once at startup"""
+        self.loaded = True
+
+    def transcribe(self, audio: sr.AudioData) -> str:
+        raise NotImplementedError
+
+    def recognize(self, audio: sr.AudioData) -> str:
+        """Transcribe audio and record how long it took"""
+        if not self.loaded:
+            self.load()
+        start = time.perf_counter()
+        try:
+            return self.transcribe(audio)
+        finally:
+            self.last_latency = time.perf_counter() - start
+            self.latencies.append(self.last_latency)
+
+    def stats(self) -> Dict[str, float]:
+        """Latency summary for comparing engines on this machine"""
+        if not self.latencies:
+            return {'backend': self.name, 'utterances': 0}
+        ordered = sorted(self.latencies)
+        return {
+            'backend': self.name,
+            'utterances': len(ordered),
+            'mean': sum(ordered) / len(ordered),
+            'p50': ordered[len(ordered) // 2],
+            'p95': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        }
+
+
+class GoogleBackend(STTBackend):
+    """Google Web Speech API via speech_recognition (the original behavior)
+
+    Given an http_pool, requests reuse its keep-alive connections instead of
+    opening a new one per utterance.
+    """
+
+    name = "google"
+
+    def __init__(self, recognizer: Optional[sr.Recognizer] = None, language: str = "ar-SA",
+                 endpoint: Optional[str] = None, http_pool=None):
+        super().__init__(language)
+        self.recognizer = recognizer or sr.Recognizer()
+        # Alternative endpoint speaking the same protocol (e.g. a local stub)
+        self.endpoint = endpoint
+        self.http_pool = http_pool
+        self.http_client: Optional[httpx.Client] = None
+
+    def load(self):
+        if self.http_pool is not None:
+            self.endpoint = self.endpoint or GOOGLE_SPEECH_ENDPOINT
+            self.http_client = self.http_pool.client(self.endpoint)
+        super().load()
+
+    def transcribe(self, audio: sr.AudioData) -> str:
+        if self.http_client is not None:
+            return self.transcribe_pooled(audio)
+        if self.endpoint:
+            return self.recognizer.recognize_google(audio, language=self.language, endpoint=self.endpoint)
+        return self.recognizer.recognize_google(audio, language=self.language)
+
+    def transcribe_pooled(self, audio: sr.AudioData) -> str:
+        """The request recognize_google() builds, sent over the pooled client"""
+        builder = create_request_builder(endpoint=self.endpoint, language=self.language)
+        timeout = self.recognizer.operation_timeout or httpx.USE_CLIENT_DEFAULT
+        try:
+            response = self.http_client.post(builder.build_url(), content=builder.build_data(audio),
+                                             headers=builder.build_headers(audio), timeout=timeout)
+            response.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            raise sr.RequestError(f"recognition request failed: {e.response.reason_phrase}")
+        except httpx.HTTPError as e:
+            raise sr.RequestError(f"recognition connection failed: {e}")
+        return OutputParser(show_all=False, with_confidence=False).parse(response.text)
+
+
+class VoskBackend(STTBackend):
+    """Offline Kaldi-based recognition with a Vosk model kept in memory"""
+
+    name = "vosk"
+
+    def __init__(self, model_path: str, language: str = "ar-SA", sample_rate: int = 16000):
+        super().__init__(language)
+        self.model_path = model_path
+        self.sample_rate = sample_rate
+        self.model = None
+
+    def load(self):
+        try:
+            import vosk
+        except ImportError:
+            raise RuntimeError("Vosk backend needs 'pip install vosk' and an Arabic model")
+        vosk.SetLogLevel(-1)
+        self._vosk = vosk
+        self.model = vosk.Model(self.model_path)
+        super().load()
+
+    def transcribe(self, audio: sr.AudioData) -> str:
+        # Recognizers are cheap; the model itself is shared and stays warm
+        recognizer = self._vosk.KaldiRecognizer(self.model, self.sample_rate)
+        recognizer.AcceptWaveform(audio.get_raw_data(convert_rate=self.sample_rate, convert_width=2))
+        text = json.loads(recognizer.FinalResult()).get('text', '').strip()
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+
+class WhisperBackend(STTBackend):
+    """Offline Whisper recognition on CPU via faster-whisper (CTranslate2)"""
+
+    name = "whisper"
+
+    def __init__(self, model_name: str = "small", language: str = "ar-SA", threads: int = 0):
+        super().__init__(language)
+        self.model_name = model_name
+        self.threads = threads
+        self.model = None
+        # One decode at a time per model instance
+        self._lock = threading.Lock()
+
+    def load(self):
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError:
+            raise RuntimeError("Whisper backend needs 'pip install faster-whisper'")
+        self.model = WhisperModel(self.model_name, device="cpu", compute_type="int8",
+                                  cpu_threads=self.threads)
+        super().load()
+
+    def transcribe(self, audio: sr.AudioData) -> str:
+        pcm = np.frombuffer(audio.get_raw_data(convert_rate=16000, convert_width=2), dtype='<i2')
+        with self._lock:
+            segments, _ = self.model.transcribe(
+                pcm.astype(np.float32) / 32768.0,
+                language=self.language.split("-")[0],
+                beam_size=1
+            )
+            text = " ".join(segment.text.strip() for segment in segments).strip()
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+
+class FakeBackend(STTBackend):
+    """Deterministic backend for tests: transcripts by audio hash or in order"""
+
+    name = "fake"
+
+    def __init__(self, transcripts: Optional[Dict[str, str]] = None, sequence: Optional[List[str]] = None,
+                 latency: float = 0.0, language: str = "ar-SA"):
+        super().__init__(language)
+        self.transcripts = transcripts or {}
+        self.sequence = list(sequence or [])
+        self.latency = latency
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def audio_key(audio: sr.AudioData) -> str:
+        return hashlib.sha256(audio.get_raw_data()).hexdigest()
+
+    def transcribe(self, audio: sr.AudioData) -> str:
+        if self.latency:
+            time.sleep(self.latency)
+        text = self.transcripts.get(self.audio_key(audio))
+        if text is None:
+            with self._lock:
+                text = self.sequence.pop(0) if self.sequence else None
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+
+def create_backend(name: str, recognizer: Optional[sr.Recognizer] = None, language: str = "ar-SA",
+                   model_path: Optional[str] = None, endpoint: Optional[str] = None,
+                   http_pool=None) -> STTBackend:
+    """Build the backend selected by STT_BACKEND"""
+    name = (name or "google").lower()
+    if name == "google":
+        return GoogleBackend(recognizer, language, endpoint=endpoint, http_pool=http_pool)
+    if name == "vosk":
+        if not model_path:
+            raise ValueError("STT_MODEL_PATH must point at a Vosk model directory")
+        return VoskBackend(model_path, language)
+    if name == "whisper":
+        return WhisperBackend(model_path or "small", language)
+    if name == "fake":
+        return FakeBackend(language=language)
+    raise ValueError(f"Unknown STT backend: {name}")
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Local stand-ins for the cloud backends used in tests, load tests and benchmarks
+OpenAI-compatible chat completions, ElevenLabs-compatible text-to-speech and
+Google Web Speech-compatible recognition, each served over HTTP or HTTPS on
+127.0.0.1 with configurable latency distributions and streaming behavior
+"""
+
+import json
+import math
+import os
+import random
+import ssl
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+# Self-signed certificate for 127.0.0.1/localhost; clients trust STUB_CA_FILE
+STUB_CERT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "certs", "stub-localhost.pem")
+STUB_CA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "certs", "stub-localhost-ca.pem")
+
+
+class Latency:
+    """Log-normal latency around a median; spread 0 gives a fixed delay"""
+
+    def __init__(self, median: float, spread: float = 0.0, seed: Optional[int] = None):
+        self.median = median
+        self.spread = spread
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        if not self.spread or not self.median:
+            return self.median
+        with self._lock:
+            return self.median * math.exp(self._rng.gauss(0.0, self.spread))
+
+
+class StubServer:
+    """Threaded HTTP server that records every request body
+
+    respond() returns (content_type, payload); a list payload is sent with
+    chunked transfer encoding, chunk_interval seconds apart. With tls=True
+    it serves HTTPS; connections counts accepted connections (handshakes)
+    and pings counts HEAD requests, which are not recorded in requests.
+    aborted counts responses the client hung up on part-way through.
+    Setting fail_status (e.g. 503) makes every request fail with that
+    status after the usual delay, until it is set back to 0. Setting
+    fail_after drops the connection after that many chunks of a chunked
+    response, as a backend dying mid-stream would.
+    waits holds the perf_counter() (start, end) of every injected delay and
+    chunk interval, so callers can tell stub time from their own.
+    """
+
+    def __init__(self, delay: Union[float, Latency] = 0.0, chunk_interval: float = 0.0, tls: bool = False):
+        self.latency = delay if isinstance(delay, Latency) else Latency(delay)
+        self.delay = self.latency.median
+        self.chunk_interval = chunk_interval
+        self.requests: List[Any] = []
+        self.connections = 0
+        self.pings = 0
+        self.aborted = 0
+        self.fail_status = 0
+        self.fail_after = 0
+        # CPU spent in handler threads, so callers can subtract it from their own
+        self.cpu_seconds = 0.0
+        self.waits: List[Tuple[float, float]] = []
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out in separate writes; on a kept-alive
+            # connection Nagle would hold the body for the client's delayed ACK
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+
+            def do_HEAD(self):
+                with stub._lock:
+                    stub.pings += 1
+                self.send_response(200)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def do_POST(self):
+                cpu_start = time.thread_time()
+                length = int(self.headers.get('Content-Length', 0))
+                raw = self.rfile.read(length)
+                if self.headers.get('Content-Type', '').startswith('application/json'):
+                    body = json.loads(raw or b"{}")
+                else:
+                    body = raw
+                with stub._lock:
+                    stub.requests.append(body)
+                stub.wait(stub.latency.sample())
+                if stub.fail_status:
+                    content_type, payload = 'application/json', b'{"error": {"message": "stub failure"}}'
+                else:
+                    content_type, payload = stub.respond(self.path, body)
+                try:
+                    self.send_response(stub.fail_status or 200)
+                    self.send_header('Content-Type', content_type)
+                    if isinstance(payload, list):
+                        self.send_header('Transfer-Encoding', 'chunked')
+                        self.end_headers()
+                        for index, chunk in enumerate(payload):
+                            if stub.fail_after and index == stub.fail_after:
+                                # No terminating chunk: the client sees a truncated body
+                                self.close_connection = True
+                                return
+                            if index and stub.chunk_interval:
+                                stub.wait(stub.chunk_interval)
+                            self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                            self.wfile.flush()
+                        self.wfile.write(b"0\r\n\r\n")
+                    else:
+                        self.send_header('Content-Length', str(len(payload)))
+                        self.end_headers()
+                        self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    # Client gave up (cancelled stream or shutdown)
+                    with stub._lock:
+                        stub.aborted += 1
+                finally:
+                    with stub._lock:
+                        stub.cpu_seconds += time.thread_time() - cpu_start
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        scheme = "http"
+        if tls:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(STUB_CERT_FILE)
+            self.server.socket = context.wrap_socket(self.server.socket, server_side=True)
+            scheme = "https"
+        self.url = f"{scheme}://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def wait(self, seconds: float):
+        """Sleep as the simulated backend and record when"""
+        start = time.perf_counter()
+        time.sleep(seconds)
+        if seconds > 0:
+            with self._lock:
+                self.waits.append((start, time.perf_counter()))
+
+    def respond(self, path: str, body: Any):
+        raise NotImplementedError
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class ChatStub(StubServer):
+    """OpenAI-compatible /v1/chat/completions
+
+    reply is a fixed string or a function of the request body; streamed
+    replies send one word per chunk, token_interval seconds apart.
+    Usage counts a token per four characters of the serialized messages and
+    reports the longest prefix shared with an earlier prompt as cached, like
+    a provider's prompt prefix cache.
+    """
+
+    def __init__(self, reply: Union[str, Callable[[Dict[str, Any]], str]] = "ساعات العمل من الثامنة إلى الرابعة",
+                 delay: Union[float, Latency] = 0.2, token_interval: float = 0.0, tls: bool = False):
+        self.reply = reply
+        # Recent prompts, like a cache that keeps prefixes for a few minutes
+        self.prompts: deque = deque(maxlen=64)
+        super().__init__(delay, chunk_interval=token_interval, tls=tls)
+        self.url += "/v1"
+
+    def reply_text(self, body: Dict[str, Any]) -> str:
+        return self.reply(body) if callable(self.reply) else self.reply
+
+    def usage(self, body: Dict[str, Any], text: str) -> Dict[str, Any]:
+        prompt = json.dumps(body.get('messages', []), ensure_ascii=False)
+        shared = max((len(os.path.commonprefix([prompt, earlier])) for earlier in tuple(self.prompts)), default=0)
+        self.prompts.append(prompt)
+        prompt_tokens = len(prompt) // 4
+        completion_tokens = len(text.split())
+        return {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens,
+            'prompt_tokens_details': {'cached_tokens': shared // 4},
+        }
+
+    def respond(self, path: str, body: Dict[str, Any]):
+        text = self.reply_text(body)
+        if body.get('stream'):
+            return 'text/event-stream', self.stream_events(body, text)
+        payload = {
+            'id': 'chatcmpl-stub',
+            'object': 'chat.completion',
+            'created': 0,
+            'model': body.get('model', 'stub'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': text},
+                'finish_reason': 'stop',
+            }],
+            'usage': self.usage(body, text),
+        }
+        return 'application/json', json.dumps(payload).encode("utf-8")
+
+    def stream_events(self, body: Dict[str, Any], text: str) -> List[bytes]:
+        """Server-sent events with one word of the reply per chunk"""
+        events = []
+        words = text.split(" ")
+        for index, word in enumerate(words):
+            chunk = {
+                'id': 'chatcmpl-stub',
+                'object': 'chat.completion.chunk',
+                'created': 0,
+                'model': body.get('model', 'stub'),
+                'choices': [{
+                    'index': 0,
+                    'delta': {'content': word if index == 0 else " " + word},
+                    'finish_reason': None,
+                }],
+            }
+            events.append(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+        usage = self.usage(body, text)
+        if body.get('stream_options', {}).get('include_usage'):
+            chunk = {'id': 'chatcmpl-stub', 'object': 'chat.completion.chunk', 'created': 0,
+                     'model': body.get('model', 'stub'), 'choices': [], 'usage': usage}
+            events.append(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+        events.append(b"data: [DONE]\n\n")
+        return events
+
+
+class TTSStub(StubServer):
+    """ElevenLabs-compatible /v1/text-to-speech/{voice_id}[/stream] returning fixed audio
+
+    The /stream endpoint sends the audio in chunk_size pieces, chunk_interval apart.
+    """
+
+    def __init__(self, audio: bytes = b"ID3" + b"\x00" * 2048, delay: Union[float, Latency] = 0.1,
+                 chunk_size: int = 1024, chunk_interval: float = 0.0, tls: bool = False):
+        self.audio = audio
+        self.chunk_size = chunk_size
+        super().__init__(delay, chunk_interval=chunk_interval, tls=tls)
+
+    def respond(self, path: str, body: Dict[str, Any]):
+        if path.split("?")[0].endswith("/stream") and self.chunk_size:
+            return 'audio/mpeg', [self.audio[i:i + self.chunk_size]
+                                  for i in range(0, len(self.audio), self.chunk_size)]
+        return 'audio/mpeg', self.audio
+
+
+class ASRStub(StubServer):
+    """Google Web Speech API-compatible /speech-api/v2/recognize
+
+    Every request is answered with the current transcript; an empty
+    transcript means speech was not understood.
+    """
+
+    def __init__(self, transcript: str = "", delay: Union[float, Latency] = 0.3, tls: bool = False):
+        self.transcript = transcript
+        super().__init__(delay, tls=tls)
+        self.url += "/speech-api/v2/recognize"
+
+    def respond(self, path: str, body: bytes):
+        lines = ['{"result":[]}']
+        if self.transcript:
+            lines.append(json.dumps({
+                'result': [{'alternative': [{'transcript': self.transcript, 'confidence': 0.9}], 'final': True}],
+                'result_index': 0,
+            }, ensure_ascii=False))
+        return 'application/json', ("\n".join(lines) + "\n").encode("utf-8")
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Shared fixtures for tests, load tests and benchmarks
+Environment overrides, generated speech and WAV files, and an office
+assistant wired to the local stubs in stub_backends
+"""
+
+import asyncio
+import os
+import wave
+from contextlib import contextmanager
+from typing import List, Optional
+
+import numpy as np
+
+from stub_backends import ChatStub, TTSStub
+
+SAMPLE_RATE = 16000
+
+
+@contextmanager
+def environment(**values):
+    """Temporarily set environment variables"""
+    previous = {key: os.environ.get(key) for key in values}
+    os.environ.update({key: str(value) for key, value in values.items()})
+    try:
+        yield
+    finally:
+        for key, value in previous.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def speech_fixture(seconds: float = 1.2, silence: float = 0.8, pitch: float = 140.0) -> np.ndarray:
+    """One voiced, syllable-modulated utterance followed by silence"""
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    phase = 2 * np.pi * np.cumsum(pitch * (1 + 0.1 * np.sin(2 * np.pi * 1.5 * t))) / SAMPLE_RATE
+    harmonics = sum(np.sin(k * phase) / k for k in range(1, 12))
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t) ** 2
+    rng = np.random.default_rng(0)
+    lead = rng.normal(0, 30, int(0.3 * SAMPLE_RATE))
+    tail = rng.normal(0, 30, int(silence * SAMPLE_RATE))
+    return np.concatenate([lead, 6000 * harmonics * envelope, tail]).astype(np.int16)
+
+
+def write_wav(path: str, samples: np.ndarray, sample_rate: int = SAMPLE_RATE):
+    """Write 16-bit mono PCM samples to a WAV file"""
+    with wave.open(path, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(samples.astype('<i2').tobytes())
+
+
+def stub_office(chat: ChatStub, tts: TTSStub, directory: str, asr_latency: float = 0.2,
+                transcripts: Optional[List[str]] = None):
+    """An office assistant wired to the local stubs and the fake recognizer"""
+    # Imported here so the environment below is in place before construction
+    from arabic_voice_assistant import ArabicVoiceAssistant
+
+    with environment(OPENAI_API_KEY="stub", OPENAI_BASE_URL=chat.url,
+                     ELEVENLABS_API_KEY="stub", ELEVENLABS_BASE_URL=tts.url,
+                     DEFAULT_VOICE_ID="stub-voice", STT_BACKEND="fake",
+                     MEMORY_DIR=os.path.join(directory, "memory"),
+                     TTS_CACHE_DIR=os.path.join(directory, "tts"),
+                     TTS_PREWARM_PHRASES="", RESPONSE_CACHE="false",
+                     CAPTURE_END_SILENCE="0.5"):
+        office = ArabicVoiceAssistant(audio_input=False)
+    office.stt_backend.latency = asr_latency
+    office.stt_backend.sequence = list(transcripts or [])
+    return office
+
+
+async def close_office(office):
+    """Release the journal, stores, recognizer workers and pooled connections"""
+    # Capped replies still being read hold pooled connections
+    await asyncio.gather(*office.stream_drains)
+    office.memory_journal.close()
+    if office.shared_store:
+        office.shared_store.close()
+    office.recognition_service.shutdown()
+    await office.http_pool.aclose()
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Test script for the multi-client WebSocket server against local stubs
+"""
+
+import asyncio
+import json
+import sys
+import tempfile
+import time
+
+import websockets
+
+from assistant_server import AssistantServer, ServerBusy, TurnLimiter
+from scheduler import Announcement, item_from_dict, new_item_id
+from server_load_test import run_load_test, simulated_client
+from stub_backends import ChatStub, TTSStub
+from stub_environment import close_office, speech_fixture, stub_office
+
+
+def test_turn_limiter_backpressure():
+    """Turns beyond the slots wait; beyond the waiting line they are refused"""
+    print("🧪 Testing turn limiter...")
+
+    async def scenario():
+        limiter = TurnLimiter(max_concurrent=1, max_waiting=1)
+        release = asyncio.Event()
+
+        async def turn():
+            async with limiter.slot():
+                await release.wait()
+
+        first = asyncio.create_task(turn())
+        second = asyncio.create_task(turn())
+        await asyncio.sleep(0.01)
+        assert limiter.active == 1 and limiter.waiting == 1
+        try:
+            async with limiter.slot():
+                pass
+            refused = False
+        except ServerBusy:
+            refused = True
+        release.set()
+        await asyncio.gather(first, second)
+        return refused, limiter.stats()
+
+    refused, stats = asyncio.run(scenario())
+    assert refused
+    assert stats['admitted'] == 2 and stats['rejected'] == 1, stats
+    print("✅ Third turn refused while the line was full")
+
+
+def test_sessions_share_office_but_not_history():
+    """A task added at one desk is visible at another; conversations stay apart"""
+    print("🧪 Testing session isolation...")
+
+    chat = ChatStub(delay=0.05)
+    tts = TTSStub(delay=0.01)
+    samples = speech_fixture()
+
+    async def scenario(directory):
+        office = stub_office(chat, tts, directory, asr_latency=0.0, transcripts=[
+            "أضف مهمة تجهيز القاعة", "ما هي ساعات العمل؟", "عرض المهام", "اعرض الذاكرة",
+        ])
+        server = AssistantServer(office, "127.0.0.1", 0)
+        await server.start()
+        url = f"ws://127.0.0.1:{server.port}"
+        desk_a = await simulated_client(url, "desk-a", samples, turns=2)
+        desk_b = await simulated_client(url, "desk-b", samples, turns=2)
+        await server.stop()
+        await close_office(office)
+        return office, server, desk_a, desk_b
+
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            office, server, desk_a, desk_b = asyncio.run(scenario(directory))
+    finally:
+        chat.close()
+        tts.close()
+
+    assert len(desk_a['latencies']) == 2 and len(desk_b['latencies']) == 2, (desk_a, desk_b)
+    assert office.office_context['current_tasks'] == ["تجهيز القاعة"]
+    sessions = [conv['session'] for conv in office.conversation_history]
+    assert sessions == ["desk-a", "desk-a", "desk-b", "desk-b"], sessions
+    # Desk B's "show memory" only listed its own turn, not desk A's question
+    assert "ساعات العمل" not in office.conversation_history[-1]['assistant_response']
+    assert "تجهيز القاعة" in office.conversation_history[2]['assistant_response']
+    assert server.stats()['turns'] == 4
+    print("✅ Shared tasks, separate conversation histories")
+
+
+def test_sessions_do_not_share_summary_or_cache():
+    """One desk's summary and cached replies never reach another desk"""
+    print("🧪 Testing summary and cache isolation...")
+
+    secret = "مشروع الصقر"
+    desk_a_questions = [f"ما أخبار {secret}؟", f"من يتابع {secret}؟", "ما هي ساعات العمل؟"]
+    desk_b_questions = ["ما هي ساعات العمل؟", "متى الاجتماع؟", "متى الإجازة؟"]
+
+    def reply(body):
+        messages = body['messages']
+        if messages[0]['content'].startswith("لخص"):
+            # Echo the turns so a leaked summary is easy to spot
+            return "ملخص: " + messages[-1]['content'].replace("\n", " ")
+        return "حسناً."
+
+    chat = ChatStub(reply=reply, delay=0.01)
+    tts = TTSStub(delay=0.0)
+    samples = speech_fixture()
+
+    async def scenario(directory):
+        office = stub_office(chat, tts, directory, asr_latency=0.0,
+                             transcripts=desk_a_questions + desk_b_questions)
+        office.context_builder.window = 1
+        office.summary_batch = 1
+        office.response_cache_enabled = True
+        server = AssistantServer(office, "127.0.0.1", 0)
+        await server.start()
+        url = f"ws://127.0.0.1:{server.port}"
+        await simulated_client(url, "desk-a", samples, turns=3)
+        # Let desk A's background summary land before desk B speaks
+        await asyncio.sleep(0.3)
+        desk_b_start = len(chat.requests)
+        await simulated_client(url, "desk-b", samples, turns=3)
+        await asyncio.sleep(0.3)
+        await server.stop()
+        await close_office(office)
+        return office, desk_b_start
+
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            office, desk_b_start = asyncio.run(scenario(directory))
+    finally:
+        chat.close()
+        tts.close()
+
+    assert secret in office.office_context.get("conversation_summary@desk-a", ""), office.office_context
+    assert not office.office_context.get("conversation_summary"), office.office_context
+    assert secret not in office.office_context.get("conversation_summary@desk-b", "")
+    # Every request from desk B's turns: its answers and its own summaries
+    desk_b_prompts = [json.dumps(request['messages'], ensure_ascii=False)
+                      for request in chat.requests[desk_b_start:]]
+    assert len(desk_b_prompts) >= len(desk_b_questions), len(desk_b_prompts)
+    for prompt in desk_b_prompts:
+        assert secret not in prompt, prompt
+    # The same question at both desks goes to the model twice: no shared cached reply
+    asked = [request for request in chat.requests if request['messages'][-1]['content'] == "ما هي ساعات العمل؟"]
+    assert len(asked) == 2, len(asked)
+    print(f"✅ {len(desk_b_prompts)} desk B prompts free of desk A's conversation")
+
+
+def test_reminders_reach_their_desk():
+    """Due reminders go to the desk that set them; announcements to every desk"""
+    print("🧪 Testing reminders in server mode...")
+
+    chat = ChatStub(delay=0.01)
+    tts = TTSStub(delay=0.01)
+    samples = speech_fixture()
+
+    async def collect(websocket, seconds: float):
+        """Messages the desk receives within seconds; audio as its length"""
+        received = []
+        deadline = time.monotonic() + seconds
+        while True:
+            try:
+                message = await asyncio.wait_for(websocket.recv(), deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                return received
+            received.append(len(message) if isinstance(message, bytes) else json.loads(message))
+
+    async def scenario(directory):
+        office = stub_office(chat, tts, directory, asr_latency=0.0,
+                             transcripts=["ذكرني بالاتصال بالعميل بعد ساعة"])
+        server = AssistantServer(office, "127.0.0.1", 0)
+        await server.start()
+        url = f"ws://127.0.0.1:{server.port}"
+        async with websockets.connect(url) as desk_a, websockets.connect(url) as desk_b:
+            await desk_a.send(json.dumps({'type': 'hello', 'session': 'desk-a', 'sample_rate': 16000}))
+            await desk_b.send(json.dumps({'type': 'hello', 'session': 'desk-b', 'sample_rate': 16000}))
+            await desk_a.send(samples.tobytes())
+            while True:
+                message = await desk_a.recv()
+                if isinstance(message, str) and json.loads(message)['type'] == 'reply':
+                    break
+            reminder = next(item for item in office.scheduler.items.values() if item.kind == "task")
+            # Bring the reminder forward instead of waiting an hour
+            soon = time.time() + 0.3
+            office.scheduler.add(item_from_dict(dict(reminder.to_dict(), due=soon)))
+            office.scheduler.add(Announcement(new_item_id('announcement'), "الغداء جاهز", soon))
+            received_a, received_b = await asyncio.gather(collect(desk_a, 1.5), collect(desk_b, 1.5))
+            await desk_a.send(json.dumps({'type': 'end'}))
+            await desk_b.send(json.dumps({'type': 'end'}))
+        await server.stop()
+        await close_office(office)
+        return office, reminder, received_a, received_b
+
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            office, reminder, received_a, received_b = asyncio.run(scenario(directory))
+    finally:
+        chat.close()
+        tts.close()
+
+    def reminders(received):
+        return [message['text'] for message in received if isinstance(message, dict) and message['type'] == 'reminder']
+
+    assert reminder.session == "desk-a", reminder
+    assert sorted(reminders(received_a)) == ["إعلان: الغداء جاهز", "تذكير: الاتصال بالعميل"], received_a
+    assert reminders(received_b) == ["إعلان: الغداء جاهز"], received_b
+    # Each reminder's pre-rendered audio followed it
+    for received in (received_a, received_b):
+        audio = [message for message in received if isinstance(message, int)]
+        assert len(audio) == len(reminders(received)) and all(audio), received
+    assert office.office_context['schedule'][reminder.id]['done']
+    assert 'reminder.fallback' not in office.metrics.snapshot()['counters']
+    print("✅ Reminder sent to desk A only; the announcement reached both desks")
+
+
+def test_tts_failure_falls_back_to_client_text():
+    """Without speech synthesis the workstation gets the text, not the server's speaker"""
+    print("🧪 Testing TTS fallback in server mode...")
+
+    chat = ChatStub(reply="ساعات العمل من الثامنة. نغلق في الرابعة.", delay=0.01)
+    tts = TTSStub(delay=0.01)
+    tts.fail_status = 503
+    samples = speech_fixture()
+
+    async def scenario(directory):
+        office = stub_office(chat, tts, directory, asr_latency=0.0, transcripts=[
+            "ما هي ساعات العمل؟", "عرض المهام", "متى يفتح المكتب؟",
+        ])
+        spoken_locally = []
+        office.local_tts.speak = lambda text: spoken_locally.append(text) or True
+        server = AssistantServer(office, "127.0.0.1", 0)
+        await server.start()
+        received = []
+        async with websockets.connect(f"ws://127.0.0.1:{server.port}") as websocket:
+            await websocket.send(json.dumps({'type': 'hello', 'session': 'desk-a', 'sample_rate': 16000}))
+            for _ in range(3):
+                await websocket.send(samples.tobytes())
+                while True:
+                    message = await asyncio.wait_for(websocket.recv(), 10)
+                    received.append(len(message) if isinstance(message, bytes) else json.loads(message))
+                    if isinstance(received[-1], dict) and received[-1]['type'] == 'reply':
+                        break
+            await websocket.send(json.dumps({'type': 'end'}))
+        await server.stop()
+        await close_office(office)
+        return office, received, spoken_locally
+
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            office, received, spoken_locally = asyncio.run(scenario(directory))
+    finally:
+        chat.close()
+        tts.close()
+
+    assert spoken_locally == [], spoken_locally
+    assert not any(isinstance(message, int) for message in received), received
+    texts = [message['text'] for message in received if message['type'] == 'speak_text']
+    replies = [message['text'] for message in received if message['type'] == 'reply']
+    assert len(replies) == 3 and all(replies), replies
+    # Pipelined sentences, the spoken command reply and the turn after the breaker opened
+    assert texts[:2] == ["ساعات العمل من الثامنة.", "نغلق في الرابعة."], texts
+    assert replies[1] in texts and texts[-2:] == texts[:2], texts
+    counters = office.metrics.snapshot()['counters']
+    assert counters['tts.fallback'] == len(texts), counters
+    assert counters.get('tts.short_circuit', 0) >= 1, counters
+    print(f"✅ {len(texts)} pieces of text sent to the workstation, none spoken on the server")
+
+
+def test_load_test_reports_throughput():
+    """Concurrent clients all get answers and the report has percentiles"""
+    print("🧪 Testing load test with concurrent clients...")
+
+    report = asyncio.run(run_load_test(clients=6, turns=2, llm_latency=0.05, tts_latency=0.01,
+                                       asr_latency=0.01, max_concurrent=3))
+    assert report['turns'] == 12, report
+    assert report['busy'] == 0 and report['ignored'] == 0, report
+    assert 0 < report['p50'] <= report['p99'], report
+    assert report['server']['limiter']['admitted'] == 12
+    # One chat call per turn, plus any rolling-summary updates
+    assert report['chat_requests'] >= 12
+    print(f"✅ {report['turns_per_second']:.1f} turns/s, p99 {report['p99'] * 1000:.0f} ms")
+
+
+def main():
+    """Main test function"""
+    print("🚀 Testing Assistant Server")
+    print("=" * 50)
+
+    tests = [
+        test_turn_limiter_backpressure,
+        test_sessions_share_office_but_not_history,
+        test_sessions_do_not_share_summary_or_cache,
+        test_reminders_reach_their_desk,
+        test_tts_failure_falls_back_to_client_text,
+        test_load_test_reports_throughput,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} failed: {e}")
+        print()
+
+    print("=" * 50)
+    print(f"📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Test script for continuous capture using generated WAV files
+"""
+
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+from audio_capture import ContinuousCapture, RingBuffer, WavFileSource
+from stub_environment import write_wav
+
+SAMPLE_RATE = 16000
+
+
+def make_speech_like_audio(segments, seed: int = 0) -> np.ndarray:
+    """Background noise with loud tone bursts at the given (start, end) seconds"""
+    rng = np.random.default_rng(seed)
+    total = max(end for _, end in segments) + 1.5
+    samples = rng.normal(0, 60, int(total * SAMPLE_RATE))
+    for start, end in segments:
+        t = np.arange(int((end - start) * SAMPLE_RATE)) / SAMPLE_RATE
+        burst = 8000 * np.sin(2 * np.pi * 220 * t)
+        first = int(start * SAMPLE_RATE)
+        samples[first:first + len(burst)] += burst
+    return np.clip(samples, -32768, 32767).astype(np.int16)
+
+
+def test_ring_buffer_wraps():
+    """Reads across the wrap point return samples in order"""
+    print("🧪 Testing ring buffer wrap-around...")
+
+    ring = RingBuffer(10)
+    ring.write(np.arange(7, dtype=np.int16))
+    ring.write(np.arange(7, 14, dtype=np.int16))
+    assert list(ring.read(5, 14)) == list(range(5, 14))
+    # Samples older than the capacity are gone
+    assert list(ring.read(0, 6)) == [4, 5]
+    print("✅ Ring buffer reads are contiguous")
+
+
+def test_segments_with_pre_roll():
+    """Each burst becomes one utterance that starts before its onset"""
+    print("🧪 Testing utterance segmentation...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "speech.wav")
+        write_wav(path, make_speech_like_audio([(1.0, 2.0), (3.5, 4.2)]))
+
+        capture = ContinuousCapture(WavFileSource(path), pre_roll=0.3, end_silence=0.5)
+        capture.start()
+        utterances = []
+        while True:
+            utterance = capture.next_utterance(timeout=5)
+            if utterance is None:
+                break
+            utterances.append(utterance)
+
+    assert len(utterances) == 2, len(utterances)
+    # 1.0 s burst + 0.3 s pre-roll + 0.5 s trailing silence
+    assert 1.7 <= utterances[0].duration <= 1.9, utterances[0].duration
+    # The onset of the burst is inside the utterance, not clipped
+    onset = int(0.3 * SAMPLE_RATE)
+    assert np.abs(utterances[0].samples[:onset - 160]).max() < 1000
+    assert np.abs(utterances[0].samples[onset:onset + 800]).max() > 4000
+    print(f"✅ {len(utterances)} utterances, first {utterances[0].duration:.2f} s")
+
+
+def test_noise_floor_adapts():
+    """The noise floor follows background energy, not speech energy"""
+    print("🧪 Testing adaptive noise floor...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "speech.wav")
+        write_wav(path, make_speech_like_audio([(1.0, 3.0)]))
+        capture = ContinuousCapture(WavFileSource(path))
+        capture.start()
+        while capture.next_utterance(timeout=5) is not None:
+            pass
+
+    background = (60 / 32768.0) ** 2
+    assert background / 3 < capture.noise_floor < background * 3, capture.noise_floor
+    print(f"✅ Noise floor {capture.noise_floor:.2e} for background {background:.2e}")
+
+
+def test_noise_step_is_absorbed():
+    """Background noise that gets louder and stays loud stops counting as speech"""
+    print("🧪 Testing a step in background noise...")
+
+    rng = np.random.default_rng(1)
+    # Quiet room for 2 s, then a fan starts (15x the minimum floor) and keeps running
+    samples = np.concatenate((rng.normal(0, 60, 2 * SAMPLE_RATE), rng.normal(0, 400, 28 * SAMPLE_RATE)))
+    t = np.arange(SAMPLE_RATE) / SAMPLE_RATE
+    samples[20 * SAMPLE_RATE:21 * SAMPLE_RATE] += 8000 * np.sin(2 * np.pi * 220 * t)
+    samples = np.clip(samples, -32768, 32767).astype(np.int16)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "fan.wav")
+        write_wav(path, samples)
+        capture = ContinuousCapture(WavFileSource(path), end_silence=0.8, max_utterance=8.0)
+        capture.start()
+        utterances = []
+        while True:
+            utterance = capture.next_utterance(timeout=5)
+            if utterance is None:
+                break
+            utterances.append(utterance)
+
+    speech = [u for u in utterances if np.abs(u.samples).max() > 4000]
+    noise = [u for u in utterances if np.abs(u.samples).max() <= 4000]
+    # The step itself looks like speech for a few seconds, then becomes background
+    assert len(noise) == 1 and noise[0].duration < 8.0, [u.duration for u in noise]
+    assert len(speech) == 1 and 1.0 < speech[0].duration < 2.5, [u.duration for u in speech]
+    background = (400 / 32768.0) ** 2
+    assert background / 3 < capture.noise_floor < background * 3, capture.noise_floor
+    print(f"✅ Step absorbed after {noise[0].duration:.1f} s, speech on top of it still segmented")
+
+
+def test_pause_drops_audio():
+    """Speech while paused (the assistant talking) is never segmented"""
+    print("🧪 Testing pause and resume...")
+
+    frames = make_speech_like_audio([(0.5, 1.0), (2.0, 2.5)])
+
+    class ArraySource:
+        sample_rate = SAMPLE_RATE
+        frame_samples = 480
+
+        def close(self):
+            pass
+
+    capture = ContinuousCapture(ArraySource(), end_silence=0.3)
+    half = int(1.5 * SAMPLE_RATE)
+    capture.pause()
+    for i in range(0, half, 480):
+        capture.process_frame(frames[i:i + 480])
+    capture.resume()
+    for i in range(half, len(frames), 480):
+        capture.process_frame(frames[i:i + 480])
+
+    first = capture.next_utterance(timeout=0)
+    assert first is not None and 0.7 <= first.duration <= 1.2, first
+    assert capture.next_utterance(timeout=0) is None
+    print("✅ Only speech after resume was segmented")
+
+
+def main():
+    """Main test function"""
+    print("🚀 Testing Continuous Capture")
+    print("=" * 50)
+
+    tests = [
+        test_ring_buffer_wraps,
+        test_segments_with_pre_roll,
+        test_noise_floor_adapts,
+        test_noise_step_is_absorbed,
+        test_pause_drops_audio,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} failed: {e}")
+        print()
+
+    print("=" * 50)
+    print(f"📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
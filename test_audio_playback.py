@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Test script for streaming audio playback using a fake TTS generator
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+import wave
+
+from audio_playback import NullSink, PCMPlayer, StreamingAudioPlayer, WavFileSink
+from stub_backends import ChatStub, TTSStub
+from stub_environment import close_office, environment, stub_office
+
+
+def fake_tts_stream(chunk_count: int = 10, chunk_size: int = 1024, first_delay: float = 0.05,
+                    chunk_delay: float = 0.05):
+    """Yield fake audio chunks on a controllable schedule"""
+    time.sleep(first_delay)
+    for i in range(chunk_count):
+        if i:
+            time.sleep(chunk_delay)
+        yield bytes([i % 256]) * chunk_size
+
+
+def sink_command(output_path: str):
+    """Player command that copies stdin to a file instead of a sound card"""
+    script = f"import sys, shutil; shutil.copyfileobj(sys.stdin.buffer, open({output_path!r}, 'wb'))"
+    return [sys.executable, '-c', script]
+
+
+def test_streaming_starts_before_synthesis_ends():
+    """Audio must reach the player long before the last chunk is generated"""
+    print("🧪 Testing time-to-first-audio...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_path = os.path.join(tmp_dir, "out.mp3")
+        player = StreamingAudioPlayer(command=sink_command(output_path), jitter_buffer_bytes=2048)
+        stats = player.play_stream(fake_tts_stream(chunk_count=20, chunk_delay=0.05))
+
+        with open(output_path, 'rb') as f:
+            played = f.read()
+
+    expected = b"".join(fake_tts_stream(chunk_count=20, first_delay=0, chunk_delay=0))
+    assert played == expected
+    assert stats['chunks'] == 20
+    assert stats['bytes'] == len(expected)
+    # First audio after ~2 chunks (0.1s), full stream takes ~1s
+    assert stats['time_to_first_audio'] < 0.5
+    assert stats['total_time'] >= 0.9
+    print(f"✅ First audio after {stats['time_to_first_audio'] * 1000:.0f} ms "
+          f"of {stats['total_time'] * 1000:.0f} ms")
+
+
+def test_short_reply_flushes_jitter_buffer():
+    """A reply smaller than the jitter buffer must still be played"""
+    print("🧪 Testing short reply flush...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_path = os.path.join(tmp_dir, "out.mp3")
+        player = StreamingAudioPlayer(command=sink_command(output_path), jitter_buffer_bytes=1 << 20)
+        stats = player.play_stream(fake_tts_stream(chunk_count=2, chunk_delay=0))
+
+        with open(output_path, 'rb') as f:
+            played = f.read()
+
+    assert len(played) == 2048
+    assert stats['time_to_first_audio'] > 0
+    print("✅ Short reply played")
+
+
+def test_generator_error_is_raised():
+    """Errors from the TTS stream must propagate to the caller"""
+    print("🧪 Testing TTS error propagation...")
+
+    def broken_stream():
+        yield b"x" * 100
+        raise ConnectionError("tts failed")
+
+    player = StreamingAudioPlayer(command=sink_command(os.devnull))
+    try:
+        player.play_stream(broken_stream())
+    except ConnectionError:
+        print("✅ Error propagated")
+        return
+    raise AssertionError("ConnectionError was not raised")
+
+
+def test_interrupted_stream_releases_fetcher():
+    """A player that goes away mid-reply must not leave the fetcher stuck on a full queue"""
+    print("🧪 Testing fetcher cleanup...")
+
+    closed = []
+
+    def endless_stream():
+        try:
+            while True:
+                yield b"\x00" * 1024
+        finally:
+            closed.append(True)
+
+    before = threading.active_count()
+    # Exits without reading stdin: the pipe breaks while chunks keep coming
+    player = StreamingAudioPlayer(command=[sys.executable, '-c', 'pass'], max_queued_chunks=2)
+    player.play_stream(endless_stream())
+
+    # stop() from another thread, as barge-in does
+    player = StreamingAudioPlayer(command=sink_command(os.devnull), max_queued_chunks=2)
+    threading.Timer(0.2, player.stop).start()
+    stats = player.play_stream(endless_stream())
+    time.sleep(0.1)
+
+    assert stats['interrupted'], stats
+    assert closed == [True, True], closed
+    assert threading.active_count() == before, (threading.active_count(), before)
+    print("✅ Fetcher threads exit and close the stream after a broken pipe or stop")
+
+
+def test_pcm_player_keeps_one_stream():
+    """Consecutive replies go into the same open output, whole samples only"""
+    print("🧪 Testing in-process PCM player...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_path = os.path.join(tmp_dir, "out.wav")
+        sink = WavFileSink(output_path, 16000)
+        player = PCMPlayer(sink, 16000, jitter_buffer_bytes=2048)
+        # Odd-sized chunks split samples, as HTTP chunking does
+        first = player.play_stream(fake_tts_stream(chunk_count=5, chunk_size=1001, first_delay=0, chunk_delay=0))
+        second = player.play_stream([b"\x01\x02" * 500])
+        player.close()
+        with wave.open(output_path, "rb") as wav:
+            frames = wav.readframes(wav.getnframes())
+            rate = wav.getframerate()
+
+    expected = b"".join(fake_tts_stream(chunk_count=5, chunk_size=1001, first_delay=0, chunk_delay=0))
+    assert rate == 16000
+    assert frames == expected[:len(expected) - 1] + b"\x01\x02" * 500
+    assert first['bytes'] == 5005 and second['bytes'] == 1000
+    assert first['underruns'] == 0
+    print(f"✅ Two replies, one stream, {len(frames)} bytes")
+
+
+def test_pcm_player_reports_underruns():
+    """A stream slower than real time starves the speaker; a fast one does not"""
+    print("🧪 Testing underrun detection...")
+
+    player = PCMPlayer(NullSink(16000, realtime=True), 16000, jitter_buffer_bytes=0)
+    # 50 ms of audio every 100 ms: the speaker runs dry between chunks
+    slow = player.play_stream(fake_tts_stream(chunk_count=5, chunk_size=1600, first_delay=0, chunk_delay=0.1))
+    fast = player.play_stream(fake_tts_stream(chunk_count=5, chunk_size=1600, first_delay=0, chunk_delay=0.01))
+    player.close()
+
+    assert slow['underruns'] == 4, slow
+    assert 0.15 < slow['underrun_time'] < 0.3, slow
+    assert fast['underruns'] == 0, fast
+    # Real-time sink: play_stream returns once the audio has played out
+    assert fast['total_time'] >= 0.25
+    assert player.underruns == 4
+    print(f"✅ {slow['underruns']} underruns ({slow['underrun_time'] * 1000:.0f} ms) detected, none when fed fast")
+
+
+def test_assistant_speaks_pcm_in_process():
+    """The assistant asks for PCM and plays it through the WAV sink, no player process"""
+    print("🧪 Testing assistant PCM playback...")
+
+    pcm = b"\x10\x00" * 4000
+    chat, tts = ChatStub(delay=0.0), TTSStub(audio=pcm, delay=0.0, chunk_size=333)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            output_path = os.path.join(directory, "speaker.wav")
+            with environment(PLAYBACK_SINK=f"wav:{output_path}", PLAYBACK_SAMPLE_RATE="16000",
+                             CONNECTION_WARMUP="false"):
+                office = stub_office(chat, tts, directory)
+
+            async def scenario():
+                await office.speak_response("مرحباً")
+                await office.speak_response("مرحباً")
+                await close_office(office)
+
+            asyncio.run(scenario())
+            office.audio_player.close()
+            with wave.open(output_path, "rb") as wav:
+                frames = wav.readframes(wav.getnframes())
+    finally:
+        chat.close()
+        tts.close()
+
+    assert office.tts_request("مرحباً")['output_format'] == "pcm_16000"
+    # Second reply came from the TTS cache
+    assert frames == pcm * 2 and len(tts.requests) == 1
+    assert office.metrics.counters.get(('error', 'tts')) is None
+    print("✅ PCM streamed, cached and played in-process")
+
+
+def main():
+    """Main test function"""
+    print("🚀 Testing Streaming Audio Playback")
+    print("=" * 50)
+
+    tests = [
+        test_streaming_starts_before_synthesis_ends,
+        test_short_reply_flushes_jitter_buffer,
+        test_generator_error_is_raised,
+        test_interrupted_stream_releases_fetcher,
+        test_pcm_player_keeps_one_stream,
+        test_pcm_player_reports_underruns,
+        test_assistant_speaks_pcm_in_process,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} failed: {e}")
+        print()
+
+    print("=" * 50)
+    print(f"📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Test script for barge-in: talking over the assistant's reply
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from audio_capture import ContinuousCapture, PushSource
+from audio_playback import NullSink, PCMPlayer
+from stub_backends import ChatStub, TTSStub
+from stub_environment import close_office, speech_fixture, stub_office, write_wav
+from voice_gate import read_wav
+
+SAMPLE_RATE = 16000
+FRAME_SAMPLES = 480
+PLAYBACK_RATE = 22050
+
+
+def echo_of_playback(seconds: float) -> np.ndarray:
+    """What the mic hears of our own voice: a quiet, different speaker"""
+    voice = speech_fixture(seconds=seconds, silence=0.0, pitch=220)[:int(seconds * SAMPLE_RATE)]
+    return (voice.astype(np.float32) * 0.12).astype(np.int16)
+
+
+def mix(*signals: np.ndarray) -> np.ndarray:
+    return np.clip(sum(signal.astype(np.int32) for signal in signals), -32768, 32767).astype(np.int16)
+
+
+def user_speech(user_wav: str, delay: float, total_seconds: float) -> np.ndarray:
+    """The user's WAV starting delay seconds in, padded to total_seconds"""
+    user, _ = read_wav(user_wav)
+    signal = np.zeros(int(total_seconds * SAMPLE_RATE), dtype=np.int16)
+    start = int(delay * SAMPLE_RATE)
+    end = min(len(signal), start + len(user))
+    signal[start:end] = user[:end - start]
+    return signal
+
+
+def test_detector_ignores_echo():
+    """Echo of the reply alone never fires; the user talking over it does"""
+    print("🧪 Testing barge-in detector...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "user.wav")
+        write_wav(path, speech_fixture())
+        speech = user_speech(path, 1.0, 3.5)
+
+    fired = []
+    capture = ContinuousCapture(PushSource(SAMPLE_RATE, FRAME_SAMPLES), end_silence=0.5)
+    capture.pause()
+    capture.arm_barge_in(fired.append)
+    echo = echo_of_playback(3.5)
+    for offset in range(0, len(echo) - FRAME_SAMPLES, FRAME_SAMPLES):
+        capture.process_frame(echo[offset:offset + FRAME_SAMPLES])
+    assert fired == [], "echo alone must not interrupt"
+
+    capture = ContinuousCapture(PushSource(SAMPLE_RATE, FRAME_SAMPLES), end_silence=0.5)
+    capture.pause()
+    capture.arm_barge_in(fired.append)
+    for offset in range(0, len(speech) - FRAME_SAMPLES, FRAME_SAMPLES):
+        frame = speech[offset:offset + FRAME_SAMPLES]
+        # Playback, and with it the echo, stops once the detector fires
+        if not fired:
+            frame = mix(frame, echo[offset:offset + FRAME_SAMPLES])
+        capture.process_frame(frame)
+    capture.resume()
+    utterance = capture.next_utterance(timeout=0)
+
+    assert len(fired) == 1, fired
+    assert utterance is not None, "the interrupting speech should be kept"
+    # speech_fixture leads with 0.3 s of near-silence before the voice
+    assert 1.1 < utterance.duration < 2.2, utterance.duration
+    print(f"✅ Echo ignored, interruption kept as a {utterance.duration:.1f} s utterance")
+
+
+def test_interrupts_reply():
+    """Speech over playback stops audio, cancels the LLM stream and is recognized"""
+    print("🧪 Testing barge-in during a streamed reply...")
+
+    reply = " ".join(["نعم، هذا صحيح."] * 30)
+    chat = ChatStub(reply=reply, delay=0.05, token_interval=0.05)
+    # Two seconds of audio per sentence, far longer than the test plays
+    tts = TTSStub(audio=b"\x10\x00" * PLAYBACK_RATE * 2, delay=0.02)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "user.wav")
+            write_wav(path, speech_fixture())
+            office = stub_office(chat, tts, directory, asr_latency=0.05, transcripts=["عرض المهام"])
+            sink = NullSink(PLAYBACK_RATE, realtime=True)
+            office.audio_player = PCMPlayer(sink, PLAYBACK_RATE)
+            office.tts_output_format = f"pcm_{PLAYBACK_RATE}"
+            office.continuous_capture = True
+            office.barge_in_enabled = True
+            office.audio_capture = ContinuousCapture(PushSource(SAMPLE_RATE, FRAME_SAMPLES), end_silence=0.5)
+            echo = echo_of_playback(4.0)
+            speech = user_speech(path, 1.0, 4.0)
+            speech_starts = 1.0 + 0.3
+
+            def feed_microphone(started: float):
+                for offset in range(0, len(speech) - FRAME_SAMPLES, FRAME_SAMPLES):
+                    due = started + (offset + FRAME_SAMPLES) / SAMPLE_RATE
+                    time.sleep(max(0.0, due - time.monotonic()))
+                    frame = speech[offset:offset + FRAME_SAMPLES]
+                    # The mic hears our reply only while it is playing
+                    if not office.turn_interrupted.is_set():
+                        frame = mix(frame, echo[offset:offset + FRAME_SAMPLES])
+                    office.audio_capture.process_frame(frame)
+
+            async def scenario():
+                office.turn_idle = asyncio.Event()
+                office.begin_turn()
+                started = time.monotonic()
+                feeder = threading.Thread(target=feed_microphone, args=(started,), daemon=True)
+                feeder.start()
+                response = await office.run_turn("اشرح لي الجدول")
+                stopped_after = time.monotonic() - started - speech_starts
+                written = sink.bytes_written
+                await asyncio.sleep(0.2)
+                office.end_turn()
+                heard = await office.listen_for_voice()
+                await asyncio.to_thread(feeder.join)
+                await close_office(office)
+                return response, stopped_after, written, heard
+
+            response, stopped_after, written, heard = asyncio.run(scenario())
+            office.audio_player.close()
+            time.sleep(0.2)
+    finally:
+        chat.close()
+        tts.close()
+
+    metrics = office.metrics.snapshot()
+    assert response is None, response
+    assert heard == "عرض المهام", heard
+    assert metrics['stages']['barge_in']['count'] == 1
+    assert metrics['stages']['barge_in_stop']['sum'] < 0.1, metrics['stages']['barge_in_stop']
+    assert metrics['counters'].get('turn.interrupted') == 1, metrics['counters']
+    assert stopped_after < 0.5, stopped_after
+    # Playback stopped mid-sentence and stayed stopped
+    assert written < len(tts.audio) and sink.bytes_written == written, (written, sink.bytes_written)
+    assert chat.aborted == 1, "the LLM stream should have been cancelled"
+    print(f"✅ Audio stopped {stopped_after * 1000:.0f} ms after the user started talking")
+
+
+def test_stop_after_interruption_keeps_listening():
+    """"توقف" over a reply only silences it; "خروج" still ends the session"""
+    print("🧪 Testing stop command after barge-in...")
+
+    chat = ChatStub(reply=" ".join(["نعم، هذا صحيح."] * 30), delay=0.05, token_interval=0.05)
+    tts = TTSStub(audio=b"\x10\x00" * PLAYBACK_RATE * 2, delay=0.02)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            office = stub_office(chat, tts, directory)
+            office.audio_player = PCMPlayer(NullSink(PLAYBACK_RATE, realtime=True), PLAYBACK_RATE)
+            office.tts_output_format = f"pcm_{PLAYBACK_RATE}"
+
+            async def scenario():
+                office.stop_requested = asyncio.Event()
+                loop = asyncio.get_running_loop()
+                # The user talks over the reply, then says "stop"
+                loop.call_later(0.4, office.interrupt_turn, time.monotonic(), time.monotonic())
+                interrupted = await office.run_turn("اشرح لي الجدول")
+                requests = (len(chat.requests), len(tts.requests))
+                stopped = await office.run_turn("توقف")
+                after_stop = (len(chat.requests), len(tts.requests), office.stop_requested.is_set())
+                await office.run_turn("خروج")
+                await close_office(office)
+                return interrupted, requests, stopped, after_stop
+
+            interrupted, requests, stopped, after_stop = asyncio.run(scenario())
+            office.audio_player.close()
+    finally:
+        chat.close()
+        tts.close()
+
+    assert interrupted is None and stopped is None, (interrupted, stopped)
+    assert office.metrics.snapshot()['counters'].get('turn.interrupted') == 1
+    # No reply was generated or spoken, and the assistant kept running
+    assert after_stop == requests + (False,), (requests, after_stop)
+    assert office.stop_requested.is_set()
+    print("✅ \"توقف\" silenced the reply without ending the session")
+
+
+def main():
+    """Main test function"""
+    print("🚀 Testing Barge-In")
+    print("=" * 50)
+
+    tests = [
+        test_detector_ignores_echo,
+        test_interrupts_reply,
+        test_stop_after_interruption_keeps_listening,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} failed: {e}")
+        print()
+
+    print("=" * 50)
+    print(f"📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Test script for the end-to-end benchmark harness in bench/
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+
+import speech_recognition as sr
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench"))
+
+from run_bench import compare, load_corpus, run_bench  # noqa: E402
+from stt_backends import GoogleBackend  # noqa: E402
+from stub_backends import ASRStub, Latency  # noqa: E402
+
+
+def test_asr_stub_speaks_google_protocol():
+    """The Google backend can be pointed at the local recognition stub"""
+    print("🧪 Testing recognition stub...")
+
+    stub = ASRStub(transcript="عرض المهام", delay=0.01)
+    try:
+        backend = GoogleBackend(language="ar-SA", endpoint=stub.url)
+        audio = sr.AudioData(b"\x00\x01" * 8000, 16000, 2)
+        assert backend.recognize(audio) == "عرض المهام"
+        stub.transcript = ""
+        try:
+            backend.recognize(audio)
+            understood = True
+        except sr.UnknownValueError:
+            understood = False
+    finally:
+        stub.close()
+    assert not understood
+    assert isinstance(stub.requests[0], bytes) and stub.requests[0][:4] == b"fLaC"
+    print("✅ FLAC request answered with the configured transcript")
+
+
+def test_latency_distribution():
+    """Log-normal samples center on the median; zero spread is fixed"""
+    print("🧪 Testing latency model...")
+
+    assert Latency(0.2).sample() == 0.2
+    latency = Latency(0.2, 0.5, seed=1)
+    samples = sorted(latency.sample() for _ in range(2001))
+    assert 0.17 < samples[1000] < 0.23, samples[1000]
+    assert samples[-1] > 0.4
+    print("✅ Median and tail as configured")
+
+
+def test_bench_replays_corpus():
+    """Every corpus utterance is recognized and answered with audio"""
+    print("🧪 Testing benchmark replay...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, "manifest.json"), "w", encoding="utf-8") as f:
+            f.write('[{"file": "hours.wav", "transcript": "ما هي ساعات العمل؟"},'
+                    ' {"file": "tasks.wav", "transcript": "عرض المهام"}]')
+        corpus = load_corpus(directory)
+        assert os.path.exists(os.path.join(directory, "hours.wav"))
+
+    report = asyncio.run(run_bench(corpus, iterations=2, llm=Latency(0.05), tts=Latency(0.02),
+                                   asr=Latency(0.02), token_interval=0.0, tts_chunk_interval=0.0))
+    assert report['turns'] == 4 and report['answered'] == 4, report['per_turn']
+    assert [turn['transcript'] for turn in report['per_turn'][:2]] == ["ما هي ساعات العمل؟", "عرض المهام"]
+    for turn in report['per_turn']:
+        assert 0 < turn['time_to_first_audio'] <= turn['turn_latency'], turn
+        # At least the recognizer's delay is stub time, not overhead
+        assert 0 <= turn['first_audio_overhead'] <= turn['time_to_first_audio'] - 0.02, turn
+        assert 0 <= turn['turn_overhead'] <= turn['turn_latency'] - 0.02, turn
+    assert report['time_to_first_audio']['p50'] >= 0.05 + 0.02
+    assert report['rss_mb']['max'] > 0
+    assert report['machine']['cpus'] == os.cpu_count()
+    assert {'asr', 'llm_stream', 'command', 'tts'} <= set(report['stages'])
+    print(f"✅ First audio p50 {report['time_to_first_audio']['p50'] * 1000:.0f} ms, "
+          f"turn p50 {report['turn_latency']['p50'] * 1000:.0f} ms")
+
+
+def test_baseline_comparison():
+    """Slowdowns past the tolerance are reported; noise is not"""
+    print("🧪 Testing baseline comparison...")
+
+    baseline = {
+        'answered': 10,
+        'time_to_first_audio': {'p50': 0.5, 'p95': 0.8, 'p99': 1.0},
+        'turn_latency': {'p50': 1.0, 'p95': 1.5, 'p99': 2.0},
+        'first_audio_overhead': {'p50': 0.03, 'p95': 0.06, 'p99': 0.09},
+        'turn_overhead': {'p50': 0.05, 'p95': 0.1, 'p99': 0.15},
+        'cpu_per_turn': {'p50': 0.04, 'p95': 0.1, 'p99': 0.12},
+        'rss_mb': {'max': 100.0},
+    }
+    # Slower stubs, a slow outlier turn and a few ms of jitter are not regressions
+    same = dict(baseline, turn_latency={'p50': 1.4, 'p95': 2.2, 'p99': 4.0},
+                turn_overhead={'p50': 0.06, 'p95': 0.12, 'p99': 0.5})
+    assert compare(same, baseline) == []
+
+    slower = dict(baseline, turn_overhead={'p50': 0.05, 'p95': 0.2, 'p99': 0.3}, rss_mb={'max': 250.0})
+    regressions = compare(slower, baseline)
+    assert len(regressions) == 2, regressions
+    assert regressions[0].startswith("turn_overhead p95")
+    assert compare(slower, baseline, tolerance=1.0, floor=0.1) == [regressions[1]]
+    print(f"✅ {len(regressions)} regressions flagged")
+
+
+def main():
+    """Main test function"""
+    print("🚀 Testing Benchmark Harness")
+    print("=" * 50)
+
+    tests = [
+        test_asr_stub_speaks_google_protocol,
+        test_latency_distribution,
+        test_bench_replays_corpus,
+        test_baseline_comparison,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} failed: {e}")
+        print()
+
+    print("=" * 50)
+    print(f"📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Test script for backend circuit breakers and the local TTS fallback
+"""
+
+import asyncio
+import sys
+import tempfile
+import time
+
+from audio_playback import NullSink, PCMPlayer
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+from local_tts import LocalTTS
+from stub_backends import ChatStub, TTSStub
+from stub_environment import close_office, environment, stub_office
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeEngine:
+    """Stands in for pyttsx3: slow to create, instant to speak"""
+
+    created = 0
+
+    def __init__(self):
+        time.sleep(0.2)
+        FakeEngine.created += 1
+        self.said = []
+
+    def setProperty(self, name, value):
+        pass
+
+    def say(self, text):
+        self.said.append(text)
+
+    def runAndWait(self):
+        pass
+
+
+def test_breaker_states():
+    """Failures open the breaker, a half-open probe closes or reopens it"""
+    print("🧪 Testing breaker state machine...")
+
+    clock = FakeClock()
+    transitions = []
+    breaker = CircuitBreaker("tts", failure_threshold=3, slow_call=1.0, reset_timeout=10,
+                             on_transition=lambda name, old, new: transitions.append(new), clock=clock)
+
+    def call(ok=True, seconds=0.1):
+        with breaker.guard():
+            clock.now += seconds
+            if not ok:
+                raise ConnectionError("down")
+
+    call()
+    for ok, seconds in ((False, 0.1), (True, 2.0), (False, 0.1)):
+        try:
+            call(ok, seconds)
+        except ConnectionError:
+            pass
+    # Two errors and one slow success in a row
+    assert breaker.state == OPEN, breaker.state
+    try:
+        call()
+        raise AssertionError("an open breaker must refuse calls")
+    except CircuitOpenError:
+        pass
+
+    clock.now += 10
+    assert breaker.available()
+    assert breaker.acquire() and breaker.state == HALF_OPEN
+    # Only one probe at a time
+    assert not breaker.available() and not breaker.acquire()
+    breaker.record(False, 0.1)
+    assert breaker.state == OPEN
+
+    clock.now += 10
+    call()
+    assert breaker.state == CLOSED
+    assert transitions == [OPEN, HALF_OPEN, OPEN, HALF_OPEN, CLOSED], transitions
+    assert breaker.stats()['short_circuits'] == 2
+    print("✅ closed -> open -> half-open -> open -> half-open -> closed")
+
+
+def test_tts_outage_goes_straight_to_fallback():
+    """Once ElevenLabs keeps failing, replies use the local voice without a network call"""
+    print("🧪 Testing TTS failover...")
+
+    chat = ChatStub(delay=0.0)
+    tts = TTSStub(audio=b"\x10\x00" * 2205, delay=0.01)
+    FakeEngine.created = 0
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            with environment(BREAKER_FAILURES=2, BREAKER_RESET_TIMEOUT=0.5, LOCAL_TTS_PRELOAD="false"):
+                office = stub_office(chat, tts, directory)
+            office.audio_player = PCMPlayer(NullSink(22050), 22050)
+            office.tts_output_format = "pcm_22050"
+            office.local_tts = LocalTTS(engine_factory=FakeEngine)
+            office.local_tts.start()
+            office.local_tts.ready.wait()
+            tts.fail_status = 503
+
+            async def scenario():
+                durations = []
+                for number in range(5):
+                    start = time.perf_counter()
+                    await office.speak_response(f"الجملة رقم {number}")
+                    durations.append(time.perf_counter() - start)
+                failed_requests = len(tts.requests)
+                tts.fail_status = 0
+                await asyncio.sleep(0.5)
+                await office.speak_response("عادت الخدمة")
+                await close_office(office)
+                return durations, failed_requests
+
+            durations, failed_requests = asyncio.run(scenario())
+            office.audio_player.close()
+            office.local_tts.close()
+    finally:
+        chat.close()
+        tts.close()
+
+    counters = office.metrics.snapshot()['counters']
+    fallback = office.metrics.snapshot()['stages']['tts_fallback']
+    assert FakeEngine.created == 1, FakeEngine.created
+    assert office.local_tts.engine.said == [f"الجملة رقم {number}" for number in range(5)]
+    assert counters['breaker_tts.open'] == 1 and counters['tts.short_circuit'] == 3, counters
+    # Every request after the breaker opened was the recovery probe
+    assert len(tts.requests) == failed_requests + 1, (len(tts.requests), failed_requests)
+    assert max(durations[2:]) < 0.05, durations
+    assert fallback['count'] == 5 and fallback['p50'] < 0.05, fallback
+    assert counters['breaker_tts.half_open'] == 1 and counters['breaker_tts.closed'] == 1, counters
+    assert office.breakers['tts'].state == CLOSED
+    print(f"✅ Failed calls took {min(durations[:2]) * 1000:.0f} ms, "
+          f"short-circuited ones {max(durations[2:]) * 1000:.1f} ms; recovered after one probe")
+
+
+def test_mid_stream_failure_is_not_repeated():
+    """A TTS stream that breaks after audio has played is not spoken again in full"""
+    print("🧪 Testing mid-stream TTS failure...")
+
+    chat = ChatStub(delay=0.0)
+    tts = TTSStub(audio=b"\x10\x00" * 4096, delay=0.0)
+    FakeEngine.created = 0
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            with environment(BREAKER_FAILURES=5, LOCAL_TTS_PRELOAD="false"):
+                office = stub_office(chat, tts, directory)
+            sink = NullSink(22050)
+            office.audio_player = PCMPlayer(sink, 22050)
+            office.tts_output_format = "pcm_22050"
+            office.local_tts = LocalTTS(engine_factory=FakeEngine)
+
+            async def scenario():
+                tts.fail_after = 2
+                await office.speak_response("بدأ الرد ثم انقطع")
+                played = sink.bytes_written
+                tts.fail_after = 0
+                tts.fail_status = 503
+                await office.speak_response("لم يبدأ هذا الرد")
+                await close_office(office)
+                return played
+
+            played = asyncio.run(scenario())
+            office.audio_player.close()
+            office.local_tts.close()
+    finally:
+        chat.close()
+        tts.close()
+
+    counters = office.metrics.snapshot()['counters']
+    assert played == 2 * 1024, played
+    # Only the reply that never started falls back to the local voice
+    assert office.local_tts.engine.said == ["لم يبدأ هذا الرد"], office.local_tts.engine.said
+    assert counters['tts.error'] == 2 and counters['tts.fallback'] == 1, counters
+    assert office.tts_cache.get(office.tts_cache_key("بدأ الرد ثم انقطع")) is None
+    print(f"✅ {played} bytes played before the break, nothing repeated")
+
+
+def test_pipelined_reply_survives_tts_failure():
+    """A failing ElevenLabs call speaks the reply itself with the local voice"""
+    print("🧪 Testing pipelined TTS failure...")
+
+    reply = "الاجتماع في الساعة العاشرة. سيحضره فريق المبيعات."
+    chat = ChatStub(reply=reply, delay=0.0)
+    tts = TTSStub(delay=0.0)
+    FakeEngine.created = 0
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            with environment(BREAKER_FAILURES=5, LOCAL_TTS_PRELOAD="false"):
+                office = stub_office(chat, tts, directory)
+            office.audio_player = PCMPlayer(NullSink(22050), 22050)
+            office.tts_output_format = "pcm_22050"
+            office.local_tts = LocalTTS(engine_factory=FakeEngine)
+            tts.fail_status = 503
+
+            async def scenario():
+                result = await office.respond_to("متى الاجتماع؟")
+                await close_office(office)
+                return result
+
+            result = asyncio.run(scenario())
+            office.audio_player.close()
+            office.local_tts.close()
+    finally:
+        chat.close()
+        tts.close()
+
+    assert result == reply, result
+    assert office.local_tts.engine.said == ["الاجتماع في الساعة العاشرة.", "سيحضره فريق المبيعات."], \
+        office.local_tts.engine.said
+    assert office.metrics.snapshot()['counters']['tts.error'] == 2
+    print("✅ Both sentences spoken locally and remembered as the reply")
+
+
+def test_open_breaker_pipelined_turn_uses_local_voice():
+    """With the TTS breaker open, a pipelined reply goes to LocalTTS without calling ElevenLabs"""
+    print("🧪 Testing pipelined turn with an open breaker...")
+
+    reply = "المكتب يفتح في الثامنة. ويغلق في الرابعة."
+    chat = ChatStub(reply=reply, delay=0.0)
+    tts = TTSStub(delay=0.0)
+    FakeEngine.created = 0
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            with environment(BREAKER_FAILURES=1, BREAKER_RESET_TIMEOUT=60, LOCAL_TTS_PRELOAD="false"):
+                office = stub_office(chat, tts, directory)
+            office.audio_player = PCMPlayer(NullSink(22050), 22050)
+            office.tts_output_format = "pcm_22050"
+            office.local_tts = LocalTTS(engine_factory=FakeEngine)
+            tts.fail_status = 503
+
+            async def scenario():
+                await office.speak_response("تجربة")
+                requests_before = len(tts.requests)
+                result = await office.respond_to("متى يفتح المكتب؟")
+                await close_office(office)
+                return result, requests_before
+
+            result, requests_before = asyncio.run(scenario())
+            office.audio_player.close()
+            office.local_tts.close()
+    finally:
+        chat.close()
+        tts.close()
+
+    counters = office.metrics.snapshot()['counters']
+    assert office.breakers['tts'].state == OPEN
+    assert result == reply, result
+    assert office.local_tts.engine.said[1:] == ["المكتب يفتح في الثامنة.", "ويغلق في الرابعة."], \
+        office.local_tts.engine.said
+    assert len(tts.requests) == requests_before, (len(tts.requests), requests_before)
+    assert counters['tts.short_circuit'] == 2, counters
+    print("✅ Reply spoken locally, sentence by sentence, with no ElevenLabs request")
+
+
+def test_slow_llm_opens_breaker():
+    """Answers slower than BREAKER_SLOW_CALL count as failures"""
+    print("🧪 Testing slow LLM...")
+
+    chat = ChatStub(reply="الاجتماع في الساعة العاشرة", delay=0.3)
+    tts = TTSStub(delay=0.0)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            with environment(BREAKER_FAILURES=2, BREAKER_SLOW_CALL=0.1, LOCAL_TTS_PRELOAD="false"):
+                office = stub_office(chat, tts, directory)
+
+            async def scenario():
+                replies = [await office.generate_response("متى الاجتماع؟"),
+                           await office.generate_response("أين الاجتماع؟")]
+                start = time.perf_counter()
+                replies.append(await office.generate_response("من سيحضر الاجتماع؟"))
+                elapsed = time.perf_counter() - start
+                await close_office(office)
+                return replies, elapsed
+
+            replies, elapsed = asyncio.run(scenario())
+    finally:
+        chat.close()
+        tts.close()
+
+    counters = office.metrics.snapshot()['counters']
+    assert replies[:2] == ["الاجتماع في الساعة العاشرة"] * 2, replies
+    assert replies[2] == "عذراً، حدث خطأ في معالجة طلبك."
+    assert len(chat.requests) == 2 and elapsed < 0.05, (len(chat.requests), elapsed)
+    assert counters['breaker_llm.open'] == 1 and counters['llm.short_circuit'] == 1, counters
+    print(f"✅ Third question answered in {elapsed * 1000:.1f} ms without calling the LLM")
+
+
+def main():
+    """Main test function"""
+    print("🚀 Testing Circuit Breakers")
+    print("=" * 50)
+
+    tests = [
+        test_breaker_states,
+        test_tts_outage_goes_straight_to_fallback,
+        test_mid_stream_failure_is_not_repeated,
+        test_pipelined_reply_survives_tts_failure,
+        test_open_breaker_pipelined_turn_uses_local_voice,
+        test_slow_llm_opens_breaker,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} failed: {e}")
+        print()
+
+    print("=" * 50)
+    print(f"📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
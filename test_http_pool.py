@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Test script for the shared keep-alive HTTP connection pool
+"""
+
+import asyncio
+import json
+import socket
+import sys
+import tempfile
+
+import openai
+import speech_recognition as sr
+from elevenlabs.client import ElevenLabs
+
+from http_pool import HTTPPool
+from stt_backends import GoogleBackend
+from stub_backends import STUB_CA_FILE, ASRStub, ChatStub, TTSStub
+from stub_environment import close_office, environment, stub_office
+
+
+def test_handshakes_per_100_turns():
+    """100 recognize/chat/speak turns over HTTPS open one connection per host"""
+    print("🧪 Testing connection reuse over 100 turns...")
+
+    chat = ChatStub(reply="تم ذلك", delay=0.0, tls=True)
+    tts = TTSStub(delay=0.0, tls=True)
+    asr = ASRStub(transcript="عرض المهام", delay=0.0, tls=True)
+    pool = HTTPPool(verify=STUB_CA_FILE)
+    try:
+        backend = GoogleBackend(language="ar-SA", endpoint=asr.url, http_pool=pool)
+        backend.load()
+        llm = openai.AsyncOpenAI(api_key="test", base_url=chat.url, http_client=pool.async_client(chat.url))
+        voice = ElevenLabs(api_key="test", base_url=tts.url, httpx_client=pool.client(tts.url))
+        audio = sr.AudioData(b"\x00\x01" * 1600, 16000, 2)
+
+        async def turns():
+            for _ in range(100):
+                text = await asyncio.to_thread(backend.recognize, audio)
+                stream = await llm.chat.completions.create(
+                    model="stub", messages=[{"role": "user", "content": text}], stream=True
+                )
+                reply = "".join([chunk.choices[0].delta.content or "" async for chunk in stream])
+                await asyncio.to_thread(lambda: b"".join(voice.text_to_speech.stream(voice_id="v", text=reply)))
+            await pool.aclose()
+
+        asyncio.run(turns())
+    finally:
+        for stub in (chat, tts, asr):
+            stub.close()
+
+    stats = pool.stats()
+    assert len(chat.requests) == len(tts.requests) == len(asr.requests) == 100
+    assert (chat.connections, tts.connections, asr.connections) == (1, 1, 1), \
+        (chat.connections, tts.connections, asr.connections)
+    for host, values in stats.items():
+        assert values['requests'] == 100 and values['tls_handshakes'] == 1, (host, values)
+        assert values['reused'] == 99, (host, values)
+    print(f"✅ {sum(v['tls_handshakes'] for v in stats.values())} TLS handshakes for 300 requests")
+
+
+def test_keep_warm_pings_idle_hosts():
+    """Idle hosts get HEAD pings on the connection already open"""
+    print("🧪 Testing keep-warm pings...")
+
+    chat, tts = ChatStub(tls=True), TTSStub(tls=True)
+    pool = HTTPPool(verify=STUB_CA_FILE, keep_warm_interval=0.05)
+    pool.async_client(chat.url)
+    pool.client(tts.url)
+
+    async def idle_for(seconds: float):
+        task = asyncio.create_task(pool.keep_warm())
+        await asyncio.sleep(seconds)
+        task.cancel()
+        await pool.aclose()
+
+    try:
+        asyncio.run(idle_for(0.5))
+    finally:
+        chat.close()
+        tts.close()
+
+    assert chat.pings >= 2 and tts.pings >= 2, (chat.pings, tts.pings)
+    assert chat.connections == 1 and tts.connections == 1
+    assert chat.requests == [] and tts.requests == []
+    print(f"✅ {chat.pings + tts.pings} pings over 2 connections")
+
+
+def test_warm_up_reports_failures():
+    """A dead endpoint is reported, not raised; a live one reports its handshake"""
+    print("🧪 Testing warm-up...")
+
+    tts = TTSStub(tls=True)
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        closed_port = probe.getsockname()[1]
+    pool = HTTPPool(verify=STUB_CA_FILE, timeout=1)
+    pool.client(tts.url)
+    pool.client(f"https://127.0.0.1:{closed_port}")
+    try:
+        live, dead = pool.warm_up()
+        again = pool.warm_up()[0]
+    finally:
+        pool.close()
+        tts.close()
+
+    assert live['error'] is None and live['connect'] is not None and live['tls'] is not None
+    assert again['connect'] is None, "second ping should reuse the connection"
+    assert dead['error'] and dead['tls'] is None
+    print("✅ Handshake timed, reuse detected, failure reported")
+
+
+def test_assistant_shares_pool():
+    """The assistant's LLM and TTS clients go through its pool"""
+    print("🧪 Testing assistant wiring...")
+
+    chat = ChatStub(reply="ساعات العمل من الثامنة", delay=0.0, tls=True)
+    tts = TTSStub(delay=0.0, tls=True)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            with environment(HTTP_CA_BUNDLE=STUB_CA_FILE, CONNECTION_WARMUP="false"):
+                office = stub_office(chat, tts, directory)
+
+            async def scenario():
+                for question in ("ما هي ساعات العمل؟", "متى يفتح المكتب؟", "هل نعمل يوم السبت؟"):
+                    await office.generate_response(question)
+                    await asyncio.to_thread(office.synthesize_audio, question)
+                await close_office(office)
+
+            asyncio.run(scenario())
+    finally:
+        chat.close()
+        tts.close()
+
+    stats = office.http_pool.stats()
+    assert chat.connections == 1 and tts.connections == 1, (chat.connections, tts.connections)
+    assert sum(values['requests'] for values in stats.values()) == len(chat.requests) + len(tts.requests)
+    print(f"✅ {len(chat.requests) + len(tts.requests)} requests over 2 connections")
+
+
+def test_capped_replies_keep_their_connection():
+    """A reply cut at the sentence cap is read to the end, not aborted"""
+    print("🧪 Testing connection reuse after capped replies...")
+
+    tiers = json.dumps([{"name": "brief", "model": "small-model", "max_tokens": 80,
+                         "expected_latency": 1.0, "max_sentences": 1}])
+    reply = " ".join(f"هذه الجملة رقم {i}." for i in range(1, 9))
+    chat = ChatStub(reply=reply, delay=0.0, token_interval=0.002, tls=True)
+    tts = TTSStub(delay=0.0, tls=True)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            with environment(HTTP_CA_BUNDLE=STUB_CA_FILE, CONNECTION_WARMUP="false", LLM_TIERS=tiers,
+                             LLM_LATENCY_BUDGET=4, LOCAL_TTS_PRELOAD="false"):
+                office = stub_office(chat, tts, directory)
+
+            async def scenario():
+                replies = []
+                for question in ("ما هي ساعات العمل؟", "متى يفتح المكتب؟", "هل نعمل يوم السبت؟"):
+                    replies.append("".join([token async for token in office.stream_response_tokens(question)]))
+                    # The next turn starts once the previous reply has been read off the wire
+                    await asyncio.gather(*office.stream_drains)
+                await close_office(office)
+                return replies
+
+            replies = asyncio.run(scenario())
+    finally:
+        chat.close()
+        tts.close()
+
+    assert all(text.strip() == "هذه الجملة رقم 1." for text in replies), replies
+    assert chat.connections == 1 and chat.aborted == 0, (chat.connections, chat.aborted)
+    counters = office.metrics.snapshot()['counters']
+    # Every capped reply still reported its usage
+    assert counters['llm_tokens.prompt'] > 0 and 'llm_tokens.unreported' not in counters, counters
+    assert office.last_prompt_stats['api_prompt_tokens'] > 0
+    print(f"✅ {len(replies)} capped replies over {chat.connections} connection")
+
+
+def main():
+    """Main test function"""
+    print("🚀 Testing HTTP Connection Pool")
+    print("=" * 50)
+
+    tests = [
+        test_handshakes_per_100_turns,
+        test_keep_warm_pings_idle_hosts,
+        test_warm_up_reports_failures,
+        test_assistant_shares_pool,
+        test_capped_replies_keep_their_connection,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} failed: {e}")
+        print()
+
+    print("=" * 50)
+    print(f"📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Test script for Arabic normalization and the compiled intent router
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+
+from arabic_text import normalize_arabic, normalize_with_offsets
+from intent_router import AhoCorasick, IntentRouter, benchmark, evaluate, load_examples, parse_number
+from test_conversation_loop import make_test_assistant
+
+EXAMPLES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "intent_examples.json")
+
+
+def test_normalization_folds_variants():
+    """Hamza, taa marbuta, tashkeel and Arabic-Indic digits fold together"""
+    print("🧪 Testing Arabic normalization...")
+
+    assert normalize_arabic("أَضِفْ مُهِمَّةً") == normalize_arabic("اضف مهمه") == "اضف مهمه"
+    assert normalize_arabic("إلى") == normalize_arabic("الي")
+    assert normalize_arabic("حذف  مهمة ٣؟") == "حذف مهمه 3"
+    assert normalize_arabic("رقم ۴٢") == "رقم 42"
+
+    text = "أضف مهمةً:  الاتصال"
+    normalized, offsets = normalize_with_offsets(text)
+    assert len(normalized) == len(offsets)
+    # Every normalized character points back at its source character
+    assert text[offsets[normalized.index("الاتصال")]:] == "الاتصال"
+    print("✅ Spelling variants normalize to one form")
+
+
+def test_aho_corasick_finds_all_patterns():
+    """Overlapping patterns are all reported in one pass"""
+    print("🧪 Testing Aho-Corasick matcher...")
+
+    matcher = AhoCorasick([("he", 1), ("she", 2), ("his", 3), ("hers", 4)])
+    found = sorted((start, end, value) for start, end, value in matcher.search("ushers"))
+    assert found == [(1, 4, 2), (2, 4, 1), (2, 6, 4)], found
+    print("✅ All overlapping matches found")
+
+
+def test_slots():
+    """Text slots keep the original spelling and numbers parse in any script"""
+    print("🧪 Testing slot extraction...")
+
+    router = IntentRouter()
+    intent = router.route("أضف مهمة: مراجعة العقد")
+    assert intent.name == "add_task" and intent.slots['text'] == "مراجعة العقد", intent
+    assert router.route("حذف مهمة ٣").slots['number'] == 3
+    assert router.route("احذف المهمة الثالثة").slots['number'] == 3
+    assert parse_number("رقم 12") == 12
+    assert parse_number("بدون رقم") is None
+    # Keywords alone are not commands
+    assert router.route("هل هذه مهمة صعبة") is None
+    assert router.route("توقفت الطابعة عن العمل") is None
+    # Control words inside a task or note are part of its text
+    intent = router.route("أضف مهمة خروج الموظفين مبكرا")
+    assert intent.name == "add_task" and intent.slots['text'] == "خروج الموظفين مبكرا", intent
+    intent = router.route("أضف ملاحظة توقف الطابعة")
+    assert intent.name == "add_note" and intent.slots['text'] == "توقف الطابعة", intent
+    print("✅ Slots extracted")
+
+
+def test_labelled_accuracy_and_speed():
+    """Every labelled example routes correctly, well under a millisecond each"""
+    print("🧪 Testing labelled examples...")
+
+    router = IntentRouter()
+    examples = load_examples(EXAMPLES)
+    results = evaluate(router, examples)
+    assert results['accuracy'] == 1.0, results['failures']
+
+    speed = benchmark(router, [example['text'] for example in examples], repeat=20)
+    assert speed['us_per_route'] < 1000, speed
+    print(f"✅ {results['examples']} examples, {speed['us_per_route']:.1f} µs/route")
+
+
+def test_assistant_uses_router():
+    """Commands are handled locally and other questions reach the LLM"""
+    print("🧪 Testing assistant routing...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        assistant = make_test_assistant(directory, [])
+        reply = asyncio.run(assistant.respond_to("اضف مهمه إرسال التقرير"))
+        assert reply == "تم إضافة المهمة: إرسال التقرير", reply
+        reply = asyncio.run(assistant.respond_to("حذف مهمة ١"))
+        assert reply == "تم حذف المهمة: إرسال التقرير", reply
+        reply = asyncio.run(assistant.respond_to("هل هذه مهمة صعبة"))
+        assert reply == "رد على هل هذه مهمة صعبة", reply
+        assistant.memory_journal.close()
+    print("✅ Router drives the assistant")
+
+
+def main():
+    """Main test function"""
+    print("🚀 Testing Intent Router")
+    print("=" * 50)
+
+    tests = [
+        test_normalization_folds_variants,
+        test_aho_corasick_finds_all_patterns,
+        test_slots,
+        test_labelled_accuracy_and_speed,
+        test_assistant_uses_router,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} failed: {e}")
+        print()
+
+    print("=" * 50)
+    print(f"📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
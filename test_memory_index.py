@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Test script for the local retrieval index over conversations, notes and tasks
+"""
+
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from arabic_text import index_terms, light_stem
+from memory_index import MemoryIndex
+from test_conversation_loop import make_test_assistant
+
+WORDS = ("اجتماع تقرير عميل فاتورة موعد مشروع ميزانية موظف قسم طابعة "
+         "عقد شحنة مورد مبيعات حساب بريد مكتب إجازة راتب تدريب").split()
+
+
+def test_light_stemming():
+    """Attached articles, conjunctions and plural suffixes are stripped"""
+    print("🧪 Testing light stemming...")
+
+    assert light_stem("والمهندسون") == "مهندس"
+    assert light_stem("بالمكتب") == "مكتب"
+    assert index_terms("في الاجتماعات") == index_terms("اجتماع")
+    # Short words are left alone
+    assert light_stem("وان") == "وان"
+    print("✅ Terms reduced to their stems")
+
+
+def test_bm25_ranking():
+    """The document sharing the rarest query terms ranks first"""
+    print("🧪 Testing BM25 ranking...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        index = MemoryIndex(directory)
+        index.add("note:0", "كلمة سر الطابعة عند أحمد", "note")
+        index.add("note:1", "اجتماع الميزانية يوم الأحد", "note")
+        index.add("task:اتصل بالمورد", "اتصل بالمورد", "task")
+        for i in range(50):
+            index.add(f"conversation:{i}", f"سؤال عام عن الاجتماعات رقم {i}", "conversation")
+
+        results = index.search("متى اجتماع الميزانية؟", k=3)
+        assert results[0]['text'] == "اجتماع الميزانية يوم الأحد", results
+        assert index.search("أين الطابعة", k=1)[0]['kind'] == "note"
+
+        index.remove("task:اتصل بالمورد")
+        assert index.search("المورد", k=3) == []
+        assert index.search("الاجتماعات", k=3, exclude=["note:1"])[0]['kind'] == "conversation"
+    print("✅ Relevant memories ranked first")
+
+
+def test_persistence_is_memory_mapped():
+    """A saved index reloads without re-indexing and keeps accepting documents"""
+    print("🧪 Testing memory-mapped persistence...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        index = MemoryIndex(directory)
+        index.add("note:0", "موعد تسليم التقرير الخميس", "note")
+        index.add("task:جدد العقد", "جدد العقد", "task")
+        index.remove("task:جدد العقد")
+        index.save()
+        index.add("note:1", "العميل الجديد من جدة", "note")
+        index.save()
+
+        reloaded = MemoryIndex(directory)
+        assert reloaded.load() == 2
+        assert isinstance(reloaded.postings, np.memmap)
+        assert reloaded.search("التقرير", k=1)[0]['text'] == "موعد تسليم التقرير الخميس"
+        assert reloaded.search("العقد", k=1) == []
+        # Known keys are skipped, new ones go to the delta
+        assert reloaded.sync([], ["موعد تسليم التقرير الخميس", "العميل الجديد من جدة", "الإجازة في أغسطس"], []) == 1
+        assert reloaded.search("الإجازة", k=1)[0]['text'] == "الإجازة في أغسطس"
+    print("✅ Index reloaded from disk")
+
+
+def test_dense_fusion():
+    """Dense vectors can surface a memory that shares no terms with the query"""
+    print("🧪 Testing dense vector fusion...")
+
+    topics = {"اجتماع": 0, "لقاء": 0, "فاتورة": 1, "دفع": 1}
+
+    def embed(texts):
+        vectors = np.zeros((len(texts), 2), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word, axis in topics.items():
+                if word in text:
+                    vectors[row, axis] = 1
+        return vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-8)
+
+    with tempfile.TemporaryDirectory() as directory:
+        index = MemoryIndex(directory, embed=embed)
+        index.add("note:0", "لقاء الفريق صباحاً", "note")
+        index.add("note:1", "دفع المستحقات", "note")
+        texts = [result['text'] for result in index.search("موعد الاجتماع", k=2)]
+        assert texts[0] == "لقاء الفريق صباحاً", texts
+        index.save()
+        reloaded = MemoryIndex(directory, embed=embed)
+        reloaded.load()
+        assert reloaded.search("موعد الاجتماع", k=1)[0]['text'] == "لقاء الفريق صباحاً"
+    print("✅ Dense ranks fused with BM25")
+
+
+def test_query_latency_at_100k():
+    """Queries stay in the low milliseconds with 100k stored turns"""
+    print("🧪 Testing query latency at 100k turns...")
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as directory:
+        index = MemoryIndex(directory)
+        for i in range(100_000):
+            text = " ".join(rng.choice(WORDS) for _ in range(8))
+            index.add(f"conversation:{i}", text, "conversation")
+        index.save()
+
+        reloaded = MemoryIndex(directory)
+        start = time.perf_counter()
+        reloaded.load()
+        load_time = time.perf_counter() - start
+
+        timings = []
+        for _ in range(20):
+            query = " ".join(rng.choice(WORDS) for _ in range(3))
+            start = time.perf_counter()
+            reloaded.search(query, k=5)
+            timings.append(time.perf_counter() - start)
+    median = sorted(timings)[len(timings) // 2]
+    assert median < 0.02, median
+    print(f"✅ Median query {median * 1000:.1f} ms, load {load_time * 1000:.0f} ms")
+
+
+def test_assistant_retrieves_old_memories():
+    """Turns outside the recent window reach the prompt through retrieval"""
+    print("🧪 Testing assistant retrieval...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        assistant = make_test_assistant(directory, [])
+        assistant.add_to_memory("من يتابع عقد شركة النور؟", "سارة تتابع عقد شركة النور")
+        for i in range(10):
+            assistant.add_to_memory(f"سؤال عادي {i}", f"جواب عادي {i}")
+        assistant.record_memory('task_add', task="مراجعة عقد النور")
+
+        messages = assistant.build_messages("من المسؤول عن عقد النور")
+        assistant.memory_journal.close()
+    assert "سارة تتابع عقد شركة النور" in messages[1]['content']
+    assert "مراجعة عقد النور" in messages[1]['content']
+    print("✅ Old turn and task retrieved into the prompt")
+
+
+def test_delta_compacted_while_running():
+    """A delta past INDEX_COMPACT_EVERY is merged in the background without losing turns"""
+    print("🧪 Testing runtime index compaction...")
+
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as directory:
+        assistant = make_test_assistant(directory, [])
+        assistant.index_compact_every = 50
+        questions = [f"{' '.join(rng.choice(WORDS) for _ in range(6))} {i}" for i in range(300)]
+        for i, question in enumerate(questions):
+            assistant.add_to_memory(question, f"جواب {i}")
+        assistant.index_compaction.join()
+        index = assistant.memory_index
+        compactions = index.compactions
+        assert compactions >= 2, compactions
+        assert len(index.delta_texts) < 300 - 50, len(index.delta_texts)
+        assert len(index) == 300 and index.base_count + len(index.delta_texts) == 300
+        # Every turn is still found, whether it landed in the base or the delta
+        for i in (0, 149, 299):
+            assert index.search(questions[i], k=1)[0]['text'].startswith(questions[i]), i
+
+        index.save()
+        reloaded = MemoryIndex(index.directory)
+        assert reloaded.load() == 300
+        assert set(reloaded.keys) == set(index.keys)
+        assistant.memory_journal.close()
+    print(f"✅ {compactions} background compactions, no turn lost")
+
+
+def main():
+    """Main test function"""
+    print("🚀 Testing Memory Index")
+    print("=" * 50)
+
+    tests = [
+        test_light_stemming,
+        test_bm25_ranking,
+        test_persistence_is_memory_mapped,
+        test_dense_fusion,
+        test_query_latency_at_100k,
+        test_assistant_retrieves_old_memories,
+        test_delta_compacted_while_running,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} failed: {e}")
+        print()
+
+    print("=" * 50)
+    print(f"📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
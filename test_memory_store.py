@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Test script for the append-only memory journal
+"""
+
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+from memory_store import MemoryJournal
+
+
+def test_replay_after_restart():
+    """Mutations appended before a restart are replayed on load"""
+    print("🧪 Testing journal replay...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        journal = MemoryJournal(directory)
+        journal.load()
+        journal.append('task_add', task="إرسال التقرير")
+        journal.append('task_add', task="مراجعة العقد")
+        journal.append('task_remove', index=0)
+        journal.append('note_add', note="الاجتماع يوم الأحد")
+        journal.append('preference_set', key="pref_0", value="القهوة السوداء")
+        journal.append('conversation', conversation={'user_input': "مرحبا", 'assistant_response': "أهلاً"})
+        journal.close()
+
+        conversations, context = MemoryJournal(directory).load()
+
+    assert context['current_tasks'] == ["مراجعة العقد"]
+    assert context['important_notes'] == ["الاجتماع يوم الأحد"]
+    assert context['user_preferences'] == {"pref_0": "القهوة السوداء"}
+    assert conversations[0]['user_input'] == "مرحبا"
+    print("✅ State rebuilt from the journal")
+
+
+def test_torn_tail_is_ignored():
+    """A half-written final record does not lose the earlier ones"""
+    print("🧪 Testing torn journal tail...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        journal = MemoryJournal(directory)
+        journal.load()
+        journal.append('note_add', note="أولى")
+        journal.close()
+        with open(os.path.join(directory, "journal.jsonl"), 'a', encoding='utf-8') as f:
+            f.write('{"seq": 2, "op": "note_a')
+
+        _, context = MemoryJournal(directory).load()
+
+    assert context['important_notes'] == ["أولى"]
+    print("✅ Torn record skipped")
+
+
+def test_appends_after_torn_tail_survive():
+    """Records written after recovering from a torn tail are replayed next time"""
+    print("🧪 Testing appends after torn-tail recovery...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        journal = MemoryJournal(directory)
+        journal.load()
+        journal.append('note_add', note="a")
+        journal.append('note_add', note="b")
+        journal.close()
+        with open(os.path.join(directory, "journal.jsonl"), 'a', encoding='utf-8') as f:
+            f.write('{"seq": 3, "op": "note_a')
+
+        journal = MemoryJournal(directory)
+        journal.load()
+        journal.append('note_add', note="c")
+        journal.append('note_add', note="d")
+        journal.close()
+
+        reloaded = MemoryJournal(directory)
+        _, context = reloaded.load()
+        reloaded.close()
+
+    assert context['important_notes'] == ["a", "b", "c", "d"], context['important_notes']
+    assert reloaded.seq == 4, reloaded.seq
+    print("✅ Torn tail truncated, later records kept")
+
+
+def test_snapshot_compacts_journal():
+    """Snapshots truncate the journal and records are not applied twice"""
+    print("🧪 Testing snapshot compaction...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        conversations, context = [], {'important_notes': []}
+        journal = MemoryJournal(directory, snapshot_every=3)
+        journal.load()
+        journal.state_provider = lambda: (conversations, context)
+        for i in range(7):
+            context['important_notes'].append(str(i))
+            journal.append('note_add', note=str(i))
+            journal.wait_for_snapshot()
+        journal.close()
+
+        with open(os.path.join(directory, "journal.jsonl"), encoding='utf-8') as f:
+            assert len(f.readlines()) == 1
+
+        _, loaded = MemoryJournal(directory).load()
+
+    assert loaded['important_notes'] == [str(i) for i in range(7)]
+    print("✅ Snapshot plus journal tail loaded once")
+
+
+def test_snapshot_does_not_block_append():
+    """The append that triggers a snapshot returns before the snapshot is written"""
+    print("🧪 Testing background snapshot...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        conversations = [{'user_input': "سؤال " * 20, 'assistant_response': "جواب " * 40}] * 100000
+        context = {'important_notes': []}
+        journal = MemoryJournal(directory, snapshot_every=1)
+        journal.load()
+        journal.state_provider = lambda: (conversations, context)
+
+        start = time.perf_counter()
+        journal.append('note_add', note="أول")
+        appended = time.perf_counter() - start
+        journal.wait_for_snapshot()
+        written = time.perf_counter() - start
+        journal.close()
+
+        loaded, _ = MemoryJournal(directory).load()
+
+    assert appended * 5 < written, (appended, written)
+    assert len(loaded) == len(conversations)
+    print(f"✅ Append took {appended * 1000:.1f}ms, snapshot {written * 1000:.0f}ms")
+
+
+def test_interrupted_snapshot_is_recovered():
+    """Records in a rotated journal survive a crash before its snapshot lands"""
+    print("🧪 Testing crash during background snapshot...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        context = {'important_notes': []}
+        journal = MemoryJournal(directory, snapshot_every=3)
+        journal.load()
+        # Simulate the snapshot thread dying before it writes anything
+        journal._background_snapshot = lambda *args: None
+        journal.state_provider = lambda: ([], context)
+        for i in range(8):
+            context['important_notes'].append(str(i))
+            journal.append('note_add', note=str(i))
+        journal.close()
+        assert os.path.exists(os.path.join(directory, "journal.prev.jsonl"))
+
+        reopened = MemoryJournal(directory)
+        _, loaded = reopened.load()
+        reopened.append('note_add', note="8")
+        reopened.close()
+        assert not os.path.exists(os.path.join(directory, "journal.prev.jsonl"))
+
+        _, reloaded = MemoryJournal(directory).load()
+
+    assert loaded['important_notes'] == [str(i) for i in range(8)]
+    assert reloaded['important_notes'] == [str(i) for i in range(9)]
+    print("✅ Rotated journal replayed and compacted on load")
+
+
+def test_legacy_pickle_migration():
+    """An existing assistant_memory.pkl is imported on first start"""
+    print("🧪 Testing pickle migration...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        legacy = os.path.join(directory, "assistant_memory.pkl")
+        with open(legacy, 'wb') as f:
+            pickle.dump({'conversations': [{'user_input': "قديم"}],
+                         'context': {'current_tasks': ["مهمة قديمة"]}}, f)
+
+        conversations, context = MemoryJournal(os.path.join(directory, "memory")).load(legacy)
+
+    assert conversations == [{'user_input': "قديم"}]
+    assert context['current_tasks'] == ["مهمة قديمة"]
+    print("✅ Legacy memory migrated")
+
+
+def test_append_cost_independent_of_history():
+    """Appending costs the same with 10 or 20,000 stored conversations"""
+    print("🧪 Testing append cost...")
+
+    def time_appends(history_size):
+        with tempfile.TemporaryDirectory() as directory:
+            conversations = [{'user_input': "سؤال", 'assistant_response': "جواب"}] * history_size
+            journal = MemoryJournal(directory, snapshot_every=10 ** 9)
+            journal.load()
+            journal.snapshot(conversations, {})
+            start = time.perf_counter()
+            for _ in range(200):
+                journal.append('conversation', conversation=conversations[0])
+            elapsed = time.perf_counter() - start
+            journal.close()
+            return elapsed
+
+    small = time_appends(10)
+    large = time_appends(20000)
+    assert large < small * 5 + 0.05, (small, large)
+    print(f"✅ 200 appends: {small * 1000:.1f} ms small history, {large * 1000:.1f} ms large history")
+
+
+def main():
+    """Main test function"""
+    print("🚀 Testing Memory Journal")
+    print("=" * 50)
+
+    tests = [
+        test_replay_after_restart,
+        test_torn_tail_is_ignored,
+        test_appends_after_torn_tail_survive,
+        test_snapshot_compacts_journal,
+        test_snapshot_does_not_block_append,
+        test_interrupted_snapshot_is_recovered,
+        test_legacy_pickle_migration,
+        test_append_cost_independent_of_history,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} failed: {e}")
+        print()
+
+    print("=" * 50)
+    print(f"📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
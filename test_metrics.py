@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Test script for per-stage latency histograms, counters and their export
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import urllib.request
+
+import openai
+
+from metrics import Histogram, Metrics, MetricsExporter
+from stub_backends import ChatStub
+from test_conversation_loop import make_test_assistant
+
+
+def test_histogram_buckets_and_quantiles():
+    """Values land in fixed buckets and quantiles are interpolated"""
+    print("🧪 Testing histogram buckets...")
+
+    histogram = Histogram((0.1, 0.2, 0.5))
+    for value in (0.05, 0.15, 0.15, 0.3, 2.0):
+        histogram.observe(value)
+    assert histogram.counts == [1, 2, 1, 1]
+    assert histogram.count == 5 and abs(histogram.sum - 2.65) < 1e-9
+    assert 0.1 <= histogram.quantile(0.5) <= 0.2
+    assert Histogram().quantile(0.99) == 0.0
+    print("✅ Buckets and quantiles correct")
+
+
+def test_spans_count_errors():
+    """A span records its duration, and an exception inside counts as an error"""
+    print("🧪 Testing spans and counters...")
+
+    metrics = Metrics()
+    with metrics.span('asr'):
+        time.sleep(0.01)
+    try:
+        with metrics.span('asr'):
+            raise RuntimeError("boom")
+    except RuntimeError:
+        pass
+    metrics.count('timeout', 'asr')
+
+    assert metrics.stages['asr'].count == 2
+    assert metrics.stages['asr'].sum >= 0.01
+    assert metrics.counters == {('error', 'asr'): 1, ('timeout', 'asr'): 1}
+    print("✅ Durations and events recorded")
+
+
+def test_span_overhead():
+    """Spans are cheap enough to leave on in production"""
+    print("🧪 Testing span overhead...")
+
+    metrics = Metrics()
+    runs = 100_000
+    start = time.perf_counter()
+    for _ in range(runs):
+        with metrics.span('llm'):
+            pass
+    per_span = (time.perf_counter() - start) / runs
+    assert per_span < 5e-6, per_span
+    print(f"✅ {per_span * 1e6:.2f} µs per span")
+
+
+def test_prometheus_endpoint_and_dump():
+    """/metrics serves cumulative buckets; the dump writes JSON lines"""
+    print("🧪 Testing exporters...")
+
+    metrics = Metrics()
+    for value in (0.003, 0.04, 0.7):
+        metrics.observe('tts', value)
+    metrics.count('fallback', 'tts')
+
+    with tempfile.TemporaryDirectory() as directory:
+        dump_path = os.path.join(directory, "metrics.jsonl")
+        exporter = MetricsExporter(metrics, port=0, dump_path=dump_path, interval=0.05)
+        exporter.start()
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{exporter.port}/metrics", timeout=5) as response:
+                text = response.read().decode("utf-8")
+            time.sleep(0.12)
+        finally:
+            exporter.stop()
+        with open(dump_path, encoding="utf-8") as f:
+            lines = [json.loads(line) for line in f]
+
+    assert '# TYPE assistant_stage_seconds histogram' in text
+    assert 'assistant_stage_seconds_bucket{stage="tts",le="0.005"} 1' in text
+    assert 'assistant_stage_seconds_bucket{stage="tts",le="+Inf"} 3' in text
+    assert 'assistant_stage_seconds_count{stage="tts"} 3' in text
+    assert 'assistant_events_total{stage="tts",event="fallback"} 1' in text
+    # Periodic lines plus the final one written on stop
+    assert len(lines) >= 2, lines
+    assert lines[-1]['stages']['tts']['count'] == 3
+    assert lines[-1]['counters'] == {'tts.fallback': 1}
+    print(f"✅ Endpoint served {len(text.splitlines())} lines, dump has {len(lines)} snapshots")
+
+
+def test_assistant_stages_recorded():
+    """A turn records prompt, LLM, command and memory stages; a dead endpoint counts an error"""
+    print("🧪 Testing assistant stage spans...")
+
+    stub = ChatStub(delay=0.05)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            assistant = make_test_assistant(directory, [])
+            del assistant.generate_response
+            assistant.openai_client = openai.AsyncOpenAI(api_key="test", base_url=stub.url, max_retries=0)
+
+            async def scenario():
+                reply = await assistant.respond_to("ما هي ساعات العمل؟")
+                assistant.add_to_memory("ما هي ساعات العمل؟", reply)
+                await assistant.respond_to("أضف مهمة مراجعة العقد")
+                await assistant.openai_client.close()
+                assistant.openai_client = openai.AsyncOpenAI(
+                    api_key="test", base_url="http://127.0.0.1:9/v1", max_retries=0
+                )
+                await assistant.generate_response("سؤال جديد تماماً")
+                await assistant.openai_client.close()
+
+            asyncio.run(scenario())
+            assistant.memory_journal.close()
+    finally:
+        stub.close()
+
+    stages = assistant.metrics.stages
+    for stage in ('prompt', 'llm', 'command', 'memory'):
+        assert stage in stages, (stage, list(stages))
+    assert stages['llm'].sum >= stub.delay
+    assert assistant.metrics.counters.get(('error', 'llm')) == 1, assistant.metrics.counters
+    print(f"✅ Stages recorded: {', '.join(sorted(stages))}")
+
+
+def main():
+    """Main test function"""
+    print("🚀 Testing Metrics")
+    print("=" * 50)
+
+    tests = [
+        test_histogram_buckets_and_quantiles,
+        test_spans_count_errors,
+        test_span_overhead,
+        test_prometheus_endpoint_and_dump,
+        test_assistant_stages_recorded,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} failed: {e}")
+        print()
+
+    print("=" * 50)
+    print(f"📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
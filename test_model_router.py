@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Test script for latency-budgeted LLM model tiering
+"""
+
+import asyncio
+import json
+import sys
+import tempfile
+import time
+
+from model_router import ModelRouter, default_tiers, load_tiers, voice_limit
+from stub_backends import ChatStub, TTSStub
+from stub_environment import close_office, environment, stub_office
+
+LONG_REPLY = " ".join(f"هذه الجملة رقم {number}." for number in range(1, 11))
+
+
+def test_classify_and_select():
+    """Questions get the smallest capable tier that fits the budget"""
+    print("🧪 Testing tier selection...")
+
+    router = ModelRouter(default_tiers(), budget=4.0)
+    cases = [
+        ("مرحبا", "brief", "brief"),
+        ("شكراً لك", "brief", "brief"),
+        ("ما هي ساعات العمل؟", "brief", "brief"),
+        ("هل يمكنك أن تخبرني من المسؤول عن طلبات الصيانة في المبنى الثاني هذا الشهر", "standard", "standard"),
+        ("اشرح لي خطوات طلب إجازة سنوية", "detailed", "detailed"),
+        ("ما الفرق بين العقد المؤقت والدائم؟ ومتى أحتاج موافقة؟", "detailed", "detailed"),
+    ]
+    for text, need, tier in cases:
+        choice = router.select(text)
+        assert (choice.need, choice.tier.name) == (need, tier), (text, choice)
+
+    # A tighter budget steps down to the largest tier that still fits
+    choice = router.select("اشرح لي خطوات طلب إجازة سنوية", budget=2.5)
+    assert (choice.tier.name, choice.reason) == ("standard", "budget"), choice
+    choice = router.select("اشرح لي خطوات طلب إجازة سنوية", budget=0.5)
+    assert (choice.tier.name, choice.reason) == ("brief", "over_budget"), choice
+
+    # A two-row table serves every need from its last row upwards
+    router = ModelRouter(load_tiers(json.dumps([
+        {"name": "fast", "model": "small-model", "max_tokens": 60, "expected_latency": 0.8},
+        {"name": "full", "model": "large-model", "max_tokens": 300, "expected_latency": 3.0},
+    ])))
+    assert router.select("اشرح لي خطوات طلب إجازة سنوية").tier.model == "large-model"
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        router.select(cases[3][0])
+    per_call = (time.perf_counter() - start) / 1000
+    assert per_call < 0.001, per_call
+    print(f"✅ {len(cases)} questions routed, {per_call * 1e6:.0f} µs per choice")
+
+
+def test_voice_limit():
+    """Replies are cut to whole sentences"""
+    print("🧪 Testing spoken length limits...")
+
+    assert voice_limit(LONG_REPLY, 2) == "هذه الجملة رقم 1. هذه الجملة رقم 2."
+    assert voice_limit("أولاً افتح النظام. ثم اختر نوع", 3, truncated=True) == "أولاً افتح النظام."
+    # A single unfinished sentence is still better than silence
+    assert voice_limit("ساعات العمل من الثامنة", 3, truncated=True) == "ساعات العمل من الثامنة"
+    print("✅ Sentence cap and cut-off fragment handled")
+
+
+def test_assistant_uses_tiers():
+    """The assistant sends each question with its tier's model and limits"""
+    print("🧪 Testing assistant tiering...")
+
+    tiers = json.dumps([
+        {"name": "brief", "model": "small-model", "max_tokens": 80, "expected_latency": 1.0, "max_sentences": 2},
+        {"name": "detailed", "model": "large-model", "max_tokens": 350, "expected_latency": 3.5,
+         "max_sentences": 5},
+    ])
+    chat = ChatStub(reply=LONG_REPLY, delay=0.0, token_interval=0.005)
+    tts = TTSStub(delay=0.0)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            with environment(LLM_TIERS=tiers, LLM_LATENCY_BUDGET=4, LOCAL_TTS_PRELOAD="false"):
+                office = stub_office(chat, tts, directory)
+
+            async def scenario():
+                brief = await office.generate_response("مرحبا")
+                detailed = await office.generate_response("اشرح لي خطوات طلب إجازة سنوية")
+                streamed = [token async for token in office.stream_response_tokens("ما هي ساعات العمل؟")]
+                await close_office(office)
+                return brief, detailed, streamed
+
+            brief, detailed, streamed = asyncio.run(scenario())
+    finally:
+        chat.close()
+        tts.close()
+
+    sent = [(request['model'], request['max_tokens']) for request in chat.requests]
+    assert sent == [("small-model", 80), ("large-model", 350), ("small-model", 80)], sent
+    assert brief == "هذه الجملة رقم 1. هذه الجملة رقم 2.", brief
+    assert detailed.endswith("رقم 5.") and detailed.count(".") == 5, detailed
+    assert "".join(streamed).strip() == brief, streamed
+    snapshot = office.metrics.snapshot()
+    assert snapshot['counters']['llm_tier.brief'] == 2 and snapshot['counters']['llm_tier.detailed'] == 1
+    assert snapshot['stages']['llm_brief']['count'] == 2
+    assert [row['count'] for row in office.model_router.report()] == [2, 1]
+    print("✅ Models, token limits and spoken length follow the tier table")
+
+
+def main():
+    """Main test function"""
+    print("🚀 Testing Model Tiering")
+    print("=" * 50)
+
+    tests = [
+        test_classify_and_select,
+        test_voice_limit,
+        test_assistant_uses_tiers,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} failed: {e}")
+        print()
+
+    print("=" * 50)
+    print(f"📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Test script for the token-budgeted prompt builder and background summarization
+"""
+
+import asyncio
+import sys
+import tempfile
+import time
+
+import openai
+
+from memory_store import MemoryJournal
+from prompt_builder import ContextBuilder, TokenCounter, summary_watermark, turns_to_summarize
+from stub_backends import ChatStub
+from test_conversation_loop import make_test_assistant
+
+
+def make_turns(count: int):
+    return [
+        {'timestamp': f"2024-01-01T10:{i // 60:02d}:{i % 60:02d}",
+         'user_input': f"سؤال رقم {i}", 'assistant_response': f"جواب رقم {i}"}
+        for i in range(count)
+    ]
+
+
+def test_budget_holds_as_notes_grow():
+    """Prompt context stays under budget however many notes exist"""
+    print("🧪 Testing token budget...")
+
+    counter = TokenCounter()
+    builder = ContextBuilder(counter, budget=300, window=5)
+    notes = [f"ملاحظة طويلة عن موضوع إداري رقم {i} في المكتب" for i in range(2000)]
+    for _ in range(2):
+        # The first build normalizes and counts every note once; later turns reuse that
+        context = builder.build("ما هي المواعيد", make_turns(50), summary="ملخص قصير",
+                                preferences={'pref_0': "القهوة بدون سكر"}, notes=notes)
+
+    assert context.tokens <= 300, context.tokens
+    assert counter.count(context.text) <= 300
+    assert context.included['preferences'] == 1 and context.included['turns'] == 5
+    assert context.dropped['notes'] > 0
+    assert context.build_seconds < 0.05, context.build_seconds
+    print(f"✅ {context.tokens} tokens from 2000 notes in {context.build_seconds * 1000:.2f} ms")
+
+
+def test_priority_order():
+    """Notes related to the query win over newer unrelated notes"""
+    print("🧪 Testing note priority...")
+
+    builder = ContextBuilder(budget=60, window=2)
+    notes = ["كلمة سر الطابعة عند أحمد"] + [f"ملاحظة عامة {i}" for i in range(30)]
+    context = builder.build("أين كلمة سر الطابعة", [], notes=notes)
+    assert "كلمة سر الطابعة" in context.text
+    assert "ملاحظة عامة 0" not in context.text
+
+    # Recent turns are read oldest first
+    context = ContextBuilder(budget=500, window=2).build("سؤال", make_turns(4))
+    assert context.text.index("سؤال رقم 2") < context.text.index("سؤال رقم 3")
+    assert "سؤال رقم 1" not in context.text
+    print("✅ Related notes and recent turns come first")
+
+
+def test_turns_to_summarize():
+    """Only turns outside the window, in batches, since the last summary"""
+    print("🧪 Testing summary batching...")
+
+    turns = make_turns(12)
+    assert len(turns_to_summarize(turns, "", window=5, batch=5)) == 7
+    assert turns_to_summarize(turns, turns[3]['timestamp'], window=5, batch=5) == []
+    assert len(turns_to_summarize(turns, turns[1]['timestamp'], window=5, batch=5)) == 5
+
+    # The watermark skips absorbed turns without rescanning them
+    watermark = summary_watermark(turns, turns[1]['timestamp'])
+    assert watermark == 2
+    assert summary_watermark(turns, turns[1]['timestamp'], start=watermark) == 2
+    assert turns_to_summarize(turns, turns[1]['timestamp'], window=5, batch=5, start=watermark) == turns[2:7]
+    history = [{'timestamp': f"2024-01-01T{i // 3600:02d}:{i // 60 % 60:02d}:{i % 60:02d}",
+                'user_input': "سؤال", 'assistant_response': "جواب"} for i in range(20000)]
+    start = time.perf_counter()
+    watermark = summary_watermark(history, history[19990]['timestamp'])
+    for _ in range(100):
+        watermark = summary_watermark(history, history[19990]['timestamp'], start=watermark)
+        turns_to_summarize(history, history[19990]['timestamp'], window=5, batch=5, start=watermark)
+    per_turn = (time.perf_counter() - start) / 100
+    assert per_turn < 0.0005, per_turn
+    print(f"✅ Batches selected, {per_turn * 1e6:.0f} µs per turn over 20000 turns")
+
+
+def test_background_summary():
+    """The summarizer writes conversation_summary through the journal"""
+    print("🧪 Testing background summarization...")
+
+    stub = ChatStub(reply="الموظف سأل عن مواعيد الاجتماعات", delay=0.05)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            assistant = make_test_assistant(directory, [])
+            assistant.openai_client = openai.AsyncOpenAI(api_key="test", base_url=stub.url)
+            assistant.conversation_history.extend(make_turns(10))
+
+            async def scenario():
+                assistant.schedule_summary()
+                await assistant.summary_task
+                # Nothing new to fold in yet
+                assistant.schedule_summary()
+                await assistant.openai_client.close()
+                return assistant.summary_task
+
+            task = asyncio.run(scenario())
+            assistant.memory_journal.close()
+
+            _, context = MemoryJournal(directory).load()
+    finally:
+        stub.close()
+
+    assert task.done()
+    assert len(stub.requests) == 1
+    assert context['conversation_summary'] == stub.reply
+    assert context['summary_until'] == make_turns(10)[4]['timestamp']
+    assert "سؤال رقم 4" in stub.requests[0]['messages'][1]['content']
+    print("✅ Summary stored and journaled")
+
+
+def main():
+    """Main test function"""
+    print("🚀 Testing Prompt Builder")
+    print("=" * 50)
+
+    tests = [
+        test_budget_holds_as_notes_grow,
+        test_priority_order,
+        test_turns_to_summarize,
+        test_background_summary,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} failed: {e}")
+        print()
+
+    print("=" * 50)
+    print(f"📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
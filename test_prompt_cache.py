@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Test script for the cache-friendly prompt layout and cached token reporting
+"""
+
+import asyncio
+import sys
+import tempfile
+
+from stub_backends import ChatStub, TTSStub
+from stub_environment import close_office, environment, stub_office
+
+
+def test_prefix_is_byte_stable():
+    """The system prefix stays identical while memory and questions change"""
+    print("🧪 Testing prompt prefix stability...")
+
+    chat = ChatStub(delay=0.0)
+    tts = TTSStub(delay=0.0)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            with environment(LOCAL_TTS_PRELOAD="false"):
+                office = stub_office(chat, tts, directory)
+
+            questions = ["متى الاجتماع؟", "أين تقرير المبيعات؟", "من المسؤول عن الطابعة؟"]
+            prompts = [office.build_messages(questions[0])]
+            office.record_memory('note_add', note="اجتماع الميزانية يوم الأحد")
+            office.record_memory('preference_set', key="pref-1", value="الردود المختصرة")
+            office.add_to_memory(questions[0], "الاجتماع في العاشرة")
+            prompts.append(office.build_messages(questions[1]))
+            office.add_to_memory(questions[1], "التقرير في المجلد المشترك")
+            prompts.append(office.build_messages(questions[2]))
+            asyncio.run(close_office(office))
+    finally:
+        chat.close()
+        tts.close()
+
+    prefixes = {messages[0]['content'].encode("utf-8") for messages in prompts}
+    assert len(prefixes) == 1, prefixes
+    for question, messages in zip(questions, prompts):
+        assert messages[-1] == {"role": "user", "content": question}, messages[-1]
+        assert sum(message['content'].count(question) for message in messages) == 1, messages
+    # Memory added between turns lands after the prefix
+    assert "الميزانية" in prompts[1][1]['content'] and "الميزانية" not in prompts[1][0]['content']
+    print(f"✅ {len(prompts)} prompts share a {len(prompts[0][0]['content'])}-character prefix")
+
+
+def test_cached_tokens_reported():
+    """Cached prompt tokens from the API usage reach the metrics"""
+    print("🧪 Testing cached token reporting...")
+
+    chat = ChatStub(reply="الاجتماع في الساعة العاشرة.", delay=0.0)
+    tts = TTSStub(delay=0.0)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            with environment(LOCAL_TTS_PRELOAD="false"):
+                office = stub_office(chat, tts, directory)
+
+            async def scenario():
+                stats = []
+                await office.generate_response("متى الاجتماع؟")
+                stats.append(dict(office.last_prompt_stats))
+                office.record_memory('note_add', note="اجتماع الميزانية يوم الأحد")
+                await office.generate_response("متى اجتماع الميزانية؟")
+                stats.append(dict(office.last_prompt_stats))
+                tokens = [token async for token in office.stream_response_tokens("أين الاجتماع؟")]
+                stats.append(dict(office.last_prompt_stats))
+                await close_office(office)
+                return stats, tokens
+
+            stats, tokens = asyncio.run(scenario())
+    finally:
+        chat.close()
+        tts.close()
+
+    assert "".join(tokens).strip() == "الاجتماع في الساعة العاشرة.", tokens
+    assert chat.requests[-1]['stream_options'] == {"include_usage": True}
+    assert stats[0]['cached_tokens'] == 0, stats[0]
+    for turn in stats[1:]:
+        # At least the whole system prefix came from the cache
+        assert turn['cached_tokens'] >= len(office.system_prefix) // 4, turn
+        assert turn['cached_tokens'] < turn['api_prompt_tokens'], turn
+    counters = office.metrics.snapshot()['counters']
+    assert counters['llm_tokens.cached'] == sum(turn['cached_tokens'] for turn in stats), counters
+    assert counters['llm_tokens.prompt'] == sum(turn['api_prompt_tokens'] for turn in stats), counters
+    assert 'llm_tokens.unreported' not in counters, counters
+    print(f"✅ {counters['llm_tokens.cached']}/{counters['llm_tokens.prompt']} prompt tokens served from cache")
+
+
+def main():
+    """Main test function"""
+    print("🚀 Testing Prompt Caching")
+    print("=" * 50)
+
+    tests = [
+        test_prefix_is_byte_stable,
+        test_cached_tokens_reported,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} failed: {e}")
+        print()
+
+    print("=" * 50)
+    print(f"📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Test script for the recognition service using a fake recognizer
+"""
+
+import asyncio
+import sys
+import threading
+import time
+
+from recognition_service import RecognitionService
+
+
+class FakeRecognizer:
+    """Recognizer that sleeps, hangs or fails on demand, call by call"""
+
+    def __init__(self, schedule):
+        self.schedule = list(schedule)
+        self.calls = 0
+        self.release = threading.Event()
+        self.lock = threading.Lock()
+
+    def __call__(self, audio):
+        with self.lock:
+            behaviour = self.schedule[min(self.calls, len(self.schedule) - 1)]
+            self.calls += 1
+        if behaviour == 'hang':
+            self.release.wait()
+            return "متأخر"
+        if isinstance(behaviour, BaseException):
+            raise behaviour
+        time.sleep(behaviour)
+        return f"نص {audio}"
+
+
+def test_deadline_is_enforced_on_hang():
+    """A hung request returns at the deadline instead of stalling the loop"""
+    print("🧪 Testing deadline on a hung recognizer...")
+
+    fake = FakeRecognizer(['hang'])
+    service = RecognitionService(fake, workers=2, deadline=0.3)
+
+    start = time.monotonic()
+    try:
+        asyncio.run(service.recognize(1))
+        raise AssertionError("TimeoutError was not raised")
+    except asyncio.TimeoutError:
+        pass
+    elapsed = time.monotonic() - start
+
+    fake.release.set()
+    service.shutdown()
+    assert elapsed < 0.5, elapsed
+    assert service.stats()['timeouts'] == 1
+    print(f"✅ Gave up after {elapsed * 1000:.0f} ms")
+
+
+def test_pool_is_reused():
+    """Requests share one long-lived pool instead of a new executor each time"""
+    print("🧪 Testing worker pool reuse...")
+
+    fake = FakeRecognizer([0.0])
+    service = RecognitionService(fake, workers=2)
+    executor = service.executor
+
+    async def run():
+        return [await service.recognize(i) for i in range(5)]
+
+    assert asyncio.run(run()) == [f"نص {i}" for i in range(5)]
+    assert service.executor is executor
+    service.shutdown()
+    print("✅ Same pool used for all requests")
+
+
+def test_hedge_wins_over_slow_primary():
+    """A slow primary is raced by a hedge fired at the p90 latency"""
+    print("🧪 Testing hedged requests...")
+
+    fake = FakeRecognizer([1.0, 0.05])
+    service = RecognitionService(fake, workers=2, deadline=2.0, hedge=True, initial_hedge_delay=0.1)
+
+    start = time.monotonic()
+    text = asyncio.run(service.recognize(7))
+    elapsed = time.monotonic() - start
+    service.shutdown()
+
+    assert text == "نص 7"
+    assert elapsed < 0.5, elapsed
+    assert service.stats()['hedges'] == 1
+    assert service.stats()['hedge_wins'] == 1
+    print(f"✅ Hedge answered after {elapsed * 1000:.0f} ms")
+
+
+def test_hedge_delay_tracks_p90():
+    """Once enough samples exist the hedge fires at the observed p90"""
+    print("🧪 Testing p90 hedge threshold...")
+
+    service = RecognitionService(lambda audio: "", hedge=True, hedge_min_samples=10)
+    service.latencies.extend([0.1] * 90 + [1.0] * 10)
+    assert service.hedge_delay() == 1.0
+    service.latencies.clear()
+    service.latencies.extend([0.1] * 95 + [1.0] * 5)
+    assert service.hedge_delay() == 0.1
+    service.shutdown()
+    print("✅ Hedge threshold follows p90")
+
+
+def test_definitive_error_is_not_hedged():
+    """Speech that cannot be understood ends the request immediately"""
+    print("🧪 Testing definitive errors...")
+
+    class NotUnderstood(Exception):
+        pass
+
+    service = RecognitionService(FakeRecognizer([NotUnderstood()]), definitive_errors=(NotUnderstood,))
+    try:
+        asyncio.run(service.recognize(1))
+        raise AssertionError("NotUnderstood was not raised")
+    except NotUnderstood:
+        pass
+    service.shutdown()
+    print("✅ Error returned without hedging")
+
+
+def main():
+    """Main test function"""
+    print("🚀 Testing Recognition Service")
+    print("=" * 50)
+
+    tests = [
+        test_deadline_is_enforced_on_hang,
+        test_pool_is_reused,
+        test_hedge_wins_over_slow_primary,
+        test_hedge_delay_tracks_p90,
+        test_definitive_error_is_not_hedged,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} failed: {e}")
+        print()
+
+    print("=" * 50)
+    print(f"📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
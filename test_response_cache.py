@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Test script for the LLM response cache against a local chat-completions stub
+"""
+
+import asyncio
+import sys
+import tempfile
+import time
+
+import openai
+
+from response_cache import ResponseCache, memory_fingerprint
+from stub_backends import ChatStub
+from test_conversation_loop import make_test_assistant
+
+
+def test_ttl_and_lru():
+    """Entries expire after the TTL and the oldest is evicted first"""
+    print("🧪 Testing TTL and LRU bounds...")
+
+    now = [0.0]
+    cache = ResponseCache(max_entries=2, ttl=10, clock=lambda: now[0])
+    cache.put("سؤال أ", "fp", "جواب أ")
+    cache.put("سؤال ب", "fp", "جواب ب")
+    assert cache.get("سؤال أ", "fp") == "جواب أ"
+    cache.put("سؤال ج", "fp", "جواب ج")
+    # "ب" was least recently used
+    assert cache.get("سؤال ب", "fp") is None
+    assert cache.stats()['evictions'] == 1
+
+    now[0] = 11
+    assert cache.get("سؤال أ", "fp") is None
+    assert cache.stats()['expirations'] == 1
+    print("✅ TTL and LRU enforced")
+
+
+def test_key_normalization_and_fingerprint():
+    """Spelling variants share an entry; different memory does not"""
+    print("🧪 Testing cache keys...")
+
+    cache = ResponseCache()
+    before = memory_fingerprint({}, [])
+    after = memory_fingerprint({}, ["المكتب مغلق الخميس"])
+    assert before != after
+
+    cache.put("ما هي ساعات العمل؟", before, "من الثامنة")
+    assert cache.get("ما هى ساعات العمل", before) == "من الثامنة"
+    assert cache.get("ما هي ساعات العمل؟", after) is None
+    print("✅ Keys follow normalized text and memory")
+
+
+def test_assistant_cache_against_stub():
+    """Repeated questions skip the endpoint until a note changes"""
+    print("🧪 Testing assistant against chat-completions stub...")
+
+    stub = ChatStub()
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            assistant = make_test_assistant(directory, [])
+            # Use the real generate_response, not the loop stub
+            del assistant.generate_response
+            assistant.openai_client = openai.AsyncOpenAI(api_key="test", base_url=stub.url)
+
+            async def ask(question):
+                start = time.perf_counter()
+                reply = await assistant.generate_response(question)
+                return reply, time.perf_counter() - start
+
+            async def scenario():
+                first, miss_time = await ask("ما هي ساعات العمل؟")
+                second, hit_time = await ask("ما هى ساعات العمل")
+                assistant.record_memory('note_add', note="المكتب مغلق الخميس")
+                third, _ = await ask("ما هي ساعات العمل؟")
+                await assistant.openai_client.close()
+                return first, second, third, miss_time, hit_time
+
+            first, second, third, miss_time, hit_time = asyncio.run(scenario())
+            assistant.memory_journal.close()
+    finally:
+        stub.close()
+
+    assert first == second == third == stub.reply
+    # Miss, hit, then a miss again after the note invalidated the cache
+    assert len(stub.requests) == 2, len(stub.requests)
+    assert hit_time < 0.05 < miss_time, (hit_time, miss_time)
+    stats = assistant.response_cache.stats()
+    assert stats['hits'] == 1 and stats['invalidations'] == 1, stats
+    assert stats['saved_seconds'] >= stub.delay
+    print(f"✅ Hit in {hit_time * 1000:.1f} ms vs {miss_time * 1000:.0f} ms, "
+          f"hit rate {stats['hit_rate']:.0%}")
+
+
+def main():
+    """Main test function"""
+    print("🚀 Testing Response Cache")
+    print("=" * 50)
+
+    tests = [
+        test_ttl_and_lru,
+        test_key_normalization_and_fingerprint,
+        test_assistant_cache_against_stub,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} failed: {e}")
+        print()
+
+    print("=" * 50)
+    print(f"📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Test script for the sentence-pipelined LLM to TTS path using stub streams
+"""
+
+import asyncio
+import sys
+import threading
+import time
+
+from response_pipeline import SentencePipeline, split_sentences
+
+
+def stub_llm_stream(text: str, token_delay: float = 0.0):
+    """Yield a reply word by word like a streaming chat completion"""
+    for word in text.split(" "):
+        if token_delay:
+            time.sleep(token_delay)
+        yield word + " "
+
+
+def test_split_sentences():
+    """Sentences are cut at Arabic boundaries but not inside numbers"""
+    print("🧪 Testing sentence splitting...")
+
+    tokens = ["مرحباً", "، كيف ", "حالك؟ ", "السعر 3.5 ", "ريال.", "\nشكراً!"]
+    sentences = list(split_sentences(tokens))
+    assert sentences == ["مرحباً،", "كيف حالك؟", "السعر 3.5 ريال.", "شكراً!"], sentences
+    print(f"✅ {len(sentences)} sentences")
+
+
+def test_pipeline_overlaps_and_keeps_order():
+    """Synthesis of sentence N+1 overlaps playback of sentence N, in strict order"""
+    print("🧪 Testing pipeline overlap and ordering...")
+
+    reply = "الجملة الأولى. الجملة الثانية. الجملة الثالثة. الجملة الرابعة."
+    played = []
+    events = []
+    lock = threading.Lock()
+
+    def synthesize(sentence):
+        with lock:
+            events.append(('synth_start', sentence, time.monotonic()))
+        time.sleep(0.1)
+        return sentence.encode()
+
+    def play(audio):
+        with lock:
+            events.append(('play_start', audio.decode(), time.monotonic()))
+        time.sleep(0.2)
+        played.append(audio.decode())
+
+    pipeline = SentencePipeline(synthesize, play)
+    start = time.monotonic()
+    full_text = asyncio.run(pipeline.run(stub_llm_stream(reply, token_delay=0.02)))
+    elapsed = time.monotonic() - start
+
+    assert full_text == reply
+    assert played == ["الجملة الأولى.", "الجملة الثانية.", "الجملة الثالثة.", "الجملة الرابعة."]
+
+    # Serial would be 4 * (0.1 + 0.2) = 1.2s, pipelined is about 0.1 + 4 * 0.2
+    assert elapsed < 1.1, elapsed
+    assert pipeline.last_stats['sentences'] == 4
+    assert pipeline.last_stats['time_to_first_audio'] < 0.4
+    print(f"✅ Turn took {elapsed * 1000:.0f} ms, first audio after "
+          f"{pipeline.last_stats['time_to_first_audio'] * 1000:.0f} ms")
+
+
+def test_pipeline_propagates_errors():
+    """A synthesis failure stops the pipeline and reaches the caller"""
+    print("🧪 Testing error propagation...")
+
+    def synthesize(sentence):
+        raise ConnectionError("tts down")
+
+    pipeline = SentencePipeline(synthesize, lambda audio: None)
+    try:
+        asyncio.run(pipeline.run(stub_llm_stream("جملة. أخرى.")))
+    except ConnectionError:
+        print("✅ Error propagated")
+        return
+    raise AssertionError("ConnectionError was not raised")
+
+
+def test_pipeline_tracks_spoken_sentences():
+    """A reply cut off by a failed LLM stream reports only what was played"""
+    print("🧪 Testing spoken text on failure...")
+
+    def failing_stream():
+        yield from stub_llm_stream("الاجتماع غداً. في القاعة الكبرى. ")
+        time.sleep(0.1)
+        raise ConnectionError("llm stream dropped")
+
+    played = []
+    pipeline = SentencePipeline(lambda sentence: sentence, played.append)
+    try:
+        asyncio.run(pipeline.run(failing_stream()))
+        raise AssertionError("ConnectionError was not raised")
+    except ConnectionError:
+        pass
+    assert pipeline.spoken == played == ["الاجتماع غداً.", "في القاعة الكبرى."], (pipeline.spoken, played)
+    print("✅ Played sentences recorded before the failure")
+
+
+def main():
+    """Main test function"""
+    print("🚀 Testing Sentence Pipeline")
+    print("=" * 50)
+
+    tests = [
+        test_split_sentences,
+        test_pipeline_overlaps_and_keeps_order,
+        test_pipeline_propagates_errors,
+        test_pipeline_tracks_spoken_sentences,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} failed: {e}")
+        print()
+
+    print("=" * 50)
+    print(f"📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Test script for the meeting/announcement scheduler using a simulated clock
+"""
+
+import asyncio
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from audio_playback import NullSink, PCMPlayer
+from intent_router import IntentRouter
+from scheduler import Announcement, Meeting, Scheduler, SimulatedClock, Task, parse_due
+from stub_backends import ChatStub, TTSStub
+from stub_environment import close_office, stub_office
+
+
+def test_parse_due():
+    """Relative and clock times are found and cut out of the text"""
+    print("🧪 Testing due-time parsing...")
+
+    now = datetime(2026, 10, 18, 9, 0)
+    cases = [
+        ("مع العميل غداً الساعة 10 صباحاً", datetime(2026, 10, 19, 10, 0), "مع العميل"),
+        ("الاتصال بالمورد بعد 5 دقائق", datetime(2026, 10, 18, 9, 5), "الاتصال بالمورد"),
+        ("بعد ساعتين", datetime(2026, 10, 18, 11, 0), ""),
+        ("مراجعة العقد الساعة الثالثة والنصف", datetime(2026, 10, 18, 15, 30), "مراجعة العقد"),
+        ("فريق المبيعات الساعة ١٠:٣٠", datetime(2026, 10, 18, 10, 30), "فريق المبيعات"),
+        ("الساعة 8 مساءً", datetime(2026, 10, 18, 20, 0), ""),
+        ("الساعة 8", datetime(2026, 10, 19, 8, 0), ""),
+    ]
+    for text, due, rest in cases:
+        assert parse_due(text, now) == (due, rest), (text, parse_due(text, now))
+    assert parse_due("تجديد الاشتراك", now) == (None, "تجديد الاشتراك")
+    print(f"✅ {len(cases)} time phrases parsed")
+
+
+def test_thousands_fire_in_order():
+    """5,000 items fire once each, in due order, and cancelled ones never fire"""
+    print("🧪 Testing scheduling at scale...")
+
+    rng = random.Random(7)
+    clock = SimulatedClock(start=1000.0)
+    fired = []
+
+    async def announce(item, audio):
+        fired.append((item.id, clock.now()))
+
+    async def scenario():
+        scheduler = Scheduler(clock, announce=announce)
+        kinds = (Task, Meeting, Announcement)
+        start = time.perf_counter()
+        for number in range(5000):
+            item = kinds[number % 3](f"item:{number}", f"بند {number}", 1000.0 + rng.uniform(1, 3600))
+            scheduler.add(item)
+        for number in range(0, 5000, 10):
+            scheduler.cancel(f"item:{number}")
+        added = time.perf_counter() - start
+
+        loop = asyncio.create_task(scheduler.run())
+        for _ in range(61):
+            await clock.advance(60)
+        loop.cancel()
+        return scheduler, added
+
+    scheduler, added = asyncio.run(scenario())
+    expected = sorted(
+        (item for item in scheduler.items.values()), key=lambda item: item.due
+    )
+    assert [item_id for item_id, _ in fired] == [item.id for item in expected]
+    assert len(fired) == 4500 and not any(item_id.endswith("0") for item_id, _ in fired)
+    for item_id, fired_at in fired:
+        assert 0 <= fired_at - scheduler.items[item_id].due < 60
+    # Cancelled entries are compacted out of the heap
+    assert scheduler.stats()['heap'] == 0 and scheduler.stats()['pending'] == 0
+    # One wake-up per clock step with something due, not one per item
+    assert scheduler.wakeups <= 61, scheduler.wakeups
+    print(f"✅ 4,500 fired in order; 5,000 scheduled in {added * 1000:.0f} ms, {scheduler.wakeups} wake-ups")
+
+
+def test_idle_costs_nothing():
+    """With nothing due the loop sleeps through a simulated day"""
+    print("🧪 Testing idle scheduler...")
+
+    clock = SimulatedClock()
+
+    async def scenario():
+        scheduler = Scheduler(clock)
+        loop = asyncio.create_task(scheduler.run())
+        await clock.advance(0)
+        for _ in range(24):
+            await clock.advance(3600)
+        idle_wakeups = scheduler.wakeups
+        # A new item wakes the loop once; it then sleeps until it is due
+        scheduler.add(Task("task:a", "مهمة", clock.now() + 7200))
+        await scheduler.settle()
+        before_due = scheduler.wakeups
+        await clock.advance(7200)
+        loop.cancel()
+        return idle_wakeups, before_due, scheduler
+
+    idle_wakeups, before_due, scheduler = asyncio.run(scenario())
+    assert idle_wakeups == 0, idle_wakeups
+    assert before_due == 1, before_due
+    assert scheduler.fired == 1
+    print("✅ No wake-ups while idle")
+
+
+def test_audio_rendered_ahead():
+    """Reminder audio is synthesized render_ahead seconds early and played as-is"""
+    print("🧪 Testing pre-rendered reminder audio...")
+
+    clock = SimulatedClock()
+    rendered = []
+    played = []
+
+    def render(text):
+        rendered.append((text, clock.now()))
+        return text.encode("utf-8")
+
+    async def announce(item, audio):
+        played.append((item.id, audio, clock.now()))
+
+    async def scenario():
+        scheduler = Scheduler(clock, render=render, announce=announce, render_ahead=300)
+        scheduler.add(Meeting("meeting:1", "فريق المبيعات", due=1200, remind_before=600))
+        loop = asyncio.create_task(scheduler.run())
+        await clock.advance(299)
+        await scheduler.settle()
+        early = list(rendered)
+        await clock.advance(2)
+        await scheduler.settle()
+        ahead = list(rendered)
+        await clock.advance(299)
+        loop.cancel()
+        return scheduler, early, ahead
+
+    scheduler, early, ahead = asyncio.run(scenario())
+    text = "تذكير: اجتماع فريق المبيعات بعد 10 دقائق"
+    assert early == [] and ahead == [(text, 301)], ahead
+    assert played == [("meeting:1", text.encode("utf-8"), 600)], played
+    assert scheduler.late_renders == 0
+    print("✅ Rendered 5 minutes ahead, played on time")
+
+
+def test_assistant_meeting_commands():
+    """Meetings are scheduled by voice, persisted, listed and cancelled"""
+    print("🧪 Testing meeting commands...")
+
+    router = IntentRouter()
+    chat, tts = ChatStub(delay=0.0), TTSStub(delay=0.0)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            office = stub_office(chat, tts, directory)
+
+            async def command(text):
+                return await office.process_office_command(text, router.route(text))
+
+            async def first_session():
+                replies = [
+                    await command("أضف اجتماع مع فريق المبيعات غداً الساعة 10"),
+                    await command("أضف اجتماع مراجعة الميزانية بعد ساعتين"),
+                    await command("أضف مهمة إرسال التقرير بعد 3 ساعات"),
+                    await command("عرض الاجتماعات"),
+                ]
+                await close_office(office)
+                return replies
+
+            replies = asyncio.run(first_session())
+            again = stub_office(chat, tts, directory)
+
+            async def second_session():
+                listed = await again.process_office_command("عرض الاجتماعات", router.route("عرض الاجتماعات"))
+                cancelled = await again.process_office_command("إلغاء الاجتماع الأول", router.route("إلغاء الاجتماع الأول"))
+                deleted = await again.process_office_command("حذف مهمة 1", router.route("حذف مهمة 1"))
+                await close_office(again)
+                return listed, cancelled, deleted
+
+            listed, cancelled, deleted = asyncio.run(second_session())
+    finally:
+        chat.close()
+        tts.close()
+
+    assert replies[0].startswith("تم جدولة الاجتماع مع فريق المبيعات غداً الساعة 10:00"), replies[0]
+    assert replies[2].startswith("تم إضافة المهمة: إرسال التقرير،"), replies[2]
+    assert replies[3].splitlines()[1].startswith("1. مراجعة الميزانية"), replies[3]
+    assert listed == replies[3], (listed, replies[3])
+    assert cancelled == "تم إلغاء الاجتماع: مراجعة الميزانية", cancelled
+    assert deleted == "تم حذف المهمة: إرسال التقرير"
+    assert [item.text for item in again.scheduler.items.values()] == ["مع فريق المبيعات"]
+    assert list(again.office_context['schedule']) == list(again.scheduler.items)
+    print("✅ Scheduled, reloaded from the journal, listed and cancelled")
+
+
+def test_assistant_announces_on_time():
+    """A due announcement plays audio synthesized before it was due"""
+    print("🧪 Testing reminder playback...")
+
+    chat = ChatStub(delay=0.0)
+    tts = TTSStub(audio=b"\x10\x00" * 4410, delay=0.05)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            office = stub_office(chat, tts, directory)
+            sink = NullSink(22050)
+            office.audio_player = PCMPlayer(sink, 22050)
+            office.tts_output_format = "pcm_22050"
+
+            async def scenario():
+                office.turn_idle = asyncio.Event()
+                office.turn_idle.set()
+                loop = asyncio.create_task(office.scheduler.run())
+                office.record_memory('schedule_add', item=Announcement(
+                    "announcement:1", "الغداء جاهز", time.time() + 0.5).to_dict())
+                await asyncio.sleep(0.8)
+                loop.cancel()
+                await close_office(office)
+
+            asyncio.run(scenario())
+            office.audio_player.close()
+    finally:
+        chat.close()
+        tts.close()
+
+    lag = office.metrics.snapshot()['stages']['reminder_lag']
+    assert len(tts.requests) == 1 and tts.requests[0]['text'] == "إعلان: الغداء جاهز", tts.requests
+    assert sink.bytes_written == len(tts.audio)
+    assert lag['count'] == 1 and lag['sum'] < 0.05, lag
+    assert office.office_context['schedule']['announcement:1']['done'] is True
+    print(f"✅ Played {lag['sum'] * 1000:.0f} ms after it was due")
+
+
+def main():
+    """Main test function"""
+    print("🚀 Testing Scheduler")
+    print("=" * 50)
+
+    tests = [
+        test_parse_due,
+        test_thousands_fire_in_order,
+        test_idle_costs_nothing,
+        test_audio_rendered_ahead,
+        test_assistant_meeting_commands,
+        test_assistant_announces_on_time,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} failed: {e}")
+        print()
+
+    print("=" * 50)
+    print(f"📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Test script for office memory shared between assistant processes
+"""
+
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from intent_router import IntentRouter
+from shared_memory import SharedOfficeStore, run_stress
+from stub_backends import ChatStub, TTSStub
+from stub_environment import close_office, environment, stub_office
+
+
+def test_no_lost_updates_across_processes():
+    """Concurrent writer processes lose nothing and converge on one state"""
+    print("🧪 Testing concurrent writer processes...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        report = run_stress(os.path.join(directory, "office.db"), processes=4, operations=150)
+
+    final = report['final']
+    assert report['lost'] == [] and report['unexpected'] == [], (report['lost'], report['unexpected'])
+    assert report['diverged'] == [], report['diverged']
+    assert len(final['current_tasks']) == 4 * 120
+    assert len(final['important_notes']) == 4 * 15 and len(final['user_preferences']) == 4 * 15
+    assert report['read_p99'] < 0.1, report['read_p99']
+    print(f"✅ {report['writes']} writes at {report['writes_per_second']:.0f}/s, "
+          f"refresh p99 {report['read_p99'] * 1000:.1f} ms, nothing lost")
+
+
+def test_readers_never_block_writers():
+    """A long read transaction neither delays writers nor sees half a change"""
+    print("🧪 Testing readers against writers...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "office.db")
+        writer = SharedOfficeStore(path)
+        writer.append('task_add', {'task': "قبل القراءة"})
+        reader = sqlite3.connect(path, isolation_level=None)
+        reader.execute("BEGIN")
+        before = reader.execute("SELECT count(*) FROM changes").fetchone()[0]
+
+        start = time.perf_counter()
+        for number in range(100):
+            writer.append('task_add', {'task': f"مهمة {number}"})
+        elapsed = time.perf_counter() - start
+
+        during = reader.execute("SELECT count(*) FROM changes").fetchone()[0]
+        reader.execute("COMMIT")
+        after = reader.execute("SELECT count(*) FROM changes").fetchone()[0]
+        reader.close()
+        writer.close()
+
+    assert (before, during, after) == (1, 1, 101), (before, during, after)
+    assert elapsed < 1.0, elapsed
+    print(f"✅ 100 writes in {elapsed * 1000:.0f} ms while a reader held its snapshot")
+
+
+def test_assistants_share_office_memory():
+    """Two assistants see each other's tasks and notes and never overwrite them"""
+    print("🧪 Testing assistants sharing office memory...")
+
+    router = IntentRouter()
+    chat, tts = ChatStub(delay=0.0), TTSStub(delay=0.0)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "office.db")
+            with environment(SHARED_MEMORY_DB=path):
+                first = stub_office(chat, tts, os.path.join(directory, "desk-1"))
+                second = stub_office(chat, tts, os.path.join(directory, "desk-2"))
+
+            async def command(office, text):
+                return await office.process_office_command(text, router.route(text))
+
+            async def scenario():
+                first.watch_shared_memory()
+                await command(first, "أضف مهمة مراجعة العقد")
+                await command(second, "أضف مهمة الاتصال بالعميل")
+                await command(second, "أضف ملاحظة موعد التسليم يوم الخميس")
+                await asyncio.sleep(0.3)
+                # Task 1 in the second desk's list is the first desk's task
+                deleted = await command(second, "حذف مهمة 1")
+                await command(first, "أضف مهمة تجهيز العرض")
+                await asyncio.sleep(0.3)
+                listed = await command(first, "عرض المهام")
+                # Each desk compacts on shutdown; neither may undo the other
+                first.save_memory()
+                second.save_memory()
+                await close_office(first)
+                await close_office(second)
+                return deleted, listed
+
+            deleted, listed = asyncio.run(scenario())
+            with environment(SHARED_MEMORY_DB=path):
+                third = stub_office(chat, tts, os.path.join(directory, "desk-3"))
+            reloaded = dict(third.office_context)
+            asyncio.run(close_office(third))
+    finally:
+        chat.close()
+        tts.close()
+
+    assert deleted == "تم حذف المهمة: مراجعة العقد", deleted
+    assert listed == "المهام الحالية:\n1. الاتصال بالعميل\n2. تجهيز العرض", listed
+    assert first.office_context['important_notes'] == ["موعد التسليم يوم الخميس"]
+    assert reloaded['current_tasks'] == ["الاتصال بالعميل", "تجهيز العرض"], reloaded['current_tasks']
+    assert reloaded['important_notes'] == first.office_context['important_notes']
+    print("✅ Changes from both desks kept, refreshed by notification and reloaded")
+
+
+def main():
+    """Main test function"""
+    print("🚀 Testing Shared Office Memory")
+    print("=" * 50)
+
+    tests = [
+        test_no_lost_updates_across_processes,
+        test_readers_never_block_writers,
+        test_assistants_share_office_memory,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} failed: {e}")
+        print()
+
+    print("=" * 50)
+    print(f"📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
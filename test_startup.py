@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Test script for lazy, concurrent startup
+"""
+
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+
+from startup import STARTUP, StartupProfile
+from stub_backends import ChatStub, TTSStub
+from stub_environment import close_office, stub_office
+
+REPO = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_sdks_not_imported_eagerly():
+    """Importing the assistant module leaves the cloud SDKs for later"""
+    print("🧪 Testing lazy SDK imports...")
+
+    code = ("import sys, arabic_voice_assistant; "
+            "print(sorted(m for m in ('openai', 'elevenlabs') if m in sys.modules))")
+    output = subprocess.run([sys.executable, "-c", code], cwd=REPO, capture_output=True,
+                            text=True, timeout=60)
+    assert output.returncode == 0, output.stderr
+    assert output.stdout.strip().splitlines()[-1] == "[]", output.stdout
+    print("✅ openai and elevenlabs not imported at module load")
+
+
+def test_profile_report():
+    """Phases are reported in start order with their overlap"""
+    print("🧪 Testing startup profile...")
+
+    profile = StartupProfile()
+    origin = profile.origin
+    profile.record("load memory", origin + 0.010, origin + 0.050)
+    profile.record("api clients", origin + 0.005, origin + 0.060)
+    report = profile.report(origin + 0.060)
+    lines = report.splitlines()
+    assert lines[2].startswith("api clients") and lines[3].startswith("load memory")
+    assert lines[-1] == "Ready after 60 ms; phases add up to 95 ms", lines[-1]
+    print("✅ Report ordered and totalled")
+
+
+def test_concurrent_init_phases():
+    """Client construction, memory and speech model loading overlap"""
+    print("🧪 Testing concurrent initialization...")
+
+    chat, tts = ChatStub(delay=0.01), TTSStub(delay=0.01)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            office = stub_office(chat, tts, directory)
+            office.record_memory('task_add', task="مراجعة العقد")
+            asyncio.run(close_office(office))
+            again = stub_office(chat, tts, directory)
+            tasks = list(again.office_context['current_tasks'])
+            asyncio.run(close_office(again))
+            office.warmup_thread.join(timeout=5)
+    finally:
+        chat.close()
+        tts.close()
+
+    assert tasks == ["مراجعة العقد"], tasks
+    assert again.openai_client is not None and again.elevenlabs_client is not None
+    phases = {name: (start, end, thread) for name, start, end, thread in STARTUP.phases}
+    for name in ("api clients", "load memory", "load stt (fake)"):
+        assert phases[name][2].startswith("startup"), phases[name]
+    assert {result['error'] for result in office.warmup_results} == {None}, office.warmup_results
+    print(f"✅ {len(STARTUP.phases)} phases recorded on startup threads")
+
+
+def main():
+    """Main test function"""
+    print("🚀 Testing Startup")
+    print("=" * 50)
+
+    tests = [
+        test_sdks_not_imported_eagerly,
+        test_profile_report,
+        test_concurrent_init_phases,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} failed: {e}")
+        print()
+
+    print("=" * 50)
+    print(f"📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
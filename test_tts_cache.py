@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Test script for the on-disk TTS cache
+"""
+
+import os
+import sys
+import tempfile
+
+from tts_cache import TTSCache
+
+
+def test_key_normalization():
+    """Whitespace and tatweel do not change the key, the voice does"""
+    print("🧪 Testing cache keys...")
+
+    key = TTSCache.make_key("لا توجد  مهام حالياً", "voice", "model")
+    assert key == TTSCache.make_key(" لا توجـد مهام حالياً ", "voice", "model")
+    assert key != TTSCache.make_key("لا توجد مهام حالياً", "other_voice", "model")
+    assert key != TTSCache.make_key("لا توجد مهام حالياً", "voice", "model", {"stability": 0.5})
+    print("✅ Keys are content addressed")
+
+
+def test_hits_misses_and_persistence():
+    """Entries survive a restart and lookups are counted"""
+    print("🧪 Testing hits, misses and persistence...")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = TTSCache(cache_dir=cache_dir)
+        assert cache.get("a") is None
+        cache.put("a", b"audio-a")
+        assert cache.get("a") == b"audio-a"
+        assert cache.stats()['hits'] == 1
+        assert cache.stats()['misses'] == 1
+
+        reopened = TTSCache(cache_dir=cache_dir)
+        assert reopened.get("a") == b"audio-a"
+    print("✅ Cache persisted across instances")
+
+
+def test_file_extension_follows_format():
+    """Raw PCM entries are stored as .pcm, MP3 entries as .mp3"""
+    print("🧪 Testing entry file names...")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = TTSCache(cache_dir=cache_dir)
+        pcm_key = TTSCache.make_key("مرحباً", "voice", "model", output_format="pcm_22050")
+        mp3_key = TTSCache.make_key("مرحباً", "voice", "model")
+        cache.put(pcm_key, b"\x00\x01" * 10)
+        cache.put(mp3_key, b"ID3-audio")
+
+        names = sorted(os.listdir(cache_dir))
+        assert names == sorted([pcm_key, mp3_key + ".mp3"]), names
+        assert pcm_key.endswith(".pcm")
+        reopened = TTSCache(cache_dir=cache_dir)
+        assert reopened.get(pcm_key) == b"\x00\x01" * 10
+        assert reopened.get(mp3_key) == b"ID3-audio"
+    print("✅ Extensions match the audio format")
+
+
+def test_lru_eviction():
+    """The least recently used entry is evicted over the size cap"""
+    print("🧪 Testing LRU eviction...")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = TTSCache(cache_dir=cache_dir, max_bytes=30)
+        cache.put("a", b"a" * 10)
+        cache.put("b", b"b" * 10)
+        cache.put("c", b"c" * 10)
+        cache.get("a")
+        cache.put("d", b"d" * 10)
+
+        assert "b" not in cache
+        assert "a" in cache and "c" in cache and "d" in cache
+        assert cache.stats()['bytes'] == 30
+        assert cache.stats()['evictions'] == 1
+    print("✅ Oldest entry evicted")
+
+
+def test_prewarm():
+    """Pre-warming synthesizes only missing phrases"""
+    print("🧪 Testing pre-warm...")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = TTSCache(cache_dir=cache_dir)
+        synthesized = []
+
+        def synthesize(text):
+            synthesized.append(text)
+            return text.encode()
+
+        make_key = lambda text: TTSCache.make_key(text, "voice", "model")
+        cache.put(make_key("تم عرض الإعدادات"), b"cached")
+        cache.prewarm(["تم عرض الإعدادات", "رقم المهمة غير صحيح"], make_key, synthesize).join()
+
+        assert synthesized == ["رقم المهمة غير صحيح"]
+        assert cache.get(make_key("رقم المهمة غير صحيح")) == "رقم المهمة غير صحيح".encode()
+    print("✅ Pre-warm filled the cache")
+
+
+def main():
+    """Main test function"""
+    print("🚀 Testing TTS Cache")
+    print("=" * 50)
+
+    tests = [
+        test_key_normalization,
+        test_hits_misses_and_persistence,
+        test_file_extension_follows_format,
+        test_lru_eviction,
+        test_prewarm,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} failed: {e}")
+        print()
+
+    print("=" * 50)
+    print(f"📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -3,16 +3,26 @@
 Test script to verify voice recognition is working
 """
 
+import os
 import speech_recognition as sr
 import time
+from dotenv import load_dotenv
+from stt_backends import create_backend
 
 def test_voice_recognition():
     """Test basic voice recognition"""
     print("🎤 اختبار التعرف على الكلام...")
     
     # Initialize recognizer and microphone
+    load_dotenv()
     recognizer = sr.Recognizer()
     microphone = sr.Microphone()
+    backend = create_backend(
+        os.getenv("STT_BACKEND", "google"),
+        recognizer=recognizer,
+        model_path=os.getenv("STT_MODEL_PATH")
+    )
+    backend.load()
     
     try:
         with microphone as source:
@@ -28,8 +38,8 @@ def test_voice_recognition():
         
         # Try recognition
         try:
-            text = recognizer.recognize_google(audio, language='ar-SA')
-            print(f"✅ تم التعرف على الكلام: {text}")
+            text = backend.recognize(audio)
+            print(f"✅ تم التعرف على الكلام: {text} ({backend.name}، {backend.last_latency * 1000:.0f} مللي ثانية)")
             return text
         except sr.UnknownValueError:
             print("❌ لم أتمكن من فهم الصوت")
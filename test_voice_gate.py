@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Test script for the local voice gate using generated clips
+"""
+
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+from test_audio_capture import write_wav
+from voice_gate import KeywordSpotter, VoiceGate, evaluate
+
+SAMPLE_RATE = 16000
+rng = np.random.default_rng(7)
+
+
+def voiced(seconds: float, f0: float = 140) -> np.ndarray:
+    """Harmonic, syllable-modulated signal that behaves like voiced speech"""
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    phase = 2 * np.pi * np.cumsum(f0 * (1 + 0.1 * np.sin(2 * np.pi * 1.5 * t))) / SAMPLE_RATE
+    harmonics = sum(np.sin(k * phase) / k for k in range(1, 12))
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t) ** 2
+    return (6000 * harmonics * envelope).astype(np.int16)
+
+
+def chirp(f0: float, f1: float, seconds: float = 0.6) -> np.ndarray:
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return (8000 * np.sin(2 * np.pi * (f0 * t + (f1 - f0) * t * t / (2 * seconds)))).astype(np.int16)
+
+
+def noise(seconds: float, level: float) -> np.ndarray:
+    return rng.normal(0, level, int(seconds * SAMPLE_RATE)).astype(np.int16)
+
+
+def door_slam() -> np.ndarray:
+    clip = np.zeros(SAMPLE_RATE)
+    clip[1000:3000] = rng.normal(0, 15000, 2000) * np.exp(-np.arange(2000) / 300)
+    return clip.astype(np.int16)
+
+
+def test_rejects_non_speech():
+    """Silence, hiss and a door slam are rejected, speech is accepted"""
+    print("🧪 Testing speech versus non-speech...")
+
+    gate = VoiceGate()
+    assert gate.check(voiced(1.5)).accepted
+    assert gate.check(noise(1.0, 20)).reason == 'silence'
+    assert gate.check(noise(1.0, 3000)).reason == 'noise'
+    assert not gate.check(door_slam()).accepted
+
+    stats = gate.stats()
+    assert stats['segments'] == 4 and stats['rejected'] == 3
+    assert stats['us_per_frame'] < 1000
+    print(f"✅ Rejected {stats['rejected']}/{stats['segments']}, {stats['us_per_frame']:.1f} µs per frame")
+
+
+def test_noise_floor_raises_threshold():
+    """Quiet background chatter below the room's noise margin is ignored"""
+    print("🧪 Testing noise-floor relative threshold...")
+
+    gate = VoiceGate()
+    distant = (voiced(1.5) * 0.05).astype(np.int16)
+    assert gate.check(distant).accepted
+    loud_room = (1500 / 32768.0) ** 2
+    assert not gate.check(distant, noise_floor=loud_room).accepted
+    print("✅ Distant speech rejected in a noisy room")
+
+
+def test_wake_word():
+    """Only segments containing the enrolled name pass, then follow-ups pass"""
+    print("🧪 Testing wake word spotting...")
+
+    name = np.concatenate([chirp(300, 900), chirp(900, 400)])
+    spotter = KeywordSpotter()
+    spotter.enroll(name)
+    gate = VoiceGate(spotter=spotter, require_wake_word=True, wake_window=10)
+
+    without_name = np.concatenate([voiced(1.0), voiced(0.5, f0=200)])
+    with_name = np.concatenate([noise(0.2, 100), (name * 0.5).astype(np.int16), voiced(1.0)])
+
+    assert gate.check(without_name, now=0).reason == 'wake_word'
+    assert gate.check(with_name, now=1).accepted
+    assert gate.check(without_name, now=5).accepted
+    assert gate.check(without_name, now=20).reason == 'wake_word'
+    print("✅ Wake word opens a follow-up window")
+
+
+def test_offline_evaluation():
+    """The offline evaluator scores a labelled folder of clips"""
+    print("🧪 Testing offline evaluation...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.makedirs(os.path.join(directory, "speech"))
+        os.makedirs(os.path.join(directory, "non_speech"))
+        for i in range(3):
+            write_wav(os.path.join(directory, "speech", f"{i}.wav"), voiced(1.0 + i * 0.3, f0=120 + 30 * i))
+        write_wav(os.path.join(directory, "non_speech", "hiss.wav"), noise(1.0, 3000))
+        write_wav(os.path.join(directory, "non_speech", "slam.wav"), door_slam())
+        write_wav(os.path.join(directory, "non_speech", "quiet.wav"), noise(1.0, 10))
+
+        results = evaluate(directory, VoiceGate())
+
+    assert results['recall'] == 1.0
+    assert results['rejection_rate'] == 1.0
+    print(f"✅ Recall {results['recall']:.2f}, rejection {results['rejection_rate']:.2f}")
+
+
+def main():
+    """Main test function"""
+    print("🚀 Testing Voice Gate")
+    print("=" * 50)
+
+    tests = [
+        test_rejects_non_speech,
+        test_noise_floor_raises_threshold,
+        test_wake_word,
+        test_offline_evaluation,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} failed: {e}")
+        print()
+
+    print("=" * 50)
+    print(f"📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Content-addressed on-disk TTS cache for the Arabic Voice Assistant
+Repeated phrases are played from disk instead of a paid ElevenLabs round trip
+"""
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional
+
+# Tatweel (kashida) only stretches letters, it never changes pronunciation
+TATWEEL = "ـ"
+
+# File extension per ElevenLabs output_format family (mp3_44100_128, pcm_22050, ...)
+FORMAT_EXTENSIONS = {
+    'mp3': ".mp3",
+    'pcm': ".pcm",
+    'wav': ".wav",
+    'ulaw': ".ulaw",
+    'alaw': ".alaw",
+    'opus': ".opus",
+}
+DEFAULT_EXTENSION = ".mp3"
+
+
+def format_extension(output_format: Optional[str]) -> str:
+    """File extension for audio in an ElevenLabs output_format"""
+    if not output_format:
+        return DEFAULT_EXTENSION
+    return FORMAT_EXTENSIONS.get(output_format.split("_", 1)[0], ".audio")
+
+
+def normalize_speech_text(text: str) -> str:
+    """Normalize text without changing how it would be pronounced"""
+    text = unicodedata.normalize("NFC", text).replace(TATWEEL, "")
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class TTSCache:
+    """File-per-entry audio cache with a size cap and LRU eviction
+
+    Keys for MP3 audio are bare hashes stored as <key>.mp3; keys for other
+    formats carry their extension (<hash>.pcm) so each file says what it holds.
+    """
+
+    def __init__(self, cache_dir: str = "tts_cache", max_bytes: int = 100 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.total_bytes = 0
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        """Rebuild the LRU order from file modification times"""
+        files = []
+        extensions = set(FORMAT_EXTENSIONS.values()) | {".audio"}
+        for name in os.listdir(self.cache_dir):
+            stem, extension = os.path.splitext(name)
+            if extension not in extensions:
+                continue
+            stat = os.stat(os.path.join(self.cache_dir, name))
+            files.append((stat.st_mtime, stem if extension == DEFAULT_EXTENSION else name, stat.st_size))
+
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+            self.total_bytes += size
+        self._evict()
+
+    def _path(self, key: str) -> str:
+        if os.path.splitext(key)[1]:
+            return os.path.join(self.cache_dir, key)
+        return os.path.join(self.cache_dir, key + DEFAULT_EXTENSION)
+
+    @staticmethod
+    def make_key(text: str, voice_id: Optional[str], voice_model: Optional[str],
+                 voice_settings: Optional[Dict[str, Any]] = None, output_format: Optional[str] = None) -> str:
+        """Hash everything that affects the synthesized audio"""
+        fields = {
+            'text': normalize_speech_text(text),
+            'voice_id': voice_id,
+            'voice_model': voice_model,
+            'voice_settings': voice_settings or {},
+        }
+        if output_format:
+            # Only non-default formats, so existing MP3 entries keep their keys
+            fields['output_format'] = output_format
+        payload = json.dumps(fields, ensure_ascii=False, sort_keys=True)
+        digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        extension = format_extension(output_format)
+        return digest if extension == DEFAULT_EXTENSION else digest + extension
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return cached audio and mark it as recently used"""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+
+        try:
+            with open(self._path(key), 'rb') as f:
+                audio = f.read()
+            # Persist recency so LRU order survives restarts
+            os.utime(self._path(key))
+        except OSError:
+            with self._lock:
+                self.total_bytes -= self._entries.pop(key, 0)
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return audio
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def put(self, key: str, audio: bytes):
+        """Store audio atomically and evict old entries over the size cap"""
+        if not audio or len(audio) > self.max_bytes:
+            return
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(audio)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            return
+
+        with self._lock:
+            self.total_bytes -= self._entries.pop(key, 0)
+            self._entries[key] = len(audio)
+            self.total_bytes += len(audio)
+            self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries until under the size cap"""
+        while self.total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self.total_bytes -= size
+            self.evictions += 1
+            try:
+                os.unlink(self._path(key))
+            except OSError:
+                pass
+
+    def prewarm(self, phrases: Iterable[str], make_key: Callable[[str], str],
+                synthesize: Callable[[str], bytes]) -> threading.Thread:
+        """Synthesize missing phrases on a background thread"""
+        def run():
+            warmed = 0
+            for phrase in phrases:
+                key = make_key(phrase)
+                if key in self:
+                    continue
+                try:
+                    self.put(key, synthesize(phrase))
+                    warmed += 1
+                except Exception as e:
+                    print(f"⚠️ فشل تحضير الصوت المسبق: {e}")
+            if warmed:
+                print(f"✅ تم تحضير {warmed} عبارة صوتية مسبقاً")
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit/miss counters and cache size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self.total_bytes,
+            }
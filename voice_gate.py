@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Local voice gate for the Arabic Voice Assistant
+Frame-level VAD and an optional wake-word spotter decide which segments are
+worth a cloud recognition round trip
+"""
+
+import argparse
+import os
+import sys
+import time
+import wave
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+def frame_signal(samples: np.ndarray, frame_length: int, hop: int) -> np.ndarray:
+    """Split samples into overlapping frames (one row per frame)"""
+    if len(samples) < frame_length:
+        samples = np.pad(samples, (0, frame_length - len(samples)))
+    count = 1 + (len(samples) - frame_length) // hop
+    strides = (samples.strides[0] * hop, samples.strides[0])
+    return np.lib.stride_tricks.as_strided(samples, shape=(count, frame_length), strides=strides)
+
+
+def read_wav(path: str) -> Tuple[np.ndarray, int]:
+    """Read a 16-bit mono WAV file"""
+    with wave.open(path, 'rb') as wav:
+        if wav.getsampwidth() != 2 or wav.getnchannels() != 1:
+            raise ValueError(f"{path} must be 16-bit mono PCM")
+        data = wav.readframes(wav.getnframes())
+        return np.frombuffer(data, dtype='<i2'), wav.getframerate()
+
+
+@dataclass
+class GateDecision:
+    """Outcome of gating one segment"""
+    accepted: bool
+    reason: str
+    speech_ratio: float = 0.0
+    voiced_seconds: float = 0.0
+    wake_word_distance: Optional[float] = None
+
+
+class KeywordSpotter:
+    """Template-matching spotter for the assistant's name using log-mel features and DTW"""
+
+    def __init__(self, sample_rate: int = 16000, threshold: float = 0.16, search_seconds: float = 2.5,
+                 n_mels: int = 26):
+        self.sample_rate = sample_rate
+        self.threshold = threshold
+        self.search_seconds = search_seconds
+        self.frame_length = int(0.025 * sample_rate)
+        self.hop = int(0.010 * sample_rate)
+        self.n_fft = 512
+        self.templates: List[np.ndarray] = []
+        self.mel_filters = self._mel_filterbank(n_mels)
+        self.window = np.hamming(self.frame_length).astype(np.float32)
+
+    def _mel_filterbank(self, n_mels: int) -> np.ndarray:
+        def to_mel(hz):
+            return 2595 * np.log10(1 + hz / 700)
+
+        def to_hz(mel):
+            return 700 * (10 ** (mel / 2595) - 1)
+
+        mel_points = np.linspace(to_mel(60), to_mel(self.sample_rate / 2), n_mels + 2)
+        bins = np.floor((self.n_fft + 1) * to_hz(mel_points) / self.sample_rate).astype(int)
+        filters = np.zeros((n_mels, self.n_fft // 2 + 1), dtype=np.float32)
+        for m in range(1, n_mels + 1):
+            left, center, right = bins[m - 1], bins[m], bins[m + 1]
+            if center > left:
+                filters[m - 1, left:center] = (np.arange(left, center) - left) / (center - left)
+            if right > center:
+                filters[m - 1, center:right] = (right - np.arange(center, right)) / (right - center)
+        return filters
+
+    def features(self, samples: np.ndarray) -> np.ndarray:
+        """Gain-independent log-mel frames as unit vectors"""
+        frames = frame_signal(samples.astype(np.float32) / 32768.0, self.frame_length, self.hop)
+        power = np.abs(np.fft.rfft(frames * self.window, n=self.n_fft)) ** 2
+        log_mel = np.log(power @ self.mel_filters.T + 1e-10)
+        # Removing the per-frame mean cancels loudness differences
+        log_mel -= log_mel.mean(axis=1, keepdims=True)
+        return log_mel / (np.linalg.norm(log_mel, axis=1, keepdims=True) + 1e-8)
+
+    def enroll(self, samples: np.ndarray):
+        """Add a recording of the assistant's name as a template"""
+        self.templates.append(self.features(samples))
+
+    def enroll_directory(self, directory: str) -> int:
+        """Enroll every WAV file in a directory"""
+        for name in sorted(os.listdir(directory)):
+            if name.lower().endswith(".wav"):
+                samples, _ = read_wav(os.path.join(directory, name))
+                self.enroll(samples)
+        return len(self.templates)
+
+    @staticmethod
+    def subsequence_distance(template: np.ndarray, query: np.ndarray) -> float:
+        """Best DTW alignment of the whole template anywhere in the query
+
+        Steps (1,0), (1,1) and (1,2) let each template row be computed from
+        the previous row alone, so every row is one vectorized operation.
+        """
+        # Cosine distance between unit-length frames
+        cost = 1.0 - template @ query.T
+        accumulated = cost[0].copy()
+        for i in range(1, len(template)):
+            best = accumulated.copy()
+            best[1:] = np.minimum(best[1:], accumulated[:-1])
+            best[2:] = np.minimum(best[2:], accumulated[:-2])
+            accumulated = cost[i] + best
+        return float(accumulated.min() / len(template))
+
+    def distance(self, samples: np.ndarray) -> Optional[float]:
+        """Smallest normalized distance to any template, None without templates"""
+        if not self.templates:
+            return None
+        query = self.features(samples[:int(self.search_seconds * self.sample_rate)])
+        return min(self.subsequence_distance(template, query) for template in self.templates)
+
+
+class VoiceGate:
+    """Reject segments without speech (or without the wake word) before recognition"""
+
+    def __init__(self, sample_rate: int = 16000, frame_seconds: float = 0.02,
+                 min_energy_db: float = -50.0, noise_margin_db: float = 10.0,
+                 zcr_range: Tuple[float, float] = (0.01, 0.35), max_flatness: float = 0.45,
+                 min_speech_ratio: float = 0.2, min_voiced_seconds: float = 0.2,
+                 spotter: Optional[KeywordSpotter] = None, require_wake_word: bool = False,
+                 wake_window: float = 20.0):
+        self.sample_rate = sample_rate
+        self.frame_seconds = frame_seconds
+        self.min_energy_db = min_energy_db
+        self.noise_margin_db = noise_margin_db
+        self.zcr_range = zcr_range
+        self.max_flatness = max_flatness
+        self.min_speech_ratio = min_speech_ratio
+        self.min_voiced_seconds = min_voiced_seconds
+        self.spotter = spotter
+        self.require_wake_word = require_wake_word
+        self.wake_window = wake_window
+        self.counters = {
+            'segments': 0,
+            'accepted': 0,
+            'rejected_silence': 0,
+            'rejected_noise': 0,
+            'rejected_wake_word': 0,
+        }
+        self.frames_processed = 0
+        self.gate_seconds = 0.0
+        self._wake_until = 0.0
+
+    def frame_features(self, samples: np.ndarray) -> Dict[str, np.ndarray]:
+        """Energy (dBFS), zero-crossing rate and spectral flatness per frame"""
+        frame_length = int(self.frame_seconds * self.sample_rate)
+        frames = frame_signal(samples.astype(np.float32) / 32768.0, frame_length, frame_length)
+
+        energy_db = 10 * np.log10((frames ** 2).mean(axis=1) + 1e-12)
+        signs = np.signbit(frames)
+        zcr = (signs[:, 1:] != signs[:, :-1]).mean(axis=1)
+        power = np.abs(np.fft.rfft(frames, axis=1)) ** 2 + 1e-12
+        flatness = np.exp(np.log(power).mean(axis=1)) / power.mean(axis=1)
+        return {'energy_db': energy_db, 'zcr': zcr, 'flatness': flatness}
+
+    def speech_frames(self, samples: np.ndarray,
+                      noise_floor: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Boolean masks of loud frames and of frames that look like speech"""
+        features = self.frame_features(samples)
+        threshold = self.min_energy_db
+        if noise_floor:
+            threshold = max(threshold, 10 * np.log10(noise_floor) + self.noise_margin_db)
+        loud = features['energy_db'] > threshold
+        return loud, (
+            loud
+            & (features['zcr'] >= self.zcr_range[0])
+            & (features['zcr'] <= self.zcr_range[1])
+            & (features['flatness'] <= self.max_flatness)
+        )
+
+    def check(self, samples: np.ndarray, noise_floor: Optional[float] = None,
+              now: Optional[float] = None) -> GateDecision:
+        """Decide whether a segment should be sent to recognition"""
+        start = time.perf_counter()
+        now = time.monotonic() if now is None else now
+        self.counters['segments'] += 1
+        try:
+            loud, mask = self.speech_frames(samples, noise_floor)
+            self.frames_processed += len(mask)
+            speech_ratio = float(mask.mean()) if len(mask) else 0.0
+            voiced_seconds = float(mask.sum()) * self.frame_seconds
+
+            if not loud.any():
+                self.counters['rejected_silence'] += 1
+                return GateDecision(False, 'silence', speech_ratio, voiced_seconds)
+            if speech_ratio < self.min_speech_ratio or voiced_seconds < self.min_voiced_seconds:
+                self.counters['rejected_noise'] += 1
+                return GateDecision(False, 'noise', speech_ratio, voiced_seconds)
+
+            distance = None
+            if self.require_wake_word and self.spotter and now >= self._wake_until:
+                distance = self.spotter.distance(samples)
+                if distance is None or distance > self.spotter.threshold:
+                    self.counters['rejected_wake_word'] += 1
+                    return GateDecision(False, 'wake_word', speech_ratio, voiced_seconds, distance)
+            if self.require_wake_word:
+                # Follow-up questions do not need the name again
+                self._wake_until = now + self.wake_window
+
+            self.counters['accepted'] += 1
+            return GateDecision(True, 'speech', speech_ratio, voiced_seconds, distance)
+        finally:
+            self.gate_seconds += time.perf_counter() - start
+
+    def stats(self) -> Dict[str, float]:
+        """Rejection counts and the gate's own per-frame cost"""
+        stats = dict(self.counters)
+        rejected = stats['segments'] - stats['accepted']
+        stats['rejected'] = rejected
+        stats['rejection_rate'] = rejected / stats['segments'] if stats['segments'] else 0.0
+        stats['gate_seconds'] = self.gate_seconds
+        stats['us_per_frame'] = (
+            self.gate_seconds / self.frames_processed * 1e6 if self.frames_processed else 0.0
+        )
+        return stats
+
+
+def evaluate(directory: str, gate: VoiceGate) -> Dict[str, float]:
+    """Score the gate on WAV clips in speech/ and non_speech/ subfolders"""
+    results = {'true_positive': 0, 'false_negative': 0, 'true_negative': 0, 'false_positive': 0}
+    for label in ('speech', 'non_speech'):
+        folder = os.path.join(directory, label)
+        if not os.path.isdir(folder):
+            continue
+        for name in sorted(os.listdir(folder)):
+            if not name.lower().endswith(".wav"):
+                continue
+            samples, sample_rate = read_wav(os.path.join(folder, name))
+            gate.sample_rate = sample_rate
+            accepted = gate.check(samples).accepted
+            if label == 'speech':
+                results['true_positive' if accepted else 'false_negative'] += 1
+            else:
+                results['false_positive' if accepted else 'true_negative'] += 1
+
+    speech = results['true_positive'] + results['false_negative']
+    non_speech = results['true_negative'] + results['false_positive']
+    results['recall'] = results['true_positive'] / speech if speech else 0.0
+    results['rejection_rate'] = results['true_negative'] / non_speech if non_speech else 0.0
+    results.update({key: value for key, value in gate.stats().items()
+                    if key in ('us_per_frame', 'gate_seconds')})
+    return results
+
+
+def main():
+    """Evaluate the voice gate offline on a folder of labelled clips"""
+    parser = argparse.ArgumentParser(description="Evaluate the local voice gate on labelled WAV clips")
+    parser.add_argument("directory", help="folder with speech/ and non_speech/ subfolders")
+    parser.add_argument("--wake-word-templates", help="folder of WAV recordings of the assistant's name")
+    args = parser.parse_args()
+
+    gate = VoiceGate()
+    if args.wake_word_templates:
+        gate.spotter = KeywordSpotter()
+        gate.spotter.enroll_directory(args.wake_word_templates)
+        gate.require_wake_word = True
+        gate.wake_window = 0
+
+    results = evaluate(args.directory, gate)
+    print("🚦 Voice Gate Evaluation")
+    print("=" * 40)
+    for key, value in results.items():
+        print(f"{key}: {value:.3f}" if isinstance(value, float) else f"{key}: {value}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())